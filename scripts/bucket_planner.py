@@ -0,0 +1,212 @@
+#!/usr/bin/env python3
+"""
+Aspect-ratio bucket planner for sd-scripts training.
+- Builds the same bucket resolutions sd-scripts does (make_bucket_resolutions)
+- Assigns each image to the bucket with the closest aspect ratio, reading sizes
+  from a dimension cache (falls back to a header-only read on a miss)
+- Pre-resizes and centre-crops every image to its bucket once, in parallel
+- Writes a fine-tuning metadata JSON (caption + train_resolution per image) that
+  train_network.py consumes via --in_json, so the trainer neither opens images
+  to size them at start-up nor resizes them every step.
+
+Prints PROGRESS:{json} lines, then a final JSON summary on stdout.
+"""
+
+import argparse
+import json
+import math
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Dict, List, Optional, Tuple
+
+from PIL import Image, ImageOps
+
+IMAGE_EXTENSIONS = ('.png', '.jpg', '.jpeg', '.webp')
+
+
+def make_bucket_resolutions(max_reso: Tuple[int, int], min_size: int, max_size: int, divisible: int) -> List[Tuple[int, int]]:
+    """Port of sd-scripts library/model_util.make_bucket_resolutions."""
+    max_width, max_height = max_reso
+    max_area = max_width * max_height
+
+    resos = set()
+
+    width = int(math.sqrt(max_area) // divisible) * divisible
+    resos.add((width, width))
+
+    width = min_size
+    while width <= max_size:
+        height = min(max_size, int((max_area // width) // divisible) * divisible)
+        if height >= min_size:
+            resos.add((width, height))
+            resos.add((height, width))
+        width += divisible
+
+    return sorted(resos)
+
+
+def select_bucket(width: int, height: int, buckets: List[Tuple[int, int]]) -> Tuple[Tuple[int, int], Tuple[int, int]]:
+    """Returns (bucket, resized size before centre crop), matching sd-scripts BucketManager.select_bucket."""
+    aspect = width / height
+    bucket = min(buckets, key=lambda b: abs(b[0] / b[1] - aspect))
+
+    if aspect > bucket[0] / bucket[1]:
+        scale = bucket[1] / height
+    else:
+        scale = bucket[0] / width
+    resized = (int(width * scale + 0.5), int(height * scale + 0.5))
+    return bucket, resized
+
+
+def load_dims_cache(path: Optional[str]) -> Dict:
+    if not path or not os.path.exists(path):
+        return {}
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def save_dims_cache(path: Optional[str], cache: Dict):
+    if not path:
+        return
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = path + '.tmp'
+    with open(tmp, 'w', encoding='utf-8') as f:
+        json.dump(cache, f)
+    os.replace(tmp, path)
+
+
+def image_dims(path: str, cache: Dict) -> Tuple[int, int]:
+    """Size after EXIF orientation, cached by path + size + mtime."""
+    st = os.stat(path)
+    key = f"{path}|{st.st_size}|{st.st_mtime_ns}"
+    cached = cache.get(key)
+    if cached:
+        return cached[0], cached[1]
+
+    with Image.open(path) as img:  # Header only, no pixel decode
+        width, height = img.size
+        try:
+            orientation = img.getexif().get(0x0112, 1)
+        except Exception:
+            orientation = 1
+        if orientation in (5, 6, 7, 8):
+            width, height = height, width
+
+    cache[key] = [width, height]
+    return width, height
+
+
+def resize_to_bucket(src: str, dst: str, bucket: Tuple[int, int], resized: Tuple[int, int]) -> Optional[str]:
+    """Worker: resize to cover the bucket, centre-crop to it and save. Returns an error string on failure."""
+    try:
+        with Image.open(src) as img:
+            img = ImageOps.exif_transpose(img)
+            mode = 'RGBA' if img.mode in ('RGBA', 'LA', 'P') else 'RGB'
+            img = img.convert(mode)
+            if img.size != resized:
+                img = img.resize(resized, Image.LANCZOS)
+            left = (resized[0] - bucket[0]) // 2
+            top = (resized[1] - bucket[1]) // 2
+            img = img.crop((left, top, left + bucket[0], top + bucket[1]))
+            img.save(dst, format='PNG', compress_level=1)
+        return None
+    except Exception as e:
+        return str(e)
+
+
+def read_caption(caption_dir: str, image_name: str, extension: str) -> str:
+    caption_path = os.path.join(caption_dir, os.path.splitext(image_name)[0] + extension)
+    try:
+        with open(caption_path, 'r', encoding='utf-8') as f:
+            return f.read().strip()
+    except OSError:
+        return ''
+
+
+def report(processed: int, total: int, current: str):
+    print('PROGRESS:' + json.dumps({'progress': {'processed': processed, 'total': total, 'current': current}}), flush=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Plan aspect-ratio buckets and pre-resize a training dataset')
+    parser.add_argument('--source-dir', required=True, help='Folder with images and caption files')
+    parser.add_argument('--output-dir', required=True, help='Folder to write bucket-sized images to')
+    parser.add_argument('--metadata', required=True, help='Path of the metadata JSON to write (for --in_json)')
+    parser.add_argument('--resolution', required=True, help='Training resolution as W,H')
+    parser.add_argument('--min-bucket-reso', type=int, default=256)
+    parser.add_argument('--max-bucket-reso', type=int, default=1024)
+    parser.add_argument('--bucket-reso-steps', type=int, default=64)
+    parser.add_argument('--caption-dir', help='Folder with caption files (default: --source-dir)')
+    parser.add_argument('--caption-extension', default='.txt')
+    parser.add_argument('--dims-cache', help='JSON file caching image dimensions between runs')
+    parser.add_argument('--workers', type=int, default=max(2, (os.cpu_count() or 2) // 2))
+    args = parser.parse_args()
+
+    width, height = (int(v) for v in args.resolution.split(','))
+    buckets = make_bucket_resolutions((width, height), args.min_bucket_reso, args.max_bucket_reso, args.bucket_reso_steps)
+
+    images = sorted(f for f in os.listdir(args.source_dir) if f.lower().endswith(IMAGE_EXTENSIONS))
+    if not images:
+        print(json.dumps({'error': 'No images found in source directory'}))
+        sys.exit(1)
+
+    os.makedirs(args.output_dir, exist_ok=True)
+    caption_dir = args.caption_dir or args.source_dir
+    dims_cache = load_dims_cache(args.dims_cache)
+
+    # Plan: sizes come from the cache, so this pass doesn't decode anything
+    plan = []
+    for name in images:
+        src = os.path.join(args.source_dir, name)
+        w, h = image_dims(src, dims_cache)
+        bucket, resized = select_bucket(w, h, buckets)
+        dst = os.path.join(args.output_dir, os.path.splitext(name)[0] + '.png')
+        plan.append((src, dst, bucket, resized))
+    save_dims_cache(args.dims_cache, dims_cache)
+
+    total = len(plan)
+    report(0, total, f'Planned {total} images into buckets')
+
+    metadata = {}
+    bucket_counts: Dict[str, int] = {}
+    failed = 0
+    processed = 0
+
+    with ProcessPoolExecutor(max_workers=args.workers) as pool:
+        futures = {pool.submit(resize_to_bucket, src, dst, bucket, resized): (src, dst, bucket)
+                   for src, dst, bucket, resized in plan}
+        for future in as_completed(futures):
+            src, dst, bucket = futures[future]
+            error = future.result()
+            processed += 1
+            if error:
+                failed += 1
+                print(f"Failed to resize {src}: {error}", file=sys.stderr)
+            else:
+                # Absolute paths as keys: sd-scripts uses them directly when they exist
+                metadata[os.path.abspath(dst)] = {
+                    'caption': read_caption(caption_dir, os.path.basename(src), args.caption_extension),
+                    'train_resolution': [bucket[0], bucket[1]],
+                }
+                label = f'{bucket[0]}x{bucket[1]}'
+                bucket_counts[label] = bucket_counts.get(label, 0) + 1
+            if processed % 10 == 0 or processed == total:
+                report(processed, total, f'Resizing {os.path.basename(src)}')
+
+    with open(args.metadata, 'w', encoding='utf-8') as f:
+        json.dump(metadata, f, indent=2, ensure_ascii=False)
+
+    print(json.dumps({
+        'images': len(metadata),
+        'failed': failed,
+        'buckets': dict(sorted(bucket_counts.items())),
+        'metadata': os.path.abspath(args.metadata),
+    }))
+
+
+if __name__ == '__main__':
+    main()
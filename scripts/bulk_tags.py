@@ -0,0 +1,271 @@
+#!/usr/bin/env python3
+"""
+Bulk tag editing over a project's captions in one pass.
+
+Applies an ordered list of rules to every caption in train_data (sidecar .txt
+files, or captions.db when the project uses the caption store), then writes
+only the captions that changed:
+- sidecars: each file is replaced atomically (temp file + rename)
+- store: one transaction
+The tag index (tag_index.py) is updated for the changed captions.
+
+Rules (JSON list, applied in order to each caption's comma-separated tags;
+tags match case-insensitively with spaces and underscores treated alike, and
+a trailing * matches by prefix):
+    {"op": "remove", "tags": ["hat", "simple_background", "hair_*"]}
+    {"op": "replace", "from": "cap", "to": "baseball cap"}      # "to": "" removes
+    {"op": "alias", "map": {"blonde hair": "yellow hair", ...}}
+    {"op": "move_to_front", "tags": ["1girl"], "keep_tokens": 1}  # after the trigger
+    {"op": "dedupe"}
+    {"op": "max_tags", "count": 20, "keep_tokens": 1}
+
+--dry_run reports what would change without writing. Sidecars that can't be read
+(or aren't UTF-8) are skipped and counted as unreadable. Prints one JSON summary line.
+
+CLI:
+    bulk_tags.py --project_dir projects/<id> --rules rules.json [--folder 10_class] [--caption_store captions.db] [--dry_run]
+"""
+
+import argparse
+import json
+import os
+import stat
+import sys
+import tempfile
+import time
+from collections import Counter
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+
+from caption_store import CaptionStore
+from tag_index import TagIndex, normalize_tag
+
+IMAGE_EXTENSIONS = ('.png', '.jpg', '.jpeg', '.webp')
+SAMPLE_LIMIT = 20
+TAG_CHANGES_LIMIT = 100
+
+
+class RuleError(ValueError):
+    pass
+
+
+def matcher(patterns: List[str]) -> Callable[[str], bool]:
+    exact = set()
+    prefixes = []
+    for pattern in patterns:
+        if pattern.strip().endswith('*'):
+            prefixes.append(normalize_tag(pattern.strip()[:-1]))
+        else:
+            exact.add(normalize_tag(pattern))
+    prefixes = tuple(p for p in prefixes if p)
+    return lambda tag: (norm := normalize_tag(tag)) in exact or (bool(prefixes) and norm.startswith(prefixes))
+
+
+def split_tags(text: str) -> List[str]:
+    return [t.strip() for t in text.split(',') if t.strip()]
+
+
+def compile_rule(rule: Dict) -> Callable[[List[str]], List[str]]:
+    op = rule.get('op')
+
+    if op == 'remove':
+        match = matcher(rule.get('tags', []))
+        return lambda tags: [t for t in tags if not match(t)]
+
+    if op in ('replace', 'alias'):
+        mapping = {rule.get('from', ''): rule.get('to', '')} if op == 'replace' else rule.get('map', {})
+        if not isinstance(mapping, dict):
+            raise RuleError(f'{op}: expected a mapping')
+        table = {normalize_tag(k): split_tags(v or '') for k, v in mapping.items() if normalize_tag(k)}
+
+        def apply(tags):
+            out = []
+            for t in tags:
+                out.extend(table.get(normalize_tag(t), [t]))
+            return out
+        return apply
+
+    if op == 'move_to_front':
+        wanted = [normalize_tag(t) for t in rule.get('tags', [])]
+        keep = max(0, int(rule.get('keep_tokens', 1)))
+
+        def apply(tags):
+            head, rest = tags[:keep], tags[keep:]
+            by_norm = {normalize_tag(t): t for t in rest}
+            moved = [by_norm[w] for w in wanted if w in by_norm]
+            moved_set = {normalize_tag(t) for t in moved}
+            return head + moved + [t for t in rest if normalize_tag(t) not in moved_set]
+        return apply
+
+    if op == 'dedupe':
+        def apply(tags):
+            seen = set()
+            out = []
+            for t in tags:
+                norm = normalize_tag(t)
+                if norm not in seen:
+                    seen.add(norm)
+                    out.append(t)
+            return out
+        return apply
+
+    if op == 'max_tags':
+        count = int(rule.get('count', 0))
+        if count <= 0:
+            raise RuleError('max_tags: count must be positive')
+        keep = max(0, int(rule.get('keep_tokens', 1)))
+        # The trigger tokens always survive, even past the limit
+        return lambda tags: tags[:max(count, keep)]
+
+    raise RuleError(f'unknown op: {op!r}')
+
+
+def compile_rules(rules) -> List[Tuple[str, Callable[[List[str]], List[str]]]]:
+    """(op, apply) per rule; anything malformed is a RuleError."""
+    if not isinstance(rules, list) or not rules:
+        raise RuleError('rules must be a non-empty list')
+    try:
+        return [(rule.get('op'), compile_rule(rule)) for rule in rules]
+    except RuleError:
+        raise
+    except (AttributeError, ValueError, TypeError) as e:
+        raise RuleError(str(e)) from e
+
+
+def iter_sidecars(train_data_dir: str, folders: List[str]) -> Iterator[Tuple[str, str]]:
+    """(key, .txt path) for every image with a caption, streaming through the folders."""
+    for folder in folders:
+        folder_dir = os.path.join(train_data_dir, folder)
+        with os.scandir(folder_dir) as entries:
+            names = {e.name for e in entries if e.is_file()}
+        for name in sorted(names):
+            if not name.lower().endswith(IMAGE_EXTENSIONS):
+                continue
+            txt = os.path.splitext(name)[0] + '.txt'
+            if txt in names:
+                yield f'{folder}/{name}', os.path.join(folder_dir, txt)
+
+
+def write_atomic(path: str, text: str):
+    fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), prefix='.bulk-', suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            f.write(text)
+        # mkstemp creates 0600; keep the sidecar's own permissions
+        os.chmod(tmp, stat.S_IMODE(os.stat(path).st_mode))
+        os.replace(tmp, path)
+    except BaseException:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+        raise
+
+
+def run(project_dir: str, steps: List[Tuple[str, Callable[[List[str]], List[str]]]], folder: Optional[str],
+        store_path: Optional[str], dry_run: bool) -> Dict:
+    started = time.time()
+    train_data_dir = os.path.join(project_dir, 'train_data')
+    folders = [folder] if folder else sorted(
+        e.name for e in os.scandir(train_data_dir) if e.is_dir() and not e.name.startswith('.')
+    ) if os.path.isdir(train_data_dir) else []
+
+    store = CaptionStore(store_path) if store_path else None
+    unreadable = 0
+    if store:
+        source = ((key, text) for f in folders for key, text in sorted(store.folder(f).items()))
+    else:
+        sidecars = dict(iter_sidecars(train_data_dir, folders))
+
+        def read_sidecars():
+            nonlocal unreadable
+            for key, txt_path in sidecars.items():
+                try:
+                    with open(txt_path, 'r', encoding='utf-8') as f:
+                        text = f.read()
+                except (OSError, UnicodeDecodeError) as e:
+                    # One bad sidecar shouldn't stop the pass; it is left untouched
+                    unreadable += 1
+                    print(f'Skipping {txt_path}: {e}', file=sys.stderr)
+                    continue
+                yield key, text
+        source = read_sidecars()
+
+    scanned = 0
+    rule_counts = [0] * len(steps)
+    tag_changes: Counter = Counter()
+    changed: List[Tuple[str, str]] = []
+    samples = []
+
+    for key, text in source:
+        scanned += 1
+        before = split_tags(text)
+        tags = before
+        for i, (_, apply) in enumerate(steps):
+            result = apply(tags)
+            if result != tags:
+                rule_counts[i] += 1
+            tags = result
+        # Only rewrite captions whose tags changed, not ones that are merely spaced differently
+        if tags == before:
+            continue
+        new_text = ', '.join(tags)
+
+        old_norm = Counter(normalize_tag(t) for t in before)
+        new_norm = Counter(normalize_tag(t) for t in tags)
+        tag_changes.update(new_norm)
+        tag_changes.subtract(old_norm)
+        changed.append((key, new_text))
+        if len(samples) < SAMPLE_LIMIT:
+            samples.append({'key': key, 'before': text.strip(), 'after': new_text})
+
+    if changed and not dry_run:
+        if store:
+            store.put_many(((key, text, 'bulk') for key, text in changed), edited=True)
+        else:
+            for key, text in changed:
+                write_atomic(sidecars[key], text)
+        try:
+            index = TagIndex(project_dir)
+            index.update(changed)
+            index.close()
+        except Exception as e:
+            print(f"Warning: tag index not updated: {e}", file=sys.stderr)
+    if store:
+        store.close()
+
+    net = sorted(((t, n) for t, n in tag_changes.items() if n), key=lambda x: -abs(x[1]))
+    return {
+        'dry_run': dry_run,
+        'scanned': scanned,
+        'changed': len(changed),
+        'unreadable': unreadable,
+        'rules': [{'op': op, 'captions': n} for (op, _), n in zip(steps, rule_counts)],
+        'tag_changes': dict(net[:TAG_CHANGES_LIMIT]),
+        'samples': samples,
+        'seconds': round(time.time() - started, 3),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Apply bulk tag rules to all captions of a project')
+    parser.add_argument('--project_dir', type=str, required=True)
+    parser.add_argument('--rules', type=str, required=True, help='JSON file with the rule list')
+    parser.add_argument('--folder', type=str, default='', help='Only this train_data folder')
+    parser.add_argument('--caption_store', type=str, default='', help="The project's captions.db, when it uses the store")
+    parser.add_argument('--dry_run', action='store_true', help='Report changes without writing')
+    args = parser.parse_args()
+
+    sys.stdout.reconfigure(encoding='utf-8')
+    # Only the rules themselves are "Invalid rules" (HTTP 400); failures of the pass are errors
+    try:
+        with open(args.rules, 'r', encoding='utf-8') as f:
+            steps = compile_rules(json.load(f))
+    except (RuleError, ValueError) as e:
+        print(f'Invalid rules: {e}', file=sys.stderr)
+        sys.exit(2)
+
+    summary = run(args.project_dir, steps, args.folder or None, args.caption_store or None, args.dry_run)
+
+    print(json.dumps(summary, ensure_ascii=False))
+
+
+if __name__ == '__main__':
+    main()
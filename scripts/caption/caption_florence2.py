@@ -10,6 +10,11 @@ import sys
 from pathlib import Path
 from PIL import Image
 
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from caption_store import CaptionWriter
+from onnx_vision import accelerate as accelerate_vision_encoder
+from model_host import DEFAULT_WORKERS as DEFAULT_HOST_WORKERS, caption_with_host, pretrained_kwargs
+
 # Generic phrase patterns to remove
 GENERIC_PATTERNS = [
     'a picture of ',
@@ -21,7 +26,7 @@ GENERIC_PATTERNS = [
 ]
 
 
-def load_model():
+def load_model(device=None):
     """Load Florence-2 model"""
     try:
         from transformers import AutoProcessor, AutoModelForCausalLM
@@ -38,11 +43,12 @@ def load_model():
     model = AutoModelForCausalLM.from_pretrained(
         model_name, 
         trust_remote_code=True,
-        attn_implementation="eager"
+        attn_implementation="eager",
+        **pretrained_kwargs()
     )
     
     # Move to GPU if available
-    device = "cuda" if torch.cuda.is_available() else "cpu"
+    device = device or ("cuda" if torch.cuda.is_available() else "cpu")
     model.to(device)
     
     return processor, model, device
@@ -137,23 +143,32 @@ def main():
                        help='Remove generic phrases')
     parser.add_argument('--trigger', type=str, default='',
                        help='Trigger word to prepend')
+    parser.add_argument('--caption_store', type=str, default='',
+                       help="Write to the project's captions.db instead of .txt files")
+    parser.add_argument('--file_list', type=str, default='',
+                       help='Caption only the images listed in this file, one path per line (used by distributed.py)')
+    parser.add_argument('--onnx', type=str, default='auto', choices=['auto', 'off'],
+                       help='Run the vision encoder through ONNX Runtime on CPU (exported once, see onnx_vision.py)')
+    parser.add_argument('--model_host', type=str, default='auto', choices=['auto', 'off'],
+                       help='Caption through the shared copy-on-write model host on CPU; its workers keep the shared PyTorch vision encoder (see model_host.py)')
+    parser.add_argument('--host_workers', type=int, default=DEFAULT_HOST_WORKERS,
+                       help='Worker processes when this job starts the model host')
     
     args = parser.parse_args()
     
     # Configure stdout
     sys.stdout.reconfigure(encoding='utf-8', line_buffering=True)
     
-    # Load model
-    print(f"Loading Florence-2 model...", flush=True)
-    processor, model, device = load_model()
-    print(f"Model loaded on {device}", flush=True)
-    
     # Find images
     input_dir = Path(args.input_dir)
     image_files = []
-    for ext in ['*.jpg', '*.jpeg', '*.png', '*.webp']:
-        image_files.extend(input_dir.glob(ext))
-        image_files.extend(input_dir.glob(ext.upper()))
+    if args.file_list:
+        with open(args.file_list, 'r', encoding='utf-8') as f:
+            image_files = [Path(line.strip()) for line in f if line.strip()]
+    else:
+        for ext in ['*.jpg', '*.jpeg', '*.png', '*.webp']:
+            image_files.extend(input_dir.glob(ext))
+            image_files.extend(input_dir.glob(ext.upper()))
     
     total = len(image_files)
     print(f"Found {total} images to caption", flush=True)
@@ -162,39 +177,67 @@ def main():
         print("No images found!", file=sys.stderr)
         sys.exit(1)
     
-    # Process images
-    for idx, img_path in enumerate(image_files, 1):
+    writer = CaptionWriter(args.caption_store or None, source='florence2')
+    done = 0
+
+    def emit_progress(img_path):
+        progress_data = {
+            "progress": done,
+            "total": total,
+            "current_file": img_path.name,
+            "status": "processing"
+        }
+        print(f"PROGRESS:{json.dumps(progress_data)}", flush=True)
+
+    def save(img_path, caption):
+        # Prepend trigger word
+        if args.trigger:
+            caption = f"{args.trigger}, {caption}"
+        # Write to .txt file (or the caption store)
+        writer.write(img_path, caption)
+
+    # Shared model host: weights loaded once for all concurrent jobs (see model_host.py)
+    pending = image_files
+    if args.model_host == 'auto':
+        def on_result(img_path, caption, error):
+            nonlocal done
+            done += 1
+            emit_progress(img_path)
+            if error:
+                print(f"Error processing {img_path.name}: {error}", file=sys.stderr)
+            else:
+                save(img_path, caption)
+
+        options = {'style': args.style, 'output_format': args.format, 'avoid_generic': args.avoid_generic}
+        pending = caption_with_host('florence2', image_files, options, on_result, args.host_workers, args.onnx)
+
+    if pending:
+        # Load model
+        print(f"Loading Florence-2 model...", flush=True)
+        processor, model, device = load_model()
+        encoder = accelerate_vision_encoder('florence2', processor, model, device, args.onnx)
+        print(f"Model loaded on {device} (vision encoder: {encoder})", flush=True)
+
+    # Process images (whatever the host didn't)
+    for img_path in pending:
+        done += 1
         try:
             # Emit progress
-            progress_data = {
-                "progress": idx,
-                "total": total,
-                "current_file": img_path.name,
-                "status": "processing"
-            }
-            print(f"PROGRESS:{json.dumps(progress_data)}", flush=True)
+            emit_progress(img_path)
             
             # Generate caption
             caption = generate_caption(
                 processor, model, device, str(img_path),
                 args.style, args.format, args.avoid_generic
             )
-            
-            # Prepend trigger word
-            if args.trigger:
-                caption = f"{args.trigger}, {caption}"
-            
-            # Write to .txt file
-            output_path = img_path.with_suffix('.txt')
-            with open(output_path, 'w', encoding='utf-8') as f:
-                f.write(caption)
+            save(img_path, caption)
             
         except Exception as e:
             print(f"Error processing {img_path.name}: {e}", file=sys.stderr)
             continue
     
+    writer.close()
     print(f"Captioning complete: {total} images processed", flush=True)
 
-
 if __name__ == "__main__":
     main()
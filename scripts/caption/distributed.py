@@ -0,0 +1,524 @@
+#!/usr/bin/env python3
+"""
+Distributed captioning over a shared filesystem.
+
+The coordinator splits an image folder into chunks and writes a plan to
+<input_dir>/.caption_work/. Any number of workers pointed at that directory
+(on this machine or on others that mount the same project folder) claim chunks
+through lease files, run the normal tagger/captioner script on each chunk
+(--file_list) and publish a done marker. The coordinator aggregates progress
+into PROGRESS lines for the job file.
+
+Leases:
+- A worker claims a chunk by creating leases/<chunk>.lease with O_EXCL, so only
+  one claim can succeed.
+- The owner touches the lease every HEARTBEAT_SECONDS (at most a quarter of the TTL). A lease whose mtime is
+  older than the plan's lease_ttl is expired; any worker may reclaim it by
+  renaming it away (only one rename can succeed) and claiming it again.
+- A worker that finds its lease gone or taken over stops its chunk without
+  publishing anything. The chunk is redone by whoever holds the lease.
+- Ages are measured against the shared filesystem's own clock (the mtime of a
+  freshly touched file), so machines with skewed clocks agree on expiry.
+- On Linux the chunk's script is killed with its worker (PR_SET_PDEATHSIG), so a
+  killed worker doesn't leave it running alongside whoever reclaims the chunk.
+  scripts/test-distributed-lease.py kills a worker and checks both.
+
+Results are the script's normal outputs (.txt sidecars next to the images).
+Only use --caption_store with remote workers if the project folder's filesystem
+has working locks (SQLite). Per-model JSON (--per_model_json) is written per
+chunk and merged by the coordinator.
+
+CLI:
+    distributed.py coordinate --input_dir DIR --script tagger_wd14.py [--local_workers N] -- <script args>
+    distributed.py work <input_dir>/.caption_work [--worker_id ID]
+"""
+
+import argparse
+import ctypes
+import ctypes.util
+import json
+import os
+import shutil
+import signal
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import uuid
+from datetime import datetime, timezone
+from hashlib import sha1
+from pathlib import Path
+from typing import Dict, List, Optional
+
+SCRIPTS_DIR = Path(__file__).resolve().parent
+WORK_DIR_NAME = '.caption_work'
+IMAGE_EXTENSIONS = {'.png', '.jpg', '.jpeg', '.webp'}
+
+DEFAULT_CHUNK_SIZE = 64
+DEFAULT_LEASE_TTL = 60
+HEARTBEAT_SECONDS = 10
+POLL_SECONDS = 2
+# A chunk whose script fails this many times is marked failed instead of retried
+MAX_ATTEMPTS = 3
+PR_SET_PDEATHSIG = 1
+
+
+def list_images(input_dir: Path) -> List[str]:
+    return sorted(p.name for p in input_dir.iterdir() if p.is_file() and p.suffix.lower() in IMAGE_EXTENSIONS)
+
+
+def write_json_atomic(path: Path, data: Dict):
+    fd, tmp = tempfile.mkstemp(dir=path.parent, prefix=f'.{path.name}-', suffix='.tmp')
+    with os.fdopen(fd, 'w', encoding='utf-8') as f:
+        json.dump(data, f)
+    os.replace(tmp, path)
+
+
+def read_json(path: Path) -> Optional[Dict]:
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+class WorkDir:
+    def __init__(self, root: Path):
+        self.root = Path(root)
+        self.plan_path = self.root / 'plan.json'
+        self.cancel_path = self.root / 'cancel'
+        self.leases = self.root / 'leases'
+        self.done = self.root / 'done'
+        self.results = self.root / 'results'
+        self.workers = self.root / 'workers'
+        self.attempts = self.root / 'attempts'
+
+    def create(self):
+        for d in (self.leases, self.done, self.results, self.workers, self.attempts):
+            d.mkdir(parents=True, exist_ok=True)
+
+    def lease_path(self, chunk: int) -> Path:
+        return self.leases / f'{chunk:05d}.lease'
+
+    def done_path(self, chunk: int) -> Path:
+        return self.done / f'{chunk:05d}.json'
+
+    def result_path(self, chunk: int) -> Path:
+        return self.results / f'{chunk:05d}.json'
+
+    def worker_path(self, worker_id: str) -> Path:
+        return self.workers / f'{worker_id}.json'
+
+    def is_done(self, chunk: int) -> bool:
+        return self.done_path(chunk).exists()
+
+    def fs_now(self) -> float:
+        """Current time on the shared filesystem's clock."""
+        probe = self.workers / f'.clock-{socket.gethostname()}-{os.getpid()}'
+        probe.touch()
+        return probe.stat().st_mtime
+
+
+class Lease:
+    def __init__(self, work: WorkDir, chunk: int, worker_id: str):
+        self.work = work
+        self.chunk = chunk
+        self.path = work.lease_path(chunk)
+        self.worker_id = worker_id
+        self.token = uuid.uuid4().hex
+
+    def acquire(self) -> bool:
+        try:
+            fd = os.open(self.path, os.O_CREAT | os.O_EXCL | os.O_WRONLY, 0o644)
+        except FileExistsError:
+            return False
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            json.dump({'worker': self.worker_id, 'host': socket.gethostname(), 'pid': os.getpid(),
+                       'token': self.token, 'claimed_at': datetime.now(timezone.utc).isoformat()}, f)
+        return True
+
+    def owned(self) -> bool:
+        lease = read_json(self.path)
+        return bool(lease) and lease.get('token') == self.token
+
+    def heartbeat(self) -> bool:
+        # The check and the touch aren't atomic; a reclaim in between only costs a redone chunk
+        if not self.owned():
+            return False
+        try:
+            os.utime(self.path)
+            return True
+        except OSError:
+            return False
+
+    def release(self):
+        if self.owned():
+            try:
+                os.unlink(self.path)
+            except OSError:
+                pass
+
+
+def lease_expired(work: WorkDir, chunk: int, now: float, ttl: float) -> bool:
+    try:
+        return now - work.lease_path(chunk).stat().st_mtime > ttl
+    except OSError:
+        return False
+
+
+def reclaim(work: WorkDir, chunk: int, now: float, ttl: float) -> bool:
+    """Removes an expired lease. Returns False if another worker got there first."""
+    lease = work.lease_path(chunk)
+    expired = lease.with_name(f'{lease.name}.expired-{uuid.uuid4().hex[:8]}')
+    try:
+        os.rename(lease, expired)
+    except OSError:
+        return False
+    try:
+        if now - expired.stat().st_mtime <= ttl:
+            # The owner heartbeat between our check and the rename; hand the lease back
+            try:
+                os.link(expired, lease)
+            except OSError:
+                pass
+            return False
+        return True
+    finally:
+        try:
+            os.unlink(expired)
+        except OSError:
+            pass
+
+
+# --- worker ---------------------------------------------------------------
+
+def parent_death_hook():
+    """
+    preexec_fn that has the kernel SIGKILL the child when the worker dies, or None
+    where prctl isn't available (the orphan then runs to the end of its chunk).
+    libc is loaded here, in the parent, so the hook itself only makes syscalls.
+    """
+    if not sys.platform.startswith('linux'):
+        return None
+    try:
+        prctl = ctypes.CDLL(ctypes.util.find_library('c') or 'libc.so.6', use_errno=True).prctl
+    except (OSError, AttributeError):
+        return None
+    parent = os.getpid()
+
+    def hook():
+        prctl(PR_SET_PDEATHSIG, signal.SIGKILL)
+        # The worker may have died before prctl took effect
+        if os.getppid() != parent:
+            os._exit(1)
+
+    return hook
+
+
+class Worker:
+    def __init__(self, work_dir: Path, worker_id: Optional[str] = None, python: str = sys.executable):
+        self.work = WorkDir(work_dir)
+        self.worker_id = worker_id or f'{socket.gethostname()}-{os.getpid()}'
+        self.python = python
+        self.input_dir = self.work.root.parent
+        self.plan = self.wait_for_plan()
+        self.chunks: List[List[str]] = self.plan['chunks']
+        self.ttl = float(self.plan.get('lease_ttl', DEFAULT_LEASE_TTL))
+        # Several heartbeats per TTL, so one slow write doesn't expire a live lease
+        self.heartbeat_seconds = min(HEARTBEAT_SECONDS, self.ttl / 4)
+        self.chunks_done = 0
+
+    def log(self, message: str):
+        print(f'[worker {self.worker_id}] {message}', flush=True)
+
+    def wait_for_plan(self) -> Dict:
+        deadline = time.time() + 60
+        while time.time() < deadline:
+            plan = read_json(self.work.plan_path)
+            if plan:
+                return plan
+            time.sleep(1)
+        raise SystemExit(f'No plan in {self.work.root}')
+
+    def report(self, chunk: Optional[int], chunk_progress: int = 0):
+        write_json_atomic(self.work.worker_path(self.worker_id), {
+            'worker': self.worker_id,
+            'host': socket.gethostname(),
+            'pid': os.getpid(),
+            'chunk': chunk,
+            'chunk_progress': chunk_progress,
+            'chunks_done': self.chunks_done,
+            'updated_at': time.time(),
+        })
+
+    def claim(self) -> Optional[Lease]:
+        now = self.work.fs_now()
+        pending = [c for c in range(len(self.chunks)) if not self.work.is_done(c)]
+        # Start at a worker-specific offset so workers don't all race for the same chunk
+        offset = int(sha1(self.worker_id.encode('utf-8')).hexdigest(), 16) % max(1, len(pending))
+        for chunk in pending[offset:] + pending[:offset]:
+            lease = Lease(self.work, chunk, self.worker_id)
+            if lease.acquire():
+                pass
+            elif lease_expired(self.work, chunk, now, self.ttl) and reclaim(self.work, chunk, now, self.ttl) and lease.acquire():
+                self.log(f'reclaimed expired lease on chunk {chunk}')
+            else:
+                continue
+            # The previous owner may have published between our scan and the claim
+            if self.work.is_done(chunk):
+                lease.release()
+                continue
+            return lease
+        return None
+
+    def script_args(self, chunk: int) -> List[str]:
+        # Paths in the plan are the coordinator's; this machine may mount the project elsewhere
+        args = ['--input_dir', str(self.input_dir), *self.plan['args']]
+        if '--per_model_json' in args:
+            i = args.index('--per_model_json')
+            args[i + 1] = str(self.work.result_path(chunk))
+        return args
+
+    def record_failure(self, chunk: int, error: str):
+        (self.work.attempts / f'{chunk:05d}-{uuid.uuid4().hex[:8]}').write_text(error, encoding='utf-8')
+        attempts = len(list(self.work.attempts.glob(f'{chunk:05d}-*')))
+        if attempts >= MAX_ATTEMPTS:
+            write_json_atomic(self.work.done_path(chunk), {
+                'status': 'failed', 'worker': self.worker_id, 'images': 0, 'error': error,
+                'finished_at': datetime.now(timezone.utc).isoformat(),
+            })
+
+    def run_chunk(self, lease: Lease):
+        chunk = lease.chunk
+        files = self.chunks[chunk]
+        fd, file_list = tempfile.mkstemp(prefix=f'caption-chunk-{chunk:05d}-', suffix='.txt')
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            f.write('\n'.join(str(self.input_dir / name) for name in files))
+
+        # Each machine runs the script from its own checkout
+        cmd = [self.python, str(SCRIPTS_DIR / self.plan['script']), *self.script_args(chunk), '--file_list', file_list]
+        self.log(f'chunk {chunk}: {len(files)} images')
+        self.report(chunk)
+        proc = subprocess.Popen(cmd, stdout=subprocess.PIPE, text=True, encoding='utf-8', errors='replace',
+                                preexec_fn=parent_death_hook())
+
+        lost = threading.Event()
+        finished = threading.Event()
+
+        def heartbeat():
+            while not finished.wait(self.heartbeat_seconds):
+                if self.work.cancel_path.exists() or not lease.heartbeat():
+                    lost.set()
+                    proc.terminate()
+                    return
+
+        threading.Thread(target=heartbeat, daemon=True).start()
+
+        progress = 0
+        last_report = 0.0
+        try:
+            for line in proc.stdout:
+                line = line.strip()
+                if line.startswith('PROGRESS:'):
+                    try:
+                        progress = int(json.loads(line[len('PROGRESS:'):]).get('progress', progress))
+                    except (ValueError, TypeError):
+                        pass
+                    if time.time() - last_report >= 1:
+                        self.report(chunk, progress)
+                        last_report = time.time()
+                elif line and not line.startswith('DEBUG:'):
+                    self.log(line)
+            code = proc.wait()
+        finally:
+            finished.set()
+            os.unlink(file_list)
+
+        if lost.is_set():
+            self.log(f'chunk {chunk}: lease lost or job cancelled, abandoning it')
+            return
+        if code == 0:
+            write_json_atomic(self.work.done_path(chunk), {
+                'status': 'ok', 'worker': self.worker_id, 'images': len(files),
+                'finished_at': datetime.now(timezone.utc).isoformat(),
+            })
+            self.chunks_done += 1
+        else:
+            self.log(f'chunk {chunk}: script exited with {code}')
+            self.record_failure(chunk, f'{self.plan["script"]} exited with {code}')
+        lease.release()
+        self.report(None)
+
+    def run(self):
+        self.log(f'joined {self.work.root} ({len(self.chunks)} chunks)')
+        try:
+            while not self.work.cancel_path.exists():
+                if all(self.work.is_done(c) for c in range(len(self.chunks))):
+                    break
+                lease = self.claim()
+                if lease is None:
+                    # Everything left is leased; wait in case a holder dies and its lease expires
+                    self.report(None)
+                    time.sleep(POLL_SECONDS)
+                    continue
+                self.run_chunk(lease)
+        except FileNotFoundError:
+            # The coordinator removes the work dir once every chunk is done
+            pass
+        self.log(f'finished ({self.chunks_done} chunks)')
+        try:
+            os.unlink(self.work.worker_path(self.worker_id))
+        except OSError:
+            pass
+
+
+# --- coordinator ----------------------------------------------------------
+
+def aggregate(work: WorkDir, chunks: List[List[str]], ttl: float) -> Dict:
+    progress = 0
+    done = failed = 0
+    for c, files in enumerate(chunks):
+        marker = read_json(work.done_path(c))
+        if marker:
+            done += 1
+            if marker.get('status') == 'failed':
+                failed += 1
+            progress += len(files)
+
+    # Partial progress of chunks that are currently leased by a live worker
+    now = work.fs_now()
+    active = 0
+    for status_path in work.workers.glob('*.json'):
+        status = read_json(status_path)
+        chunk = status.get('chunk') if status else None
+        if chunk is None or work.is_done(chunk) or lease_expired(work, chunk, now, ttl):
+            continue
+        lease = read_json(work.lease_path(chunk))
+        if lease and lease.get('worker') == status.get('worker'):
+            active += 1
+            progress += min(int(status.get('chunk_progress', 0)), len(chunks[chunk]))
+
+    return {'progress': progress, 'chunks_done': done, 'chunks_failed': failed, 'active_workers': active}
+
+
+def merge_results(work: WorkDir, chunks: List[List[str]], target: str):
+    merged = {}
+    for c in range(len(chunks)):
+        merged.update(read_json(work.result_path(c)) or {})
+    with open(target, 'w', encoding='utf-8') as f:
+        json.dump(merged, f, indent=2, ensure_ascii=False)
+
+
+def coordinate(input_dir: Path, script: str, script_args: List[str], chunk_size: int, local_workers: int,
+               lease_ttl: float, job_file: str = '', keep_work: bool = False) -> int:
+    sys.stdout.reconfigure(encoding='utf-8', line_buffering=True)
+    images = list_images(input_dir)
+    if not images:
+        print('No images found.', file=sys.stderr)
+        return 1
+
+    work = WorkDir(input_dir / WORK_DIR_NAME)
+    chunks = [images[i:i + chunk_size] for i in range(0, len(images), chunk_size)]
+    plan = {'script': script, 'args': script_args, 'chunks': chunks, 'lease_ttl': lease_ttl}
+
+    # Same job interrupted earlier: keep its finished chunks
+    previous = read_json(work.plan_path)
+    if previous and {k: previous.get(k) for k in plan} == plan and not work.cancel_path.exists():
+        print(f'Resuming distributed job in {work.root}', flush=True)
+    else:
+        shutil.rmtree(work.root, ignore_errors=True)
+    work.create()
+    write_json_atomic(work.plan_path, {**plan, 'created_at': datetime.now(timezone.utc).isoformat()})
+
+    total = len(images)
+    print(f'Found {total} images in {len(chunks)} chunks. Workers can join with: '
+          f'python {Path(__file__).resolve()} work {work.root}', flush=True)
+
+    def spawn_worker(i: int):
+        return subprocess.Popen([sys.executable, str(Path(__file__).resolve()), 'work', str(work.root),
+                                 '--worker_id', f'{socket.gethostname()}-local{i}-{uuid.uuid4().hex[:4]}'])
+
+    workers = [spawn_worker(i) for i in range(local_workers)]
+    respawns = local_workers * MAX_ATTEMPTS
+
+    def cancel(signum, frame):
+        work.cancel_path.touch()
+        for proc in workers:
+            proc.terminate()
+        sys.exit(1)
+
+    signal.signal(signal.SIGTERM, cancel)
+    signal.signal(signal.SIGINT, cancel)
+
+    last = None
+    while True:
+        stats = aggregate(work, chunks, lease_ttl)
+        state = {
+            'progress': stats['progress'],
+            'total': total,
+            'status': 'processing',
+            'current_file': f"{stats['chunks_done']}/{len(chunks)} chunks, {stats['active_workers']} workers",
+            'distributed': {**stats, 'chunks_total': len(chunks)},
+        }
+        if state != last:
+            print(f'PROGRESS:{json.dumps(state)}', flush=True)
+            if job_file:
+                write_json_atomic(Path(job_file), state)
+            last = state
+        if stats['chunks_done'] == len(chunks):
+            break
+
+        # Local workers only exit early if they crash; replace them while there's work left
+        for i, proc in enumerate(workers):
+            if proc.poll() not in (None, 0) and respawns > 0:
+                respawns -= 1
+                workers[i] = spawn_worker(i)
+        time.sleep(1)
+
+    for proc in workers:
+        proc.wait()
+
+    if '--per_model_json' in script_args:
+        merge_results(work, chunks, script_args[script_args.index('--per_model_json') + 1])
+
+    failed = [read_json(work.done_path(c)) for c in range(len(chunks))]
+    failed = [m for m in failed if m and m.get('status') == 'failed']
+    for marker in failed:
+        print(f"Chunk failed on {marker.get('worker')}: {marker.get('error')}", file=sys.stderr)
+    if not keep_work:
+        shutil.rmtree(work.root, ignore_errors=True)
+    print('Distributed captioning finished.', flush=True)
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Distributed captioning over a shared project folder')
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    coord = sub.add_parser('coordinate', help='Plan chunks, run local workers and aggregate progress')
+    coord.add_argument('--input_dir', type=str, required=True)
+    coord.add_argument('--script', type=str, default='tagger_wd14.py', help='Captioner script (must accept --file_list)')
+    coord.add_argument('--chunk_size', type=int, default=DEFAULT_CHUNK_SIZE)
+    coord.add_argument('--local_workers', type=int, default=1, help='Workers to run on this machine (0 = remote only)')
+    coord.add_argument('--lease_ttl', type=float, default=DEFAULT_LEASE_TTL, help='Seconds without a heartbeat before a lease expires')
+    coord.add_argument('--job_file', type=str, default='', help='Also write aggregated progress to this JSON file')
+    coord.add_argument('--keep_work', action='store_true', help='Keep the work directory when done')
+    coord.add_argument('script_args', nargs=argparse.REMAINDER, help='Arguments for the script, after --')
+
+    wrk = sub.add_parser('work', help='Claim and process chunks until the job is done')
+    wrk.add_argument('work_dir', type=str)
+    wrk.add_argument('--worker_id', type=str, default='')
+
+    args = parser.parse_args()
+    if args.command == 'coordinate':
+        script_args = args.script_args[1:] if args.script_args[:1] == ['--'] else args.script_args
+        # Each worker passes its own view of the folder, plus the chunk's --file_list
+        if '--input_dir' in script_args:
+            i = script_args.index('--input_dir')
+            del script_args[i:i + 2]
+        sys.exit(coordinate(Path(args.input_dir).resolve(), args.script, script_args, max(1, args.chunk_size),
+                            max(0, args.local_workers), args.lease_ttl, args.job_file, args.keep_work))
+    else:
+        Worker(Path(args.work_dir), args.worker_id or None).run()
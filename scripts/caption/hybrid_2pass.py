@@ -12,6 +12,9 @@ import tempfile
 import shutil
 from pathlib import Path
 
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from caption_store import CaptionWriter
+
 
 def run_tagger(args, temp_dir):
     """Run tagger and collect results"""
@@ -171,6 +174,8 @@ def main():
                        help='Maximum caption length in characters')
     parser.add_argument('--trigger', type=str, default='',
                        help='Trigger word to prepend')
+    parser.add_argument('--caption_store', type=str, default='',
+                       help="Write to the project's captions.db instead of .txt files")
     parser.add_argument('--shuffle', action='store_true',
                        help='Shuffle tags (preserving trigger)')
     parser.add_argument('--keep_tokens', type=int, default=1)
@@ -219,8 +224,9 @@ def main():
             with open(txt_file, 'r', encoding='utf-8') as f:
                 captioner_outputs[txt_file.stem] = f.read().strip()
         
-        # Merge outputs
+        # Merge outputs (temp passes always use .txt; only the final result goes to the store)
         print("[Hybrid] Merging outputs...", flush=True)
+        writer = CaptionWriter(args.caption_store or None, source='hybrid')
         
         for img in image_files:
             stem = img.stem
@@ -274,9 +280,9 @@ def main():
                     final_caption = final_caption[:last_comma]
             
             # Write to output
-            output_path = img.with_suffix('.txt')
-            with open(output_path, 'w', encoding='utf-8') as f:
-                f.write(final_caption)
+            writer.write(img, final_caption)
+        
+        writer.close()
     
     print("Hybrid captioning complete", flush=True)
 
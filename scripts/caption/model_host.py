@@ -0,0 +1,401 @@
+#!/usr/bin/env python3
+"""
+Shared model host for the PyTorch captioners (BLIP, BLIP-2, Florence-2) on CPU.
+
+Without it every captioning job loads its own copy of the weights (BLIP-2
+OPT-2.7B is >10 GB in fp32), so two projects captioning at once can run out of
+RAM. With it, one host process per captioner loads the weights once
+(low_cpu_mem_usage, safetensors are memory-mapped) and forks worker processes
+that share those pages copy-on-write. Jobs connect over a local socket and their
+images go onto one queue, so peak RSS is about one model plus one set of
+activations per worker, however many jobs are running.
+
+- The captioner scripts use the host by default (--model_host auto): they connect,
+  starting the host if it isn't running, and fall back to loading the model
+  in-process when the host can't be used (Windows, CUDA, host failure).
+- Host workers keep the shared PyTorch vision encoder, except for captioners in
+  HOST_ONNX_KINDS. An ONNX Runtime session can't cross a fork, so each worker
+  would build its own and hold a private copy of the exported encoder: cheap for
+  BLIP's ViT-B, but N extra copies of BLIP-2's ViT-g (~4 GB fp32) or Florence-2's
+  DaViT would undo what the host saves. For those, --onnx auto only applies to
+  in-process runs and jobs with either --onnx setting share one host. Where ONNX
+  is used, a missing or stale export is made once, in a separate process, before
+  the host loads the model, because the parity check runs a forward pass and the
+  parent must not do that before forking; the sessions are built after the fork.
+- Only one host per captioner and --onnx mode: the host takes an exclusive lock before binding.
+- The host exits after IDLE_SECONDS without jobs.
+- The parent never runs a forward pass before forking, so workers don't inherit
+  a live intra-op thread pool; gc.freeze() keeps the garbage collector from
+  touching (and so copying) the shared objects.
+
+CLI:
+    model_host.py serve blip|blip2|florence2 [--workers N] [--onnx auto|off]
+"""
+
+import gc
+import importlib
+import importlib.util
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import uuid
+from collections import deque
+from hashlib import sha1
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+
+SCRIPTS_DIR = Path(__file__).resolve().parent
+CAPTIONER_SCRIPTS = {
+    'blip': 'caption_blip_legacy',
+    'blip2': 'caption_blip2',
+    'florence2': 'caption_florence2',
+}
+IDLE_SECONDS = 300
+# Loading BLIP-2 from disk can take minutes on a slow machine
+STARTUP_TIMEOUT = 900
+DEFAULT_WORKERS = 2
+# Captioners whose host workers run the vision encoder through ONNX Runtime with --onnx auto.
+# Each worker holds its own copy of the exported encoder, so only small encoders qualify.
+HOST_ONNX_KINDS = ('blip',)
+
+
+class HostUnavailable(Exception):
+    pass
+
+
+def supported() -> bool:
+    # fork + copy-on-write is POSIX only; CUDA contexts don't survive a fork either
+    if os.name != 'posix':
+        return False
+    try:
+        import torch
+        return not torch.cuda.is_available()
+    except ImportError:
+        return False
+
+
+def pretrained_kwargs() -> Dict:
+    """from_pretrained() options that avoid a second full copy of the weights while loading."""
+    # transformers < 5 only honours low_cpu_mem_usage with accelerate installed
+    return {'low_cpu_mem_usage': True} if importlib.util.find_spec('accelerate') else {}
+
+
+def host_onnx_mode(kind: str, onnx: str) -> str:
+    """The --onnx mode a host for kind actually runs with (see HOST_ONNX_KINDS)."""
+    return onnx if kind in HOST_ONNX_KINDS else 'off'
+
+
+def host_paths(kind: str, onnx: str = 'auto') -> Dict[str, str]:
+    # AF_UNIX paths are length-limited, so these live in the temp dir, keyed by checkout
+    tag = sha1(str(SCRIPTS_DIR).encode('utf-8')).hexdigest()[:10]
+    variant = '' if onnx == 'auto' else f'-{onnx}'
+    base = os.path.join(tempfile.gettempdir(), f'lora-bento-{kind}{variant}-{tag}')
+    return {'socket': base + '.sock', 'lock': base + '.lock', 'log': base + '.log'}
+
+
+# --- host -----------------------------------------------------------------
+
+def worker_loop(index: int, kind: str, module, processor, model, tasks, results, threads: int, onnx: str):
+    import torch
+    from onnx_vision import accelerate
+    torch.set_num_threads(threads)
+    # After the fork, so the session and its thread pool belong to this worker.
+    # The export was prepared before the fork; never start one from a worker, and only
+    # the first worker touches the optimised-graph cache so they don't write it at once.
+    encoder = accelerate(kind, processor, model, 'cpu', onnx, threads=threads, allow_export=False,
+                         cache_optimized=index == 0)
+    print(f'Worker {os.getpid()} ready (vision encoder: {encoder})', file=sys.stderr, flush=True)
+    while True:
+        task = tasks.get()
+        if task is None:
+            return
+        job_id, image_path, options = task
+        try:
+            caption = module.generate_caption(processor, model, 'cpu', image_path, **options)
+            results.put((job_id, image_path, caption, None))
+        except Exception as e:
+            results.put((job_id, image_path, None, str(e)))
+
+
+class Host:
+    def __init__(self, kind: str, workers: int, onnx: str = 'auto'):
+        import multiprocessing as mp
+        import torch
+
+        self.kind = kind
+        self.onnx = onnx
+        self.paths = host_paths(kind, onnx)
+        self.jobs: Dict[str, Dict] = {}  # job id -> {'conn', 'remaining', 'queue', 'lock'}
+        # Guards jobs and in_flight; the feeder waits on it for work and free slots
+        self.cond = threading.Condition()
+        self.in_flight = 0
+        self.last_active = time.time()
+
+        # Tokenizers' own thread pool doesn't survive fork
+        os.environ.setdefault('TOKENIZERS_PARALLELISM', 'false')
+
+        sys.path.insert(0, str(SCRIPTS_DIR))
+        if onnx == 'auto':
+            prepare_onnx_export(kind)
+        module = importlib.import_module(CAPTIONER_SCRIPTS[kind])
+        processor, model, _ = module.load_model(device='cpu')
+        model.eval()
+        torch.set_grad_enabled(False)
+
+        # Everything allocated so far is shared with the workers; keep the GC off it
+        gc.collect()
+        gc.freeze()
+
+        ctx = mp.get_context('fork')
+        self.tasks = ctx.Queue()
+        self.results = ctx.Queue()
+        self.max_in_flight = workers * 2
+        threads = max(1, (os.cpu_count() or 1) // workers)
+        self.workers = [ctx.Process(target=worker_loop, args=(i, kind, module, processor, model, self.tasks, self.results, threads, self.onnx), daemon=True)
+                        for i in range(workers)]
+        for worker in self.workers:
+            worker.start()
+
+    def shutdown(self, code: int = 0):
+        for worker in self.workers:
+            worker.terminate()
+        try:
+            os.unlink(self.paths['socket'])
+        except OSError:
+            pass
+        os._exit(code)
+
+    def fail_jobs(self, message: str):
+        with self.cond:
+            for job in self.jobs.values():
+                try:
+                    job['conn'].send({'error': message})
+                except OSError:
+                    pass
+
+    def feed_workers(self):
+        """
+        Round-robin across jobs, keeping only a few tasks queued, so a second
+        project's job starts making progress right away instead of waiting
+        behind the first one's whole folder.
+        """
+        while True:
+            with self.cond:
+                while True:
+                    ready = [job_id for job_id, job in self.jobs.items() if job['queue']]
+                    if ready and self.in_flight < self.max_in_flight:
+                        break
+                    self.cond.wait()
+                for job_id in ready:
+                    if self.in_flight >= self.max_in_flight:
+                        break
+                    job = self.jobs[job_id]
+                    image_path = job['queue'].popleft()
+                    self.tasks.put((job_id, image_path, job['options']))
+                    self.in_flight += 1
+                # Rotate so the next round starts with a different job
+                for job_id in ready[:1]:
+                    self.jobs[job_id] = self.jobs.pop(job_id)
+
+    def dispatch_results(self):
+        while True:
+            job_id, image_path, caption, error = self.results.get()
+            with self.cond:
+                self.in_flight -= 1
+                self.cond.notify_all()
+                job = self.jobs.get(job_id)
+            self.last_active = time.time()
+            if not job:
+                continue  # Client went away
+            with job['lock']:
+                job['remaining'] -= 1
+                try:
+                    job['conn'].send({'path': image_path, 'caption': caption, 'error': error})
+                    if job['remaining'] == 0:
+                        job['conn'].send({'done': True})
+                except OSError:
+                    pass
+
+    def serve_client(self, conn):
+        job_id = uuid.uuid4().hex
+        try:
+            request = conn.recv()
+            items: List[str] = request['images']
+            if not items:
+                conn.send({'done': True})
+            with self.cond:
+                self.jobs[job_id] = {
+                    'conn': conn,
+                    'remaining': len(items),
+                    'queue': deque(items),
+                    'options': request.get('options', {}),
+                    'lock': threading.Lock(),
+                }
+                self.cond.notify_all()
+            # Blocks until the client hangs up (after 'done', or if it's killed)
+            while True:
+                conn.recv()
+        except (EOFError, OSError):
+            pass
+        finally:
+            with self.cond:
+                # Images not yet handed to a worker are dropped with the job
+                self.jobs.pop(job_id, None)
+            conn.close()
+            self.last_active = time.time()
+
+    def watchdog(self):
+        while True:
+            time.sleep(5)
+            if any(not w.is_alive() for w in self.workers):
+                # A worker was killed (most likely out of memory); clients fall back to local captioning
+                print('A worker died, shutting down', file=sys.stderr, flush=True)
+                self.fail_jobs('model host worker died')
+                self.shutdown(1)
+            with self.cond:
+                busy = bool(self.jobs) or self.in_flight > 0
+            if not busy and time.time() - self.last_active > IDLE_SECONDS:
+                self.shutdown(0)
+
+    def serve(self):
+        from multiprocessing.connection import Listener
+
+        address = self.paths['socket']
+        try:
+            os.unlink(address)  # Stale socket from a host that died; we hold the lock
+        except OSError:
+            pass
+        listener = Listener(address, family='AF_UNIX')
+        os.chmod(address, 0o600)
+
+        threading.Thread(target=self.feed_workers, daemon=True).start()
+        threading.Thread(target=self.dispatch_results, daemon=True).start()
+        threading.Thread(target=self.watchdog, daemon=True).start()
+        print(json.dumps({'ready': True, 'kind': self.kind, 'onnx': self.onnx, 'workers': len(self.workers), 'socket': address}), flush=True)
+
+        while True:
+            conn = listener.accept()
+            self.last_active = time.time()
+            threading.Thread(target=self.serve_client, args=(conn,), daemon=True).start()
+
+
+def prepare_onnx_export(kind: str):
+    """Runs the one-time vision encoder export + parity check in a child process, if needed."""
+    if importlib.util.find_spec('onnxruntime') is None:
+        return
+    from onnx_vision import export_is_current
+    try:
+        if export_is_current(kind):
+            return
+    except ImportError:
+        return
+    print(f'Exporting the {kind} vision encoder to ONNX before loading (one-time)...', flush=True)
+    # Its output goes to the host log; a failed export or parity check leaves the workers on PyTorch
+    subprocess.run([sys.executable, str(SCRIPTS_DIR / 'onnx_vision.py'), 'export', kind], stdin=subprocess.DEVNULL)
+
+
+def serve(kind: str, workers: int, onnx: str = 'auto'):
+    import fcntl
+
+    onnx = host_onnx_mode(kind, onnx)
+    paths = host_paths(kind, onnx)
+    lock_file = open(paths['lock'], 'w')
+    try:
+        fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except OSError:
+        print(f'A {kind} model host is already running', file=sys.stderr)
+        sys.exit(0)
+
+    Host(kind, workers, onnx).serve()
+
+
+# --- client ---------------------------------------------------------------
+
+def connect(kind: str, workers: int = DEFAULT_WORKERS, start: bool = True, onnx: str = 'auto'):
+    """Connection to the kind's host, starting one (detached) if none is running."""
+    from multiprocessing.connection import Client
+
+    onnx = host_onnx_mode(kind, onnx)
+    paths = host_paths(kind, onnx)
+    address = paths['socket']
+    try:
+        return Client(address, family='AF_UNIX')
+    except OSError:
+        if not start:
+            raise HostUnavailable(f'no {kind} model host running')
+
+    log = open(paths['log'], 'ab')
+    proc = subprocess.Popen(
+        [sys.executable, str(Path(__file__).resolve()), 'serve', kind, '--workers', str(workers), '--onnx', onnx],
+        stdout=log, stderr=log, stdin=subprocess.DEVNULL, start_new_session=True
+    )
+    log.close()
+
+    deadline = time.time() + STARTUP_TIMEOUT
+    while time.time() < deadline:
+        try:
+            return Client(address, family='AF_UNIX')
+        except OSError:
+            pass
+        # Exit code 0 here means another job's host won the lock; keep waiting for it
+        if proc.poll() not in (None, 0):
+            raise HostUnavailable(f'{kind} model host failed to start (see {paths["log"]})')
+        time.sleep(1)
+    raise HostUnavailable(f'{kind} model host did not start within {STARTUP_TIMEOUT}s')
+
+
+def caption_with_host(kind: str, image_files: List[Path], options: Dict,
+                      on_result: Callable[[Path, Optional[str], Optional[str]], None],
+                      workers: int = DEFAULT_WORKERS, onnx: str = 'auto') -> List[Path]:
+    """
+    Captions image_files through the shared host, calling on_result(path, caption, error)
+    as each one finishes (in completion order). Returns the images that were not
+    handled - all of them if the host can't be used - for the caller to caption locally.
+    """
+    if not supported():
+        return list(image_files)
+
+    try:
+        print(f"Connecting to shared {kind} model host...", flush=True)
+        conn = connect(kind, workers, onnx=onnx)
+    except HostUnavailable as e:
+        print(f"Model host unavailable, loading the model in-process: {e}", file=sys.stderr)
+        return list(image_files)
+
+    by_path = {str(p.resolve()): p for p in image_files}
+    pending = dict(by_path)
+    try:
+        conn.send({'images': list(by_path), 'options': options})
+        while pending:
+            message = conn.recv()
+            if message.get('done'):
+                break
+            if 'error' in message and 'path' not in message:
+                raise HostUnavailable(message['error'])
+            image = pending.pop(message['path'], None)
+            if image is not None:
+                on_result(image, message['caption'], message['error'])
+    except (EOFError, OSError, HostUnavailable) as e:
+        print(f"Model host stopped ({e}), captioning {len(pending)} remaining images in-process", file=sys.stderr)
+    finally:
+        conn.close()
+    return list(pending.values())
+
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Shared captioner model host (copy-on-write workers)')
+    sub = parser.add_subparsers(dest='command', required=True)
+    srv = sub.add_parser('serve', help='Load a captioner once and serve caption jobs over a local socket')
+    srv.add_argument('kind', choices=sorted(CAPTIONER_SCRIPTS))
+    srv.add_argument('--workers', type=int, default=DEFAULT_WORKERS)
+    srv.add_argument('--onnx', type=str, default='auto', choices=['auto', 'off'],
+                     help='Vision encoder through ONNX Runtime in each worker, for HOST_ONNX_KINDS only (see onnx_vision.py)')
+    args = parser.parse_args()
+
+    serve(args.kind, max(1, args.workers), args.onnx)
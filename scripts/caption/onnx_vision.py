@@ -0,0 +1,311 @@
+#!/usr/bin/env python3
+"""
+ONNX Runtime path for the captioners' vision encoders (BLIP, BLIP-2, Florence-2).
+
+On CPU the vision tower is most of the per-image cost and runs in eager PyTorch.
+The first CPU run exports it once to models/captioners/<repo name>/vision_encoder/,
+compares the ONNX output with PyTorch on a fixed sample image and records the
+result in export.json. Later runs load the cached export into an ONNX Runtime
+session (same tuning as the WD tagger, see ort_session.py) and swap it into the
+model, so generate() and its beam search are unchanged.
+
+The text decoders stay in PyTorch: exporting them with a KV cache needs a
+per-architecture past-key-value layout (BERT, OPT and BART here), and decoding is
+already cached by transformers' generate().
+
+Anything that goes wrong (onnxruntime/onnx missing, export error, parity
+mismatch) leaves the model on the PyTorch path.
+
+CLI:
+    onnx_vision.py export blip|blip2|florence2 [--force]   # one-time export + parity check
+    onnx_vision.py verify blip|blip2|florence2             # re-run the parity check
+"""
+
+import importlib
+import inspect
+import json
+import os
+import shutil
+import sys
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Dict, Optional, Tuple
+
+import numpy as np
+from PIL import Image
+
+MODELS_DIR = Path(__file__).resolve().parent.parent.parent / 'models' / 'captioners'
+EXPORT_DIR = 'vision_encoder'
+EXPORT_MODEL = 'model.onnx'
+EXPORT_META = 'export.json'
+OPSET = 17
+
+# Outputs must match PyTorch within atol + rtol * max|reference|
+PARITY_ATOL = 1e-3
+PARITY_RTOL = 1e-3
+PARITY_SIZE = 384
+
+CAPTIONERS = {
+    'blip': {'repo_id': 'Salesforce/blip-image-captioning-base', 'script': 'caption_blip_legacy'},
+    'blip2': {'repo_id': 'Salesforce/blip2-opt-2.7b', 'script': 'caption_blip2'},
+    'florence2': {'repo_id': 'microsoft/Florence-2-base', 'script': 'caption_florence2'},
+}
+
+
+def export_dir(kind: str) -> Path:
+    return MODELS_DIR / CAPTIONERS[kind]['repo_id'].split('/')[-1] / EXPORT_DIR
+
+
+def library_versions() -> Dict[str, str]:
+    import torch
+    import transformers
+    return {'torch': torch.__version__, 'transformers': transformers.__version__}
+
+
+def load_meta(kind: str) -> Optional[Dict]:
+    try:
+        with open(export_dir(kind) / EXPORT_META, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def save_meta(directory: Path, meta: Dict):
+    with open(directory / EXPORT_META, 'w', encoding='utf-8') as f:
+        json.dump(meta, f, indent=2)
+
+
+def encoder_module(kind: str, model):
+    """The part of the model that gets exported: pixel_values -> image features."""
+    import torch
+
+    if kind == 'florence2' and not hasattr(model, '_encode_image'):
+        raise RuntimeError('this Florence-2 implementation has no _encode_image')
+
+    class VisionEncoder(torch.nn.Module):
+        def __init__(self):
+            super().__init__()
+            self.model = model
+
+        def forward(self, pixel_values):
+            if kind == 'florence2':
+                # Vision tower + projection + position embeddings, as consumed by generate()
+                return self.model._encode_image(pixel_values)
+            out = self.model.vision_model(pixel_values=pixel_values, return_dict=True)
+            return out.last_hidden_state, out.pooler_output
+
+    return VisionEncoder().eval()
+
+
+def output_names(kind: str):
+    return ['image_features'] if kind == 'florence2' else ['last_hidden_state', 'pooler_output']
+
+
+def sample_pixel_values(processor):
+    """Deterministic, non-trivial test image run through the model's own processor."""
+    rng = np.random.RandomState(0)
+    gradient = np.linspace(0, 255, PARITY_SIZE, dtype=np.float32)
+    pixels = (gradient[None, :, None] * 0.5 + gradient[:, None, None] * 0.3
+              + rng.randint(0, 64, (PARITY_SIZE, PARITY_SIZE, 3))).clip(0, 255).astype(np.uint8)
+    image_processor = getattr(processor, 'image_processor', processor)
+    return image_processor(Image.fromarray(pixels), return_tensors='pt')['pixel_values']
+
+
+def torch_reference(kind: str, model, pixel_values):
+    import torch
+    with torch.no_grad():
+        out = encoder_module(kind, model)(pixel_values)
+    out = out if isinstance(out, tuple) else (out,)
+    return [t.float().numpy() for t in out]
+
+
+def check_parity(kind: str, session, model, pixel_values) -> Dict:
+    reference = torch_reference(kind, model, pixel_values)
+    outputs = session.run(None, {'pixel_values': pixel_values.numpy()})
+
+    max_abs_diff = 0.0
+    ok = len(outputs) == len(reference)
+    for got, want in zip(outputs, reference):
+        if got.shape != want.shape:
+            ok = False
+            continue
+        diff = float(np.max(np.abs(got - want)))
+        max_abs_diff = max(max_abs_diff, diff)
+        if diff > PARITY_ATOL + PARITY_RTOL * float(np.max(np.abs(want))):
+            ok = False
+    return {'ok': ok, 'max_abs_diff': max_abs_diff, 'atol': PARITY_ATOL, 'rtol': PARITY_RTOL}
+
+
+def export_encoder(kind: str, processor, model, force: bool = False) -> Dict:
+    """
+    Exports the vision encoder and checks parity. Returns the export metadata;
+    meta['parity']['ok'] says whether the ONNX path may be used.
+    """
+    import torch
+    from ort_session import create_session
+
+    target = export_dir(kind)
+    meta = load_meta(kind)
+    if meta and not force and meta.get('versions') == library_versions():
+        return meta
+
+    pixel_values = sample_pixel_values(processor).to(torch.float32)
+    # Export into a scratch dir and swap it in, so an interrupted export never looks complete.
+    # Large towers (BLIP-2's ViT-g) are written with external data files next to model.onnx.
+    scratch = target.with_name(EXPORT_DIR + '.tmp')
+    shutil.rmtree(scratch, ignore_errors=True)
+    scratch.mkdir(parents=True)
+
+    started = time.time()
+    names = output_names(kind)
+    # Newer torch defaults to the dynamo exporter; the TorchScript one handles these towers as-is
+    export_kwargs = {'dynamo': False} if 'dynamo' in inspect.signature(torch.onnx.export).parameters else {}
+    with torch.no_grad():
+        torch.onnx.export(
+            encoder_module(kind, model),
+            (pixel_values,),
+            str(scratch / EXPORT_MODEL),
+            input_names=['pixel_values'],
+            output_names=names,
+            dynamic_axes={'pixel_values': {0: 'batch'}, **{name: {0: 'batch'} for name in names}},
+            opset_version=OPSET,
+            do_constant_folding=True,
+            **export_kwargs,
+        )
+
+    session = create_session(str(scratch / EXPORT_MODEL), cache_optimized=False)
+    meta = {
+        'kind': kind,
+        'repo_id': CAPTIONERS[kind]['repo_id'],
+        'opset': OPSET,
+        'outputs': names,
+        'versions': library_versions(),
+        'parity': check_parity(kind, session, model, pixel_values),
+        'export_seconds': round(time.time() - started, 1),
+        'exported_at': datetime.now(timezone.utc).isoformat(),
+    }
+    del session
+    save_meta(scratch, meta)
+
+    shutil.rmtree(target, ignore_errors=True)
+    os.replace(scratch, target)
+    return meta
+
+
+class OnnxVisionModel:
+    """Runs the exported encoder; returns torch tensors on the model's device/dtype."""
+
+    def __init__(self, session, dtype, device):
+        self.session = session
+        self.dtype = dtype
+        self.device = device
+
+    def run(self, pixel_values) -> Tuple:
+        import torch
+        outputs = self.session.run(None, {'pixel_values': pixel_values.detach().float().cpu().numpy()})
+        return tuple(torch.from_numpy(o).to(device=self.device, dtype=self.dtype) for o in outputs)
+
+
+def install_encoder(kind: str, model, runner: OnnxVisionModel):
+    """Routes the model's vision encoding through ONNX Runtime without touching generate()."""
+    import torch
+    from transformers.modeling_outputs import BaseModelOutputWithPooling
+
+    if kind == 'florence2':
+        # generate() calls self._encode_image(pixel_values); an instance attribute shadows it
+        model._encode_image = lambda pixel_values, *args, **kwargs: runner.run(pixel_values)[0]
+        return
+
+    class OnnxVisionTower(torch.nn.Module):
+        def forward(self, pixel_values=None, *args, **kwargs):
+            last_hidden_state, pooler_output = runner.run(pixel_values)
+            return BaseModelOutputWithPooling(last_hidden_state=last_hidden_state, pooler_output=pooler_output)
+
+    # Dropping the PyTorch tower also frees its weights
+    model.vision_model = OnnxVisionTower()
+
+
+def export_is_current(kind: str) -> bool:
+    """A usable export exists: made with the installed torch/transformers and parity-checked."""
+    meta = load_meta(kind)
+    return bool(meta and meta.get('versions') == library_versions() and meta.get('parity', {}).get('ok'))
+
+
+def accelerate(kind: str, processor, model, device: str, mode: str = 'auto',
+               threads: Optional[int] = None, allow_export: bool = True, cache_optimized: bool = True):
+    """
+    Switches the model's vision encoder to ONNX Runtime when running on CPU
+    (exporting it first if needed and allow_export). threads caps the session's
+    intra-op threads; cache_optimized=False neither reads nor writes the cached
+    optimised graph (for concurrent processes). Returns a short description of the path in use.
+    """
+    if mode == 'off' or device != 'cpu':
+        return 'pytorch'
+
+    try:
+        import onnxruntime  # noqa: F401
+        from ort_session import create_session
+    except ImportError as e:
+        print(f"ONNX Runtime unavailable, using PyTorch vision encoder: {e}", file=sys.stderr)
+        return 'pytorch'
+
+    try:
+        meta = load_meta(kind)
+        if not meta or meta.get('versions') != library_versions():
+            if not allow_export:
+                return 'pytorch'
+            print(f"Exporting {kind} vision encoder to ONNX (one-time)...", flush=True)
+            meta = export_encoder(kind, processor, model, force=True)
+
+        parity = meta.get('parity', {})
+        if not parity.get('ok'):
+            print(f"ONNX {kind} vision encoder failed the parity check "
+                  f"(max diff {parity.get('max_abs_diff')}), using PyTorch", file=sys.stderr)
+            return 'pytorch'
+
+        session = create_session(str(export_dir(kind) / EXPORT_MODEL), threads=threads, cache_optimized=cache_optimized)
+        dtype = next(model.parameters()).dtype
+        install_encoder(kind, model, OnnxVisionModel(session, dtype, device))
+        return 'onnx'
+    except Exception as e:
+        print(f"ONNX vision encoder unavailable for {kind}, using PyTorch: {e}", file=sys.stderr)
+        return 'pytorch'
+
+
+def load_captioner(kind: str):
+    """The captioner script's own (PyTorch) loader, so the export sees the exact same model."""
+    sys.path.insert(0, str(Path(__file__).resolve().parent))
+    module = importlib.import_module(CAPTIONERS[kind]['script'])
+    processor, model, _ = module.load_model()
+    return processor, model.to('cpu').float().eval()
+
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Export captioner vision encoders to ONNX')
+    sub = parser.add_subparsers(dest='command', required=True)
+    exp = sub.add_parser('export', help='Export a vision encoder and check parity with PyTorch')
+    exp.add_argument('kind', choices=sorted(CAPTIONERS))
+    exp.add_argument('--force', action='store_true', help='Re-export even if a current export exists')
+    ver = sub.add_parser('verify', help='Re-run the parity check against the cached export')
+    ver.add_argument('kind', choices=sorted(CAPTIONERS))
+    args = parser.parse_args()
+
+    processor, model = load_captioner(args.kind)
+    if args.command == 'export':
+        result = export_encoder(args.kind, processor, model, force=args.force)
+    else:
+        from ort_session import create_session
+        meta = load_meta(args.kind)
+        if not meta:
+            print(json.dumps({'error': f'{args.kind} has not been exported'}))
+            sys.exit(1)
+        session = create_session(str(export_dir(args.kind) / EXPORT_MODEL), cache_optimized=False)
+        meta['parity'] = check_parity(args.kind, session, model, sample_pixel_values(processor).to(model.dtype))
+        save_meta(export_dir(args.kind), meta)
+        result = meta
+
+    print(json.dumps(result, indent=2))
+    sys.exit(0 if result['parity']['ok'] else 1)
@@ -0,0 +1,65 @@
+#!/usr/bin/env python3
+"""
+Shared ONNX Runtime session setup for the WD tagger and the captioners'
+exported vision encoders (see onnx_vision.py).
+- Full graph optimisation, with the optimised graph cached next to the model
+  so later runs skip the optimisation pass
+- One intra-op thread per core, sequential execution (single-stream inference)
+- CPU provider unless CUDA is requested and available
+"""
+
+import os
+import sys
+from typing import List, Optional
+
+import onnxruntime as ort
+
+OPTIMIZED_SUFFIX = '.ort-opt.onnx'
+
+
+def providers(use_cuda: bool = False) -> List[str]:
+    available = ort.get_available_providers()
+    if use_cuda and 'CUDAExecutionProvider' in available:
+        return ['CUDAExecutionProvider', 'CPUExecutionProvider']
+    return ['CPUExecutionProvider']
+
+
+def session_options(threads: Optional[int] = None, optimized_path: Optional[str] = None) -> ort.SessionOptions:
+    opts = ort.SessionOptions()
+    opts.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+    opts.execution_mode = ort.ExecutionMode.ORT_SEQUENTIAL
+    opts.intra_op_num_threads = threads or os.cpu_count() or 1
+    opts.inter_op_num_threads = 1
+    if optimized_path:
+        opts.optimized_model_filepath = optimized_path
+    return opts
+
+
+def create_session(model_path: str, use_cuda: bool = False, threads: Optional[int] = None,
+                   cache_optimized: bool = True) -> ort.InferenceSession:
+    """
+    Loads model_path, preferring a previously saved optimised graph. The optimised
+    copy is only written for CPU sessions (it can contain provider-specific nodes)
+    and only where the model directory is writable.
+    """
+    chosen = providers(use_cuda)
+    cache_optimized = cache_optimized and chosen == ['CPUExecutionProvider']
+    optimized = os.path.splitext(model_path)[0] + OPTIMIZED_SUFFIX
+
+    if cache_optimized and os.path.exists(optimized) and os.path.getmtime(optimized) >= os.path.getmtime(model_path):
+        try:
+            # Already optimised: skip the graph passes entirely
+            opts = session_options(threads)
+            opts.graph_optimization_level = ort.GraphOptimizationLevel.ORT_DISABLE_ALL
+            return ort.InferenceSession(optimized, sess_options=opts, providers=chosen)
+        except Exception as e:
+            print(f"Warning: ignoring cached optimised model {optimized}: {e}", file=sys.stderr)
+
+    if cache_optimized and os.access(os.path.dirname(os.path.abspath(model_path)), os.W_OK):
+        try:
+            return ort.InferenceSession(model_path, sess_options=session_options(threads, optimized), providers=chosen)
+        except Exception as e:
+            # e.g. graphs over 2GB can't be saved without external data
+            print(f"Warning: could not cache optimised model for {model_path}: {e}", file=sys.stderr)
+
+    return ort.InferenceSession(model_path, sess_options=session_options(threads), providers=chosen)
@@ -4,28 +4,36 @@ Refactored WD14 Tagger
 - Supports standard SmilingWolf v2 models (ConvNeXt, SwinV2, ViT)
 - Correct preprocessing (448x448, standard normalization)
 - Correct CSV parsing (handling General/Character/Rating categories)
-- Supports single file or batch directory processing
+- Supports single file, batch directory or --file_list processing
+- Supports several --model repo ids at once: each image is decoded and
+  preprocessed once, and every batch is fed to all loaded sessions. Tags are
+  merged by max/mean probability (--ensemble), optionally with per-model tag
+  sets written to --per_model_json
 """
 
 import argparse
 import json
 import sys
 import os
-import csv
 from pathlib import Path
 from typing import List, Dict, Tuple, Set
 import numpy as np
 from PIL import Image
 
-# Check for required dependencies
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from caption_store import CaptionWriter
+from model_registry import load_tags, repo_key, resolve
+
+# Check for required dependencies (huggingface_hub is only needed for models that aren't installed locally)
 try:
     import onnxruntime as ort
-    from huggingface_hub import hf_hub_download
 except ImportError as e:
     print(f"Error: Missing required package: {e}", file=sys.stderr)
     print("Please install: pip install onnxruntime huggingface-hub pillow numpy", file=sys.stderr)
     sys.exit(1)
 
+from ort_session import create_session
+
 # Default exclude list (Standard booru junk)
 DEFAULT_EXCLUDE = [
     'masterpiece', 'best quality', 'highres', 'absurdres',
@@ -41,45 +49,46 @@ MODEL_FILES = {
     'tags': 'selected_tags.csv'
 }
 
-def load_model(repo_id: str):
-    """Downloads (if needed) and loads the ONNX model and tags CSV from a repo_id."""
-    print(f"Loading model from {repo_id}...", flush=True)
+def download_from_hub(repo_id: str) -> Tuple[str, str]:
+    """Fallback for models missing from the local registry."""
+    try:
+        from huggingface_hub import hf_hub_download
+    except ImportError as e:
+        print(f"Error: {repo_id} is not installed locally and huggingface_hub is missing: {e}", file=sys.stderr)
+        sys.exit(1)
 
     try:
-        model_path = hf_hub_download(repo_id, MODEL_FILES['model'])
-        tags_path = hf_hub_download(repo_id, MODEL_FILES['tags'])
+        return hf_hub_download(repo_id, MODEL_FILES['model']), hf_hub_download(repo_id, MODEL_FILES['tags'])
     except Exception as e:
         print(f"Error downloading model: {e}", file=sys.stderr)
         sys.exit(1)
 
-    # Load Tags
-    tags = []
-    character_indexes = []
-    general_indexes = []
-    rating_indexes = []
-
-    with open(tags_path, 'r', encoding='utf-8') as f:
-        reader = csv.DictReader(f)
-        for idx, row in enumerate(reader):
-            name = row.get('name', '').strip()
-            category = int(row.get('category', row.get('category_id', 0))) # Handle different CSV headers
-            
-            tags.append(name)
-            
-            # 0: General, 4: Character, 9: Rating
-            if category == 0:
-                general_indexes.append(idx)
-            elif category == 4:
-                character_indexes.append(idx)
-            elif category == 9:
-                rating_indexes.append(idx)
-            # Other categories ignored for now (e.g. 1: Artist, 3: Copyright)
+
+def load_model(repo_id: str):
+    """Loads the ONNX model and tags from the local registry, downloading from the hub only on a miss."""
+    print(f"Loading model from {repo_id}...", flush=True)
+
+    local = resolve(repo_id, [MODEL_FILES['model'], MODEL_FILES['tags']])
+    if local:
+        model_path, tags_path = local
+    else:
+        print(f"{repo_id} not found in local registry, using Hugging Face Hub", flush=True)
+        model_path, tags_path = download_from_hub(repo_id)
+
+    # Load Tags (parsed CSV is cached as .npz)
+    tags, categories = load_tags(tags_path, repo_key(repo_id))
+
+    # 0: General, 4: Character, 9: Rating
+    # Other categories ignored for now (e.g. 1: Artist, 3: Copyright)
+    general_indexes = np.nonzero(categories == 0)[0].tolist()
+    character_indexes = np.nonzero(categories == 4)[0].tolist()
+    rating_indexes = np.nonzero(categories == 9)[0].tolist()
 
     # Load ONNX
     try:
-        # Use CPU provider to avoid CUDA issues unless explicitly available/configured
-        # For now simple CPU is safer for a general script
-        session = ort.InferenceSession(model_path, providers=['CPUExecutionProvider'])
+        # CPU provider to avoid CUDA issues; the optimised graph is only cached for
+        # locally installed models, not inside the hub cache
+        session = create_session(model_path, cache_optimized=bool(local))
     except Exception as e:
         print(f"Error creating ONNX session: {e}", file=sys.stderr)
         sys.exit(1)
@@ -87,24 +96,89 @@ def load_model(repo_id: str):
     input_name = session.get_inputs()[0].name
     return session, input_name, tags, general_indexes, character_indexes, rating_indexes
 
-def preprocess_image(image_path: str, size: int = 448) -> np.ndarray:
+
+class TaggerModel:
+    """A loaded tagger plus the mapping of its tags into the shared (union) vocabulary."""
+
+    def __init__(self, repo_id: str):
+        self.repo_id = repo_id
+        (self.session, self.input_name, self.tags,
+         self.gen_idx, self.char_idx, self.rat_idx) = load_model(repo_id)
+
+        input_shape = self.session.get_inputs()[0].shape
+        self.nchw = input_shape[3] != 3 and input_shape[1] == 3
+        size = input_shape[2] if self.nchw else input_shape[1]
+        self.size = size if isinstance(size, int) else 448
+        # Exports with a fixed batch dimension of 1 get fed one image at a time
+        self.max_batch = input_shape[0] if isinstance(input_shape[0], int) else None
+
+        # Filled in by build_vocabulary
+        self.model_idx = None
+        self.union_idx = None
+
+    def infer(self, batch: np.ndarray) -> np.ndarray:
+        """batch is [B, H, W, C]; returns [B, num_tags] probabilities."""
+        if self.nchw:
+            batch = batch.transpose(0, 3, 1, 2)
+        if self.max_batch == 1 and len(batch) > 1:
+            return np.concatenate([self.session.run(None, {self.input_name: batch[i:i + 1]})[0] for i in range(len(batch))])
+        return self.session.run(None, {self.input_name: batch})[0]
+
+
+def build_vocabulary(models: List['TaggerModel']) -> Tuple[List[str], np.ndarray]:
     """
-    Standard WD14 preprocessing:
-    - Resize long edge to 448
-    - Pad short edge to 448 with white (or model specific color, white is standard for these)
-    - Convert to BGR (standard for CV models, many ONNX exports expect this) or RGB?
-      SmilingWolf v2 models generally expect RGB input normalized 0-1 (BGR is old Caffe style).
-      Let's verify: official demo uses `PIL.Image` (RGB) -> resize -> pad -> numpy.
-      Standard `SmilingWolf` inference code uses BGR for some, RGB for others. 
-      However, the most stable `comfyui` and `A1111` impls use BGR for `wd-v1-4` models.
-      Let's try BGR first which is critical for correcting the "confusion" issue.
+    Union of the general + character tags of all models, keyed by tag name
+    (vocabularies differ between v2 and v3 models). Returns the names and a
+    per-tag flag that is True for character tags.
+    """
+    names: List[str] = []
+    is_character: List[bool] = []
+    index: Dict[str, int] = {}
+
+    for model in models:
+        model_idx = []
+        union_idx = []
+        for indexes, character in ((model.gen_idx, False), (model.char_idx, True)):
+            for i in indexes:
+                name = model.tags[i]
+                if name not in index:
+                    index[name] = len(names)
+                    names.append(name)
+                    is_character.append(character)
+                model_idx.append(i)
+                union_idx.append(index[name])
+        model.model_idx = np.array(model_idx, dtype=np.int64)
+        model.union_idx = np.array(union_idx, dtype=np.int64)
+
+    return names, np.array(is_character, dtype=bool)
+
+
+def select_tags(scores, names, thresholds, exclude_set, max_tags):
+    """Threshold a score vector over the union vocabulary into a confidence-sorted tag list."""
+    candidates = np.nonzero(scores >= thresholds)[0]
+    ranked = candidates[np.argsort(-scores[candidates], kind='stable')]
+    result = [names[i] for i in ranked if names[i] not in exclude_set]
+    after_threshold = len(result)
+    if max_tags > 0 and len(result) > max_tags:
+        result = result[:max_tags]
+    return result, after_threshold
+
+
+def score_batch(models: List['TaggerModel'], batches: Dict[int, np.ndarray], vocab_size: int) -> np.ndarray:
+    """[models, batch, union vocabulary] probabilities; tags a model doesn't know score 0."""
+    count = len(next(iter(batches.values())))
+    scores = np.zeros((len(models), count, vocab_size), dtype=np.float32)
+    for m, model in enumerate(models):
+        probs = model.infer(batches[model.size])
+        scores[m][:, model.union_idx] = probs[:, model.model_idx]
+    return scores
+
+
+def preprocess_decoded(img: Image.Image, size: int = 448) -> np.ndarray:
+    """
+    Standard WD14 preprocessing for an already decoded RGB image: resize the long
+    edge to size, pad to a white square and convert to BGR float32 (0-255).
     """
-    try:
-        img = Image.open(image_path).convert('RGB')
-    except Exception as e:
-        print(f"Error opening image {image_path}: {e}", file=sys.stderr)
-        return None
-
     # Resize/Pad logic
     # We want to fit into size x size while maintaining aspect ratio, padding the rest
     old_size = img.size # (width, height)
@@ -143,76 +217,6 @@ def preprocess_image(image_path: str, size: int = 448) -> np.ndarray:
     # Check shape later.
     return img_np
 
-def run_inference(session, input_name, img_array):
-    """Run inference, handling NCHW vs NHWC."""
-    # ONNX Runtime expects specific shape.
-    # Check input shape from session
-    input_shape = session.get_inputs()[0].shape
-    # usually [None, height, width, 3] or [None, 3, height, width]
-    
-    # img_array is [H, W, 3]
-    h, w, c = img_array.shape
-    
-    # Add batch dimension
-    input_data = np.expand_dims(img_array, axis=0) # [1, H, W, C]
-    
-    # If model expects NCHW [1, C, H, W]
-    if input_shape[3] != 3 and input_shape[1] == 3:
-        input_data = input_data.transpose(0, 3, 1, 2)
-        
-    outputs = session.run(None, {input_name: input_data})
-    return outputs[0][0] # First batch item
-
-def process_tags(probs, tags, gen_idx, char_idx, rat_idx, threshold, char_threshold, exclude_set):
-    """Process raw probabilities into a tag list."""
-    
-    result_tags = []
-    
-    stats = {
-        "raw": len(tags),
-        "after_exclude": 0, # To be calculated roughly
-        "after_threshold": 0
-    }
-    
-    # We can't easily count "after_exclude" for all tags without iterating all 4000+ tags.
-    # Instead, we'll just count how many candidate tags passed threshold AND exclude.
-    # The user asking for "after_exclude" and "after_threshold" separately implies a pipeline.
-    # But we do (Threshold AND NotExcluded).
-    # Let's just approximate or do it efficiently.
-    
-    # Actually, let's just count relevant ones.
-    
-    # 1. Process General Tags
-    for i in gen_idx:
-        score = probs[i]
-        tag_name = tags[i]
-        
-        # Check exclusion
-        if tag_name in exclude_set:
-            continue
-            
-        # Check threshold
-        if score >= threshold:
-            result_tags.append((tag_name, score))
-
-    # 2. Process Character Tags
-    for i in char_idx:
-        score = probs[i]
-        tag_name = tags[i]
-        
-        if tag_name in exclude_set:
-            continue
-            
-        if score >= char_threshold:
-            result_tags.append((tag_name, score))
-            
-    stats["after_threshold"] = len(result_tags)
-    
-    # Sort by confidence
-    result_tags.sort(key=lambda x: x[1], reverse=True)
-    
-    return [t[0] for t in result_tags], stats
-
 def normalize_tag(tag):
     return tag.replace('_', ' ').strip()
 
@@ -243,7 +247,13 @@ def main():
     parser = argparse.ArgumentParser()
     parser.add_argument('--input_dir', type=str)
     parser.add_argument('--file', type=str)
-    parser.add_argument('--model', type=str, default='convnext')
+    parser.add_argument('--model', type=str, nargs='+', default=['convnext'],
+                        help='One or more model repo ids; several models are ensembled')
+    parser.add_argument('--ensemble', choices=['max', 'mean'], default='max',
+                        help='How to merge per-tag probabilities across models')
+    parser.add_argument('--per_model_json', type=str, default='',
+                        help='Also write per-model tag sets to this JSON file')
+    parser.add_argument('--batch_size', type=int, default=8)
     parser.add_argument('--threshold', type=float, default=0.35)
     parser.add_argument('--character_threshold', type=float, default=0.7) 
     parser.add_argument('--max_tags', type=int, default=50) 
@@ -254,6 +264,8 @@ def main():
     parser.add_argument('--shuffle', action='store_true')
     parser.add_argument('--append', action='store_true', help='Append tags to existing files instead of overwriting')
     parser.add_argument('--blacklist', type=str, help='deprecated alias for exclude_tags')
+    parser.add_argument('--caption_store', type=str, default='', help="Write to the project's captions.db instead of .txt files")
+    parser.add_argument('--file_list', type=str, default='', help='Tag only the images listed in this file, one path per line (used by distributed.py)')
     
     args = parser.parse_args()
 
@@ -276,6 +288,9 @@ def main():
     targets = []
     if args.file:
         targets.append(Path(args.file))
+    elif args.file_list:
+        with open(args.file_list, 'r', encoding='utf-8') as f:
+            targets = [Path(line.strip()) for line in f if line.strip()]
     elif args.input_dir:
         p = Path(args.input_dir)
         for ext in ['.png', '.jpg', '.jpeg', '.webp']:
@@ -286,78 +301,118 @@ def main():
         print("No images found.", file=sys.stderr)
         sys.exit(1)
 
-    # Load Model
-    session, input_name, tags, gen_idx, char_idx, rat_idx = load_model(args.model)
+    # Load all models up front; every batch is fed to each session
+    models = [TaggerModel(repo_id) for repo_id in dict.fromkeys(args.model)]
+    names, is_character = build_vocabulary(models)
+    char_threshold = args.character_threshold or args.threshold
+    thresholds = np.where(is_character, char_threshold, args.threshold).astype(np.float32)
+    sizes = sorted(set(m.size for m in models))
+    per_model_output = {} if args.per_model_json else None
 
     sys.stdout.reconfigure(encoding='utf-8', line_buffering=True)
     total = len(targets)
-    print(f"Found {total} images. Starting inference...", flush=True)
+    print(f"Found {total} images. Starting inference with {len(models)} model(s)...", flush=True)
+
+    writer = CaptionWriter(args.caption_store or None, source='wd14')
+    batch_size = max(1, args.batch_size)
+    processed = 0
+
+    def report(img_path: Path, status: str):
+        # Every image counts once, skipped ones too, so progress reaches total
+        nonlocal processed
+        processed += 1
+        prog = json.dumps({
+            "progress": processed,
+            "total": total,
+            "current_file": img_path.name,
+            "status": status
+        })
+        print(f"PROGRESS:{prog}", flush=True)
+
+    for batch_start in range(0, total, batch_size):
+        batch_paths = targets[batch_start:batch_start + batch_size]
+
+        # Decode once, preprocess once per distinct input size
+        decoded_paths = []
+        inputs = {size: [] for size in sizes}
+        for img_path in batch_paths:
+            try:
+                img = Image.open(img_path).convert('RGB')
+            except Exception as e:
+                print(f"Error opening image {img_path}: {e}", file=sys.stderr)
+                report(img_path, "skipped")
+                continue
+            for size in sizes:
+                inputs[size].append(preprocess_decoded(img, size))
+            decoded_paths.append(img_path)
+        if not decoded_paths:
+            continue
+        batches = {size: np.stack(arrays) for size, arrays in inputs.items()}
 
-    for i, img_path in enumerate(targets, 1):
         try:
-            # Emit Progress
-            prog = json.dumps({
-                "progress": i, 
-                "total": total, 
-                "current_file": img_path.name,
-                "status": "tagging"
-            })
-            print(f"PROGRESS:{prog}", flush=True)
-
-            # Preprocess
-            img_in = preprocess_image(str(img_path))
-            if img_in is None: continue
-
-            # Infer
-            probs = run_inference(session, input_name, img_in)
-
-            # Process outputs (Threshold & Filter)
-            final_tags, stats = process_tags(
-                probs, tags, gen_idx, char_idx, rat_idx, 
-                args.threshold, args.character_threshold or args.threshold, 
-                exclude_set
-            )
-            
-            # Apply Max Tags (Limit)
-            if args.max_tags > 0 and len(final_tags) > args.max_tags:
-                final_tags = final_tags[:args.max_tags]
-            
-            stats['after_max'] = len(final_tags)
-            print(f"DEBUG:counts:{json.dumps(stats)}", flush=True)
-
-            # Format (Trigger, Shuffle, Normalize)
-            formatted_tags = format_tags(final_tags, args)
-            
-            # Write
-            txt_path = img_path.with_suffix('.txt')
-            
-            if args.append and txt_path.exists():
+            scores = score_batch(models, batches, len(names))
+        except Exception as e:
+            # One bad image (or a batch too large for the device) shouldn't cost the whole batch
+            print(f"Batch starting at {batch_paths[0]} failed ({e}), retrying one image at a time", file=sys.stderr)
+            kept_paths, kept_scores = [], []
+            for i, img_path in enumerate(decoded_paths):
                 try:
-                    with open(txt_path, 'r', encoding='utf-8') as f:
-                        existing_content = f.read().strip()
-                except Exception:
-                    existing_content = ""
-                
+                    kept_scores.append(score_batch(models, {size: batch[i:i + 1] for size, batch in batches.items()}, len(names)))
+                    kept_paths.append(img_path)
+                except Exception as e:
+                    print(f"Error running inference on {img_path}: {e}", file=sys.stderr)
+                    report(img_path, "skipped")
+            if not kept_paths:
+                continue
+            decoded_paths = kept_paths
+            scores = np.concatenate(kept_scores, axis=1)
+        merged = scores.max(axis=0) if args.ensemble == 'max' else scores.mean(axis=0)
+
+        for b, img_path in enumerate(decoded_paths):
+            try:
+                report(img_path, "tagging")
+
+                # Threshold, filter and apply max tags
+                final_tags, after_threshold = select_tags(merged[b], names, thresholds, exclude_set, args.max_tags)
+
+                stats = {"raw": len(names), "after_exclude": 0, "after_threshold": after_threshold, "after_max": len(final_tags)}
+                print(f"DEBUG:counts:{json.dumps(stats)}", flush=True)
+
+                if per_model_output is not None:
+                    per_model_output[img_path.name] = {
+                        model.repo_id: select_tags(scores[m][b], names, thresholds, exclude_set, args.max_tags)[0]
+                        for m, model in enumerate(models)
+                    }
+
+                # Format (Trigger, Shuffle, Normalize)
+                formatted_tags = format_tags(final_tags, args)
+
+                # Write
+                existing_content = (writer.read(img_path) or "").strip() if args.append else ""
+
                 if existing_content:
                     existing_tags = [t.strip() for t in existing_content.split(',')]
                     existing_set = set(t.lower() for t in existing_tags)
-                    
+
                     # Append new tags that are not in existing
                     for new_tag in formatted_tags:
                         if new_tag.lower() not in existing_set:
                             existing_tags.append(new_tag)
-                    
+
                     output_tags = existing_tags
                 else:
                     output_tags = formatted_tags
-            else:
-                output_tags = formatted_tags
 
-            with open(txt_path, 'w', encoding='utf-8') as f:
-                f.write(', '.join(output_tags))
-                
-        except Exception as e:
-            print(f"Error processing {img_path}: {e}", file=sys.stderr)
+                writer.write(img_path, ', '.join(output_tags))
+
+            except Exception as e:
+                print(f"Error processing {img_path}: {e}", file=sys.stderr)
+
+    writer.close()
+
+    if per_model_output is not None:
+        with open(args.per_model_json, 'w', encoding='utf-8') as f:
+            json.dump(per_model_output, f, indent=2, ensure_ascii=False)
 
     print("Tagging Finished.")
 
@@ -0,0 +1,196 @@
+#!/usr/bin/env python3
+"""
+Consolidated caption store (projects/<id>/captions.db).
+
+Mirrors src/lib/captions.ts: one row per train_data image, keyed by its path
+relative to train_data (e.g. "10_class/img_001.png"). A project uses the store
+when captions.db exists; otherwise captions live in .txt sidecars as before.
+
+Caption backends write through CaptionWriter, which handles both modes and
+batches store writes into a few transactions instead of one file per image.
+It also keeps the project's tag index (tag_index.py) up to date:
+
+    sys.path.insert(0, <scripts dir>)
+    from caption_store import CaptionWriter
+
+    with CaptionWriter(args.caption_store, source='wd14') as writer:
+        existing = writer.read(img_path)
+        writer.write(img_path, ', '.join(tags))
+"""
+
+import os
+import sqlite3
+import sys
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from tag_index import TagIndex, project_dir_for
+
+CAPTIONS_DB = 'captions.db'
+SCHEMA_VERSION = 1
+BUSY_TIMEOUT_MS = 5000
+# Rows buffered by CaptionWriter before a transaction is committed
+WRITE_BATCH = 64
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS captions (
+    key TEXT PRIMARY KEY,
+    folder TEXT NOT NULL,
+    text TEXT NOT NULL,
+    source TEXT,
+    edited INTEGER NOT NULL DEFAULT 0,
+    updated_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_captions_folder ON captions(folder);
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+"""
+
+UPSERT_SQL = """
+INSERT INTO captions (key, folder, text, source, edited, updated_at)
+VALUES (?, ?, ?, ?, ?, ?)
+ON CONFLICT(key) DO UPDATE SET
+    text = excluded.text,
+    source = excluded.source,
+    edited = excluded.edited,
+    updated_at = excluded.updated_at
+"""
+
+
+class CaptionStore:
+    def __init__(self, db_path: str):
+        self.db_path = db_path
+        # isolation_level=None: we issue BEGIN/COMMIT ourselves
+        self.conn = sqlite3.connect(db_path, timeout=BUSY_TIMEOUT_MS / 1000, isolation_level=None)
+        self.conn.execute('PRAGMA journal_mode = WAL')
+        self.conn.execute('PRAGMA synchronous = NORMAL')
+        self.conn.execute(f'PRAGMA busy_timeout = {BUSY_TIMEOUT_MS}')
+        self.conn.executescript(SCHEMA)
+        self.conn.execute("INSERT OR IGNORE INTO meta (key, value) VALUES ('schema_version', ?)", (str(SCHEMA_VERSION),))
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        self.conn.close()
+
+    @contextmanager
+    def _write(self):
+        self.conn.execute('BEGIN IMMEDIATE')
+        try:
+            yield
+            self.conn.execute('COMMIT')
+        except Exception:
+            self.conn.execute('ROLLBACK')
+            raise
+
+    def get(self, key: str) -> Optional[str]:
+        row = self.conn.execute('SELECT text FROM captions WHERE key = ?', (key,)).fetchone()
+        return row[0] if row else None
+
+    def folder(self, folder: str) -> Dict[str, str]:
+        rows = self.conn.execute('SELECT key, text FROM captions WHERE folder = ?', (folder,)).fetchall()
+        return {k: t for k, t in rows}
+
+    def put_many(self, rows: Iterable[Tuple[str, str, Optional[str]]], edited: bool = False) -> int:
+        """Upserts (key, text, source) rows in one transaction. Returns rows written."""
+        now = time.time() * 1000
+        params = [(key, key.split('/', 1)[0] if '/' in key else '', text, source, int(edited), now)
+                  for key, text, source in rows]
+        with self._write():
+            self.conn.executemany(UPSERT_SQL, params)
+        return len(params)
+
+
+class CaptionWriter:
+    """
+    Reads/writes captions for images under train_data/.
+    With a store path, writes are buffered and committed in batches; without
+    one, each caption goes to a .txt sidecar next to its image (legacy mode).
+    """
+
+    def __init__(self, store_path: Optional[str] = None, source: str = '', batch_size: int = WRITE_BATCH):
+        self.store = CaptionStore(store_path) if store_path else None
+        self.train_data_dir = os.path.join(os.path.dirname(os.path.abspath(store_path)), 'train_data') if store_path else None
+        self.source = source
+        self.batch_size = batch_size
+        self.pending: List[Tuple[str, str, Optional[str]]] = []
+        # (project dir, key, text) waiting for the tag index
+        self.index_pending: List[Tuple[str, str, str]] = []
+        self.indexes: Dict[str, TagIndex] = {}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def key_for(self, image_path) -> str:
+        return os.path.relpath(os.path.abspath(image_path), self.train_data_dir).replace(os.sep, '/')
+
+    def read(self, image_path) -> Optional[str]:
+        if self.store:
+            key = self.key_for(image_path)
+            # A buffered write wins over what's committed
+            for pending_key, text, _ in reversed(self.pending):
+                if pending_key == key:
+                    return text
+            return self.store.get(key)
+
+        txt_path = os.path.splitext(str(image_path))[0] + '.txt'
+        try:
+            with open(txt_path, 'r', encoding='utf-8') as f:
+                return f.read()
+        except OSError:
+            return None
+
+    def write(self, image_path, text: str):
+        located = project_dir_for(image_path)
+        if located:
+            self.index_pending.append((located[0], located[1], text))
+
+        if not self.store:
+            with open(os.path.splitext(str(image_path))[0] + '.txt', 'w', encoding='utf-8') as f:
+                f.write(text)
+            if len(self.index_pending) >= self.batch_size:
+                self.flush_index()
+            return
+
+        self.pending.append((self.key_for(image_path), text, self.source or None))
+        if len(self.pending) >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        if self.store and self.pending:
+            self.store.put_many(self.pending)
+            self.pending = []
+        self.flush_index()
+
+    def flush_index(self):
+        by_project: Dict[str, List[Tuple[str, str]]] = {}
+        for project_dir, key, text in self.index_pending:
+            by_project.setdefault(project_dir, []).append((key, text))
+        self.index_pending = []
+        for project_dir, rows in by_project.items():
+            # The index can be rebuilt from the captions, so a failure here mustn't fail captioning
+            try:
+                if project_dir not in self.indexes:
+                    self.indexes[project_dir] = TagIndex(project_dir)
+                self.indexes[project_dir].update(rows)
+            except sqlite3.Error as e:
+                print(f"Warning: tag index not updated for {project_dir}: {e}", file=sys.stderr)
+
+    def close(self):
+        self.flush()
+        for index in self.indexes.values():
+            index.close()
+        self.indexes = {}
+        if self.store:
+            self.store.close()
+            self.store = None
@@ -0,0 +1,229 @@
+#!/usr/bin/env python3
+"""
+Checkpoint library index (data/checkpoint_index.db).
+
+Scans model directories for checkpoints and records, per file:
+- family, from the safetensors header (read directly: 8-byte length + JSON, no
+  torch/safetensors import) using detect_model.classify_safetensors
+- SHA-256 of the whole file, plus the A1111-style short hashes derived from it:
+  AutoV2 (first 10 hex of the SHA-256) and AutoV1 (legacy: SHA-256 of 64 KiB at 1 MiB)
+
+Rows are keyed by path and reused while size and mtime are unchanged, so a
+refresh only touches new or modified files. Headers are indexed first (fast, so
+the picker has families right away), then hashes are streamed through large
+mmap'd reads in a thread pool (hashlib releases the GIL), committing each file
+as it finishes. Progress is printed as PROGRESS:{json} lines and a JSON summary
+at the end.
+
+CLI:
+    checkpoint_index.py --models_dir models/checkpoints [--models_dir D2] [--db data/checkpoint_index.db] [--no_hash]
+"""
+
+import argparse
+import hashlib
+import json
+import mmap
+import os
+import sqlite3
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Dict, List, Optional, Tuple
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from detect_model import classify_safetensors  # noqa: E402
+
+DEFAULT_DB = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'data', 'checkpoint_index.db')
+CHECKPOINT_EXTENSIONS = ('.safetensors', '.ckpt', '.pt', '.pth')
+HASH_CHUNK = 64 * 1024 * 1024
+MAX_HEADER_BYTES = 100 * 1024 * 1024
+BUSY_TIMEOUT_MS = 5000
+# Metadata keys worth keeping for the picker (kohya ss_* / modelspec); the rest can be huge
+KEPT_METADATA = ('modelspec.architecture', 'modelspec.title', 'ss_base_model_version', 'ss_sd_model_name',
+                 'ss_network_module', 'ss_network_dim', 'ss_network_alpha', 'ss_output_name')
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS checkpoints (
+    path TEXT PRIMARY KEY,
+    dir TEXT NOT NULL,
+    name TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    format TEXT NOT NULL,
+    family TEXT,
+    tensors INTEGER,
+    metadata TEXT,
+    sha256 TEXT,
+    autov1 TEXT,
+    autov2 TEXT,
+    error TEXT,
+    indexed_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_checkpoints_dir ON checkpoints(dir);
+"""
+
+
+def read_safetensors_header(path: str) -> Tuple[Dict[str, str], List[str]]:
+    """(metadata, tensor names) from the JSON header, without touching tensor data."""
+    with open(path, 'rb') as f:
+        length = int.from_bytes(f.read(8), 'little')
+        if not 0 < length <= MAX_HEADER_BYTES:
+            raise ValueError('Not a safetensors file')
+        header = json.loads(f.read(length))
+    metadata = header.pop('__metadata__', None) or {}
+    return metadata, list(header.keys())
+
+
+def inspect(path: str) -> Dict:
+    """Header pass: format, family and a trimmed metadata dict."""
+    ext = os.path.splitext(path)[1].lower()
+    if ext != '.safetensors':
+        # Pickled checkpoints can't be classified without unpickling; detect_model.py handles those on demand
+        return {'format': ext.lstrip('.'), 'family': None, 'tensors': None, 'metadata': None, 'error': None}
+    try:
+        metadata, keys = read_safetensors_header(path)
+    except (OSError, ValueError) as e:
+        return {'format': 'safetensors', 'family': None, 'tensors': None, 'metadata': None, 'error': str(e)}
+    kept = {k: metadata[k] for k in KEPT_METADATA if k in metadata}
+    return {
+        'format': 'safetensors',
+        'family': classify_safetensors(metadata, keys),
+        'tensors': len(keys),
+        'metadata': json.dumps(kept) if kept else None,
+        'error': None,
+    }
+
+
+def hash_file(path: str) -> Dict[str, str]:
+    """SHA-256 over large mmap'd slices (no per-chunk copies), plus AutoV1/AutoV2."""
+    sha = hashlib.sha256()
+    legacy = hashlib.sha256()
+    with open(path, 'rb') as f:
+        size = os.fstat(f.fileno()).st_size
+        if size > 0:
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                if hasattr(mm, 'madvise') and hasattr(mmap, 'MADV_SEQUENTIAL'):
+                    mm.madvise(mmap.MADV_SEQUENTIAL)
+                view = memoryview(mm)
+                try:
+                    for offset in range(0, size, HASH_CHUNK):
+                        sha.update(view[offset:offset + HASH_CHUNK])
+                    legacy.update(view[0x100000:0x110000])
+                finally:
+                    view.release()
+    digest = sha.hexdigest()
+    return {'sha256': digest, 'autov2': digest[:10], 'autov1': legacy.hexdigest()[:8]}
+
+
+def scan(models_dir: str) -> Dict[str, os.stat_result]:
+    found = {}
+    for root, dirs, files in os.walk(models_dir):
+        dirs[:] = [d for d in dirs if not d.startswith('.')]
+        for name in files:
+            if name.lower().endswith(CHECKPOINT_EXTENSIONS):
+                path = os.path.join(root, name)
+                try:
+                    found[path] = os.stat(path)
+                except OSError:
+                    pass
+    return found
+
+
+def report(processed: int, total: int, current: str):
+    print('PROGRESS:' + json.dumps({'progress': {'processed': processed, 'total': total, 'current': current}}), flush=True)
+
+
+class CheckpointIndex:
+    def __init__(self, db_path: str):
+        os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+        self.conn = sqlite3.connect(db_path, timeout=BUSY_TIMEOUT_MS / 1000)
+        self.conn.execute('PRAGMA journal_mode = WAL')
+        self.conn.execute('PRAGMA synchronous = NORMAL')
+        self.conn.executescript(SCHEMA)
+
+    def close(self):
+        self.conn.close()
+
+    def rows(self, models_dir: str) -> Dict[str, Tuple[int, int, Optional[str]]]:
+        """path -> (size, mtime_ns, sha256) for everything indexed under models_dir."""
+        return {path: (size, mtime_ns, sha) for path, size, mtime_ns, sha in self.conn.execute(
+            'SELECT path, size, mtime_ns, sha256 FROM checkpoints WHERE dir = ?', (models_dir,))}
+
+    def upsert(self, models_dir: str, path: str, st: os.stat_result, info: Dict):
+        # A changed file loses its hashes; they are recomputed in the hash pass
+        self.conn.execute("""
+            INSERT OR REPLACE INTO checkpoints
+                (path, dir, name, size, mtime_ns, format, family, tensors, metadata, sha256, autov1, autov2, error, indexed_at)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, NULL, NULL, NULL, ?, ?)
+        """, (path, models_dir, os.path.basename(path), st.st_size, st.st_mtime_ns, info['format'],
+              info['family'], info['tensors'], info['metadata'], info['error'], time.time()))
+
+    def set_hashes(self, path: str, st: os.stat_result, hashes: Dict[str, str]):
+        # Only if the file is still the version that was hashed
+        with self.conn:
+            self.conn.execute(
+                'UPDATE checkpoints SET sha256 = ?, autov1 = ?, autov2 = ? WHERE path = ? AND size = ? AND mtime_ns = ?',
+                (hashes['sha256'], hashes['autov1'], hashes['autov2'], path, st.st_size, st.st_mtime_ns))
+
+    def remove(self, paths: List[str]):
+        self.conn.executemany('DELETE FROM checkpoints WHERE path = ?', [(p,) for p in paths])
+
+
+def refresh(index: CheckpointIndex, models_dir: str, workers: int, with_hashes: bool) -> Dict:
+    models_dir = os.path.abspath(models_dir)
+    found = scan(models_dir) if os.path.isdir(models_dir) else {}
+    known = index.rows(models_dir)
+
+    changed = [p for p, st in found.items() if known.get(p, (None, None))[:2] != (st.st_size, st.st_mtime_ns)]
+    removed = [p for p in known if p not in found]
+
+    # Pass 1: headers (a few MB at most per file)
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        infos = dict(zip(changed, pool.map(inspect, changed)))
+    with index.conn:
+        index.remove(removed)
+        for path in changed:
+            index.upsert(models_dir, path, found[path], infos[path])
+    report(0, len(found), f'{len(changed)} new or changed, {len(removed)} removed')
+
+    # Pass 2: hashes for everything still missing one
+    unhashed = [p for p in found if p in changed or not known[p][2]] if with_hashes else []
+    hashed = failed = 0
+    if unhashed:
+        # Largest first, so one huge file doesn't start last and run alone
+        unhashed.sort(key=lambda p: -found[p].st_size)
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            futures = {pool.submit(hash_file, p): p for p in unhashed}
+            for future in as_completed(futures):
+                path = futures[future]
+                try:
+                    index.set_hashes(path, found[path], future.result())
+                    hashed += 1
+                except OSError as e:
+                    failed += 1
+                    print(f'Failed to hash {path}: {e}', file=sys.stderr)
+                report(hashed + failed, len(unhashed), f'Hashed {os.path.basename(path)}')
+
+    return {'dir': models_dir, 'checkpoints': len(found), 'indexed': len(changed),
+            'removed': len(removed), 'hashed': hashed, 'failed': failed}
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Index checkpoint families and hashes for the model picker')
+    parser.add_argument('--models_dir', action='append', required=True, help='Directory to scan (repeatable)')
+    parser.add_argument('--db', type=str, default=DEFAULT_DB)
+    # Hashing is disk-bound; a couple of readers saturate most drives
+    parser.add_argument('--workers', type=int, default=min(4, max(2, (os.cpu_count() or 2) // 2)))
+    parser.add_argument('--no_hash', action='store_true', help='Only index headers')
+    args = parser.parse_args()
+
+    index = CheckpointIndex(args.db)
+    try:
+        summaries = [refresh(index, d, args.workers, not args.no_hash) for d in args.models_dir]
+    finally:
+        index.close()
+    print(json.dumps({'dirs': summaries}))
+
+
+if __name__ == '__main__':
+    main()
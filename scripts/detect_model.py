@@ -2,7 +2,51 @@ import sys
 import os
 import json
 import argparse
-from typing import Dict, Any, List, Optional
+from typing import Dict, Any, Iterable, List, Optional
+
+def classify_safetensors(metadata: Optional[Dict[str, str]], keys: Iterable[str]) -> str:
+    """Model family from a safetensors header (metadata and tensor names). Shared with checkpoint_index.py."""
+    keys = list(keys)
+    model_family = "Unknown"
+
+    # Metadata-based heuristics
+    if metadata:
+        # Some models specifically tag their architecture
+        # This is model-specific and not standardized, but we can look for clues
+        meta_str = str(metadata).lower()
+        if "sdxl" in meta_str:
+            model_family = "SDXL"
+        elif "sd3" in meta_str or "stable-diffusion-v3" in meta_str:
+            model_family = "SD3"
+        elif "flux" in meta_str:
+            model_family = "FLUX"
+        elif "v1" in meta_str or "sd1" in meta_str:
+            model_family = "SD1.5" # Generic Bucket
+        elif "v2" in meta_str or "sd2" in meta_str:
+            model_family = "SD2.x"
+
+    # Key-based heuristics (stronger fallbacks)
+    if model_family == "Unknown":
+        has_conditioner = any(k.startswith("conditioner.embedders.1") for k in keys)
+        # FLUX specific keys
+        is_flux = any(k.startswith("flux_") or "double_blocks" in k for k in keys)
+
+        if has_conditioner:
+            model_family = "SDXL"
+        elif is_flux:
+            model_family = "FLUX"
+        elif any("model.diffusion_model" in k for k in keys) and any("cond_stage_model" in k for k in keys):
+            # SD1.5 or SD2.x
+            # Distinguishing SD1.5 vs SD2.1 usually requires checking checking tensor shapes
+            # (e.g. text encoder output size 768 vs 1024), but for "trainer script" purposes,
+            # they often share train_network.py.
+            model_family = "SD1.x/2.x"
+        elif any("model.diffusion_model" in k for k in keys):
+            # Fallback for SD1/2 variants
+            model_family = "SD1.x/2.x"
+
+    return model_family
+
 
 def detect_model(checkpoint_path: str, repo_path: str) -> Dict[str, Any]:
     """
@@ -32,45 +76,7 @@ def detect_model(checkpoint_path: str, repo_path: str) -> Dict[str, Any]:
             from safetensors import safe_open
             
             with safe_open(checkpoint_path, framework="pt", device="cpu") as f:
-                metadata = f.metadata()
-                keys = f.keys()
-                
-                # Metadata-based heuristics
-                if metadata:
-                    # Some models specifically tag their architecture
-                    # This is model-specific and not standardized, but we can look for clues
-                    meta_str = str(metadata).lower()
-                    if "sdxl" in meta_str:
-                        model_family = "SDXL"
-                    elif "sd3" in meta_str or "stable-diffusion-v3" in meta_str:
-                        model_family = "SD3"
-                    elif "flux" in meta_str:
-                        model_family = "FLUX"
-                    elif "v1" in meta_str or "sd1" in meta_str:
-                        model_family = "SD1.5" # Generic Bucket
-                    elif "v2" in meta_str or "sd2" in meta_str:
-                        model_family = "SD2.x"
-                
-                # Key-based heuristics (stronger fallbacks)
-                if model_family == "Unknown":
-                    has_conditioner = any(k.startswith("conditioner.embedders.1") for k in keys)
-                    has_adm_in = any("adm_in" in k for k in keys) # Flux often has this? Or SD3?
-                    # FLUX specific keys
-                    is_flux = any(k.startswith("flux_") or "double_blocks" in k for k in keys)
-                    
-                    if has_conditioner:
-                        model_family = "SDXL"
-                    elif is_flux:
-                        model_family = "FLUX"
-                    elif any("model.diffusion_model" in k for k in keys) and any("cond_stage_model" in k for k in keys):
-                        # SD1.5 or SD2.x
-                        # Distinguishing SD1.5 vs SD2.1 usually requires checking checking tensor shapes 
-                        # (e.g. text encoder output size 768 vs 1024), but for "trainer script" purposes, 
-                        # they often share train_network.py. 
-                        model_family = "SD1.x/2.x"
-                    elif any("model.diffusion_model" in k for k in keys):
-                         # Fallback for SD1/2 variants
-                        model_family = "SD1.x/2.x"
+                model_family = classify_safetensors(f.metadata(), f.keys())
 
         elif ext == ".ckpt":
             # CKPT is harder to parse without loading. 
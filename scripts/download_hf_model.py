@@ -8,8 +8,11 @@ import sys
 import json
 import os
 import time
+import hashlib
 from pathlib import Path
 
+from model_registry import register
+
 try:
     import requests
     from huggingface_hub import HfApi, hf_hub_url
@@ -76,11 +79,14 @@ def download_file(url, dest_path, filename, file_size, current_downloaded_bytes,
         
         file_downloaded = 0
         chunk_size = 1024 * 1024  # 1MB chunks for smoother UI updates
+        # Hash while streaming, so the registry checksum costs no extra read
+        hasher = hashlib.sha256()
         
         with open(dest_path, 'wb') as f:
             for chunk in response.iter_content(chunk_size=chunk_size):
                 if chunk:
                     f.write(chunk)
+                    hasher.update(chunk)
                     file_downloaded += len(chunk)
                     
                     # Update global progress
@@ -100,7 +106,7 @@ def download_file(url, dest_path, filename, file_size, current_downloaded_bytes,
                         "progress": progress
                     })
         
-        return file_downloaded
+        return file_downloaded, hasher.hexdigest()
         
     except Exception as e:
         raise Exception(f"Failed to download {filename}: {str(e)}")
@@ -139,6 +145,7 @@ def download_model(repo_id, local_dir):
     
     # Step 2: Download files one by one
     total_downloaded = 0
+    hashes = {}
     
     for file_info in files_info:
         filename = file_info['filename']
@@ -149,7 +156,7 @@ def download_model(repo_id, local_dir):
         url = hf_hub_url(repo_id=repo_id, filename=filename)
         
         try:
-            downloaded = download_file(
+            downloaded, hashes[filename] = download_file(
                 url, 
                 dest_path, 
                 filename, 
@@ -166,7 +173,16 @@ def download_model(repo_id, local_dir):
             })
             sys.exit(1)
     
-    # Step 3: Download complete
+    # Step 3: Record checksums so taggers can resolve the model without the hub
+    try:
+        register(repo_id, local_dir, hashes)
+    except Exception as e:
+        report_progress({
+            "error": f"Failed to register model: {str(e)}"
+        })
+        sys.exit(1)
+
+    # Step 4: Download complete
     report_progress({
         "stage": "completed",
         "status": "completed",
@@ -0,0 +1,338 @@
+#!/usr/bin/env python3
+"""
+LoRA output inspector for train_outputs/*.safetensors (no torch).
+
+Per file, from the header: rank/alpha, module coverage (text encoder vs UNet,
+by block) and the kohya training metadata (ss_*). From the weights, which are
+memory-mapped (safetensors_mmap.py): the norm of every module's effective
+update dW = (alpha / rank) * up @ down, and between consecutive epochs of the
+same run, the norm of the change in dW.
+
+Neither needs dW itself. With U = up (out x r) and D = down (r x in):
+    ||U D||_F^2         = sum((U^T U) * (D D^T))               (r x r)
+    <U1 D1, U2 D2>_F    = sum((U1^T U2) * (D1 D2^T))           (r1 x r2)
+so a module costs two small Gram products, and RAM stays around one module.
+
+Results are cached in SQLite per file (path, size, mtime) and per epoch pair, so
+re-opening the outputs only inspects new checkpoints. Prints one JSON document.
+
+CLI:
+    lora_inspect.py --outputs_dir projects/<id>/train_outputs [--cache projects/<id>/.cache/lora_inspect.db] [--top 20]
+"""
+
+import argparse
+import json
+import math
+import os
+import re
+import sqlite3
+import sys
+from collections import Counter, defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from safetensors_mmap import SafetensorsFile  # noqa: E402
+
+CACHE_VERSION = 1
+DEFAULT_TOP = 20
+# Factor pairs: kohya (lora_down/lora_up) and PEFT/diffusers (lora_A/lora_B)
+FACTOR_SUFFIXES = (('.lora_down.weight', '.lora_up.weight'), ('.lora_A.weight', '.lora_B.weight'))
+EPOCH_SUFFIX = re.compile(r'^(.*?)[-_](\d+)$')
+KEPT_METADATA = ('ss_output_name', 'ss_epoch', 'ss_steps', 'ss_num_epochs', 'ss_max_train_steps',
+                 'ss_learning_rate', 'ss_unet_lr', 'ss_text_encoder_lr', 'ss_network_module',
+                 'ss_network_dim', 'ss_network_alpha', 'ss_network_args', 'ss_base_model_version',
+                 'ss_sd_model_name', 'ss_resolution', 'ss_optimizer', 'ss_lr_scheduler',
+                 'ss_training_started_at', 'ss_training_finished_at', 'ss_num_train_images',
+                 'ss_seed', 'modelspec.architecture')
+
+
+def component_of(module: str) -> str:
+    if module.startswith(('lora_te1_', 'text_encoder.')):
+        return 'text_encoder'
+    if module.startswith('lora_te2_') or module.startswith('text_encoder_2.'):
+        return 'text_encoder_2'
+    if module.startswith('lora_te_'):
+        return 'text_encoder'
+    return 'unet'
+
+
+def block_of(module: str) -> str:
+    for marker, block in (('down_blocks', 'down'), ('input_blocks', 'down'), ('mid_block', 'mid'),
+                          ('middle_block', 'mid'), ('up_blocks', 'up'), ('output_blocks', 'up'),
+                          ('double_blocks', 'double'), ('single_blocks', 'single')):
+        if marker in module:
+            return block
+    return 'text_encoder' if component_of(module) != 'unet' else 'other'
+
+
+def find_modules(f: SafetensorsFile) -> Dict[str, Tuple[str, str, Optional[str]]]:
+    """module -> (down key, up key, alpha key or None)."""
+    modules = {}
+    for key in f.keys():
+        for down_suffix, up_suffix in FACTOR_SUFFIXES:
+            if key.endswith(down_suffix):
+                module = key[:-len(down_suffix)]
+                up_key = module + up_suffix
+                if up_key in f.header:
+                    alpha_key = module + '.alpha'
+                    modules[module] = (key, up_key, alpha_key if alpha_key in f.header else None)
+    return modules
+
+
+def factors(f: SafetensorsFile, keys: Tuple[str, str, Optional[str]]) -> Optional[Tuple[np.ndarray, np.ndarray, float]]:
+    """(U, D, scale) as 2-D float64, or None for layouts that aren't a plain up @ down."""
+    down_key, up_key, alpha_key = keys
+    down = f.tensor(down_key)
+    up = f.tensor(up_key)
+    rank = down.shape[0]
+    d = down.reshape(rank, -1).astype(np.float64)
+    u = up.reshape(up.shape[0], -1).astype(np.float64)
+    if u.shape[1] != rank:
+        return None
+    alpha = float(f.tensor(alpha_key).reshape(-1)[0]) if alpha_key else float(rank)
+    return u, d, alpha / rank
+
+
+def inner(a: Tuple[np.ndarray, np.ndarray, float], b: Tuple[np.ndarray, np.ndarray, float]) -> float:
+    (ua, da, sa), (ub, db, sb) = a, b
+    return sa * sb * float(np.sum((ua.T @ ub) * (da @ db.T)))
+
+
+def epoch_of(name: str, metadata: Dict[str, str]) -> Tuple[str, float]:
+    """(run name, epoch) so files of one run sort in training order; the final file has no suffix."""
+    stem = os.path.splitext(name)[0]
+    match = EPOCH_SUFFIX.match(stem)
+    run = match.group(1) if match else stem
+    try:
+        return run, float(metadata['ss_epoch'])
+    except (KeyError, ValueError):
+        return run, float(match.group(2)) if match else math.inf
+
+
+def inspect_file(path: str, top: int) -> Dict:
+    with SafetensorsFile(path) as f:
+        modules = find_modules(f)
+        ranks: Counter = Counter()
+        alphas: Counter = Counter()
+        coverage: Counter = Counter()
+        blocks: Counter = Counter()
+        block_norms: Dict[str, float] = defaultdict(float)
+        norms: Dict[str, float] = {}
+
+        for module, keys in modules.items():
+            ranks[f.shape(keys[0])[0]] += 1
+            coverage[component_of(module)] += 1
+            blocks[block_of(module)] += 1
+            fac = factors(f, keys)
+            if fac is None:
+                continue
+            alphas[round(fac[2] * fac[0].shape[1], 4)] += 1
+            sq = max(0.0, inner(fac, fac))
+            norms[module] = math.sqrt(sq)
+            block_norms[block_of(module)] += sq
+
+        name = os.path.basename(path)
+        run, epoch = epoch_of(name, f.metadata)
+        return {
+            'name': name,
+            'run': run,
+            'epoch': None if math.isinf(epoch) else epoch,
+            'steps': int(f.metadata['ss_steps']) if f.metadata.get('ss_steps', '').isdigit() else None,
+            'rank': ranks.most_common(1)[0][0] if ranks else None,
+            'ranks': sorted(ranks),
+            'alpha': alphas.most_common(1)[0][0] if alphas else None,
+            'modules': len(modules),
+            'tensors': len(f.header),
+            'coverage': dict(coverage),
+            'blocks': dict(blocks),
+            'metadata': {k: f.metadata[k] for k in KEPT_METADATA if k in f.metadata},
+            'norm': round(math.sqrt(sum(n * n for n in norms.values())), 6),
+            'blockNorms': {b: round(math.sqrt(v), 6) for b, v in block_norms.items()},
+            'topModules': [{'module': m, 'norm': round(n, 6)}
+                           for m, n in sorted(norms.items(), key=lambda x: -x[1])[:top]],
+            '_norms': norms,
+        }
+
+
+def inspect_delta(path_a: str, path_b: str, norms_a: Dict[str, float], norms_b: Dict[str, float], top: int) -> Dict:
+    """||dW_b - dW_a|| per module (modules in only one file count fully)."""
+    deltas: Dict[str, float] = {}
+    with SafetensorsFile(path_a) as fa, SafetensorsFile(path_b) as fb:
+        modules_a, modules_b = find_modules(fa), find_modules(fb)
+        for module in set(norms_a) | set(norms_b):
+            if module in norms_a and module in norms_b:
+                a, b = factors(fa, modules_a[module]), factors(fb, modules_b[module])
+                sq = norms_a[module] ** 2 + norms_b[module] ** 2 - 2 * inner(a, b)
+                deltas[module] = math.sqrt(max(0.0, sq))
+            else:
+                deltas[module] = norms_a.get(module, norms_b.get(module, 0.0))
+
+    total = math.sqrt(sum(d * d for d in deltas.values()))
+    base = math.sqrt(sum(n * n for n in norms_b.values()))
+    return {
+        'from': os.path.basename(path_a),
+        'to': os.path.basename(path_b),
+        'norm': round(total, 6),
+        'relative': round(total / base, 6) if base > 0 else None,
+        'topModules': [{'module': m, 'norm': round(d, 6)}
+                       for m, d in sorted(deltas.items(), key=lambda x: -x[1])[:top]],
+    }
+
+
+class InspectCache:
+    """Per-file results keyed by (path, size, mtime); deltas keyed by both files' versions."""
+
+    def __init__(self, db_path: Optional[str]):
+        self.conn = None
+        if not db_path:
+            return
+        os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+        self.conn = sqlite3.connect(db_path)
+        self.conn.executescript("""
+            CREATE TABLE IF NOT EXISTS files (
+                path TEXT PRIMARY KEY, version TEXT NOT NULL, data TEXT NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS deltas (
+                a TEXT NOT NULL, b TEXT NOT NULL, version TEXT NOT NULL, data TEXT NOT NULL,
+                PRIMARY KEY (a, b)
+            );
+        """)
+
+    @staticmethod
+    def version(path: str, top: int) -> str:
+        st = os.stat(path)
+        return f'{CACHE_VERSION}:{top}:{st.st_size}:{st.st_mtime_ns}'
+
+    def get_file(self, path: str, version: str) -> Optional[Dict]:
+        if not self.conn:
+            return None
+        row = self.conn.execute('SELECT data FROM files WHERE path = ? AND version = ?', (path, version)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def put_file(self, path: str, version: str, data: Dict):
+        if self.conn:
+            with self.conn:
+                self.conn.execute('INSERT OR REPLACE INTO files VALUES (?, ?, ?)', (path, version, json.dumps(data)))
+
+    def get_delta(self, a: str, b: str, version: str) -> Optional[Dict]:
+        if not self.conn:
+            return None
+        row = self.conn.execute('SELECT data FROM deltas WHERE a = ? AND b = ? AND version = ?', (a, b, version)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def put_delta(self, a: str, b: str, version: str, data: Dict):
+        if self.conn:
+            with self.conn:
+                self.conn.execute('INSERT OR REPLACE INTO deltas VALUES (?, ?, ?, ?)', (a, b, version, json.dumps(data)))
+
+    def prune(self, paths: List[str]):
+        """Drops entries for files that no longer exist."""
+        if not self.conn:
+            return
+        keep = set(paths)
+        with self.conn:
+            for (path,) in self.conn.execute('SELECT path FROM files').fetchall():
+                if path not in keep:
+                    self.conn.execute('DELETE FROM files WHERE path = ?', (path,))
+                    self.conn.execute('DELETE FROM deltas WHERE a = ? OR b = ?', (path, path))
+
+    def close(self):
+        if self.conn:
+            self.conn.close()
+
+
+def run(paths: List[str], cache: InspectCache, top: int, workers: int, prune: bool = False) -> Dict:
+    versions = {p: InspectCache.version(p, top) for p in paths}
+    results: Dict[str, Dict] = {}
+    errors = []
+
+    pending = []
+    for p in paths:
+        cached = cache.get_file(p, versions[p])
+        if cached is not None:
+            results[p] = cached
+        else:
+            pending.append(p)
+
+    def safe_inspect(p):
+        try:
+            return p, inspect_file(p, top), None
+        except Exception as e:
+            return p, None, str(e)
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        for p, result, error in pool.map(safe_inspect, pending):
+            if error:
+                errors.append({'name': os.path.basename(p), 'error': error})
+                print(f'Failed to inspect {p}: {error}', file=sys.stderr)
+            else:
+                results[p] = result
+                cache.put_file(p, versions[p], result)
+
+    # Consecutive epochs of each run
+    runs: Dict[str, List[str]] = defaultdict(list)
+    for p, r in results.items():
+        runs[r['run']].append(p)
+    pairs = []
+    for members in runs.values():
+        members.sort(key=lambda p: (math.inf if results[p]['epoch'] is None else results[p]['epoch'], p))
+        pairs.extend(zip(members, members[1:]))
+
+    # Cache reads and writes stay on this thread (the SQLite connection's)
+    deltas = []
+    todo = []
+    for a, b in pairs:
+        version = f'{versions[a]}|{versions[b]}'
+        cached = cache.get_delta(a, b, version)
+        if cached is not None:
+            deltas.append(cached)
+        else:
+            todo.append((a, b, version))
+
+    def safe_delta(job):
+        a, b, _ = job
+        try:
+            return inspect_delta(a, b, results[a]['_norms'], results[b]['_norms'], top)
+        except Exception as e:
+            print(f'Failed to compare {a} and {b}: {e}', file=sys.stderr)
+            return None
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        for (a, b, version), delta in zip(todo, pool.map(safe_delta, todo)):
+            if delta is not None:
+                cache.put_delta(a, b, version, delta)
+                deltas.append(delta)
+
+    if prune:
+        cache.prune(paths)
+    files = [{k: v for k, v in results[p].items() if k != '_norms'} for p in paths if p in results]
+    return {'files': files, 'deltas': deltas, 'errors': errors}
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Inspect trained LoRA safetensors: rank, coverage, norms and epoch deltas')
+    parser.add_argument('--outputs_dir', type=str, help='Inspect every .safetensors file in this folder')
+    parser.add_argument('--files', nargs='*', default=[], help='Or inspect these files')
+    parser.add_argument('--cache', type=str, default='', help='SQLite cache path')
+    parser.add_argument('--top', type=int, default=DEFAULT_TOP, help='Modules listed per file / delta')
+    parser.add_argument('--workers', type=int, default=max(2, (os.cpu_count() or 2) // 2))
+    args = parser.parse_args()
+
+    paths = [os.path.abspath(p) for p in args.files]
+    if args.outputs_dir and os.path.isdir(args.outputs_dir):
+        paths += sorted(os.path.join(os.path.abspath(args.outputs_dir), n) for n in os.listdir(args.outputs_dir)
+                        if n.lower().endswith('.safetensors'))
+
+    cache = InspectCache(args.cache or None)
+    try:
+        result = run(paths, cache, args.top, args.workers, prune=bool(args.outputs_dir))
+    finally:
+        cache.close()
+    print(json.dumps(result))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,311 @@
+#!/usr/bin/env python3
+"""
+Average or merge LoRA safetensors files (no torch).
+
+Modes:
+- average: weighted average of every tensor. For epochs of one run (same keys,
+  shapes and alphas); weights are normalized to sum to 1.
+- ema: average with weights decay^age over the inputs in epoch order, so the
+  newest epoch weighs most (--ema_decay, normalized like average).
+- svd: per module, the weighted sum of the effective updates
+  sum_i w_i * (alpha_i / rank_i) * up_i @ down_i, re-projected to --rank with an
+  SVD. Works across runs with different ranks or module coverage; weights are
+  used as given. The update matrix is never formed: each side's stacked factors
+  are reduced through the square root of their (sum of ranks)^2 Gram matrix
+  and only the small core between the two roots is decomposed.
+
+Inputs are memory-mapped (safetensors_mmap.py) and the output is written one
+tensor at a time behind a header laid out from the shapes up front, so peak
+memory is about one tensor (one module's factors in svd mode) whatever the
+number and size of the inputs. Progress is printed as PROGRESS:{json} lines and
+a JSON summary at the end.
+
+CLI:
+    lora_merge.py --files a.safetensors b.safetensors --output merged.safetensors
+                  [--mode average|ema|svd] [--weights 0.3 0.7] [--ema_decay 0.7]
+                  [--rank 32] [--dtype fp16|bf16|fp32] [--overwrite]
+"""
+
+import argparse
+import json
+import os
+import sys
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from safetensors_mmap import SafetensorsFile, SafetensorsWriter  # noqa: E402
+from lora_inspect import epoch_of, factors, find_modules  # noqa: E402
+
+MODES = ('average', 'ema', 'svd')
+DTYPE_NAMES = {'fp16': 'F16', 'bf16': 'BF16', 'fp32': 'F32'}
+FLOAT_DTYPES = ('F64', 'F32', 'F16', 'BF16')
+DEFAULT_EMA_DECAY = 0.7
+# Relative eigenvalue cutoff for the factor Gram matrices (they square the condition number)
+GRAM_RCOND = 1e-12
+# No longer true of the merged file
+DROPPED_METADATA = ('sshs_model_hash', 'sshs_legacy_hash', 'modelspec.hash_sha256', 'ss_epoch')
+
+Spec = Tuple[str, str, Tuple[int, ...]]
+
+
+class MergeError(ValueError):
+    """The inputs or options can't be merged (as opposed to an I/O or numerical failure)."""
+
+
+def report(processed: int, total: int, current: str):
+    print('PROGRESS:' + json.dumps({'progress': {'processed': processed, 'total': total, 'current': current}}), flush=True)
+
+
+def resolve_weights(files: List[SafetensorsFile], mode: str, weights: List[float], decay: float) -> List[float]:
+    n = len(files)
+    if mode == 'ema':
+        if not 0 < decay <= 1:
+            raise MergeError('--ema_decay must be in (0, 1]')
+        order = sorted(range(n), key=lambda i: (epoch_of(os.path.basename(files[i].path), files[i].metadata)[1], i))
+        weights = [0.0] * n
+        for age, i in enumerate(reversed(order)):
+            weights[i] = decay ** age
+    elif weights:
+        if len(weights) != n:
+            raise MergeError(f'{len(weights)} weights for {n} files')
+    else:
+        weights = [1.0 / n] * n
+
+    if mode != 'svd':
+        total = sum(weights)
+        if total <= 0:
+            raise MergeError('Weights must sum to a positive number')
+        weights = [w / total for w in weights]
+    return weights
+
+
+def plan_average(files: List[SafetensorsFile], weights: List[float], dtype: Optional[str]) -> Tuple[List[Spec], Callable[[], Iterator]]:
+    """Element-wise weighted average of every tensor; inputs must share keys and shapes."""
+    first = files[0]
+    for f in files[1:]:
+        if set(f.header) != set(first.header):
+            raise MergeError(f'{os.path.basename(f.path)} has different tensors than {os.path.basename(first.path)}; use --mode svd')
+        for key in first.header:
+            if f.shape(key) != first.shape(key):
+                raise MergeError(f'{key}: shape {f.shape(key)} vs {first.shape(key)}; use --mode svd')
+    # Averaging factors with different alphas would scale them inconsistently
+    for module, (_, _, alpha_key) in find_modules(first).items():
+        if alpha_key and len({float(f.tensor(alpha_key).reshape(-1)[0]) for f in files}) > 1:
+            raise MergeError(f'{module}: alpha differs between inputs; use --mode svd')
+
+    keys = first.keys()
+    out_dtype = {k: (dtype if dtype and first.dtype(k) in FLOAT_DTYPES else first.dtype(k)) for k in keys}
+    specs = [(k, out_dtype[k], first.shape(k)) for k in keys]
+
+    def tensors():
+        for key in keys:
+            if first.dtype(key) not in FLOAT_DTYPES:
+                yield key, first.tensor(key)
+                continue
+            acc = np.zeros(first.shape(key), dtype=np.float32)
+            for f, w in zip(files, weights):
+                if w:
+                    part = f.tensor(key).astype(np.float32)
+                    f.release(key)
+                    part *= w
+                    acc += part
+            yield key, acc
+
+    return specs, tensors
+
+
+def merge_module(module: str, parts: List[Tuple[SafetensorsFile, Tuple[str, str, Optional[str]], float]], rank: int) -> Tuple[np.ndarray, np.ndarray, float]:
+    """(up, down, retained energy) with up @ down the best rank-`rank` fit of sum w * dW."""
+    us, ds = [], []
+    for f, keys, w in parts:
+        fac = factors(f, keys)
+        if fac is None:
+            raise MergeError(f'{module}: unsupported layout in {os.path.basename(f.path)}')
+        u, d, scale = fac
+        for key in keys:
+            if key:
+                f.release(key)
+        us.append(u * (w * scale))
+        ds.append(d)
+    u = np.concatenate(us, axis=1)
+    d = np.concatenate(ds, axis=0)
+
+    # dW = U D with U = Qu Bu and D^T = Qd Bd (orthonormal Q, square roots B of the
+    # R x R Gram matrices), so dW = Qu (Bu Bd^T) Qd^T and only the small core needs
+    # an SVD. Q is never formed either: the kept directions are mapped back through
+    # the factors, which keeps the work to a few (dim x R) matrix products.
+    to_u, bu = gram_root(u.T @ u)
+    to_d, bd = gram_root(d @ d.T)
+    up = np.zeros((u.shape[0], rank))
+    down = np.zeros((rank, d.shape[1]))
+    if not len(bu) or not len(bd):
+        return up, down, 1.0
+    a, s, bt = np.linalg.svd(bu @ bd.T, full_matrices=False)
+    k = min(rank, len(s))
+    root = np.sqrt(s[:k])
+    up[:, :k] = u @ (to_u @ (a[:, :k] * root))
+    down[:k] = (root[:, None] * (bt[:k] @ to_d.T)) @ d
+    total = float(np.sum(s * s))
+    return up, down, float(np.sum(s[:k] ** 2)) / total if total > 0 else 1.0
+
+
+def gram_root(gram: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    For gram = X^T X: (T, B) with X = Q B, Q = X T orthonormal. Directions with
+    (numerically) no energy are dropped, so stacks of near-identical epochs work.
+    """
+    w, v = np.linalg.eigh(gram)
+    keep = w > max(float(w[-1]), 0.0) * GRAM_RCOND
+    if not keep.any():
+        return np.zeros((len(w), 0)), np.zeros((0, len(w)))
+    root = np.sqrt(w[keep])
+    return v[:, keep] / root, root[:, None] * v[:, keep].T
+
+
+def plan_svd(files: List[SafetensorsFile], weights: List[float], dtype: Optional[str], rank: Optional[int],
+             energy: List[float]) -> Tuple[List[Spec], Callable[[], Iterator], int]:
+    """Per-module sum of weighted updates, re-projected to a common rank."""
+    found = [find_modules(f) for f in files]
+    for f, modules in zip(files, found):
+        claimed = {k for keys in modules.values() for k in keys if k}
+        extra = sorted(set(f.header) - claimed)
+        if extra:
+            raise MergeError(f'{os.path.basename(f.path)}: {extra[0]} is not a plain LoRA factor; svd mode can only merge up/down pairs')
+    if not any(found):
+        raise MergeError('No LoRA modules found in the inputs')
+
+    input_rank = max(f.shape(keys[0])[0] for f, modules in zip(files, found) for keys in modules.values())
+    target = rank or input_rank
+
+    specs: List[Spec] = []
+    jobs = []
+    for module in sorted(set().union(*found)):
+        parts = [(f, modules[module], w) for f, modules, w in zip(files, found, weights) if module in modules and w]
+        # Naming, layout and dtype from the first input that has the module
+        f, (down_key, up_key, alpha_key) = next((f, m[module]) for f, m in zip(files, found) if module in m)
+        down_shape, up_shape = f.shape(down_key), f.shape(up_key)
+        in_size = int(np.prod(down_shape[1:], dtype=np.int64))
+        total_rank = sum(f.shape(keys[0])[0] for f, keys, _ in parts)
+        r = max(1, min(target, up_shape[0], in_size, total_rank or target))
+        out_dtype = dtype or f.dtype(down_key)
+
+        new_down = (r,) + down_shape[1:]
+        new_up = (up_shape[0], r) + up_shape[2:]
+        specs.append((down_key, out_dtype, new_down))
+        specs.append((up_key, out_dtype, new_up))
+        if alpha_key:
+            # alpha = rank: the factors already carry the scale
+            specs.append((alpha_key, out_dtype, f.shape(alpha_key)))
+        jobs.append((module, parts, r, down_key, up_key, alpha_key, new_down, new_up, f.shape(alpha_key) if alpha_key else None))
+
+    def tensors():
+        for module, parts, r, down_key, up_key, alpha_key, new_down, new_up, alpha_shape in jobs:
+            if parts:
+                up, down, retained = merge_module(module, parts, r)
+                energy.append(retained)
+            else:
+                up, down = np.zeros((new_up[0], r)), np.zeros((r, int(np.prod(new_down[1:], dtype=np.int64))))
+            yield down_key, down.astype(np.float32).reshape(new_down)
+            yield up_key, up.astype(np.float32).reshape(new_up)
+            if alpha_key:
+                yield alpha_key, np.full(alpha_shape, r, dtype=np.float32)
+
+    return specs, tensors, target
+
+
+def merged_metadata(files: List[SafetensorsFile], weights: List[float], mode: str, decay: float, rank: Optional[int]) -> Dict[str, str]:
+    # The most heavily weighted input describes the result best
+    base = files[max(range(len(files)), key=lambda i: abs(weights[i]))].metadata
+    metadata = {k: v for k, v in base.items() if k not in DROPPED_METADATA}
+    if rank:
+        metadata['ss_network_dim'] = str(rank)
+        metadata['ss_network_alpha'] = str(rank)
+    merge = {'mode': mode, 'inputs': [{'name': os.path.basename(f.path), 'weight': round(w, 6)} for f, w in zip(files, weights)]}
+    if mode == 'ema':
+        merge['decay'] = decay
+    metadata['ss_merge'] = json.dumps(merge)
+    return metadata
+
+
+def merge(paths: List[str], output: str, mode: str, weights: List[float], decay: float,
+          rank: Optional[int], dtype: Optional[str]) -> Dict:
+    files = []
+    try:
+        for p in paths:
+            files.append(SafetensorsFile(p))
+        weights = resolve_weights(files, mode, weights, decay)
+
+        energy: List[float] = []
+        if mode == 'svd':
+            specs, tensors, rank = plan_svd(files, weights, dtype, rank, energy)
+        else:
+            specs, tensors = plan_average(files, weights, dtype)
+            rank = None
+
+        total = len(specs)
+        step = max(1, total // 50)
+        with SafetensorsWriter(output, specs, merged_metadata(files, weights, mode, decay, rank)) as writer:
+            for i, (name, array) in enumerate(tensors()):
+                writer.write(name, array)
+                if (i + 1) % step == 0:
+                    report(i + 1, total, name)
+        report(total, total, os.path.basename(output))
+    finally:
+        for f in files:
+            f.close()
+
+    result = {
+        'output': output,
+        'name': os.path.basename(output),
+        'mode': mode,
+        'inputs': [{'name': os.path.basename(p), 'weight': round(w, 6)} for p, w in zip(paths, weights)],
+        'tensors': len(specs),
+        'size': os.path.getsize(output),
+    }
+    if mode == 'svd':
+        result['rank'] = rank
+        # Share of the merged update's energy kept by the rank cut, worst module (1.0 = exact)
+        result['energy'] = round(min(energy), 6) if energy else 1.0
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Average or merge LoRA safetensors files without loading them whole')
+    parser.add_argument('--files', nargs='+', required=True, help='Input LoRA files')
+    parser.add_argument('--output', type=str, required=True)
+    parser.add_argument('--mode', choices=MODES, default='average')
+    parser.add_argument('--weights', nargs='*', type=float, default=[], help='One per file (average/svd); default equal')
+    parser.add_argument('--ema_decay', type=float, default=DEFAULT_EMA_DECAY, help='Weight factor per epoch of age (ema)')
+    parser.add_argument('--rank', type=int, default=0, help='Output rank (svd); default the largest input rank')
+    parser.add_argument('--dtype', choices=sorted(DTYPE_NAMES), help='Output precision; default that of the inputs')
+    parser.add_argument('--overwrite', action='store_true')
+    args = parser.parse_args()
+
+    output = os.path.abspath(args.output)
+    if output in {os.path.abspath(p) for p in args.files}:
+        print('Output would overwrite an input', file=sys.stderr)
+        sys.exit(1)
+    if os.path.exists(output) and not args.overwrite:
+        print(f'{output} already exists', file=sys.stderr)
+        sys.exit(1)
+    if args.rank < 0 or (args.rank and args.mode != 'svd'):
+        print('--rank only applies to --mode svd', file=sys.stderr)
+        sys.exit(1)
+
+    try:
+        result = merge(args.files, output, args.mode, args.weights, args.ema_decay,
+                       args.rank or None, DTYPE_NAMES.get(args.dtype) if args.dtype else None)
+    except MergeError as e:
+        # The route turns this into HTTP 400
+        print(f'Cannot merge: {e}', file=sys.stderr)
+        sys.exit(2)
+    except (OSError, ValueError, np.linalg.LinAlgError) as e:
+        print(f'Merge failed: {e}', file=sys.stderr)
+        sys.exit(1)
+    print(json.dumps(result))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,191 @@
+#!/usr/bin/env python3
+"""
+Shared access to a project's manifest store (projects/<id>/manifest.db).
+
+Mirrors src/lib/manifest.ts: same schema, WAL mode and busy timeout, so worker
+scripts can read and update items while the Next.js server has the DB open.
+Writes use BEGIN IMMEDIATE, which serializes them against the server's writers.
+
+Usage from another script:
+    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))  # if needed
+    from manifest_store import ManifestStore
+
+    with ManifestStore(project_dir) as store:
+        for item in store.query(stage='raw'):
+            ...
+        store.update_items([(item_id, {'hash': h})])
+"""
+
+import json
+import os
+import sqlite3
+import sys
+from contextlib import contextmanager
+from typing import Dict, Iterable, List, Optional, Tuple
+
+MANIFEST_DB = 'manifest.db'
+SCHEMA_VERSION = 1
+BUSY_TIMEOUT_MS = 5000
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS items (
+    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+    id TEXT NOT NULL UNIQUE,
+    stage TEXT NOT NULL,
+    path TEXT NOT NULL,
+    group_key TEXT,
+    hash TEXT,
+    data TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_items_stage ON items(stage);
+CREATE INDEX IF NOT EXISTS idx_items_group_key ON items(group_key);
+CREATE INDEX IF NOT EXISTS idx_items_hash ON items(hash);
+CREATE INDEX IF NOT EXISTS idx_items_path ON items(path);
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+"""
+
+UPSERT_SQL = """
+INSERT INTO items (id, stage, path, group_key, hash, data)
+VALUES (:id, :stage, :path, :group_key, :hash, :data)
+ON CONFLICT(id) DO UPDATE SET
+    stage = excluded.stage,
+    path = excluded.path,
+    group_key = excluded.group_key,
+    hash = excluded.hash,
+    data = excluded.data
+WHERE items.data != excluded.data
+"""
+
+
+def _to_row(item: Dict) -> Dict:
+    return {
+        'id': item['id'],
+        'stage': item['stage'],
+        'path': item['path'],
+        'group_key': item.get('groupKey'),
+        'hash': item.get('hash'),
+        # Compact separators match JSON.stringify, so unchanged rows compare equal
+        'data': json.dumps(item, separators=(',', ':'), ensure_ascii=False),
+    }
+
+
+class ManifestStore:
+    def __init__(self, project_dir: str):
+        self.project_dir = project_dir
+        self.db_path = os.path.join(project_dir, MANIFEST_DB)
+        # isolation_level=None: we issue BEGIN/COMMIT ourselves
+        self.conn = sqlite3.connect(self.db_path, timeout=BUSY_TIMEOUT_MS / 1000, isolation_level=None)
+        self.conn.execute('PRAGMA journal_mode = WAL')
+        self.conn.execute('PRAGMA synchronous = NORMAL')
+        self.conn.execute(f'PRAGMA busy_timeout = {BUSY_TIMEOUT_MS}')
+        self.conn.executescript(SCHEMA)
+        self._migrate_legacy_json()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        self.conn.close()
+
+    @contextmanager
+    def _write(self):
+        self.conn.execute('BEGIN IMMEDIATE')
+        try:
+            yield
+            self.conn.execute('COMMIT')
+        except Exception:
+            self.conn.execute('ROLLBACK')
+            raise
+
+    def _migrate_legacy_json(self):
+        # Only migrates an existing manifest.json. Bootstrapping from raw/ is left
+        # to the server so a worker never marks an empty store as initialized.
+        json_path = os.path.join(self.project_dir, 'manifest.json')
+        if not os.path.exists(json_path):
+            return
+
+        with self._write():
+            initialized = self.conn.execute("SELECT value FROM meta WHERE key = 'schema_version'").fetchone()
+            if initialized:
+                return
+            with open(json_path, 'r', encoding='utf-8') as f:
+                legacy = json.load(f)
+            self.conn.executemany(UPSERT_SQL, [_to_row(i) for i in legacy.get('items', [])])
+            self.conn.execute("INSERT INTO meta (key, value) VALUES ('schema_version', ?)", (str(SCHEMA_VERSION),))
+
+        try:
+            os.replace(json_path, json_path + '.migrated')
+        except OSError as e:
+            print(f"Warning: could not rename migrated manifest: {e}", file=sys.stderr)
+
+    def all_items(self) -> List[Dict]:
+        rows = self.conn.execute('SELECT data FROM items ORDER BY seq').fetchall()
+        return [json.loads(r[0]) for r in rows]
+
+    def get_item(self, item_id: str) -> Optional[Dict]:
+        row = self.conn.execute('SELECT data FROM items WHERE id = ?', (item_id,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def query(self, stage: Optional[str] = None, group_key: Optional[str] = None,
+              hash: Optional[str] = None) -> List[Dict]:
+        clauses, params = [], []
+        if stage:
+            clauses.append('stage = ?')
+            params.append(stage)
+        if group_key:
+            clauses.append('group_key = ?')
+            params.append(group_key)
+        if hash:
+            clauses.append('hash = ?')
+            params.append(hash)
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ''
+        rows = self.conn.execute(f'SELECT data FROM items {where} ORDER BY seq', params).fetchall()
+        return [json.loads(r[0]) for r in rows]
+
+    def update_items(self, patches: Iterable[Tuple[str, Dict]]) -> int:
+        """Shallow-merges each patch into its item, all in one transaction. Returns rows updated."""
+        updated = 0
+        with self._write():
+            for item_id, patch in patches:
+                row = self.conn.execute('SELECT data FROM items WHERE id = ?', (item_id,)).fetchone()
+                if not row:
+                    continue
+                item = {**json.loads(row[0]), **patch, 'id': item_id}
+                self.conn.execute(UPSERT_SQL, _to_row(item))
+                updated += 1
+        return updated
+
+    def add_items(self, items: Iterable[Dict]) -> int:
+        """Inserts items whose path isn't tracked yet. Returns rows added."""
+        added = 0
+        with self._write():
+            for item in items:
+                exists = self.conn.execute('SELECT 1 FROM items WHERE path = ? LIMIT 1', (item['path'],)).fetchone()
+                if exists:
+                    continue
+                self.conn.execute(UPSERT_SQL, _to_row(item))
+                added += 1
+        return added
+
+    def remove_items(self, item_ids: Iterable[str]):
+        with self._write():
+            self.conn.executemany('DELETE FROM items WHERE id = ?', [(i,) for i in item_ids])
+
+
+if __name__ == '__main__':
+    # Debug helper: dump a project's manifest as JSON
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Dump a project manifest')
+    parser.add_argument('--project-dir', required=True, help='Path to project directory')
+    parser.add_argument('--stage', help='Only items in this stage')
+    args = parser.parse_args()
+
+    with ManifestStore(args.project_dir) as store:
+        print(json.dumps({'version': 1, 'items': store.query(stage=args.stage)}, indent=2))
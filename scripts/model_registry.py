@@ -0,0 +1,204 @@
+#!/usr/bin/env python3
+"""
+Local registry for installed tagger models (models/wd-tagger/registry.json).
+
+The install route downloads a repo into models/wd-tagger/<repo name>/ and records
+each file's size and SHA-256 here. Taggers resolve repo_id -> local paths through
+the registry first, so startup does no hub metadata requests or cache locking;
+the hub is only consulted on a miss.
+
+Registry format (matches ModelRegistry in src/types/wd-models.ts):
+    {"models": {"<repo name>": {"repo_id", "installed", "local_path",
+                                "files": {"model.onnx": {"size", "sha256", "mtime"}},
+                                "installed_at"}}}
+
+Also caches parsed selected_tags.csv files as .npz so startup skips CSV parsing.
+
+CLI:
+    model_registry.py register <repo_id> <local_dir>   # hash files and record them
+    model_registry.py verify <repo_id>                 # re-hash and compare
+"""
+
+import csv
+import hashlib
+import json
+import os
+import sys
+import tempfile
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+MODELS_DIR = Path(__file__).resolve().parent.parent / 'models' / 'wd-tagger'
+REGISTRY_FILE = 'registry.json'
+TAGS_CACHE_DIR = '.tags_cache'
+HASH_CHUNK = 8 * 1024 * 1024
+
+
+def registry_path() -> Path:
+    return MODELS_DIR / REGISTRY_FILE
+
+
+def load_registry() -> Dict:
+    try:
+        with open(registry_path(), 'r', encoding='utf-8') as f:
+            registry = json.load(f)
+        if isinstance(registry.get('models'), dict):
+            return registry
+    except (OSError, ValueError):
+        pass
+    return {'models': {}}
+
+
+def save_registry(registry: Dict):
+    MODELS_DIR.mkdir(parents=True, exist_ok=True)
+    # Write-then-rename so a concurrent reader never sees a partial file
+    fd, tmp = tempfile.mkstemp(dir=MODELS_DIR, prefix='.registry-', suffix='.tmp')
+    with os.fdopen(fd, 'w', encoding='utf-8') as f:
+        json.dump(registry, f, indent=2)
+    os.replace(tmp, registry_path())
+
+
+def sha256_file(path: Path) -> str:
+    h = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK), b''):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def repo_key(repo_id: str) -> str:
+    return repo_id.rstrip('/').split('/')[-1]
+
+
+def register(repo_id: str, local_dir: str, hashes: Optional[Dict[str, str]] = None) -> Dict:
+    """
+    Records every regular file in local_dir. `hashes` lets the downloader pass
+    digests it computed while streaming, so large files aren't read twice.
+    """
+    local = Path(local_dir).resolve()
+    hashes = hashes or {}
+    files = {}
+    for path in sorted(local.iterdir()):
+        if not path.is_file() or path.name.startswith('.'):
+            continue
+        st = path.stat()
+        files[path.name] = {
+            'size': st.st_size,
+            'sha256': hashes.get(path.name) or sha256_file(path),
+            'mtime': st.st_mtime_ns,
+        }
+
+    entry = {
+        'repo_id': repo_id,
+        'installed': True,
+        'local_path': str(local),
+        'files': files,
+        'installed_at': datetime.now(timezone.utc).isoformat(),
+    }
+    registry = load_registry()
+    registry['models'][repo_key(repo_id)] = entry
+    save_registry(registry)
+    return entry
+
+
+def resolve(repo_id: str, filenames: List[str]) -> Optional[List[str]]:
+    """
+    Local paths for `filenames` of an installed repo, or None on a miss.
+    Only stat()s the files: a size/mtime change since install counts as a miss
+    (full hashes are checked by `verify`, not on every startup).
+    """
+    # A local directory can be passed directly as the "repo id"
+    if os.path.isdir(repo_id):
+        paths = [os.path.join(repo_id, name) for name in filenames]
+        return paths if all(os.path.isfile(p) for p in paths) else None
+
+    entry = load_registry()['models'].get(repo_key(repo_id))
+    if not entry or entry.get('repo_id') != repo_id or not entry.get('installed'):
+        return None
+
+    paths = []
+    for name in filenames:
+        recorded = entry['files'].get(name)
+        path = os.path.join(entry['local_path'], name)
+        if not recorded:
+            return None
+        try:
+            st = os.stat(path)
+        except OSError:
+            return None
+        if st.st_size != recorded['size'] or ('mtime' in recorded and st.st_mtime_ns != recorded['mtime']):
+            return None
+        paths.append(path)
+    return paths
+
+
+def verify(repo_id: str) -> Tuple[bool, List[str]]:
+    """Re-hashes an installed model. Returns (ok, names of mismatching files)."""
+    entry = load_registry()['models'].get(repo_key(repo_id))
+    if not entry:
+        return False, ['<not registered>']
+    bad = []
+    for name, recorded in entry['files'].items():
+        path = Path(entry['local_path']) / name
+        if not path.is_file() or sha256_file(path) != recorded['sha256']:
+            bad.append(name)
+    return not bad, bad
+
+
+def load_tags(csv_path: str, cache_key: str) -> Tuple[List[str], np.ndarray]:
+    """
+    Tag names and categories from selected_tags.csv, via an .npz cache keyed by
+    the CSV's size and mtime. Falls back to parsing when the cache is stale or unwritable.
+    """
+    st = os.stat(csv_path)
+    stamp = np.array([st.st_size, st.st_mtime_ns], dtype=np.int64)
+    cache_path = MODELS_DIR / TAGS_CACHE_DIR / f'{cache_key}.npz'
+
+    try:
+        with np.load(cache_path, allow_pickle=False) as cached:
+            if np.array_equal(cached['stamp'], stamp):
+                return cached['names'].tolist(), cached['categories']
+    except (OSError, KeyError, ValueError):
+        pass
+
+    names = []
+    categories = []
+    with open(csv_path, 'r', encoding='utf-8') as f:
+        for row in csv.DictReader(f):
+            names.append(row.get('name', '').strip())
+            categories.append(int(row.get('category', row.get('category_id', 0))))  # Handle different CSV headers
+    categories = np.array(categories, dtype=np.int16)
+
+    try:
+        cache_path.parent.mkdir(parents=True, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=cache_path.parent, suffix='.npz')
+        with os.fdopen(fd, 'wb') as f:
+            np.savez(f, names=np.array(names, dtype=str), categories=categories, stamp=stamp)
+        os.replace(tmp, cache_path)
+    except OSError as e:
+        print(f"Warning: could not cache tags for {cache_key}: {e}", file=sys.stderr)
+
+    return names, categories
+
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Manage the local tagger model registry')
+    sub = parser.add_subparsers(dest='command', required=True)
+    reg = sub.add_parser('register', help='Hash and record an installed model directory')
+    reg.add_argument('repo_id')
+    reg.add_argument('local_dir')
+    ver = sub.add_parser('verify', help='Re-hash an installed model and compare with the registry')
+    ver.add_argument('repo_id')
+    args = parser.parse_args()
+
+    if args.command == 'register':
+        print(json.dumps(register(args.repo_id, args.local_dir)))
+    else:
+        ok, bad = verify(args.repo_id)
+        print(json.dumps({'ok': ok, 'mismatched': bad}))
+        sys.exit(0 if ok else 1)
@@ -0,0 +1,274 @@
+#!/usr/bin/env python3
+"""
+Image quality metrics for the QA job.
+- Blur: Laplacian variance and Tenengrad (mean Sobel gradient energy)
+- Exposure: mean luminance and clipped shadow/highlight fractions
+- Noise: Immerkaer fast sigma estimate
+- Resolution and aspect ratio flags from the original dimensions
+
+Images are decoded once, downscaled (JPEG DCT scaling where possible) and
+analysed with vectorized NumPy kernels across a process pool. Results are
+cached per content hash in .cache/qa_metrics.db, so re-running QA only
+analyses new or modified images. Items whose manifest entry already carries
+metrics of an accepted version (measured at upload) are not decoded at all.
+Raw manifest items are updated in one bulk transaction at the end.
+
+Progress is printed as PROGRESS:{json} lines.
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import sqlite3
+import sys
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+from PIL import Image, ImageOps
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from manifest_store import ManifestStore  # noqa: E402
+
+# Bump when metric definitions change, to invalidate cached results
+METRICS_VERSION = 1
+# QA_METRICS_VERSION of src/lib/ingest.ts whose upload-time metrics are reused as is.
+# Ingest measures the same definitions on sharp's decode, so values differ by resampling noise only.
+INGEST_METRICS_VERSION = 1
+
+DEFAULT_MAX_SIDE = 1024
+# Laplacian variance on a signed float response (0-255 scale). < 100 is reliably soft.
+# blurScore is this metric everywhere; src/lib/ingest.ts BLUR_THRESHOLD must match.
+DEFAULT_BLUR_THRESHOLD = 100.0
+DEFAULT_MIN_SIDE = 512
+DEFAULT_MAX_ASPECT = 2.5
+DEFAULT_NOISE_THRESHOLD = 8.0
+
+# Exposure flags
+UNDEREXPOSED_MEAN = 0.15
+OVEREXPOSED_MEAN = 0.85
+CLIP_FRACTION = 0.25
+
+HASH_CHUNK_SIZE = 1024 * 1024
+
+
+def content_hash(path: str) -> str:
+    h = hashlib.blake2b(digest_size=16)
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK_SIZE), b''):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def load_grey(path: str, max_side: int) -> Tuple[np.ndarray, int, int]:
+    """Returns (downscaled float32 greyscale 0-255, original width, original height)."""
+    with Image.open(path) as img:
+        img = ImageOps.exif_transpose(img)
+        width, height = img.size
+        # draft() lets the JPEG decoder downscale by 1/2..1/8 during decode
+        img.draft('L', (max_side, max_side))
+        img = img.convert('L')
+        img.thumbnail((max_side, max_side), Image.BILINEAR)
+        return np.asarray(img, dtype=np.float32), width, height
+
+
+def compute_metrics(path: str, max_side: int) -> Dict:
+    grey, width, height = load_grey(path, max_side)
+    if grey.shape[0] < 3 or grey.shape[1] < 3:
+        raise ValueError('Image too small to analyse')
+
+    c = grey[1:-1, 1:-1]
+    n, s = grey[:-2, 1:-1], grey[2:, 1:-1]
+    w, e = grey[1:-1, :-2], grey[1:-1, 2:]
+    nw, ne = grey[:-2, :-2], grey[:-2, 2:]
+    sw, se = grey[2:, :-2], grey[2:, 2:]
+
+    # Blur: 4-neighbour Laplacian variance
+    laplacian = n + s + w + e - 4.0 * c
+    laplacian_var = float(laplacian.var())
+
+    # Blur: Tenengrad (Sobel gradient energy)
+    gx = (ne + 2.0 * e + se) - (nw + 2.0 * w + sw)
+    gy = (sw + 2.0 * s + se) - (nw + 2.0 * n + ne)
+    tenengrad = float(np.mean(gx * gx + gy * gy))
+
+    # Exposure
+    mean_luma = float(grey.mean() / 255.0)
+    clip_low = float(np.mean(grey <= 2.0))
+    clip_high = float(np.mean(grey >= 253.0))
+
+    # Noise: Immerkaer (1996), mask [[1,-2,1],[-2,4,-2],[1,-2,1]]
+    noise_response = (nw + ne + sw + se) - 2.0 * (n + s + w + e) + 4.0 * c
+    h, w_ = grey.shape
+    noise_sigma = float(np.sqrt(np.pi / 2.0) * np.abs(noise_response).sum() / (6.0 * (w_ - 2) * (h - 2)))
+
+    return {
+        'source': 'worker',
+        'version': METRICS_VERSION,
+        'width': width,
+        'height': height,
+        'laplacianVar': round(laplacian_var, 2),
+        'tenengrad': round(tenengrad, 2),
+        'meanLuma': round(mean_luma, 4),
+        'clipLow': round(clip_low, 4),
+        'clipHigh': round(clip_high, 4),
+        'noiseSigma': round(noise_sigma, 3),
+    }
+
+
+def analyse(path: str, max_side: int) -> Tuple[str, Optional[str], Optional[Dict], Optional[str]]:
+    """Worker entry point: (path, content hash, metrics, error)."""
+    try:
+        digest = content_hash(path)
+        return path, digest, compute_metrics(path, max_side), None
+    except Exception as e:
+        return path, None, None, str(e)
+
+
+def derive_flags(metrics: Dict, args) -> Dict:
+    short_side = min(metrics['width'], metrics['height'])
+    long_side = max(metrics['width'], metrics['height'])
+    return {
+        'isBlurry': metrics['laplacianVar'] < args.blur_threshold,
+        'isUnderexposed': metrics['meanLuma'] < UNDEREXPOSED_MEAN or metrics['clipLow'] > CLIP_FRACTION,
+        'isOverexposed': metrics['meanLuma'] > OVEREXPOSED_MEAN or metrics['clipHigh'] > CLIP_FRACTION,
+        'isNoisy': metrics['noiseSigma'] > args.noise_threshold,
+        'isLowRes': short_side < args.min_side,
+        'isExtremeAspect': short_side > 0 and long_side / short_side > args.max_aspect,
+    }
+
+
+class MetricsCache:
+    """content hash -> metrics, plus a (path, size, mtime) -> content hash index to skip rehashing."""
+
+    def __init__(self, project_dir: str):
+        cache_dir = os.path.join(project_dir, '.cache')
+        os.makedirs(cache_dir, exist_ok=True)
+        self.conn = sqlite3.connect(os.path.join(cache_dir, 'qa_metrics.db'))
+        self.conn.executescript("""
+            CREATE TABLE IF NOT EXISTS file_index (
+                path TEXT PRIMARY KEY,
+                size INTEGER NOT NULL,
+                mtime_ns INTEGER NOT NULL,
+                content_hash TEXT NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS metrics (
+                content_hash TEXT PRIMARY KEY,
+                version INTEGER NOT NULL,
+                data TEXT NOT NULL
+            );
+        """)
+
+    def lookup(self, path: str) -> Tuple[Optional[str], Optional[Dict]]:
+        try:
+            st = os.stat(path)
+        except OSError:
+            return None, None
+        row = self.conn.execute(
+            'SELECT content_hash FROM file_index WHERE path = ? AND size = ? AND mtime_ns = ?',
+            (path, st.st_size, st.st_mtime_ns)).fetchone()
+        if not row:
+            return None, None
+        digest = row[0]
+        metrics = self.conn.execute(
+            'SELECT data FROM metrics WHERE content_hash = ? AND version = ?',
+            (digest, METRICS_VERSION)).fetchone()
+        return digest, json.loads(metrics[0]) if metrics else None
+
+    def store(self, results: List[Tuple[str, str, Dict]]):
+        with self.conn:
+            for path, digest, metrics in results:
+                st = os.stat(path)
+                self.conn.execute('INSERT OR REPLACE INTO file_index VALUES (?, ?, ?, ?)',
+                                  (path, st.st_size, st.st_mtime_ns, digest))
+                self.conn.execute('INSERT OR REPLACE INTO metrics VALUES (?, ?, ?)',
+                                  (digest, METRICS_VERSION, json.dumps(metrics)))
+
+    def close(self):
+        self.conn.close()
+
+
+def report(processed: int, total: int, current: str):
+    print('PROGRESS:' + json.dumps({'progress': {'processed': processed, 'total': total, 'current': current}}), flush=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Compute image quality metrics for raw project images')
+    parser.add_argument('--project-dir', required=True, help='Path to project directory')
+    parser.add_argument('--workers', type=int, default=max(2, (os.cpu_count() or 2) // 2))
+    parser.add_argument('--max-side', type=int, default=DEFAULT_MAX_SIDE, help='Analyse at most this many pixels on the long side')
+    parser.add_argument('--blur-threshold', type=float, default=DEFAULT_BLUR_THRESHOLD)
+    parser.add_argument('--noise-threshold', type=float, default=DEFAULT_NOISE_THRESHOLD)
+    parser.add_argument('--min-side', type=int, default=DEFAULT_MIN_SIDE)
+    parser.add_argument('--max-aspect', type=float, default=DEFAULT_MAX_ASPECT)
+    args = parser.parse_args()
+
+    with ManifestStore(args.project_dir) as store:
+        items = store.query(stage='raw')
+    total = len(items)
+    report(0, total, 'Checking cache')
+
+    cache = MetricsCache(args.project_dir)
+    results: Dict[str, Tuple[str, Dict]] = {}  # path -> (content hash, metrics)
+    pending: List[str] = []
+
+    for item in items:
+        # Uploads are measured during ingest (src/lib/ingest.ts) with the same definitions;
+        # raw files are never rewritten in place, so those metrics stay valid
+        stored = item.get('qa') or {}
+        accepted = INGEST_METRICS_VERSION if stored.get('source') == 'ingest' else METRICS_VERSION
+        if stored.get('version') == accepted and stored.get('contentHash'):
+            results[item['path']] = (stored['contentHash'], stored)
+            continue
+        digest, metrics = cache.lookup(item['path'])
+        if metrics is not None:
+            results[item['path']] = (digest, metrics)
+        elif os.path.exists(item['path']):
+            pending.append(item['path'])
+
+    processed = total - len(pending)
+    report(processed, total, f'{processed} cached, analysing {len(pending)}')
+
+    fresh: List[Tuple[str, str, Dict]] = []
+    failed = 0
+    if pending:
+        with ProcessPoolExecutor(max_workers=args.workers) as pool:
+            futures = [pool.submit(analyse, p, args.max_side) for p in pending]
+            for future in as_completed(futures):
+                path, digest, metrics, error = future.result()
+                processed += 1
+                if error:
+                    failed += 1
+                    print(f"Failed to analyse {path}: {error}", file=sys.stderr)
+                else:
+                    results[path] = (digest, metrics)
+                    fresh.append((path, digest, metrics))
+                if processed % 10 == 0 or processed == total:
+                    report(processed, total, f'Analyzing {os.path.basename(path)}')
+
+    cache.store(fresh)
+    cache.close()
+
+    patches = []
+    for item in items:
+        found = results.get(item['path'])
+        if not found:
+            continue
+        digest, metrics = found
+        flags = {**(item.get('flags') or {}), **derive_flags(metrics, args)}
+        patches.append((item['id'], {
+            'qa': {**metrics, 'contentHash': digest},
+            'blurScore': round(metrics['laplacianVar']),
+            'flags': flags,
+        }))
+
+    with ManifestStore(args.project_dir) as store:
+        updated = store.update_items(patches)
+
+    report(total, total, 'Done')
+    print(json.dumps({'analysed': len(fresh), 'cached': len(results) - len(fresh), 'failed': failed, 'updated': updated}))
+
+
+if __name__ == '__main__':
+    main()
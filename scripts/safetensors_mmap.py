@@ -0,0 +1,194 @@
+#!/usr/bin/env python3
+"""
+Minimal safetensors access without torch.
+
+The file is memory-mapped and tensors are returned as NumPy views over the
+mapping, so opening a multi-GB file costs nothing and reading a tensor only
+pages in its bytes. bfloat16 (which NumPy lacks) is widened to float32, which
+is the only copy made.
+
+    with SafetensorsFile('lora.safetensors') as f:
+        f.metadata          # {'ss_network_dim': '32', ...}
+        f.keys()            # tensor names, in file order
+        f.shape('lora_unet_x.lora_down.weight')
+        w = f.tensor('lora_unet_x.lora_down.weight')   # np.ndarray view
+        f.release('lora_unet_x.lora_down.weight')      # done with it: drop its pages
+
+Writing is streamed the same way: the header is laid out up front from each
+tensor's name, dtype and shape, then tensors are written one at a time in that
+order, so only the tensor being written has to be in memory.
+
+    with SafetensorsWriter('out.safetensors', [(name, 'F16', shape), ...], metadata) as w:
+        w.write(name, array)
+"""
+
+import json
+import mmap
+import os
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+MAX_HEADER_BYTES = 100 * 1024 * 1024
+
+DTYPES = {
+    'F64': np.float64, 'F32': np.float32, 'F16': np.float16,
+    'I64': np.int64, 'I32': np.int32, 'I16': np.int16, 'I8': np.int8,
+    'U8': np.uint8, 'BOOL': np.bool_,
+    'BF16': np.uint16,  # Raw bits; widened in tensor()
+}
+
+
+class SafetensorsFile:
+    def __init__(self, path: str):
+        self.path = path
+        self._file = open(path, 'rb')
+        try:
+            length = int.from_bytes(self._file.read(8), 'little')
+            if not 0 < length <= MAX_HEADER_BYTES:
+                raise ValueError(f'Not a safetensors file: {path}')
+            header = json.loads(self._file.read(length))
+            self.data_start = 8 + length
+            self.metadata: Dict[str, str] = header.pop('__metadata__', None) or {}
+            self.header: Dict[str, Dict] = header
+            size = os.fstat(self._file.fileno()).st_size
+            self._mmap = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ) if size > self.data_start else None
+        except Exception:
+            self._file.close()
+            raise
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        if self._mmap is not None:
+            try:
+                self._mmap.close()
+            except BufferError:
+                # Views are still alive; the mapping goes away with them
+                pass
+            self._mmap = None
+        self._file.close()
+
+    def keys(self) -> List[str]:
+        # Sorted by offset, so a pass over keys() reads the file front to back
+        return sorted(self.header, key=lambda k: self.header[k]['data_offsets'][0])
+
+    def shape(self, name: str) -> Tuple[int, ...]:
+        return tuple(self.header[name]['shape'])
+
+    def dtype(self, name: str) -> str:
+        return self.header[name]['dtype']
+
+    def raw(self, name: str) -> np.ndarray:
+        """The stored bytes as a zero-copy view (bfloat16 as uint16 bits)."""
+        info = self.header[name]
+        begin, end = info['data_offsets']
+        dtype = DTYPES.get(info['dtype'])
+        if dtype is None:
+            raise ValueError(f'Unsupported dtype {info["dtype"]} for {name}')
+        if end == begin:
+            return np.zeros(info['shape'], dtype=dtype)
+        buf = np.frombuffer(self._mmap, dtype=np.uint8, count=end - begin, offset=self.data_start + begin)
+        return buf.view(dtype).reshape(info['shape'])
+
+    def tensor(self, name: str) -> np.ndarray:
+        array = self.raw(name)
+        if self.header[name]['dtype'] == 'BF16':
+            return (array.astype(np.uint32) << 16).view(np.float32)
+        return array
+
+    def release(self, name: str):
+        """
+        Drops a tensor's pages from this process once it has been consumed. The mapping
+        is read-only, so they are simply re-read if touched again; a pass over a large
+        file then stays at about one tensor resident instead of the whole file.
+        """
+        if self._mmap is None or not hasattr(mmap, 'MADV_DONTNEED'):
+            return
+        begin, end = self.header[name]['data_offsets']
+        start = (self.data_start + begin) // mmap.PAGESIZE * mmap.PAGESIZE
+        length = self.data_start + end - start
+        if end > begin:
+            self._mmap.madvise(mmap.MADV_DONTNEED, start, length)
+
+
+def encode(array: np.ndarray, dtype: str) -> np.ndarray:
+    """array converted to a stored dtype, C-contiguous (bfloat16 as rounded uint16 bits)."""
+    if dtype == 'BF16':
+        bits = np.ascontiguousarray(array, dtype=np.float32).view(np.uint32)
+        # Round to nearest even; NaN stays NaN
+        rounded = ((bits + 0x7FFF + ((bits >> 16) & 1)) >> 16).astype(np.uint16)
+        return np.where(np.isnan(bits.view(np.float32)), np.uint16(0x7FC0), rounded)
+    return np.ascontiguousarray(array, dtype=DTYPES[dtype])
+
+
+class SafetensorsWriter:
+    """
+    Writes tensors in the order given by specs [(name, dtype, shape), ...]. The file
+    is written to .<name>.tmp next to path (hidden from output listings) and renamed
+    when closed with every tensor written, so a failed or interrupted write never
+    leaves a truncated file at path.
+    """
+
+    def __init__(self, path: str, specs: Sequence[Tuple[str, str, Sequence[int]]], metadata: Optional[Dict[str, str]] = None):
+        header: Dict = {}
+        if metadata:
+            header['__metadata__'] = {str(k): str(v) for k, v in metadata.items()}
+        self._pending: List[Tuple[str, str, Tuple[int, ...], int]] = []
+        offset = 0
+        for name, dtype, shape in specs:
+            if dtype not in DTYPES:
+                raise ValueError(f'Unsupported dtype {dtype} for {name}')
+            if name in header:
+                raise ValueError(f'Duplicate tensor {name}')
+            shape = tuple(int(d) for d in shape)
+            nbytes = int(np.prod(shape, dtype=np.int64)) * np.dtype(DTYPES[dtype]).itemsize
+            header[name] = {'dtype': dtype, 'shape': list(shape), 'data_offsets': [offset, offset + nbytes]}
+            self._pending.append((name, dtype, shape, nbytes))
+            offset += nbytes
+        self._pending.reverse()
+
+        blob = json.dumps(header, separators=(',', ':')).encode('utf-8')
+        # Pad so tensor data starts 8-byte aligned, as the reference implementation does
+        blob += b' ' * (-len(blob) % 8)
+
+        self.path = path
+        self._tmp = os.path.join(os.path.dirname(path), f'.{os.path.basename(path)}.tmp')
+        self._file = open(self._tmp, 'wb')
+        self._file.write(len(blob).to_bytes(8, 'little'))
+        self._file.write(blob)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, *exc):
+        self.close(discard=exc_type is not None)
+
+    def write(self, name: str, array: np.ndarray):
+        if not self._pending:
+            raise ValueError(f'Unexpected tensor {name}: all tensors already written')
+        expected, dtype, shape, nbytes = self._pending[-1]
+        if name != expected:
+            raise ValueError(f'Expected tensor {expected}, got {name}')
+        if tuple(array.shape) != shape:
+            raise ValueError(f'{name}: shape {tuple(array.shape)} does not match header {shape}')
+        data = encode(array, dtype)
+        if data.nbytes != nbytes:
+            raise ValueError(f'{name}: {data.nbytes} bytes, header says {nbytes}')
+        self._file.write(memoryview(data).cast('B'))
+        self._pending.pop()
+
+    def close(self, discard: bool = False):
+        if self._file.closed:
+            return
+        self._file.close()
+        if discard or self._pending:
+            os.remove(self._tmp)
+            if not discard:
+                raise ValueError(f'{len(self._pending)} tensors were never written to {self.path}')
+        else:
+            os.replace(self._tmp, self.path)
@@ -0,0 +1,132 @@
+#!/usr/bin/env python3
+"""
+Inverted tag index (projects/<id>/tag_index.db).
+
+Mirrors src/lib/tag-index.ts: tag -> train_data images, with per-tag counts,
+so tag search and filtering don't re-read every caption. Images are keyed like
+the caption store ("10_class/img_001.png"). CaptionWriter updates the index
+for every caption it writes, in both sidecar and store mode:
+
+    index = TagIndex(project_dir)
+    index.update([('10_class/img_001.png', '1girl, long hair, smile')])
+
+Tags are normalized the same way on both sides (see normalize_tag), so
+"Long Hair" and "long_hair" are one tag.
+"""
+
+import os
+import sqlite3
+from collections import Counter
+from contextlib import contextmanager
+from functools import lru_cache
+from typing import Dict, Iterable, List, Optional, Tuple
+
+TAG_INDEX_DB = 'tag_index.db'
+SCHEMA_VERSION = 1
+BUSY_TIMEOUT_MS = 5000
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS images (
+    id INTEGER PRIMARY KEY,
+    key TEXT NOT NULL UNIQUE
+);
+CREATE TABLE IF NOT EXISTS tags (
+    id INTEGER PRIMARY KEY,
+    tag TEXT NOT NULL UNIQUE,
+    count INTEGER NOT NULL DEFAULT 0
+);
+CREATE TABLE IF NOT EXISTS postings (
+    tag_id INTEGER NOT NULL,
+    image_id INTEGER NOT NULL,
+    PRIMARY KEY (tag_id, image_id)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS idx_postings_image ON postings(image_id);
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+"""
+
+
+# Datasets reuse a small vocabulary, so bulk passes mostly hit the cache
+@lru_cache(maxsize=65536)
+def normalize_tag(tag: str) -> str:
+    return '_'.join(tag.strip().lower().split())
+
+
+def parse_tags(text: Optional[str]) -> List[str]:
+    """Distinct normalized tags of a comma-separated caption, in order."""
+    tags = [normalize_tag(t) for t in (text or '').split(',')]
+    return list(dict.fromkeys(t for t in tags if t))
+
+
+class TagIndex:
+    def __init__(self, project_dir: str):
+        self.conn = sqlite3.connect(os.path.join(project_dir, TAG_INDEX_DB),
+                                    timeout=BUSY_TIMEOUT_MS / 1000, isolation_level=None)
+        self.conn.execute('PRAGMA journal_mode = WAL')
+        self.conn.execute('PRAGMA synchronous = NORMAL')
+        self.conn.execute(f'PRAGMA busy_timeout = {BUSY_TIMEOUT_MS}')
+        self.conn.executescript(SCHEMA)
+        self.conn.execute("INSERT OR IGNORE INTO meta (key, value) VALUES ('schema_version', ?)", (str(SCHEMA_VERSION),))
+
+    def close(self):
+        self.conn.close()
+
+    @contextmanager
+    def _write(self):
+        self.conn.execute('BEGIN IMMEDIATE')
+        try:
+            yield
+            self.conn.execute('COMMIT')
+        except Exception:
+            self.conn.execute('ROLLBACK')
+            raise
+
+    def update(self, rows: Iterable[Tuple[str, Optional[str]]]) -> int:
+        """Replaces the tags of each (key, caption text) in one transaction; text None removes the image."""
+        count = 0
+        tag_ids: Dict[str, int] = {}
+        deltas: Counter = Counter()
+        with self._write():
+            for key, text in rows:
+                row = self.conn.execute('SELECT id FROM images WHERE key = ?', (key,)).fetchone()
+                if row:
+                    image_id = row[0]
+                    deltas.subtract(t for (t,) in self.conn.execute(
+                        'SELECT tag_id FROM postings WHERE image_id = ?', (image_id,)))
+                    self.conn.execute('DELETE FROM postings WHERE image_id = ?', (image_id,))
+                    if text is None:
+                        self.conn.execute('DELETE FROM images WHERE id = ?', (image_id,))
+                        count += 1
+                        continue
+                elif text is None:
+                    continue
+                else:
+                    image_id = self.conn.execute('INSERT INTO images (key) VALUES (?)', (key,)).lastrowid
+
+                ids = []
+                for tag in parse_tags(text):
+                    if tag not in tag_ids:
+                        self.conn.execute('INSERT OR IGNORE INTO tags (tag) VALUES (?)', (tag,))
+                        tag_ids[tag] = self.conn.execute('SELECT id FROM tags WHERE tag = ?', (tag,)).fetchone()[0]
+                    ids.append(tag_ids[tag])
+                self.conn.executemany('INSERT INTO postings (tag_id, image_id) VALUES (?, ?)',
+                                      [(tag_id, image_id) for tag_id in ids])
+                deltas.update(ids)
+                count += 1
+            # Counts are applied once per tag rather than once per posting
+            self.conn.executemany('UPDATE tags SET count = count + ? WHERE id = ?',
+                                  [(n, tag_id) for tag_id, n in deltas.items() if n])
+        return count
+
+
+def project_dir_for(image_path) -> Optional[Tuple[str, str]]:
+    """(project dir, index key) for an image under <project>/train_data/<folder>/, else None."""
+    image_path = os.path.abspath(str(image_path))
+    folder_dir = os.path.dirname(image_path)
+    train_data_dir = os.path.dirname(folder_dir)
+    if os.path.basename(train_data_dir) != 'train_data':
+        return None
+    key = f'{os.path.basename(folder_dir)}/{os.path.basename(image_path)}'
+    return os.path.dirname(train_data_dir), key
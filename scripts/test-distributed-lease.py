@@ -0,0 +1,149 @@
+#!/usr/bin/env python3
+"""
+Kill-a-worker check for scripts/caption/distributed.py.
+
+Runs a coordinator without local workers and a fake captioner (no models needed),
+then:
+1. starts worker A and SIGKILLs it while it holds a lease mid-chunk,
+2. checks A's captioner child died with it (no orphan still writing sidecars),
+3. starts worker B and checks it reclaims the expired lease after the TTL,
+4. checks the job finishes with a sidecar for every image.
+
+Usage: python scripts/test-distributed-lease.py [--keep]
+Exits non-zero on the first failed check.
+"""
+
+import argparse
+import os
+import shutil
+import signal
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+DISTRIBUTED = Path(__file__).resolve().parent / 'caption' / 'distributed.py'
+IMAGES = 12
+CHUNK_SIZE = 4
+LEASE_TTL = 3
+
+# Stands in for tagger_wd14.py: slow enough to be killed mid-chunk
+FAKE_CAPTIONER = '''
+import argparse, json, os, sys, time
+parser = argparse.ArgumentParser()
+parser.add_argument('--input_dir')
+parser.add_argument('--file_list')
+parser.add_argument('--pid_dir')
+args = parser.parse_args()
+open(os.path.join(args.pid_dir, str(os.getpid())), 'w').close()
+files = [l.strip() for l in open(args.file_list, encoding='utf-8') if l.strip()]
+for i, path in enumerate(files):
+    time.sleep(1)
+    with open(os.path.splitext(path)[0] + '.txt', 'w', encoding='utf-8') as f:
+        f.write('tag')
+    try:
+        print('PROGRESS:' + json.dumps({'progress': i + 1, 'total': len(files)}), flush=True)
+    except OSError:
+        pass  # Like the real scripts' per-image handlers: a closed stdout doesn't stop the chunk
+'''
+
+
+def wait_for(condition, timeout: float, what: str):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if condition():
+            return
+        time.sleep(0.1)
+    raise AssertionError(f'Timed out waiting for {what}')
+
+
+def alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    # A zombie that nobody reaped counts as dead
+    try:
+        with open(f'/proc/{pid}/stat', encoding='utf-8') as f:
+            return f.read().split(')')[-1].split()[0] != 'Z'
+    except OSError:
+        return True
+
+
+def start_worker(work_dir: Path, worker_id: str, log: Path) -> subprocess.Popen:
+    return subprocess.Popen([sys.executable, str(DISTRIBUTED), 'work', str(work_dir), '--worker_id', worker_id],
+                            stdout=open(log, 'w', encoding='utf-8'), stderr=subprocess.STDOUT)
+
+
+def run(root: Path):
+    input_dir = root / 'images'
+    pid_dir = root / 'pids'
+    input_dir.mkdir()
+    pid_dir.mkdir()
+    for i in range(IMAGES):
+        (input_dir / f'{i}.png').write_bytes(b'')
+    captioner = root / 'fake_captioner.py'
+    captioner.write_text(FAKE_CAPTIONER, encoding='utf-8')
+    work_dir = input_dir / '.caption_work'
+
+    # An absolute --script replaces SCRIPTS_DIR in the worker's path join
+    coordinator = subprocess.Popen([
+        sys.executable, str(DISTRIBUTED), 'coordinate', '--input_dir', str(input_dir),
+        '--script', str(captioner), '--chunk_size', str(CHUNK_SIZE), '--local_workers', '0',
+        '--lease_ttl', str(LEASE_TTL), '--', '--pid_dir', str(pid_dir),
+    ], stdout=subprocess.DEVNULL)
+    try:
+        wait_for(lambda: (work_dir / 'plan.json').exists(), 10, 'the plan')
+
+        worker_a = start_worker(work_dir, 'worker-a', root / 'worker-a.log')
+        wait_for(lambda: any(pid_dir.iterdir()), 10, "worker A's captioner")
+        child = int(next(pid_dir.iterdir()).name)
+        leases = list((work_dir / 'leases').glob('*.lease'))
+        assert leases, 'worker A holds no lease'
+        time.sleep(1.5)  # Partway into the chunk
+        worker_a.kill()
+        worker_a.wait()
+        print(f'Killed worker A (lease {leases[0].name}, captioner pid {child})')
+
+        # Well before the chunk would end on its own, so an orphan can't pass by finishing
+        wait_for(lambda: not alive(child), 1.5, 'the orphaned captioner to exit')
+        print('OK: captioner died with its worker')
+
+        killed_at = time.time()
+        worker_b_log = root / 'worker-b.log'
+        worker_b = start_worker(work_dir, 'worker-b', worker_b_log)
+        wait_for(lambda: 'reclaimed expired lease' in worker_b_log.read_text(encoding='utf-8'),
+                 LEASE_TTL + 15, 'worker B to reclaim the lease')
+        waited = time.time() - killed_at
+        assert waited >= LEASE_TTL - 0.5, f'lease reclaimed after {waited:.1f}s, before the {LEASE_TTL}s TTL'
+        print(f'OK: worker B reclaimed the lease after {waited:.1f}s')
+
+        code = coordinator.wait(timeout=60)
+        worker_b.wait(timeout=30)
+        assert code == 0, f'coordinator exited with {code}'
+        missing = [i for i in range(IMAGES) if not (input_dir / f'{i}.txt').exists()]
+        assert not missing, f'no sidecar for images {missing}'
+        print(f'OK: job finished, {IMAGES} sidecars written')
+    finally:
+        if coordinator.poll() is None:
+            coordinator.send_signal(signal.SIGTERM)
+            coordinator.wait()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--keep', action='store_true', help='Keep the temporary directory for inspection')
+    args = parser.parse_args()
+
+    root = Path(tempfile.mkdtemp(prefix='distributed-lease-'))
+    try:
+        run(root)
+    except AssertionError as e:
+        print(f'FAIL: {e} (logs in {root})', file=sys.stderr)
+        args.keep = True
+        sys.exit(1)
+    finally:
+        if not args.keep:
+            shutil.rmtree(root, ignore_errors=True)
+    print('PASS')
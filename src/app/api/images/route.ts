@@ -1,6 +1,9 @@
 import { NextRequest, NextResponse } from 'next/server';
 import fs from 'fs/promises';
 import mime from 'mime';
+import nodePath from 'path';
+import { serveThumbnail, parseThumbSize } from '@/lib/thumbnails';
+import { isImmutableUrl, serveFile } from '@/lib/http-cache';
 
 export async function GET(req: NextRequest) {
     const { searchParams } = new URL(req.url);
@@ -16,15 +19,28 @@ export async function GET(req: NextRequest) {
         return new NextResponse('Invalid path', { status: 403 });
     }
 
+    // Optional ?thumb=<px> serves a cached thumbnail for files inside a project
+    const projectsDir = nodePath.join(process.cwd(), 'projects');
+    const relative = nodePath.relative(projectsDir, path);
+    const projectId = !relative.startsWith('..') && !nodePath.isAbsolute(relative) ? relative.split(nodePath.sep)[0] : null;
+    const thumbSize = parseThumbSize(searchParams.get('thumb'));
+    if (thumbSize && projectId) {
+        try {
+            return await serveThumbnail(req, projectId, path, thumbSize);
+        } catch {
+            return new NextResponse('Not found', { status: 404 });
+        }
+    }
+
     try {
-        const fileCookie = await fs.readFile(path);
-        const contentType = mime.getType(path) || 'application/octet-stream';
+        const stats = await fs.stat(path);
+        if (!stats.isFile()) {
+            return new NextResponse('Not found', { status: 404 });
+        }
 
-        return new NextResponse(fileCookie as any, {
-            headers: {
-                'Content-Type': contentType,
-                'Cache-Control': 'no-store, max-age=0'
-            }
+        return serveFile(req, path, stats, {
+            contentType: mime.getType(path) || 'application/octet-stream',
+            immutable: !!projectId && isImmutableUrl(new URL(req.url), nodePath.join(projectsDir, projectId), path)
         });
     } catch {
         return new NextResponse('Not found', { status: 404 });
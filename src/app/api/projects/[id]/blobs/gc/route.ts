@@ -0,0 +1,20 @@
+import { NextRequest, NextResponse } from 'next/server';
+import { getProject } from '@/lib/projects';
+import { collectBlobGarbage } from '@/lib/blobs';
+
+// Reclaims blob store space held by images no stage folder or manifest item refers to anymore
+export async function POST(req: NextRequest, { params }: { params: Promise<{ id: string }> }) {
+    try {
+        const { id } = await params;
+        const project = await getProject(id);
+        if (!project) {
+            return NextResponse.json({ error: 'Project not found' }, { status: 404 });
+        }
+
+        const result = await collectBlobGarbage(id);
+        return NextResponse.json(result);
+    } catch (error) {
+        console.error('Blob GC failed:', error);
+        return NextResponse.json({ error: 'Blob GC failed' }, { status: 500 });
+    }
+}
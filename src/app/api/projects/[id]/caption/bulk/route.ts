@@ -0,0 +1,52 @@
+import { NextRequest, NextResponse } from 'next/server';
+import path from 'path';
+import fs from 'fs/promises';
+import os from 'os';
+import { v4 as uuidv4 } from 'uuid';
+import { getProject } from '@/lib/projects';
+import { runPythonScript } from '@/lib/python';
+import { getCaptionStorePath, isCaptionStoreEnabled } from '@/lib/captions';
+import { BulkTagRule } from '@/types/caption';
+
+const RULE_OPS = new Set<BulkTagRule['op']>(['remove', 'replace', 'alias', 'move_to_front', 'dedupe', 'max_tags']);
+
+// Applies tag rules to every caption in one pass (scripts/bulk_tags.py).
+// { rules, dryRun?, folder? } -> counts per rule, net tag changes and sample diffs
+export async function POST(req: NextRequest, { params }: { params: Promise<{ id: string }> }) {
+    const rulesPath = path.join(os.tmpdir(), `bulk-tags-${uuidv4()}.json`);
+    try {
+        const { id } = await params;
+        const project = await getProject(id);
+        if (!project) {
+            return NextResponse.json({ error: 'Project not found' }, { status: 404 });
+        }
+
+        const { rules, dryRun = false, folder } = await req.json();
+        if (!Array.isArray(rules) || rules.length === 0) {
+            return NextResponse.json({ error: 'rules must be a non-empty array' }, { status: 400 });
+        }
+        const unknown = rules.find((rule: BulkTagRule) => !RULE_OPS.has(rule?.op));
+        if (unknown) {
+            return NextResponse.json({ error: `Unknown rule op: ${unknown?.op}` }, { status: 400 });
+        }
+
+        // Rules go through a file; alias maps can be larger than a command line allows
+        await fs.writeFile(rulesPath, JSON.stringify(rules));
+        const args = ['--project_dir', path.join(process.cwd(), 'projects', id), '--rules', rulesPath];
+        if (folder) args.push('--folder', path.basename(folder));
+        if (isCaptionStoreEnabled(id)) args.push('--caption_store', getCaptionStorePath(id));
+        if (dryRun) args.push('--dry_run');
+
+        const output = await runPythonScript('bulk_tags.py', args);
+        const summary = JSON.parse(output.trim().split('\n').pop() || '{}');
+        return NextResponse.json(summary);
+    } catch (error: any) {
+        if (String(error?.message).includes('Invalid rules')) {
+            return NextResponse.json({ error: error.message.slice(error.message.indexOf('Invalid rules')).trim() }, { status: 400 });
+        }
+        console.error('Bulk tag edit failed:', error);
+        return NextResponse.json({ error: 'Bulk tag edit failed' }, { status: 500 });
+    } finally {
+        await fs.rm(rulesPath, { force: true });
+    }
+}
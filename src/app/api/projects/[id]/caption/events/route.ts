@@ -0,0 +1,14 @@
+import { NextRequest } from 'next/server';
+import path from 'path';
+import { jobEventStream } from '@/lib/jobs';
+
+export const dynamic = 'force-dynamic';
+
+const JOB_FILE = 'caption_job.json';
+
+// Server-Sent Events for the project's captioning job (same payload as GET /caption)
+export async function GET(req: NextRequest, { params }: { params: Promise<{ id: string }> }) {
+    const { id } = await params;
+    const jobPath = path.join(process.cwd(), 'projects', id, JOB_FILE);
+    return jobEventStream(jobPath, req.signal, { status: 'idle', progress: 0, total: 0 });
+}
@@ -3,6 +3,8 @@ import path from 'path';
 import fs from 'fs/promises';
 import mime from 'mime';
 import { spawn } from 'child_process';
+import { serveThumbnail, parseThumbSize } from '@/lib/thumbnails';
+import { getCaptionStorePath, isCaptionStoreEnabled, readCaption, writeCaption } from '@/lib/captions';
 
 export async function GET(
     request: NextRequest,
@@ -20,6 +22,16 @@ export async function GET(
             return new NextResponse('Forbidden', { status: 403 });
         }
 
+        // Optional ?thumb=<px> serves a cached thumbnail (used by the image browser grid)
+        const thumbSize = parseThumbSize(request.nextUrl.searchParams.get('thumb'));
+        if (thumbSize) {
+            try {
+                return await serveThumbnail(request, id, filePath, thumbSize);
+            } catch {
+                return new NextResponse('Not Found', { status: 404 });
+            }
+        }
+
         try {
             const fileBuffer = await fs.readFile(filePath);
             const mimeType = mime.getType(filePath) || 'application/octet-stream';
@@ -57,8 +69,8 @@ export async function PUT(
             return new NextResponse('Forbidden', { status: 403 });
         }
 
-        const txtPath = imagePath.replace(/\.[^/.]+$/, '.txt');
-        await fs.writeFile(txtPath, tags.join(', '));
+        const folder = pathSegments.slice(0, -1).join('/');
+        await writeCaption(id, folder, pathSegments[pathSegments.length - 1], tags.join(', '));
 
         return NextResponse.json({ success: true });
     } catch (error) {
@@ -152,6 +164,9 @@ export async function POST(
         if (config.triggerWord) {
             scriptArgs.push('--trigger', config.triggerWord);
         }
+        if (isCaptionStoreEnabled(id)) {
+            scriptArgs.push('--caption_store', getCaptionStorePath(id));
+        }
 
         // Spawn python script
         await new Promise<void>((resolve, reject) => {
@@ -173,9 +188,9 @@ export async function POST(
             });
         });
 
-        // Read the generated .txt file
-        const txtPath = filePath.replace(/\.[^/.]+$/, '.txt');
-        const txtContent = await fs.readFile(txtPath, 'utf-8');
+        // Read the generated caption
+        const txtContent = await readCaption(id, imagePathSegments.slice(0, -1).join('/'), imagePathSegments[imagePathSegments.length - 1]);
+        if (txtContent === null) throw new Error('Tagger produced no caption');
         const tags = txtContent.split(',').map(t => t.trim()).filter(Boolean);
 
         return NextResponse.json({ tags });
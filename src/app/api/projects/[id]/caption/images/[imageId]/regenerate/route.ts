@@ -3,6 +3,7 @@ import path from 'path';
 import fs from 'fs/promises';
 import { spawn } from 'child_process';
 import { getModelByKey } from '@/lib/wd-models';
+import { getCaptionStorePath, isCaptionStoreEnabled, readCaption } from '@/lib/captions';
 
 export async function POST(
     request: NextRequest,
@@ -56,6 +57,9 @@ export async function POST(
         if (captionConfig.advanced.excludeTags) {
             scriptArgs.push('--blacklist', captionConfig.advanced.excludeTags);
         }
+        if (isCaptionStoreEnabled(id)) {
+            scriptArgs.push('--caption_store', getCaptionStorePath(id));
+        }
 
         // Execute Python script
         await new Promise<void>((resolve, reject) => {
@@ -74,8 +78,8 @@ export async function POST(
         });
 
         // Read generated tags
-        const txtPath = imagePath.replace(/\.(jpg|jpeg|png|webp)$/i, '.txt');
-        const tagContent = await fs.readFile(txtPath, 'utf-8');
+        const tagContent = await readCaption(id, path.dirname(imageId), path.basename(imageId));
+        if (tagContent === null) throw new Error('Tagger produced no caption');
         const tags = tagContent.split(',').map(t => t.trim()).filter(Boolean);
 
         return NextResponse.json({ success: true, tags });
@@ -1,6 +1,7 @@
 import { NextRequest, NextResponse } from 'next/server';
 import path from 'path';
 import fs from 'fs/promises';
+import { writeCaption } from '@/lib/captions';
 
 export async function GET(
     request: NextRequest,
@@ -53,13 +54,9 @@ export async function PUT(
             );
         }
 
-        // Get .txt file path
-        const imagePath = path.join(process.cwd(), 'projects', id, 'train_data', imageId);
-        const txtPath = imagePath.replace(/\.(jpg|jpeg|png|webp)$/i, '.txt');
-
-        // Write tags to .txt file
+        // imageId is "subdir/filename.jpg"; writes go to the caption store or the .txt sidecar
         const tagContent = tags.join(', ');
-        await fs.writeFile(txtPath, tagContent, 'utf-8');
+        await writeCaption(id, path.dirname(imageId), path.basename(imageId), tagContent);
 
         return NextResponse.json({ success: true, tags });
     } catch (error) {
@@ -1,6 +1,9 @@
 import { NextRequest, NextResponse } from 'next/server';
 import path from 'path';
 import fs from 'fs/promises';
+import { GRID_THUMB_SIZE } from '@/lib/thumbnails';
+import { readCaptions } from '@/lib/captions';
+import { ensureTagIndex, queryTagIndex, TagQueryError } from '@/lib/tag-index';
 
 export async function GET(
     request: NextRequest,
@@ -27,6 +30,14 @@ export async function GET(
 
         const allImages: any[] = [];
 
+        // ?q= narrows the list through the tag index (same syntax as tags/search)
+        const q = new URL(request.url).searchParams.get('q')?.trim();
+        let matching: Set<string> | null = null;
+        if (q) {
+            await ensureTagIndex(id);
+            matching = new Set(queryTagIndex(id, q, 0).ids);
+        }
+
         // Scan each subdirectory
         for (const subDir of subDirs) {
             const subDirPath = path.join(trainDataDir, subDir.name);
@@ -36,26 +47,17 @@ export async function GET(
                 f.match(/\.(jpg|jpeg|png|webp)$/i)
             );
 
+            // One query with the caption store, sidecar reads without it
+            const captions = await readCaptions(id, subDir.name);
+
             for (const imageFile of imageFiles) {
+                if (matching && !matching.has(`${subDir.name}/${imageFile}`)) continue;
                 const imagePath = path.join(subDirPath, imageFile);
-                const txtPath = imagePath.replace(/\.(jpg|jpeg|png|webp)$/i, '.txt');
+                const caption = captions.get(imageFile);
 
-                let tags: string[] = [];
-                let hasTxt = false;
-                let isEdited = false;
-
-                try {
-                    const txtContent = await fs.readFile(txtPath, 'utf-8');
-                    tags = txtContent.split(',').map(t => t.trim()).filter(Boolean);
-                    hasTxt = true;
-
-                    // Check if edited (simple heuristic: check file mtime)
-                    const txtStat = await fs.stat(txtPath);
-                    const imgStat = await fs.stat(imagePath);
-                    isEdited = txtStat.mtime > imgStat.mtime;
-                } catch {
-                    // No .txt file
-                }
+                const tags = caption ? caption.text.split(',').map(t => t.trim()).filter(Boolean) : [];
+                const hasTxt = !!caption;
+                const isEdited = caption?.edited ?? false;
 
                 // Get image stats for cache busting
                 const imgStat = await fs.stat(imagePath);
@@ -65,6 +67,7 @@ export async function GET(
                     id: `${subDir.name}/${imageFile}`,
                     filename: imageFile,
                     url: `/api/projects/${id}/caption/images/${subDir.name}/${imageFile}?v=${mtime}`,
+                    thumbUrl: `/api/projects/${id}/caption/images/${subDir.name}/${imageFile}?v=${mtime}&thumb=${GRID_THUMB_SIZE}`,
                     tags,
                     has_caption: hasTxt,
                     is_edited: isEdited
@@ -74,6 +77,9 @@ export async function GET(
 
         return NextResponse.json({ images: allImages });
     } catch (error) {
+        if (error instanceof TagQueryError) {
+            return NextResponse.json({ error: error.message }, { status: 400 });
+        }
         console.error('Failed to load caption images:', error);
         return NextResponse.json(
             { error: 'Failed to load images' },
@@ -5,6 +5,8 @@ import { spawn } from 'child_process';
 import { updateProjectStats, updateProject } from '@/lib/projects';
 import { getManifest } from '@/lib/manifest';
 import { getModelByKey } from '@/lib/wd-models';
+import { getCaptionStorePath, isCaptionStoreEnabled, readCaptions } from '@/lib/captions';
+import { createJobWriter, readJobState } from '@/lib/jobs';
 
 const JOB_FILE = 'caption_job.json';
 
@@ -14,12 +16,8 @@ export async function GET(req: NextRequest, { params }: { params: Promise<{ id:
         const projectDir = path.join(process.cwd(), 'projects', id);
         const jobPath = path.join(projectDir, JOB_FILE);
 
-        try {
-            const data = await fs.readFile(jobPath, 'utf-8');
-            return NextResponse.json(JSON.parse(data));
-        } catch {
-            return NextResponse.json({ status: 'idle', progress: 0, total: 0 });
-        }
+        const job = await readJobState(jobPath);
+        return NextResponse.json(job ?? { status: 'idle', progress: 0, total: 0 });
     } catch (error) {
         return NextResponse.json({ error: 'Internal Server Error' }, { status: 500 });
     }
@@ -97,8 +95,9 @@ export async function POST(req: NextRequest, { params }: { params: Promise<{ id:
         const configPath = path.join(projectDir, 'caption_config.json');
         await fs.writeFile(configPath, JSON.stringify({ ...config, lastRun: new Date().toISOString() }, null, 2));
 
-        // Initialize Job
-        const initialJob = {
+        // Initialize Job. PROGRESS lines are merged into this in memory and streamed
+        // via caption/events; the job file is only written on the writer's interval.
+        let jobState: Record<string, unknown> = {
             status: 'starting',
             progress: 0,
             total: images.length,
@@ -106,7 +105,8 @@ export async function POST(req: NextRequest, { params }: { params: Promise<{ id:
             current_file: '',
             sourceStage: 'train_data' as const
         };
-        await fs.writeFile(jobPath, JSON.stringify(initialJob, null, 2));
+        const jobWriter = createJobWriter<Record<string, unknown>>(jobPath);
+        await jobWriter.flush(jobState);
 
         // Determine which provider script to use
         const scriptsDir = path.join(process.cwd(), 'scripts', 'caption');
@@ -130,10 +130,23 @@ export async function POST(req: NextRequest, { params }: { params: Promise<{ id:
             const modelDef = getModelByKey(modelKey as any);
             const modelRepoId = modelDef?.repo_id || modelKey;
 
-            console.log(`[Caption ${id}] WD Tagger Init: Key=${modelKey}, Repo=${modelRepoId}`);
+            // Ensemble: extra models share the decode/preprocess pass in one tagger process
+            const extraRepoIds = (config.ensembleModels || [])
+                .map((key: string) => getModelByKey(key as any)?.repo_id || key)
+                .filter((repoId: string) => repoId !== modelRepoId);
+            const modelRepoIds = [modelRepoId, ...new Set<string>(extraRepoIds)];
+
+            console.log(`[Caption ${id}] WD Tagger Init: Key=${modelKey}, Repo=${modelRepoIds.join(', ')}`);
+
+            scriptArgs.push('--model', ...modelRepoIds);
+            if (modelRepoIds.length > 1) {
+                scriptArgs.push(
+                    '--ensemble', config.ensembleMode === 'mean' ? 'mean' : 'max',
+                    '--per_model_json', path.join(projectDir, 'caption_tags_by_model.json')
+                );
+            }
 
             scriptArgs.push(
-                '--model', modelRepoId,
                 '--threshold', (config.advanced.tagThreshold || 0.35).toString(),
                 '--character_threshold', '0.7',
                 '--max_tags', (config.advanced.maxTags || 12).toString(),
@@ -194,29 +207,48 @@ export async function POST(req: NextRequest, { params }: { params: Promise<{ id:
             scriptArgs.push('--trigger', config.triggerWord);
         }
 
+        // Bulk writes into captions.db instead of one .txt per image
+        if (isCaptionStoreEnabled(id)) {
+            scriptArgs.push('--caption_store', getCaptionStorePath(id));
+        }
+
+        // Distributed: a coordinator leases chunks to workers here and on any machine sharing
+        // the project folder; its PROGRESS lines are the aggregate over all of them
+        let command = [scriptPath, ...scriptArgs];
+        if (config.distributed?.enabled && (config.mode === 'tags' || config.mode === 'caption')) {
+            command = [
+                path.join(scriptsDir, 'distributed.py'), 'coordinate',
+                '--input_dir', targetDir,
+                '--script', path.basename(scriptPath),
+                '--local_workers', String(config.distributed.localWorkers ?? 1),
+                '--chunk_size', String(config.distributed.chunkSize ?? 64),
+                '--', ...scriptArgs
+            ];
+        }
+
         // Spawn Background Process
-        const pythonProcess = spawn('python', [scriptPath, ...scriptArgs]);
+        const pythonProcess = spawn('python', command);
 
         console.log(`Started captioning job for ${id} in ${targetDir}`);
 
-        pythonProcess.stdout.on('data', async (data) => {
-            const str = data.toString();
-            if (str.includes('PROGRESS:')) {
-                const lines = str.split('\n');
-                for (const line of lines) {
-                    if (line.trim().startsWith('PROGRESS:')) {
-                        try {
-                            const jsonStr = line.replace('PROGRESS:', '').trim();
-                            const progressData = JSON.parse(jsonStr);
-                            const currentJob = JSON.parse(await fs.readFile(jobPath, 'utf-8').catch(() => '{}'));
-                            await fs.writeFile(jobPath, JSON.stringify({ ...currentJob, ...progressData }, null, 2));
-                        } catch (e) {
-                            console.error('Error parsing progress:', e);
-                        }
+        // stdout chunks can split a line; keep the tail until its newline arrives
+        let stdoutBuffer = '';
+        pythonProcess.stdout.on('data', (data) => {
+            stdoutBuffer += data.toString();
+            const lines = stdoutBuffer.split('\n');
+            stdoutBuffer = lines.pop() ?? '';
+            for (const line of lines) {
+                if (line.trim().startsWith('PROGRESS:')) {
+                    try {
+                        const progressData = JSON.parse(line.replace('PROGRESS:', '').trim());
+                        jobState = { ...jobState, ...progressData };
+                        jobWriter.update(jobState);
+                    } catch (e) {
+                        console.error('Error parsing progress:', e);
                     }
+                } else if (line.trim()) {
+                    console.log(`[Caption ${id}] ${line}`);
                 }
-            } else {
-                console.log(`[Caption ${id}] ${str}`);
             }
         });
 
@@ -231,8 +263,7 @@ export async function POST(req: NextRequest, { params }: { params: Promise<{ id:
                 try {
                     // Update stats only - no file moving
 
-                    const allFiles = await fs.readdir(targetDir);
-                    const txtFiles = allFiles.filter(f => f.endsWith('.txt'));
+                    const captions = await readCaptions(id, targetSubDir);
 
                     let writtenCaptions = 0;
                     const counts: Record<string, number> = {};
@@ -241,9 +272,9 @@ export async function POST(req: NextRequest, { params }: { params: Promise<{ id:
 
                     const displayMode = config.mode === 'caption' ? 'sentence' : 'tags';
 
-                    for (const txtFile of txtFiles) {
+                    for (const [imageFile, caption] of captions) {
                         try {
-                            const captionText = await fs.readFile(path.join(targetDir, txtFile), 'utf-8');
+                            const captionText = caption.text;
                             writtenCaptions++;
 
                             if (displayMode === 'tags') {
@@ -263,7 +294,7 @@ export async function POST(req: NextRequest, { params }: { params: Promise<{ id:
                                 });
                             }
                         } catch (e) {
-                            console.error(`Error reading ${txtFile}:`, e);
+                            console.error(`Error reading caption for ${imageFile}:`, e);
                         }
                     }
 
@@ -299,20 +330,20 @@ export async function POST(req: NextRequest, { params }: { params: Promise<{ id:
                     const statsPath = path.join(projectDir, 'caption_stats.json');
                     await fs.writeFile(statsPath, JSON.stringify(finalSummary, null, 2));
 
-                    await fs.writeFile(jobPath, JSON.stringify({
+                    await jobWriter.flush({
                         status: 'completed',
                         progress: writtenCaptions,
                         total: images.length,
                         sourceStage: 'train_data',
                         summary: finalSummary
-                    }, null, 2));
+                    });
 
                 } catch (e) {
                     console.error('Post-captioning error:', e);
-                    await fs.writeFile(jobPath, JSON.stringify({ status: 'error', error: 'Post-processing failed' }, null, 2));
+                    await jobWriter.flush({ status: 'error', error: 'Post-processing failed' });
                 }
             } else {
-                await fs.writeFile(jobPath, JSON.stringify({ status: 'error', error: 'Process exited with error' }, null, 2));
+                await jobWriter.flush({ status: 'error', error: 'Process exited with error' });
             }
         });
 
@@ -2,6 +2,8 @@ import { NextRequest, NextResponse } from 'next/server';
 import path from 'path';
 import fs from 'fs/promises';
 import { getProject, updateProject } from '@/lib/projects';
+import { linkFile } from '@/lib/blobs';
+import { clearCaptions } from '@/lib/captions';
 
 export async function POST(req: NextRequest, { params }: { params: Promise<{ id: string }> }) {
     try {
@@ -33,6 +35,7 @@ export async function POST(req: NextRequest, { params }: { params: Promise<{ id:
         // 2. Clean and recreate train_data directory
         await fs.rm(trainDataDir, { recursive: true, force: true });
         await fs.mkdir(trainDataDir, { recursive: true });
+        await clearCaptions(id); // Stored captions belong to the old train_data
 
         // 3. Copy all images from resized to train_data
         let imagesCopied = 0;
@@ -41,7 +44,7 @@ export async function POST(req: NextRequest, { params }: { params: Promise<{ id:
             const targetPath = path.join(trainDataDir, imageFile);
 
             try {
-                await fs.copyFile(sourcePath, targetPath);
+                await linkFile(id, sourcePath, targetPath);
                 imagesCopied++;
             } catch (err) {
                 console.error(`Failed to copy ${imageFile}:`, err);
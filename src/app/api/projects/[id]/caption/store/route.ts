@@ -0,0 +1,31 @@
+import { NextRequest, NextResponse } from 'next/server';
+import { getProject } from '@/lib/projects';
+import { disableCaptionStore, enableCaptionStore, isCaptionStoreEnabled } from '@/lib/captions';
+
+// Whether the project keeps captions in captions.db instead of .txt sidecars
+export async function GET(req: NextRequest, { params }: { params: Promise<{ id: string }> }) {
+    const { id } = await params;
+    return NextResponse.json({ enabled: isCaptionStoreEnabled(id) });
+}
+
+// { enabled: true } imports existing sidecars into the store; { enabled: false } writes them back out
+export async function POST(req: NextRequest, { params }: { params: Promise<{ id: string }> }) {
+    try {
+        const { id } = await params;
+        const project = await getProject(id);
+        if (!project) {
+            return NextResponse.json({ error: 'Project not found' }, { status: 404 });
+        }
+
+        const { enabled } = await req.json();
+        if (typeof enabled !== 'boolean') {
+            return NextResponse.json({ error: 'enabled must be a boolean' }, { status: 400 });
+        }
+
+        const moved = enabled ? await enableCaptionStore(id) : await disableCaptionStore(id);
+        return NextResponse.json({ enabled: isCaptionStoreEnabled(id), moved });
+    } catch (error) {
+        console.error('Failed to switch caption store:', error);
+        return NextResponse.json({ error: 'Failed to switch caption store' }, { status: 500 });
+    }
+}
@@ -2,6 +2,7 @@ import { NextRequest, NextResponse } from 'next/server';
 import path from 'path';
 import fs from 'fs/promises';
 import { getProject } from '@/lib/projects';
+import { linkFile } from '@/lib/blobs';
 
 export async function POST(
     request: NextRequest,
@@ -62,8 +63,8 @@ export async function POST(
                 await fs.access(destPath);
                 // Skip if exists - explicit check to avoid overwriting manually edited files/captions
             } catch {
-                // Copy if missing
-                await fs.copyFile(srcPath, destPath);
+                // Link if missing (shares the resized file's blob)
+                await linkFile(id, srcPath, destPath);
                 copiedCount++;
             }
         }
@@ -3,6 +3,7 @@ import path from 'path';
 import fs from 'fs/promises';
 import { getProject, updateProjectStats } from '@/lib/projects';
 import sharp from 'sharp';
+import { prewarmThumbnails } from '@/lib/thumbnails';
 
 export async function POST(req: NextRequest, { params }: { params: Promise<{ id: string }> }) {
     try {
@@ -24,6 +25,7 @@ export async function POST(req: NextRequest, { params }: { params: Promise<{ id:
         await fs.mkdir(cropDir, { recursive: true });
 
         const results = [];
+        const createdCrops: string[] = [];
 
         for (const proposal of proposals) {
             const { imageId, bbox, source = 'auto', confidence, referenceSetId } = proposal;
@@ -110,6 +112,7 @@ export async function POST(req: NextRequest, { params }: { params: Promise<{ id:
 
                         await fs.writeFile(metaPath, JSON.stringify(meta, null, 2));
                         results.push({ imageId, status: 'success', file: newCropFile });
+                        createdCrops.push(newCropPath);
                     } else {
                         results.push({ imageId, status: 'error', error: 'Invalid crop dimensions' });
                     }
@@ -122,6 +125,7 @@ export async function POST(req: NextRequest, { params }: { params: Promise<{ id:
         }
 
         await updateProjectStats(id);
+        prewarmThumbnails(id, createdCrops);
 
         return NextResponse.json({ ok: true, results });
 
@@ -1,6 +1,6 @@
 import { NextRequest, NextResponse } from 'next/server';
 import path from 'path';
-import fs from 'fs/promises';
+import { readJobState } from '@/lib/jobs';
 
 export async function GET(req: NextRequest, { params }: { params: Promise<{ id: string }> }) {
     try {
@@ -15,13 +15,11 @@ export async function GET(req: NextRequest, { params }: { params: Promise<{ id:
         const projectDir = path.join(process.cwd(), 'projects', id);
         const jobPath = path.join(projectDir, 'jobs', `${jobId}.json`);
 
-        try {
-            const data = await fs.readFile(jobPath, 'utf-8');
-            const job = JSON.parse(data);
-            return NextResponse.json(job);
-        } catch {
+        const job = await readJobState(jobPath);
+        if (!job) {
             return NextResponse.json({ error: 'Job not found' }, { status: 404 });
         }
+        return NextResponse.json(job);
 
     } catch (error) {
         console.error('Get auto crop results error:', error);
@@ -4,6 +4,7 @@ import fs from 'fs/promises';
 import { v4 as uuidv4 } from 'uuid';
 import { getProject } from '@/lib/projects';
 import { runPythonScript } from '@/lib/python';
+import { createJobWriter } from '@/lib/jobs';
 
 export async function POST(req: NextRequest, { params }: { params: Promise<{ id: string }> }) {
     try {
@@ -34,7 +35,8 @@ export async function POST(req: NextRequest, { params }: { params: Promise<{ id:
             mode
         };
 
-        await fs.writeFile(jobPath, JSON.stringify(jobState, null, 2));
+        const jobWriter = createJobWriter<object>(jobPath);
+        await jobWriter.flush(jobState);
 
         // Start background process
         // We don't await this promise so the response is immediate
@@ -42,7 +44,7 @@ export async function POST(req: NextRequest, { params }: { params: Promise<{ id:
             try {
                 // Update to processing
                 jobState.status = 'processing';
-                await fs.writeFile(jobPath, JSON.stringify(jobState, null, 2));
+                jobWriter.update({ ...jobState });
 
                 // Run python script
                 // args: --project-dir <path> --mode <mode> --refs <ref1> <ref2> ...
@@ -81,7 +83,7 @@ export async function POST(req: NextRequest, { params }: { params: Promise<{ id:
                     result: result // contains { proposals: [...] }
                 };
 
-                await fs.writeFile(jobPath, JSON.stringify(completedState, null, 2));
+                await jobWriter.flush(completedState);
 
             } catch (error: any) {
                 console.error(`Job ${jobId} failed:`, error);
@@ -91,7 +93,7 @@ export async function POST(req: NextRequest, { params }: { params: Promise<{ id:
                     endTime: new Date().toISOString(),
                     error: error.message
                 };
-                await fs.writeFile(jobPath, JSON.stringify(failedState, null, 2));
+                await jobWriter.flush(failedState);
             }
         })();
 
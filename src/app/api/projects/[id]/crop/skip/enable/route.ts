@@ -2,6 +2,7 @@ import { NextRequest, NextResponse } from 'next/server';
 import path from 'path';
 import fs from 'fs/promises';
 import { updateProject, getProject } from '@/lib/projects';
+import { linkFile } from '@/lib/blobs';
 
 export async function POST(
     req: NextRequest,
@@ -32,8 +33,8 @@ export async function POST(
                 const srcPath = path.join(rawDir, file);
                 const destPath = path.join(skipCropDir, file);
 
-                // Copy file
-                await fs.copyFile(srcPath, destPath);
+                // Link to the raw file's blob (a copy without hardlink support)
+                await linkFile(id, srcPath, destPath);
                 copiedCount++;
             }
         }
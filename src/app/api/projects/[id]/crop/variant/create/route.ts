@@ -3,6 +3,7 @@ import path from 'path';
 import fs from 'fs/promises';
 import { getProject, updateProjectStats } from '@/lib/projects';
 import sharp from 'sharp';
+import { prewarmThumbnails } from '@/lib/thumbnails';
 
 export async function POST(req: NextRequest, { params }: { params: Promise<{ id: string }> }) {
     try {
@@ -124,6 +125,7 @@ export async function POST(req: NextRequest, { params }: { params: Promise<{ id:
 
         // Update project stats
         await updateProjectStats(id);
+        prewarmThumbnails(id, [newCropPath]);
 
         return NextResponse.json({ ok: true, variant: newVariant });
 
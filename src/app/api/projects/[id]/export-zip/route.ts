@@ -13,13 +13,13 @@ export async function POST(
             return NextResponse.json({ error: 'Project not found' }, { status: 404 });
         }
 
-        const zipBuffer = await exportProjectZip(id);
+        const zipStream = await exportProjectZip(id);
 
         // Sanitize filename
         const safeName = project.name.replace(/[^a-z0-9]/gi, '_').toLowerCase();
         const filename = `LoRABento_${safeName}_${project.id.slice(0, 8)}.zip`;
 
-        return new NextResponse(zipBuffer as unknown as BodyInit, {
+        return new NextResponse(zipStream, {
             headers: {
                 'Content-Type': 'application/zip',
                 'Content-Disposition': `attachment; filename="${filename}"`
@@ -4,9 +4,10 @@ import { createExportZip } from '@/lib/export';
 export async function GET(req: NextRequest, { params }: { params: Promise<{ id: string }> }) {
     try {
         const { id } = await params;
-        const zipBuffer = await createExportZip(id);
+        const zipStream = await createExportZip(id);
 
-        return new NextResponse(zipBuffer as any, {
+        // Streamed: no Content-Length, the archive is written as files are read
+        return new NextResponse(zipStream, {
             headers: {
                 'Content-Type': 'application/zip',
                 'Content-Disposition': `attachment; filename="dataset-${id}.zip"`,
@@ -2,6 +2,8 @@ import { NextRequest, NextResponse } from 'next/server';
 import path from 'path';
 import fs from 'fs/promises';
 import mime from 'mime';
+import { serveThumbnail, parseThumbSize } from '@/lib/thumbnails';
+import { isImmutableUrl, serveFile } from '@/lib/http-cache';
 
 export async function GET(
     req: NextRequest,
@@ -24,24 +26,26 @@ export async function GET(
             return new NextResponse('Invalid path', { status: 403 });
         }
 
+        // Optional ?thumb=<px> serves a cached thumbnail instead of the full file
+        const thumbSize = parseThumbSize(req.nextUrl.searchParams.get('thumb'));
+        if (thumbSize) {
+            try {
+                return await serveThumbnail(req, id, filePath, thumbSize);
+            } catch {
+                return new NextResponse('File not found', { status: 404 });
+            }
+        }
+
         try {
-            await fs.access(filePath);
             const stats = await fs.stat(filePath);
 
             if (!stats.isFile()) {
                 return new NextResponse('Not a file', { status: 400 });
             }
 
-            const fileBuffer = await fs.readFile(filePath);
-            const contentType = mime.getType(filePath) || 'application/octet-stream';
-
-            return new NextResponse(fileBuffer as any, {
-                headers: {
-                    'Content-Type': contentType,
-                    'Cache-Control': 'private, no-cache, no-store, must-revalidate',
-                    'Pragma': 'no-cache',
-                    'Expires': '0'
-                }
+            return serveFile(req, filePath, stats, {
+                contentType: mime.getType(filePath) || 'application/octet-stream',
+                immutable: isImmutableUrl(req.nextUrl, projectDir, filePath)
             });
         } catch {
             return new NextResponse('File not found', { status: 404 });
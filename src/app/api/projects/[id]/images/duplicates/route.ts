@@ -15,6 +15,7 @@ export async function DELETE(req: NextRequest, { params }: { params: Promise<{ i
 
         const { getManifest, saveManifest } = await import('@/lib/manifest');
         const manifest = await getManifest(projectId);
+        const itemsById = new Map(manifest.items.map(i => [i.id, i]));
 
         // 1. Group by Hash
         const groups = new Map<string, any[]>();
@@ -88,7 +89,7 @@ export async function DELETE(req: NextRequest, { params }: { params: Promise<{ i
             // If we deleted the others, this one is no longer a duplicate *in this set*.
             // But if it was duplicate with something we kept?
             // Wait, if we grouped by hash and kept 1, that 1 is unique for that hash.
-            const manifestItem = manifest.items.find(i => i.id === best.id);
+            const manifestItem = itemsById.get(best.id);
             if (manifestItem && manifestItem.flags) {
                 manifestItem.flags.isDuplicate = false; // No longer duplicate
             }
@@ -3,6 +3,8 @@ import path from 'path';
 import fs from 'fs/promises';
 import { getProject, updateProjectStats } from '@/lib/projects';
 import { v4 as uuidv4 } from 'uuid';
+import { writeFileDeduped } from '@/lib/blobs';
+import { ManifestItem } from '@/types';
 
 export async function POST(req: NextRequest, { params }: { params: Promise<{ id: string }> }) {
     try {
@@ -39,49 +41,59 @@ export async function POST(req: NextRequest, { params }: { params: Promise<{ id:
             if (item.hash) existingHashes.add(item.hash);
         });
 
-        // Prepare QA Lib (Moved to Background Job)
-        // const { calculatePHash, detectBlur } = await import('@/lib/qa');
+        // Ingest: each upload is decoded once, in a bounded pool, for its hashes,
+        // QA metrics, size and orientation, so QA and later stages don't re-decode it
+        const { ingestImage, HASH_VERSION } = await import('@/lib/ingest');
+        const { defaultConcurrency, mapWithConcurrency } = await import('@/lib/concurrency');
 
-        const results = [];
-        const newManifestItems: any[] = [];
-
-        let nextId = maxGroupId + 1;
-
-        for (const file of files) {
+        const firstId = maxGroupId + 1;
+        const newManifestItems = await mapWithConcurrency(files, defaultConcurrency(), async (file, index) => {
             const arrayBuffer = await file.arrayBuffer();
             const buffer = Buffer.from(arrayBuffer);
 
             // Generate Numeric Filename
             // e.g. 1.png, 2.jpg
+            const groupId = firstId + index;
             const ext = path.extname(file.name);
-            const canonicalName = `${nextId}${ext}`; // Simple N.ext
+            const canonicalName = `${groupId}${ext}`; // Simple N.ext
             const filePath = path.join(rawDir, canonicalName);
 
-            // Write File
-            await fs.writeFile(filePath, buffer);
+            // Undecodable files are still imported; QA analyses them later like before
+            const ingest = await ingestImage(buffer).catch(e => {
+                console.warn(`Ingest failed for ${file.name}, leaving it to QA`, e);
+                return null;
+            });
 
-            const newItem = {
+            // Write File (stored once in the blob store; re-uploads of the same bytes share it)
+            const blob = await writeFileDeduped(projectId, buffer, filePath, ingest?.contentHash);
+
+            return {
                 id: uuidv4(),
                 stage: 'raw',
                 src: `/api/images?path=${encodeURIComponent(filePath)}&t=${Date.now()}`,
                 path: filePath,
                 displayName: canonicalName,
                 originalName: file.name,
-                groupId: nextId,
+                groupId,
                 groupKey: canonicalName,
-                // Flags init
+                ...(blob ? { blob } : {}),
+                ...(ingest ? {
+                    hash: ingest.hash,
+                    hashVersion: HASH_VERSION,
+                    blurScore: ingest.blurScore,
+                    width: ingest.width,
+                    height: ingest.height,
+                    orientation: ingest.orientation,
+                    qa: ingest.qa
+                } : {}),
+                // Flags init (duplicates are grouped by the QA job, across all items)
                 flags: {
                     isDuplicate: false,
-                    isBlurry: false
+                    isBlurry: ingest?.isBlurry ?? false
                 },
                 excluded: false
-            };
-
-            newManifestItems.push(newItem);
-            results.push(newItem);
-
-            nextId++;
-        }
+            } as ManifestItem;
+        });
 
         // Add to Manifest (Using specific helper or manual push since we did manual ID gen)
         // We'll manually push to update maxGroupId correctly? 
@@ -90,7 +102,7 @@ export async function POST(req: NextRequest, { params }: { params: Promise<{ id:
 
         await updateProjectStats(projectId);
 
-        return NextResponse.json({ imported: results.length, items: results });
+        return NextResponse.json({ imported: newManifestItems.length, items: newManifestItems });
     } catch (error) {
         console.error('Import error:', error);
         return NextResponse.json({ error: 'Internal Server Error' }, { status: 500 });
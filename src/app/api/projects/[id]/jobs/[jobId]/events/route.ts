@@ -0,0 +1,21 @@
+import { NextRequest, NextResponse } from 'next/server';
+import path from 'path';
+import { jobEventStream, readJobState } from '@/lib/jobs';
+
+export const dynamic = 'force-dynamic';
+
+// Server-Sent Events: current job state, then each (coalesced) update until the job finishes
+export async function GET(req: NextRequest, { params }: { params: Promise<{ id: string; jobId: string }> }) {
+    const { id, jobId } = await params;
+
+    if (!/^[a-z0-9-]+$/i.test(jobId)) {
+        return NextResponse.json({ error: 'Invalid Job ID' }, { status: 400 });
+    }
+
+    const jobPath = path.join(process.cwd(), 'projects', id, 'jobs', `${jobId}.json`);
+    // Same answer as the JSON route; a stream for a job that doesn't exist would never end
+    if (!(await readJobState(jobPath))) {
+        return NextResponse.json({ error: 'Job not found' }, { status: 404 });
+    }
+    return jobEventStream(jobPath, req.signal);
+}
@@ -1,6 +1,6 @@
 import { NextRequest, NextResponse } from 'next/server';
 import path from 'path';
-import fs from 'fs/promises';
+import { readJobState } from '@/lib/jobs';
 
 export async function GET(req: NextRequest, { params }: { params: Promise<{ id: string; jobId: string }> }) {
     const { id, jobId } = await params;
@@ -14,11 +14,10 @@ export async function GET(req: NextRequest, { params }: { params: Promise<{ id:
     const jobsDir = path.join(projectDir, 'jobs');
     const jobPath = path.join(jobsDir, `${jobId}.json`);
 
-    try {
-        const data = await fs.readFile(jobPath, 'utf-8');
-        const job = JSON.parse(data);
-        return NextResponse.json(job);
-    } catch {
+    // Live state from the job bus if this process is running the job, else the job file
+    const job = await readJobState(jobPath);
+    if (!job) {
         return NextResponse.json({ error: 'Job not found' }, { status: 404 });
     }
+    return NextResponse.json(job);
 }
@@ -15,6 +15,7 @@ export async function POST(req: NextRequest, { params }: { params: Promise<{ id:
 
         const { getManifest, saveManifest } = await import('@/lib/manifest');
         const manifest = await getManifest(projectId);
+        const itemsById = new Map(manifest.items.map(i => [i.id, i]));
 
         // 1. Group by Hash
         const groups = new Map<string, any[]>();
@@ -73,7 +74,7 @@ export async function POST(req: NextRequest, { params }: { params: Promise<{ id:
             }
 
             // Update "Best" flags to remove duplicate flag
-            const manifestItem = manifest.items.find(i => i.id === best.id);
+            const manifestItem = itemsById.get(best.id);
             if (manifestItem && manifestItem.flags) {
                 manifestItem.flags.isDuplicate = false;
             }
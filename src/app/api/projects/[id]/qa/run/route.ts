@@ -3,6 +3,7 @@ import path from 'path';
 import fs from 'fs/promises';
 import { v4 as uuidv4 } from 'uuid';
 import { getProject } from '@/lib/projects';
+import { ManifestItem } from '@/types';
 
 export async function POST(req: NextRequest, { params }: { params: Promise<{ id: string }> }) {
     const { id } = await params;
@@ -15,15 +16,17 @@ export async function POST(req: NextRequest, { params }: { params: Promise<{ id:
         await fs.mkdir(jobsDir, { recursive: true });
 
         // Load dependencies dynamically
-        const { getManifest, saveManifest } = await import('@/lib/manifest');
-        const { calculatePHash, detectBlur } = await import('@/lib/qa');
+        const { queryManifest, updateManifestItems } = await import('@/lib/manifest');
+        const { calculatePHash, detectBlur, runQaMetricsWorker } = await import('@/lib/qa');
+        const { HASH_VERSION } = await import('@/lib/ingest');
+        const { createJobWriter } = await import('@/lib/jobs');
+        const { defaultConcurrency, mapWithConcurrency } = await import('@/lib/concurrency');
 
         // Create Job
         const jobId = uuidv4();
         const jobPath = path.join(jobsDir, `${jobId}.json`);
 
-        const manifest = await getManifest(id);
-        const rawItems = manifest.items.filter(i => i.stage === 'raw');
+        const rawItems = await queryManifest(id, { stage: 'raw' });
 
         const initialJobState = {
             id: jobId,
@@ -33,45 +36,53 @@ export async function POST(req: NextRequest, { params }: { params: Promise<{ id:
             results: { duplicateGroups: [], blurryItems: [] }
         };
 
-        await fs.writeFile(jobPath, JSON.stringify(initialJobState, null, 2));
+        const jobWriter = createJobWriter<object>(jobPath);
+        await jobWriter.flush(initialJobState);
 
         // Start background process
         (async () => {
             console.log(`Starting QA job ${jobId}`);
 
-            // 1. Build Histogram of existing hashes to detect dupes
-            // We need to re-scan EVERYTHING to ensure full duplicate detection
-            // Or just scan items missing flags?
-            // User wants "Import QA job". It implies checking the NEW stuff.
-            // But duplicates check needs context of ALL stuff.
-            // Let's iterate ALL raw items. If item already has hash, skip recalc.
-
-            const hashGroups = new Map<string, string[]>(); // hash -> [itemIds]
-            const blurryList: any[] = [];
+            // 1. Perceptual hashes for duplicate detection.
+            // Duplicates need context of ALL raw items, but hashes are only computed once per item.
+            // Hashes from an older HASH_VERSION are redone so every item compares on the same input.
+            const unhashed = rawItems.filter(i => !i.hash || (i.hashVersion ?? 1) !== HASH_VERSION);
+            let hashed = 0;
+            await mapWithConcurrency(unhashed, defaultConcurrency(), async (item) => {
+                item.hash = await calculatePHash(item.path);
+                hashed++;
+                jobWriter.update({
+                    ...initialJobState,
+                    progress: { processed: hashed, total: unhashed.length, current: `Hashing ${item.displayName}` }
+                });
+            });
+            if (unhashed.length > 0) {
+                await updateManifestItems(id, unhashed.map(i => ({ id: i.id, patch: { hash: i.hash, hashVersion: HASH_VERSION } })));
+            }
 
-            let processed = 0;
+            // 2. Quality metrics (blur, exposure, noise, resolution, aspect).
+            // The Python worker only analyses images it hasn't seen before and writes results back itself.
+            try {
+                await runQaMetricsWorker(projectDir, progress => jobWriter.update({ ...initialJobState, progress }));
+            } catch (e) {
+                console.warn('QA metrics worker failed, falling back to blur detection only', e);
+                const unscored = rawItems.filter(i => i.blurScore === undefined);
+                await mapWithConcurrency(unscored, defaultConcurrency(), async (item) => {
+                    const blur = await detectBlur(item.path);
+                    item.blurScore = blur.score;
+                    item.flags = { ...item.flags, isBlurry: blur.isBlurry };
+                });
+                await updateManifestItems(id, unscored.map(i => ({ id: i.id, patch: { blurScore: i.blurScore, flags: i.flags } })));
+            }
 
-            for (let i = 0; i < rawItems.length; i++) {
-                const item = rawItems[i];
-                let dirty = false;
+            // Reload: the worker updated flags and scores in the store
+            const analysedItems = await queryManifest(id, { stage: 'raw' });
+            const itemsById = new Map(analysedItems.map(i => [i.id, i]));
 
-                // Update Progress
-                const currentState = {
-                    ...initialJobState,
-                    progress: { processed: i + 1, total: rawItems.length, current: `Analyzing ${item.displayName}` }
-                };
-                // Only write occasionally to save IO? Every 5 items or 1s?
-                // For MVP write every item (safer for UI feedback on small batches)
-                if (i % 5 === 0 || i === rawItems.length - 1) {
-                    await fs.writeFile(jobPath, JSON.stringify(currentState, null, 2));
-                }
-
-                // 1. Hash
-                if (!item.hash) {
-                    item.hash = await calculatePHash(item.path);
-                    dirty = true;
-                }
+            const hashGroups = new Map<string, string[]>(); // hash -> [itemIds]
+            const blurryList: any[] = [];
 
+            for (const item of analysedItems) {
                 // Track for duplicate detection
                 if (item.hash) {
                     const group = hashGroups.get(item.hash) || [];
@@ -79,51 +90,40 @@ export async function POST(req: NextRequest, { params }: { params: Promise<{ id:
                     hashGroups.set(item.hash, group);
                 }
 
-                // 2. Blur
-                if (item.blurScore === undefined) {
-                    const blur = await detectBlur(item.path);
-                    item.blurScore = blur.score;
-                    if (!item.flags) item.flags = {};
-                    item.flags.isBlurry = blur.isBlurry;
-                    dirty = true;
-                }
-
                 if (item.flags?.isBlurry) {
                     blurryList.push({ path: item.displayName, blurScore: item.blurScore });
                 }
-
-                processed++;
             }
 
             // 3. Mark Duplicates
             const duplicateGroupsList = [];
+            const duplicatePatches: { id: string; patch: Partial<ManifestItem> }[] = [];
             for (const [hash, ids] of hashGroups.entries()) {
                 if (ids.length > 1) {
-                    // Mark all as potential duplicates?
                     // "Group duplicates... Persist isDuplicateCandidate"
                     ids.forEach(itemId => {
-                        const it = rawItems.find(x => x.id === itemId);
-                        if (it) {
-                            if (!it.flags) it.flags = {};
-                            it.flags.isDuplicate = true;
+                        const it = itemsById.get(itemId);
+                        if (it && !it.flags?.isDuplicate) {
+                            duplicatePatches.push({ id: itemId, patch: { flags: { ...it.flags, isDuplicate: true } } });
                         }
                     });
 
                     duplicateGroupsList.push({
                         hash,
-                        items: ids.map(id => rawItems.find(x => x.id === id)?.displayName)
+                        items: ids.map(id => itemsById.get(id)?.displayName)
                     });
                 } else {
                     // If unique, ensure flag is false
-                    const it = rawItems.find(x => x.id === ids[0]);
+                    const it = itemsById.get(ids[0]);
                     if (it && it.flags?.isDuplicate) {
-                        it.flags.isDuplicate = false; // Resolved?
+                        duplicatePatches.push({ id: it.id, patch: { flags: { ...it.flags, isDuplicate: false } } });
                     }
                 }
             }
 
-            // Save Manifest updates
-            await saveManifest(id, manifest);
+            // Save Manifest updates: only the flags of items that changed,
+            // so edits made elsewhere while the job ran are kept
+            await updateManifestItems(id, duplicatePatches);
 
             // Final Job State
             const finalState = {
@@ -136,7 +136,7 @@ export async function POST(req: NextRequest, { params }: { params: Promise<{ id:
                     blurryItems: blurryList
                 }
             };
-            await fs.writeFile(jobPath, JSON.stringify(finalState, null, 2));
+            await jobWriter.flush(finalState);
             console.log(`QA Job ${jobId} finished`);
 
         })().catch(err => {
@@ -146,7 +146,7 @@ export async function POST(req: NextRequest, { params }: { params: Promise<{ id:
                 status: 'error',
                 error: err.toString()
             };
-            fs.writeFile(jobPath, JSON.stringify(errorState, null, 2));
+            jobWriter.flush(errorState);
         });
 
         return NextResponse.json({ jobId });
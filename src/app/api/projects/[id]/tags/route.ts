@@ -0,0 +1,39 @@
+import { NextRequest, NextResponse } from 'next/server';
+import { getProject } from '@/lib/projects';
+import { cooccurringTags, ensureTagIndex, listTags, rebuildTagIndex } from '@/lib/tag-index';
+
+// Tag counts from the tag index. ?prefix= for autocomplete, ?with=<tag> for co-occurring tags
+export async function GET(req: NextRequest, { params }: { params: Promise<{ id: string }> }) {
+    try {
+        const { id } = await params;
+        const { searchParams } = new URL(req.url);
+        const limit = Math.min(parseInt(searchParams.get('limit') || '100') || 100, 1000);
+
+        await ensureTagIndex(id);
+        const withTag = searchParams.get('with');
+        if (withTag) {
+            return NextResponse.json({ tag: withTag, tags: cooccurringTags(id, withTag, limit) });
+        }
+        return NextResponse.json({ tags: listTags(id, searchParams.get('prefix') || '', limit) });
+    } catch (error) {
+        console.error('Failed to list tags:', error);
+        return NextResponse.json({ error: 'Failed to list tags' }, { status: 500 });
+    }
+}
+
+// Rebuilds the index from the captions (e.g. after editing .txt files outside the app)
+export async function POST(req: NextRequest, { params }: { params: Promise<{ id: string }> }) {
+    try {
+        const { id } = await params;
+        const project = await getProject(id);
+        if (!project) {
+            return NextResponse.json({ error: 'Project not found' }, { status: 404 });
+        }
+
+        const indexed = await rebuildTagIndex(id);
+        return NextResponse.json({ indexed });
+    } catch (error) {
+        console.error('Failed to rebuild tag index:', error);
+        return NextResponse.json({ error: 'Failed to rebuild tag index' }, { status: 500 });
+    }
+}
@@ -0,0 +1,25 @@
+import { NextRequest, NextResponse } from 'next/server';
+import { ensureTagIndex, queryTagIndex, TagQueryError } from '@/lib/tag-index';
+
+// ?q=1girl long_hair -hat OR hair_* ... (see lib/tag-index.ts); limit=0 returns every match
+export async function GET(req: NextRequest, { params }: { params: Promise<{ id: string }> }) {
+    try {
+        const { id } = await params;
+        const { searchParams } = new URL(req.url);
+        const q = (searchParams.get('q') || '').trim();
+        if (!q) {
+            return NextResponse.json({ error: 'q is required' }, { status: 400 });
+        }
+        const limit = Math.max(0, parseInt(searchParams.get('limit') || '100') || 0);
+        const offset = Math.max(0, parseInt(searchParams.get('offset') || '0') || 0);
+
+        await ensureTagIndex(id);
+        return NextResponse.json(queryTagIndex(id, q, limit, offset));
+    } catch (error) {
+        if (error instanceof TagQueryError) {
+            return NextResponse.json({ error: error.message }, { status: 400 });
+        }
+        console.error('Tag search failed:', error);
+        return NextResponse.json({ error: 'Tag search failed' }, { status: 500 });
+    }
+}
@@ -1,8 +1,6 @@
 import { NextRequest, NextResponse } from 'next/server';
 import path from 'path';
-import fs from 'fs/promises';
-import sharp from 'sharp';
-import mime from 'mime';
+import { serveThumbnail, parseThumbSize, DEFAULT_THUMB_SIZE } from '@/lib/thumbnails';
 
 export async function GET(
     req: NextRequest,
@@ -27,29 +25,9 @@ export async function GET(
         }
 
         try {
-            await fs.access(filePath);
-            const stats = await fs.stat(filePath);
-
-            if (!stats.isFile()) {
-                return new NextResponse('Not a file', { status: 400 });
-            }
-
-            // Resize on the fly
-            const fileBuffer = await fs.readFile(filePath);
-            const resizedBuffer = await sharp(fileBuffer)
-                .resize({ width: 512, height: 512, fit: 'inside', withoutEnlargement: true })
-                .jpeg({ quality: 80 }) // Convert to JPEG for efficiency? Or keep original? Let's use jpeg for thumbs.
-                .toBuffer();
-
-            return new NextResponse(resizedBuffer as any, {
-                headers: {
-                    'Content-Type': 'image/jpeg',
-                    'Cache-Control': 'private, no-cache, no-store, must-revalidate',
-                    'Pragma': 'no-cache',
-                    'Expires': '0'
-                }
-            });
-
+            // Served from the on-disk thumbnail cache; 304 when the client copy is current
+            const thumbSize = parseThumbSize(req.nextUrl.searchParams.get('size')) || DEFAULT_THUMB_SIZE;
+            return await serveThumbnail(req, id, filePath, thumbSize);
         } catch (err) {
             console.error(err);
             return new NextResponse('File not found', { status: 404 });
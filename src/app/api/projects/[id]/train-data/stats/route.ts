@@ -1,6 +1,7 @@
 import { NextRequest, NextResponse } from 'next/server';
 import fs from 'fs/promises';
 import path from 'path';
+import { readCaptions } from '@/lib/captions';
 
 interface TrainDataStats {
     trainData: {
@@ -40,10 +41,11 @@ export async function GET(
 
         // Count images and captions
         const imageFiles = files.filter(f => /\.(jpg|jpeg|png|webp)$/i.test(f));
-        const captionFiles = files.filter(f => f.endsWith('.txt'));
+        // Caption store or .txt sidecars, keyed by image
+        const captions = await readCaptions(id, '10_class');
 
         const imagesCount = imageFiles.length;
-        const captionsCount = captionFiles.length;
+        const captionsCount = captions.size;
         const totalFiles = imagesCount + captionsCount;
 
         // Parse tags from caption files
@@ -51,10 +53,9 @@ export async function GET(
         const samples: string[] = [];
         let isSentenceMode = false;
 
-        for (const captionFile of captionFiles) {
+        for (const [imageFile, caption] of captions) {
             try {
-                const captionPath = path.join(trainDataDir, captionFile);
-                const content = await fs.readFile(captionPath, 'utf-8');
+                const content = caption.text;
 
                 if (!content.trim()) continue;
 
@@ -80,7 +81,7 @@ export async function GET(
                     });
                 }
             } catch (err) {
-                console.error(`Failed to read caption ${captionFile}:`, err);
+                console.error(`Failed to parse caption for ${imageFile}:`, err);
                 continue;
             }
         }
@@ -0,0 +1,39 @@
+import { NextRequest, NextResponse } from 'next/server';
+import path from 'path';
+import fs from 'fs/promises';
+import { runPythonScript } from '@/lib/python';
+
+export const dynamic = 'force-dynamic';
+
+// Rank/alpha/coverage, weight norms and epoch-to-epoch deltas for the LoRA files in
+// train_outputs (scripts/lora_inspect.py). Results are cached per file in
+// .cache/lora_inspect.db, so only new checkpoints are read.
+export async function GET(
+    request: NextRequest,
+    { params }: { params: Promise<{ id: string }> }
+) {
+    try {
+        const { id } = await params;
+        const projectDir = path.join(process.cwd(), 'projects', id);
+        const outputsDir = path.join(projectDir, 'train_outputs');
+
+        try {
+            await fs.access(outputsDir);
+        } catch {
+            return NextResponse.json({ files: [], deltas: [], errors: [] });
+        }
+
+        const output = await runPythonScript('lora_inspect.py', [
+            '--outputs_dir', outputsDir,
+            '--cache', path.join(projectDir, '.cache', 'lora_inspect.db')
+        ]);
+        const resultLine = output.trim().split('\n').filter(l => !l.startsWith('PROGRESS:')).pop();
+        return NextResponse.json(JSON.parse(resultLine || '{}'));
+    } catch (error: any) {
+        console.error('Failed to inspect outputs:', error);
+        return NextResponse.json(
+            { error: error.message || 'Failed to inspect output files' },
+            { status: 500 }
+        );
+    }
+}
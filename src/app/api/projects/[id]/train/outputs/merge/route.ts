@@ -0,0 +1,93 @@
+import { NextRequest, NextResponse } from 'next/server';
+import path from 'path';
+import fs from 'fs/promises';
+import { runPythonScript } from '@/lib/python';
+
+export const dynamic = 'force-dynamic';
+
+const MODES = ['average', 'ema', 'svd'];
+const DTYPES = ['fp16', 'bf16', 'fp32'];
+
+// Output name: the given one, or <run>-<mode> from the first input (kohya's -000005 epoch suffix dropped)
+function outputStem(name: unknown, firstFile: string, mode: string) {
+    const given = typeof name === 'string' ? path.basename(name.trim()).replace(/\.safetensors$/i, '') : '';
+    const stem = given || `${path.basename(firstFile, '.safetensors').replace(/[-_]\d+$/, '')}-${mode}`;
+    return stem.replace(/[^\w.-]+/g, '_');
+}
+
+// POST { files, mode, weights?, emaDecay?, rank?, dtype?, name? }: averages or merges LoRA
+// outputs with scripts/lora_merge.py and writes the result into train_outputs, where it
+// is listed, inspected and downloaded like any trained file.
+export async function POST(
+    request: NextRequest,
+    { params }: { params: Promise<{ id: string }> }
+) {
+    try {
+        const { id } = await params;
+        const body = await request.json();
+        const outputsDir = path.resolve(process.cwd(), 'projects', id, 'train_outputs');
+
+        const mode = body.mode || 'average';
+        if (!MODES.includes(mode)) {
+            return NextResponse.json({ error: `Unknown mode: ${mode}` }, { status: 400 });
+        }
+        if (body.dtype && !DTYPES.includes(body.dtype)) {
+            return NextResponse.json({ error: `Unknown dtype: ${body.dtype}` }, { status: 400 });
+        }
+
+        const files: string[] = Array.isArray(body.files) ? body.files : [];
+        // svd can re-rank a single file; averaging needs two
+        if (mode === 'svd' ? files.length < 1 : files.length < 2) {
+            return NextResponse.json({ error: mode === 'svd' ? 'Select a file to merge' : 'Select at least two files to average' }, { status: 400 });
+        }
+        const inputs: string[] = [];
+        for (const file of files) {
+            const resolved = path.resolve(outputsDir, String(file));
+            if (path.dirname(resolved) !== outputsDir || !resolved.toLowerCase().endsWith('.safetensors')) {
+                return NextResponse.json({ error: `Invalid file: ${file}` }, { status: 403 });
+            }
+            try {
+                await fs.access(resolved);
+            } catch {
+                return NextResponse.json({ error: `File not found: ${file}` }, { status: 404 });
+            }
+            inputs.push(resolved);
+        }
+
+        const weights: number[] | undefined = body.weights;
+        if (weights && (!Array.isArray(weights) || weights.length !== inputs.length || weights.some(w => !Number.isFinite(w)))) {
+            return NextResponse.json({ error: 'Weights must be one number per file' }, { status: 400 });
+        }
+
+        // Never overwrite: -2, -3... if the name is taken
+        const stem = outputStem(body.name, files[0], mode);
+        let output = path.join(outputsDir, `${stem}.safetensors`);
+        for (let n = 2; await fs.access(output).then(() => true, () => false); n++) {
+            output = path.join(outputsDir, `${stem}-${n}.safetensors`);
+        }
+
+        const args = ['--files', ...inputs, '--output', output, '--mode', mode];
+        if (weights && mode !== 'ema') args.push('--weights', ...weights.map(String));
+        if (mode === 'ema' && body.emaDecay !== undefined) args.push('--ema_decay', String(body.emaDecay));
+        if (mode === 'svd' && body.rank) args.push('--rank', String(parseInt(body.rank)));
+        if (body.dtype) args.push('--dtype', body.dtype);
+
+        const result = await runPythonScript('lora_merge.py', args);
+        const resultLine = result.trim().split('\n').filter(l => !l.startsWith('PROGRESS:')).pop();
+        const merged = JSON.parse(resultLine || '{}');
+        // The absolute path stays server-side; clients address outputs by name
+        delete merged.output;
+
+        return NextResponse.json({ success: true, file: merged });
+    } catch (error: any) {
+        // Inputs that can't be merged together (alpha/shape mismatch, bad weights...)
+        if (String(error?.message).includes('Cannot merge:')) {
+            return NextResponse.json({ error: error.message.slice(error.message.indexOf('Cannot merge:')).trim() }, { status: 400 });
+        }
+        console.error('Failed to merge outputs:', error);
+        return NextResponse.json(
+            { error: error.message || 'Failed to merge output files' },
+            { status: 500 }
+        );
+    }
+}
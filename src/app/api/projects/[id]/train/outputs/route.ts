@@ -38,8 +38,9 @@ export async function GET(
             return NextResponse.json({ count: validFiles.length });
         }
 
+        // Dotfiles include in-progress writes (e.g. .<name>.safetensors.tmp from a merge)
         const fileStats = await Promise.all(
-            files.map(async (file) => {
+            files.filter(f => !f.startsWith('.')).map(async (file) => {
                 const filePath = path.join(outputsDir, file);
                 try {
                     const stats = await fs.stat(filePath);
@@ -0,0 +1,28 @@
+import { NextRequest, NextResponse } from 'next/server';
+import { trainingManager } from '@/lib/training';
+import { DEFAULT_MAX_POINTS, listRuns } from '@/lib/telemetry';
+
+// GET ?runId=&maxPoints=&sinceStep=  -> downsampled step/loss/lr/it-per-sec series
+// GET ?list=true                     -> recorded runs, newest first
+export async function GET(
+    req: NextRequest,
+    { params }: { params: Promise<{ id: string }> }
+) {
+    const { id } = await params;
+    const { searchParams } = new URL(req.url);
+
+    if (searchParams.get('list') === 'true') {
+        return NextResponse.json({ runs: await listRuns(id) });
+    }
+
+    const runId = searchParams.get('runId') || undefined;
+    const maxPoints = Math.min(parseInt(searchParams.get('maxPoints') || '') || DEFAULT_MAX_POINTS, 5000);
+    const sinceParam = searchParams.get('sinceStep');
+    const sinceStep = sinceParam !== null && !isNaN(Number(sinceParam)) ? Number(sinceParam) : undefined;
+
+    const result = await trainingManager.getTelemetry(id, runId, maxPoints, sinceStep);
+    if (!result) {
+        return NextResponse.json({ error: 'No telemetry found' }, { status: 404 });
+    }
+    return NextResponse.json(result);
+}
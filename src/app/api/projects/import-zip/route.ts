@@ -1,21 +1,66 @@
 import { NextRequest, NextResponse } from 'next/server';
-import { importProjectZip } from '@/lib/projects';
+import os from 'os';
+import path from 'path';
+import fs from 'fs/promises';
+import { createWriteStream } from 'fs';
+import { Readable } from 'stream';
+import { pipeline } from 'stream/promises';
+import { v4 as uuidv4 } from 'uuid';
+import { importProjectZipFile } from '@/lib/projects';
 
+// The archive is the raw request body (application/zip), streamed to a temp file and
+// imported from disk. Multipart uploads are refused: parsing them would buffer the
+// whole archive in memory. The response
+// is newline-delimited JSON: {"progress": ...} lines, then {"project": ...} or {"error": ...}.
 export async function POST(req: NextRequest) {
-    try {
-        const formData = await req.formData();
-        const file = formData.get('file') as File;
+    const zipPath = path.join(os.tmpdir(), `project-import-${uuidv4()}.zip`);
+
+    if ((req.headers.get('content-type') || '').startsWith('multipart/form-data')) {
+        return NextResponse.json({ error: 'Send the archive as the request body (application/zip), not as a form upload' }, { status: 415 });
+    }
 
-        if (!file) {
+    try {
+        const body = req.body;
+        if (!body) {
             return NextResponse.json({ error: 'No file uploaded' }, { status: 400 });
         }
-
-        const buffer = Buffer.from(await file.arrayBuffer());
-        const project = await importProjectZip(buffer);
-
-        return NextResponse.json(project);
+        await pipeline(Readable.fromWeb(body as any), createWriteStream(zipPath));
     } catch (error) {
-        console.error('Import zip error:', error);
-        return NextResponse.json({ error: error instanceof Error ? error.message : 'Import failed' }, { status: 500 });
+        await fs.rm(zipPath, { force: true });
+        console.error('Import zip upload error:', error);
+        return NextResponse.json({ error: 'Upload failed' }, { status: 500 });
     }
+
+    const encoder = new TextEncoder();
+    const stream = new ReadableStream({
+        async start(controller) {
+            const send = (msg: object) => controller.enqueue(encoder.encode(JSON.stringify(msg) + '\n'));
+            let lastSent = 0;
+
+            try {
+                const project = await importProjectZipFile(zipPath, progress => {
+                    // Throttle: large backups have tens of thousands of entries
+                    const now = Date.now();
+                    if (now - lastSent < 200 && progress.processed < progress.total) return;
+                    lastSent = now;
+                    send({ progress });
+                });
+                send({ project });
+            } catch (error) {
+                console.error('Import zip error:', error);
+                send({ error: error instanceof Error ? error.message : 'Import failed' });
+            } finally {
+                await fs.rm(zipPath, { force: true });
+                controller.close();
+            }
+        }
+    });
+
+    return new Response(stream, {
+        headers: {
+            'Content-Type': 'application/x-ndjson; charset=utf-8',
+            'Cache-Control': 'no-cache',
+            'X-Content-Type-Options': 'nosniff',
+        },
+    });
 }
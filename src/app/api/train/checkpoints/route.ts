@@ -0,0 +1,35 @@
+import { NextRequest, NextResponse } from 'next/server';
+import {
+    DEFAULT_CHECKPOINTS_DIR,
+    listCheckpoints,
+    refreshCheckpointIndex,
+    refreshCheckpointIndexInBackground
+} from '@/lib/checkpoints';
+
+export const dynamic = 'force-dynamic';
+
+// GET ?dir=<models dir>: the indexed checkpoints right away (stale-while-revalidate);
+// a background refresh picks up new or changed files for the next request.
+export async function GET(req: NextRequest) {
+    const dir = req.nextUrl.searchParams.get('dir') || DEFAULT_CHECKPOINTS_DIR;
+    try {
+        const refreshing = refreshCheckpointIndexInBackground(dir);
+        return NextResponse.json({ dir, refreshing, checkpoints: listCheckpoints(dir) });
+    } catch (error: any) {
+        console.error('Checkpoint list error:', error);
+        return NextResponse.json({ error: error.message || 'Failed to list checkpoints' }, { status: 500 });
+    }
+}
+
+// POST { dir?, hashes? }: refresh now and return the updated list
+export async function POST(req: NextRequest) {
+    try {
+        const body = await req.json().catch(() => ({}));
+        const dir = body.dir || DEFAULT_CHECKPOINTS_DIR;
+        const summary = await refreshCheckpointIndex(dir, { hashes: body.hashes !== false });
+        return NextResponse.json({ dir, summary, checkpoints: listCheckpoints(dir) });
+    } catch (error: any) {
+        console.error('Checkpoint index error:', error);
+        return NextResponse.json({ error: error.message || 'Failed to index checkpoints' }, { status: 500 });
+    }
+}
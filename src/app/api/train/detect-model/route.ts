@@ -1,6 +1,7 @@
 import { NextRequest, NextResponse } from 'next/server';
 import { spawn } from 'child_process';
 import path from 'path';
+import { lookupCheckpoint, refreshCheckpointIndexInBackground, trainerScriptFor } from '@/lib/checkpoints';
 
 export async function POST(req: NextRequest) {
     try {
@@ -14,9 +15,18 @@ export async function POST(req: NextRequest) {
             );
         }
 
+        const repoPath = path.join(process.cwd(), 'train_script', 'sd-scripts'); // Hardcoded default for now based on context, or configurable
+
+        // Indexed checkpoints (same size+mtime) are answered without spawning Python
+        const indexed = await lookupCheckpoint(checkpointPath);
+        if (indexed?.family) {
+            return NextResponse.json(trainerScriptFor(indexed.family, repoPath));
+        }
+        // Index the rest of that folder too, so the next pick from it is instant
+        refreshCheckpointIndexInBackground(path.dirname(checkpointPath), { hashes: false });
+
         // Path to the python script
         const scriptPath = path.join(process.cwd(), 'scripts', 'detect_model.py');
-        const repoPath = path.join(process.cwd(), 'train_script', 'sd-scripts'); // Hardcoded default for now based on context, or configurable
 
         // Use python from environment or specific path if needed. 
         // Assuming 'python' is available in PATH for now as per other scripts in this project likely do.
@@ -88,6 +88,8 @@ async function downloadModel(job_id: string, repo_id: string) {
             // If Python script fails, try fallback to git clone
             console.warn(`[WD Models] [${job_id}] Python download failed, falling back to git clone:`, error.message);
             await downloadWithGit(job_id, repo_id, modelPath);
+            // The Python path registers checksums itself; do it here for the clone
+            await registerModel(job_id, repo_id, modelPath);
         }
 
         // Download successful
@@ -190,6 +192,32 @@ async function downloadWithPythonScript(
     });
 }
 
+// Records file sizes/checksums in models/wd-tagger/registry.json so taggers resolve the model offline.
+// A failure here isn't fatal: taggers fall back to the hub for unregistered models.
+async function registerModel(job_id: string, repo_id: string, modelPath: string) {
+    const scriptPath = path.join(process.cwd(), 'scripts', 'model_registry.py');
+    const pythonCmd = process.platform === 'win32' ? 'python' : 'python3';
+
+    installJobs.set(job_id, {
+        ...installJobs.get(job_id),
+        current_file: 'Verifying files...'
+    });
+
+    await new Promise<void>((resolve) => {
+        const proc = spawn(pythonCmd, [scriptPath, 'register', repo_id, modelPath]);
+        let stderr = '';
+        proc.stderr.on('data', (data) => stderr += data.toString());
+        proc.on('close', (code) => {
+            if (code !== 0) console.warn(`[WD Models] [${job_id}] Registering ${repo_id} failed:`, stderr);
+            resolve();
+        });
+        proc.on('error', (err) => {
+            console.warn(`[WD Models] [${job_id}] Registering ${repo_id} failed:`, err.message);
+            resolve();
+        });
+    });
+}
+
 async function downloadWithGit(job_id: string, repo_id: string, modelPath: string) {
     return new Promise<void>((resolve, reject) => {
         const repoUrl = `https://huggingface.co/${repo_id}`;
@@ -5,6 +5,7 @@ import { Button, Card, Switch } from '@/components/ui/core';
 import { Label } from '@/components/ui/label';
 import { Loader2, Wand2, RefreshCcw, Image as ImageIcon } from 'lucide-react';
 import { useRouter } from 'next/navigation';
+import { followJob } from '@/lib/job-events';
 
 export default function AugmentationPage({ params }: { params: Promise<{ id: string }> }) {
     const { id } = use(params);
@@ -15,6 +16,9 @@ export default function AugmentationPage({ params }: { params: Promise<{ id: str
         rotationRandom: false,
         rotationRange: [-35, 35] as [number, number],
         flipEnabled: false,
+        variantsPerImage: 1,
+        colorJitter: false,
+        randomCrop: false,
         // Legacy support if needed, or remove
         zoom: 1
     });
@@ -148,30 +152,26 @@ export default function AugmentationPage({ params }: { params: Promise<{ id: str
         }
     };
 
-    // Poll Job
+    // Follow Job (server-sent events, polling fallback)
     useEffect(() => {
         if (!jobId || jobStatus === 'completed') return;
 
-        const interval = setInterval(async () => {
-            try {
-                const res = await fetch(`/api/projects/${projectId}/jobs/${jobId}`);
-                if (res.ok) {
-                    const job = await res.json();
-                    setProgress(job.progress);
-                    setResults(job.results || []);
-                    if (job.status === 'completed') {
-                        setJobStatus('completed');
-                        await fetchManifest(); // Reload full manifest
-                        setResults([]); // Clear ephemeral
-                        router.refresh(); // Update sidebar counts
-                    }
+        return followJob({
+            eventsUrl: `/api/projects/${projectId}/jobs/${jobId}/events`,
+            pollUrl: `/api/projects/${projectId}/jobs/${jobId}`,
+            onState: async (job) => {
+                if (job.progress) setProgress(job.progress);
+                setResults(job.results || []);
+                if (job.status === 'completed') {
+                    setJobStatus('completed');
+                    await fetchManifest(); // Reload full manifest
+                    setResults([]); // Clear ephemeral
+                    router.refresh(); // Update sidebar counts
+                } else if (job.status === 'error') {
+                    setJobStatus('idle');
                 }
-            } catch (e) {
-                console.error('Poll error', e);
             }
-        }, 1000);
-
-        return () => clearInterval(interval);
+        });
     }, [jobId, jobStatus, projectId, router]);
 
     // Combine Input Sources + Manifest (augmented) + Ephemeral Results for View
@@ -308,6 +308,40 @@ export default function AugmentationPage({ params }: { params: Promise<{ id: str
                                 onCheckedChange={(c) => setSettings({ ...settings, flipEnabled: c })}
                             />
                         </div>
+
+                        {/* Colour Jitter */}
+                        <div className="flex items-center justify-between pt-4 border-t">
+                            <Label className="text-base">Color Jitter</Label>
+                            <Switch
+                                checked={settings.colorJitter}
+                                onCheckedChange={(c) => setSettings({ ...settings, colorJitter: c })}
+                            />
+                        </div>
+
+                        {/* Random Resized Crop */}
+                        <div className="flex items-center justify-between pt-4 border-t">
+                            <Label className="text-base">Random Crop</Label>
+                            <Switch
+                                checked={settings.randomCrop}
+                                onCheckedChange={(c) => setSettings({ ...settings, randomCrop: c })}
+                            />
+                        </div>
+
+                        {/* Variants per image */}
+                        <div className="space-y-2 pt-4 border-t">
+                            <Label className="text-base">Variants per Image</Label>
+                            <input
+                                type="number"
+                                min={1}
+                                max={16}
+                                value={settings.variantsPerImage}
+                                onChange={(e) => setSettings({
+                                    ...settings,
+                                    variantsPerImage: Math.min(16, Math.max(1, parseInt(e.target.value) || 1))
+                                })}
+                                className="w-full text-sm p-2 bg-secondary rounded-md"
+                            />
+                        </div>
                     </div>
 
                     <div className="pt-6 border-t mt-6">
@@ -18,6 +18,7 @@ import { AutoTagProgress } from '@/components/caption/auto-tag-progress';
 import { WDModel, ModelInfo, CaptionImage } from '@/types/wd-models';
 import { CaptionConfig, DEFAULT_CAPTION_CONFIG } from '@/types/caption';
 import { WD_MODELS } from '@/lib/wd-models';
+import { followJob } from '@/lib/job-events';
 
 export default function CaptionClient({ params }: { params: Promise<{ id: string }> }) {
     const { id } = use(params);
@@ -46,7 +47,9 @@ export default function CaptionClient({ params }: { params: Promise<{ id: string
     const [isAutoTagging, setIsAutoTagging] = useState(false);
     const [autoTagProgress, setAutoTagProgress] = useState({ current: 0, total: 0, filename: '' });
 
-    const pollingRef = useRef<NodeJS.Timeout | null>(null);
+    // Unsubscribes from the caption job stream
+    const followRef = useRef<(() => void) | null>(null);
+    const lastImagesRefresh = useRef(0);
 
     // Load initial data
     useEffect(() => {
@@ -62,7 +65,7 @@ export default function CaptionClient({ params }: { params: Promise<{ id: string
         checkAutoTagStatus();
 
         return () => {
-            if (pollingRef.current) clearInterval(pollingRef.current);
+            stopPolling();
         };
     }, [id]);
 
@@ -160,20 +163,24 @@ export default function CaptionClient({ params }: { params: Promise<{ id: string
     };
 
     const startPolling = () => {
-        if (pollingRef.current) return;
-        pollingRef.current = setInterval(async () => {
-            const res = await fetch(`/api/projects/${id}/caption`);
-            if (res.ok) {
-                const data = await res.json();
+        if (followRef.current) return;
+        followRef.current = followJob({
+            eventsUrl: `/api/projects/${id}/caption/events`,
+            pollUrl: `/api/projects/${id}/caption`,
+            onState: (data) => {
                 setAutoTagProgress({
                     current: data.progress || 0,
                     total: data.total || 0,
                     filename: data.current_file || ''
                 });
 
-                // Live update of tags (refresh images)
+                // Live update of tags (refresh images), throttled since events arrive per image
                 // This ensures "Missing -> Tagged" status updates in real-time
-                loadImages();
+                const now = Date.now();
+                if (now - lastImagesRefresh.current >= 1000) {
+                    lastImagesRefresh.current = now;
+                    loadImages();
+                }
 
                 if (data.status === 'completed' || data.status === 'error') {
                     stopPolling();
@@ -186,13 +193,13 @@ export default function CaptionClient({ params }: { params: Promise<{ id: string
                     }
                 }
             }
-        }, 1000);
+        });
     };
 
     const stopPolling = () => {
-        if (pollingRef.current) {
-            clearInterval(pollingRef.current);
-            pollingRef.current = null;
+        if (followRef.current) {
+            followRef.current();
+            followRef.current = null;
         }
     };
 
@@ -451,6 +458,7 @@ export default function CaptionClient({ params }: { params: Promise<{ id: string
                 {/* Left: Image Browser */}
                 <Card className="p-4 lg:col-span-1 h-[600px]">
                     <ImageBrowserPanel
+                        projectId={id}
                         images={images}
                         selectedId={selectedImageId}
                         onSelect={setSelectedImageId}
@@ -462,6 +470,7 @@ export default function CaptionClient({ params }: { params: Promise<{ id: string
                 {/* Right: Tag Editor */}
                 <Card className="p-4 lg:col-span-2 h-[600px] overflow-auto">
                     <TagEditorPanel
+                        projectId={id}
                         image={selectedImage}
                         onSave={handleSaveTags}
                         onRegenerate={handleRegenerateTags}
@@ -5,6 +5,7 @@ import { Button, Card, Input } from '@/components/ui/core';
 import { Label } from '@/components/ui/label';
 import { Loader2, Scaling, Play, CheckCircle } from 'lucide-react';
 import { useRouter } from 'next/navigation';
+import { followJob } from '@/lib/job-events';
 
 export default function ProcessPage({ params }: { params: Promise<{ id: string }> }) {
     const { id } = use(params);
@@ -65,29 +66,25 @@ export default function ProcessPage({ params }: { params: Promise<{ id: string }
         }
     };
 
-    // Poll Job
+    // Follow Job (server-sent events, polling fallback)
     useEffect(() => {
         if (!jobId || jobStatus === 'completed') return;
 
-        const interval = setInterval(async () => {
-            try {
-                const res = await fetch(`/api/projects/${projectId}/jobs/${jobId}`);
-                if (res.ok) {
-                    const job = await res.json();
-                    setProgress(job.progress);
-                    setItemStates(job.results || {});
-
-                    if (job.status === 'completed') {
-                        setJobStatus('completed');
-                        router.refresh();
-                    }
+        return followJob({
+            eventsUrl: `/api/projects/${projectId}/jobs/${jobId}/events`,
+            pollUrl: `/api/projects/${projectId}/jobs/${jobId}`,
+            onState: (job) => {
+                if (job.progress) setProgress(job.progress);
+                setItemStates(job.results || {});
+
+                if (job.status === 'completed') {
+                    setJobStatus('completed');
+                    router.refresh();
+                } else if (job.status === 'error') {
+                    setJobStatus('idle');
                 }
-            } catch (e) {
-                console.error('Poll error', e);
             }
-        }, 1000);
-
-        return () => clearInterval(interval);
+        });
     }, [jobId, jobStatus, projectId, router]);
 
     return (
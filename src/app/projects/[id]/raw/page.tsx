@@ -2,9 +2,10 @@
 
 import { UploadZone } from '@/components/upload-zone';
 import { Card, Button } from '@/components/ui/core';
-import { useState, useEffect, use, useRef } from 'react';
+import { useState, useEffect, use } from 'react';
 import { AlertTriangle, Eye, EyeOff, Layers, Zap, Play, RotateCw } from 'lucide-react';
 import { useRouter } from 'next/navigation';
+import { followJob } from '@/lib/job-events';
 import { DuplicateManager } from '@/components/qa/duplicate-manager';
 import { BlurryManager } from '@/components/qa/blurry-manager';
 import { useTranslation } from 'react-i18next';
@@ -21,42 +22,32 @@ export default function ImportPage({ params }: { params: Promise<{ id: string }>
     const [qaProgress, setQaProgress] = useState<string>('');
     const [qaJobId, setQaJobId] = useState<string | null>(null);
 
-    const pollInterval = useRef<NodeJS.Timeout>(null);
-
     useEffect(() => {
         fetchManifest();
         // eslint-disable-next-line react-hooks/exhaustive-deps
     }, [projectId]);
 
-    // Poll for QA job status if we have an ID
+    // Follow the QA job if we have an ID (server-sent events, polling fallback)
     useEffect(() => {
-        if (qaJobId) {
-            const check = async () => {
-                try {
-                    const res = await fetch(`/api/projects/${projectId}/jobs/${qaJobId}`);
-                    if (res.ok) {
-                        const job = await res.json();
-                        if (job.status === 'running') {
-                            setIsQAJobRunning(true);
-                            setQaProgress(`${job.progress.current} (${job.progress.processed}/${job.progress.total})`);
-                        } else {
-                            // Done or Error
-                            setIsQAJobRunning(false);
-                            setQaProgress('');
-                            setQaJobId(null);
-                            fetchManifest(); // Refresh results
-                        }
-                    }
-                } catch {
-                    // ignore
-                }
-            };
-            pollInterval.current = setInterval(check, 1000);
-        }
+        if (!qaJobId) return;
 
-        return () => {
-            if (pollInterval.current) clearInterval(pollInterval.current as any);
-        }
+        return followJob({
+            eventsUrl: `/api/projects/${projectId}/jobs/${qaJobId}/events`,
+            pollUrl: `/api/projects/${projectId}/jobs/${qaJobId}`,
+            onState: (job) => {
+                if (job.status === 'running') {
+                    setIsQAJobRunning(true);
+                    setQaProgress(`${job.progress.current} (${job.progress.processed}/${job.progress.total})`);
+                } else {
+                    // Done or Error
+                    setIsQAJobRunning(false);
+                    setQaProgress('');
+                    setQaJobId(null);
+                    fetchManifest(); // Refresh results
+                }
+            }
+        });
+        // eslint-disable-next-line react-hooks/exhaustive-deps
     }, [qaJobId]);
 
 
@@ -8,6 +8,8 @@ import { Badge } from '@/components/ui/badge';
 import { X, RefreshCcw, HelpCircle } from 'lucide-react';
 import { useTranslation } from 'react-i18next';
 import { CaptionConfig, DEFAULT_CAPTION_CONFIG } from '@/types/caption';
+import { WDModel } from '@/types/wd-models';
+import { WD_MODELS } from '@/lib/wd-models';
 
 import { Tooltip, TooltipContent, TooltipProvider, TooltipTrigger } from '@/components/ui/tooltip';
 
@@ -53,6 +55,16 @@ export function CaptionSettingsModal({ open, onOpenChange, config, onSave }: Pro
         }));
     };
 
+    // Ensemble: extra models tagged in the same pass as the selected one
+    const ensembleModels = (localConfig.ensembleModels || []).filter(m => m !== localConfig.wdModel);
+
+    const toggleEnsembleModel = (key: WDModel) => {
+        const next = ensembleModels.includes(key)
+            ? ensembleModels.filter(m => m !== key)
+            : [...ensembleModels, key];
+        setLocalConfig(prev => ({ ...prev, ensembleModels: next }));
+    };
+
     // Exclude Tags Logic
     const excludeTagsList = localConfig.advanced.excludeTags
         ? localConfig.advanced.excludeTags.split(',').map(t => t.trim()).filter(Boolean)
@@ -168,6 +180,96 @@ export function CaptionSettingsModal({ open, onOpenChange, config, onSave }: Pro
                             </div>
                         </div>
 
+                        {/* Section A2: Ensemble */}
+                        <div className="space-y-4">
+                            <div className="flex items-center gap-2 pb-2 border-b">
+                                <h3 className="font-semibold text-lg">Ensemble</h3>
+                                <TooltipProvider>
+                                    <Tooltip>
+                                        <TooltipTrigger><HelpCircle className="w-4 h-4 text-muted-foreground" /></TooltipTrigger>
+                                        <TooltipContent>Extra models run in the same pass. Each image is decoded once and tag probabilities are merged.</TooltipContent>
+                                    </Tooltip>
+                                </TooltipProvider>
+                            </div>
+
+                            <div className="flex flex-wrap gap-2">
+                                {WD_MODELS.filter(m => m.key !== localConfig.wdModel).map(model => (
+                                    <Badge
+                                        key={model.key}
+                                        variant={ensembleModels.includes(model.key) ? 'default' : 'outline'}
+                                        className="cursor-pointer"
+                                        onClick={() => toggleEnsembleModel(model.key)}
+                                    >
+                                        {model.label}
+                                    </Badge>
+                                ))}
+                            </div>
+
+                            {ensembleModels.length > 0 && (
+                                <div className="flex items-center gap-2 text-sm">
+                                    <span className="text-muted-foreground">Merge by</span>
+                                    {(['max', 'mean'] as const).map(mode => (
+                                        <Button
+                                            key={mode}
+                                            size="sm"
+                                            variant={(localConfig.ensembleMode || 'max') === mode ? 'secondary' : 'ghost'}
+                                            onClick={() => setLocalConfig(prev => ({ ...prev, ensembleMode: mode }))}
+                                        >
+                                            {mode === 'max' ? 'Max probability' : 'Mean probability'}
+                                        </Button>
+                                    ))}
+                                </div>
+                            )}
+                            <p className="text-xs text-muted-foreground">
+                                Extra models are downloaded on first use. Per-model tags are saved to caption_tags_by_model.json.
+                            </p>
+                        </div>
+
+                        {/* Section A3: Distributed */}
+                        <div className="space-y-4">
+                            <div className="flex items-center gap-2 pb-2 border-b">
+                                <h3 className="font-semibold text-lg">Distributed</h3>
+                                <TooltipProvider>
+                                    <Tooltip>
+                                        <TooltipTrigger><HelpCircle className="w-4 h-4 text-muted-foreground" /></TooltipTrigger>
+                                        <TooltipContent>Images are handed out in chunks. Other machines that mount this project folder can join the job as extra workers.</TooltipContent>
+                                    </Tooltip>
+                                </TooltipProvider>
+                            </div>
+
+                            <div className="flex items-center gap-2 text-sm">
+                                {([false, true] as const).map(enabled => (
+                                    <Button
+                                        key={String(enabled)}
+                                        size="sm"
+                                        variant={(localConfig.distributed?.enabled ?? false) === enabled ? 'secondary' : 'ghost'}
+                                        onClick={() => setLocalConfig(prev => ({ ...prev, distributed: { ...prev.distributed, enabled } }))}
+                                    >
+                                        {enabled ? 'On' : 'Off'}
+                                    </Button>
+                                ))}
+                            </div>
+
+                            {localConfig.distributed?.enabled && (
+                                <div className="space-y-2">
+                                    <Label>Local workers</Label>
+                                    <Input
+                                        type="number"
+                                        min={0}
+                                        max={16}
+                                        value={localConfig.distributed.localWorkers ?? 1}
+                                        onChange={(e) => {
+                                            const localWorkers = Math.max(0, parseInt(e.target.value) || 0);
+                                            setLocalConfig(prev => ({ ...prev, distributed: { enabled: true, ...prev.distributed, localWorkers } }));
+                                        }}
+                                    />
+                                    <p className="text-xs text-muted-foreground">
+                                        Join from another machine with: python scripts/caption/distributed.py work &lt;project&gt;/train_data/&lt;folder&gt;/.caption_work
+                                    </p>
+                                </div>
+                            )}
+                        </div>
+
                         {/* Section B: Filtering & Exclusion */}
                         <div className="space-y-4">
                             <div className="flex items-center gap-2 pb-2 border-b">
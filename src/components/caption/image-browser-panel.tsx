@@ -1,6 +1,6 @@
 'use client';
 
-import { useState } from 'react';
+import { useEffect, useState } from 'react';
 import { Input } from '@/components/ui/core';
 import { Badge } from '@/components/ui/badge';
 import { Search } from 'lucide-react';
@@ -9,6 +9,7 @@ import { CaptionImage } from '@/types/wd-models';
 import { cn, stringToColor } from '@/lib/utils';
 
 interface ImageBrowserPanelProps {
+    projectId: string;
     images: CaptionImage[];
     selectedId: string | null;
     onSelect: (id: string) => void;
@@ -17,15 +18,51 @@ interface ImageBrowserPanelProps {
 
 type ViewMode = 'compact' | 'review';
 
-export function ImageBrowserPanel({ images, selectedId, onSelect, editedIds }: ImageBrowserPanelProps) {
+// Searches using operators go to the tag index; plain text keeps the substring match
+const TAG_QUERY_RE = /(^|\s)-\S|\b(OR|AND|NOT)\b|[*"()]/;
+
+export function ImageBrowserPanel({ projectId, images, selectedId, onSelect, editedIds }: ImageBrowserPanelProps) {
     const { t } = useTranslation();
     const [search, setSearch] = useState('');
     const [viewMode, setViewMode] = useState<ViewMode>('compact');
+    const [queryIds, setQueryIds] = useState<Set<string> | null>(null);
+    const [queryError, setQueryError] = useState<string | null>(null);
 
-    const filteredImages = images.filter(img =>
-        img.filename.toLowerCase().includes(search.toLowerCase()) ||
-        img.tags.some(tag => tag.toLowerCase().includes(search.toLowerCase()))
-    );
+    const isTagQuery = TAG_QUERY_RE.test(search);
+
+    useEffect(() => {
+        if (!isTagQuery) {
+            setQueryIds(null);
+            setQueryError(null);
+            return;
+        }
+        const controller = new AbortController();
+        const timer = setTimeout(async () => {
+            try {
+                const res = await fetch(`/api/projects/${projectId}/tags/search?limit=0&q=${encodeURIComponent(search)}`, { signal: controller.signal });
+                const data = await res.json();
+                if (!res.ok) {
+                    setQueryError(data.error || 'Invalid query');
+                    return;
+                }
+                setQueryError(null);
+                setQueryIds(new Set(data.ids));
+            } catch (e) {
+                if (!controller.signal.aborted) console.error('Tag search failed', e);
+            }
+        }, 150);
+        return () => {
+            clearTimeout(timer);
+            controller.abort();
+        };
+    }, [projectId, search, isTagQuery]);
+
+    const filteredImages = isTagQuery
+        ? (queryIds ? images.filter(img => queryIds.has(img.id)) : images)
+        : images.filter(img =>
+            img.filename.toLowerCase().includes(search.toLowerCase()) ||
+            img.tags.some(tag => tag.toLowerCase().includes(search.toLowerCase()))
+        );
 
     const getStatusBadge = (img: CaptionImage) => {
         if (editedIds.has(img.id)) {
@@ -85,10 +122,13 @@ export function ImageBrowserPanel({ images, selectedId, onSelect, editedIds }: I
                 <Input
                     value={search}
                     onChange={(e) => setSearch(e.target.value)}
-                    placeholder="Search images or tags..."
+                    placeholder="Search images or tags... (long_hair -hat, a OR b, hair_*)"
                     className="pl-9"
                 />
             </div>
+            {queryError && (
+                <div className="text-xs text-red-500">{queryError}</div>
+            )}
 
             {/* Image Count */}
             <div className="text-sm text-gray-600 dark:text-gray-400">
@@ -117,7 +157,7 @@ export function ImageBrowserPanel({ images, selectedId, onSelect, editedIds }: I
                             >
                                 <div className="aspect-square bg-gray-100 dark:bg-gray-800">
                                     <img
-                                        src={img.url}
+                                        src={img.thumbUrl || img.url}
                                         alt={img.filename}
                                         className="w-full h-full object-cover"
                                     />
@@ -147,7 +187,7 @@ export function ImageBrowserPanel({ images, selectedId, onSelect, editedIds }: I
                             >
                                 <div className="w-20 h-20 bg-gray-100 dark:bg-gray-800 rounded overflow-hidden flex-shrink-0">
                                     <img
-                                        src={img.url}
+                                        src={img.thumbUrl || img.url}
                                         alt={img.filename}
                                         className="w-full h-full object-cover"
                                     />
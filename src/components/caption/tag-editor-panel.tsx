@@ -10,6 +10,7 @@ import { stringToColor } from '@/lib/utils';
 import { cn } from '@/lib/utils';
 
 interface TagEditorPanelProps {
+    projectId?: string; // Enables tag autocomplete from the project's tag index
     image: CaptionImage | null;
     onSave: (tags: string[], silent?: boolean) => Promise<boolean>;
     onRegenerate: () => Promise<void>;
@@ -18,10 +19,11 @@ interface TagEditorPanelProps {
 
 type SaveStatus = 'idle' | 'saving' | 'saved' | 'error';
 
-export function TagEditorPanel({ image, onSave, onRegenerate, onRevert }: TagEditorPanelProps) {
+export function TagEditorPanel({ projectId, image, onSave, onRegenerate, onRevert }: TagEditorPanelProps) {
     const { t } = useTranslation();
     const [tags, setTags] = useState<string[]>([]);
     const [tagInput, setTagInput] = useState('');
+    const [suggestions, setSuggestions] = useState<string[]>([]);
     const [status, setStatus] = useState<SaveStatus>('idle');
     const [isRegenerating, setIsRegenerating] = useState(false);
 
@@ -51,6 +53,31 @@ export function TagEditorPanel({ image, onSave, onRegenerate, onRevert }: TagEdi
         }
     }, [image]);
 
+    // Autocomplete the tag being typed (after the last comma) from the tag index
+    useEffect(() => {
+        const typed = tagInput.split(',').pop()?.trim() || '';
+        if (!projectId || !typed) {
+            setSuggestions([]);
+            return;
+        }
+        const controller = new AbortController();
+        const timer = setTimeout(async () => {
+            try {
+                const res = await fetch(`/api/projects/${projectId}/tags?limit=10&prefix=${encodeURIComponent(typed)}`, { signal: controller.signal });
+                if (!res.ok) return;
+                const data = await res.json();
+                const head = tagInput.includes(',') ? tagInput.slice(0, tagInput.lastIndexOf(',') + 1) + ' ' : '';
+                setSuggestions(data.tags.map((s: { tag: string }) => head + s.tag));
+            } catch {
+                // Aborted by the next keystroke
+            }
+        }, 100);
+        return () => {
+            clearTimeout(timer);
+            controller.abort();
+        };
+    }, [projectId, tagInput]);
+
     // Auto-save logic
     useEffect(() => {
         if (isInitialLoadRef.current) {
@@ -220,7 +247,11 @@ export function TagEditorPanel({ image, onSave, onRegenerate, onRevert }: TagEdi
                     onKeyDown={handleKeyDown}
                     placeholder={t('caption.tag_editor.add_tag_placeholder', 'Add tags...')}
                     className="w-full"
+                    list="tag-suggestions"
                 />
+                <datalist id="tag-suggestions">
+                    {suggestions.map(s => <option key={s} value={s} />)}
+                </datalist>
                 <p className="text-xs text-gray-500 dark:text-gray-400">
                     Press Enter to add • Backspace in empty field removes last tag
                 </p>
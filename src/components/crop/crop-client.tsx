@@ -8,6 +8,7 @@ import 'react-image-crop/dist/ReactCrop.css';
 import { Button } from '@/components/ui/core';
 import { toast } from 'sonner';
 import { cn } from '@/lib/utils';
+import { followJob } from '@/lib/job-events';
 import { CheckCircle, RotateCcw, Scissors, ArrowRight, Settings2, Sparkles, Loader2 } from 'lucide-react';
 import { ManageCropsModal } from './manage-crops-modal';
 import { ReviewAutoCropModal } from './review-auto-crop-modal';
@@ -165,38 +166,32 @@ export function CropClient({ projectId, images, project, initialStats }: CropCli
         setCompletedCrop(undefined);
     }, [selectedImage]);
 
-    // Poll for auto crop job
+    // Follow the auto crop job (server-sent events, polling fallback)
     useEffect(() => {
         if (!autoCropJobId) return;
 
-        const interval = setInterval(async () => {
-            try {
-                const res = await fetch(`/api/projects/${projectId}/crop/auto/results?jobId=${autoCropJobId}`);
-                if (res.ok) {
-                    const job = await res.json();
-                    if (job.status === 'completed') {
-                        setIsAutoCropping(false);
-                        setAutoCropJobId(null);
-                        if (job.result && job.result.proposals) {
-                            setAutoCropProposals(job.result.proposals);
-                            setIsReviewModalOpen(true);
-                            toast.success('Auto Crop completed');
-                        } else {
-                            toast.error('Auto Crop completed but no proposals found');
-                        }
-                    } else if (job.status === 'failed') {
-                        setIsAutoCropping(false);
-                        setAutoCropJobId(null);
-                        toast.error(`Auto Crop failed: ${job.error}`);
+        return followJob({
+            eventsUrl: `/api/projects/${projectId}/jobs/${autoCropJobId}/events`,
+            pollUrl: `/api/projects/${projectId}/crop/auto/results?jobId=${autoCropJobId}`,
+            onState: (job) => {
+                if (job.status === 'completed') {
+                    setIsAutoCropping(false);
+                    setAutoCropJobId(null);
+                    if (job.result && job.result.proposals) {
+                        setAutoCropProposals(job.result.proposals);
+                        setIsReviewModalOpen(true);
+                        toast.success('Auto Crop completed');
+                    } else {
+                        toast.error('Auto Crop completed but no proposals found');
                     }
-                    // else pending/processing, continue polling
+                } else if (job.status === 'failed') {
+                    setIsAutoCropping(false);
+                    setAutoCropJobId(null);
+                    toast.error(`Auto Crop failed: ${job.error}`);
                 }
-            } catch (e) {
-                console.error(e);
+                // else pending/processing, keep following
             }
-        }, 2000);
-
-        return () => clearInterval(interval);
+        });
     }, [autoCropJobId, projectId]);
 
     function onImageLoad(e: React.SyntheticEvent<HTMLImageElement>) {
@@ -10,6 +10,7 @@ import { useTranslation } from 'react-i18next';
 export function ImportProjectButton() {
     const { t } = useTranslation('common');
     const [isUploading, setIsUploading] = useState(false);
+    const [progress, setProgress] = useState<number | null>(null);
     const fileInputRef = useRef<HTMLInputElement>(null);
     const router = useRouter();
 
@@ -22,20 +23,47 @@ export function ImportProjectButton() {
         if (!file) return;
 
         setIsUploading(true);
-        const formData = new FormData();
-        formData.append('file', file);
+        setProgress(null);
 
         try {
+            // Raw body: the server streams it to disk instead of buffering a multipart form
             const res = await fetch('/api/projects/import-zip', {
                 method: 'POST',
-                body: formData,
+                headers: { 'Content-Type': 'application/zip' },
+                body: file,
             });
 
             if (!res.ok) {
-                const data = await res.json();
-                throw new Error(data.error || 'Import failed');
+                const data = await res.json().catch(() => null);
+                throw new Error(data?.error || 'Import failed');
             }
 
+            // Newline-delimited JSON: progress lines, then the project or an error
+            const reader = res.body?.getReader();
+            if (!reader) throw new Error('No response body');
+            const decoder = new TextDecoder();
+            let buffered = '';
+            let imported = false;
+
+            while (true) {
+                const { done, value } = await reader.read();
+                if (done) break;
+                buffered += decoder.decode(value, { stream: true });
+                const lines = buffered.split('\n');
+                buffered = lines.pop() || '';
+                for (const line of lines) {
+                    if (!line.trim()) continue;
+                    const msg = JSON.parse(line);
+                    if (msg.error) throw new Error(msg.error);
+                    if (msg.progress) {
+                        const { bytes, totalBytes } = msg.progress;
+                        setProgress(totalBytes > 0 ? Math.floor((bytes / totalBytes) * 100) : null);
+                    }
+                    if (msg.project) imported = true;
+                }
+            }
+            if (!imported) throw new Error('Import failed');
+
             // Success
             // Clear input
             if (fileInputRef.current) fileInputRef.current.value = '';
@@ -45,6 +73,7 @@ export function ImportProjectButton() {
             alert(error instanceof Error ? error.message : t('errors.import_failed'));
         } finally {
             setIsUploading(false);
+            setProgress(null);
         }
     };
 
@@ -60,6 +89,7 @@ export function ImportProjectButton() {
             <Button variant="outline" onClick={handleClick} disabled={isUploading}>
                 {isUploading ? <Loader2 className="mr-2 h-4 w-4 animate-spin" /> : <Upload className="mr-2 h-4 w-4" />}
                 {t('dashboard.import_project')}
+                {isUploading && progress !== null && <span className="ml-2 tabular-nums">{progress}%</span>}
             </Button>
         </>
     );
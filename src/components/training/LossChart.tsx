@@ -0,0 +1,96 @@
+'use client';
+
+import { useEffect, useState } from 'react';
+
+interface TelemetrySeries {
+    step: (number | null)[];
+    loss: (number | null)[];
+    avrLoss: (number | null)[];
+    lr: (number | null)[];
+    itPerSec: (number | null)[];
+}
+
+interface LossChartProps {
+    projectId: string;
+    runId: string | null;
+    isRunning: boolean;
+}
+
+const WIDTH = 400;
+const HEIGHT = 80;
+const MAX_POINTS = 200;
+
+function lastValue(values: (number | null)[]) {
+    for (let i = values.length - 1; i >= 0; i--) {
+        if (values[i] !== null) return values[i] as number;
+    }
+    return null;
+}
+
+export function LossChart({ projectId, runId, isRunning }: LossChartProps) {
+    const [series, setSeries] = useState<TelemetrySeries | null>(null);
+
+    useEffect(() => {
+        if (!runId) return;
+        let interval: NodeJS.Timeout;
+
+        const fetchSeries = async () => {
+            try {
+                const res = await fetch(`/api/projects/${projectId}/train/telemetry?runId=${runId}&maxPoints=${MAX_POINTS}`);
+                if (res.ok) {
+                    const data = await res.json();
+                    setSeries(data.series);
+                }
+            } catch (e) {
+                // Ignore errors
+            }
+        };
+
+        fetchSeries();
+        if (isRunning) {
+            interval = setInterval(fetchSeries, 5000);
+        }
+
+        return () => clearInterval(interval);
+    }, [projectId, runId, isRunning]);
+
+    if (!series) return null;
+
+    // Prefer the smoothed average loss sd-scripts reports; fall back to raw loss
+    const values = series.avrLoss.some(v => v !== null) ? series.avrLoss : series.loss;
+    const points = values
+        .map((v, i) => ({ x: series.step[i], y: v }))
+        .filter((p): p is { x: number; y: number } => p.x !== null && p.y !== null);
+
+    if (points.length < 2) return null;
+
+    const minX = points[0].x;
+    const maxX = points[points.length - 1].x;
+    const minY = Math.min(...points.map(p => p.y));
+    const maxY = Math.max(...points.map(p => p.y));
+    const spanX = maxX - minX || 1;
+    const spanY = maxY - minY || 1;
+
+    const polyline = points
+        .map(p => `${((p.x - minX) / spanX) * WIDTH},${HEIGHT - ((p.y - minY) / spanY) * HEIGHT}`)
+        .join(' ');
+
+    const latestLoss = lastValue(values);
+    const latestLr = lastValue(series.lr);
+    const latestRate = lastValue(series.itPerSec);
+
+    return (
+        <div className="space-y-1">
+            <div className="flex justify-between text-xs text-muted-foreground">
+                <span>Loss {latestLoss !== null ? latestLoss.toFixed(4) : '-'}</span>
+                <span>
+                    {latestLr !== null && `lr ${latestLr.toExponential(2)} · `}
+                    {latestRate !== null ? `${latestRate.toFixed(2)} it/s` : ''}
+                </span>
+            </div>
+            <svg viewBox={`0 0 ${WIDTH} ${HEIGHT}`} preserveAspectRatio="none" className="w-full h-20 border rounded-md bg-muted/30">
+                <polyline points={polyline} fill="none" stroke="currentColor" strokeWidth={1.5} className="text-primary" vectorEffect="non-scaling-stroke" />
+            </svg>
+        </div>
+    );
+}
@@ -2,8 +2,8 @@
 
 import { useState, useEffect } from 'react';
 import { Dialog, DialogContent, DialogHeader, DialogTitle, DialogFooter, DialogDescription } from '@/components/ui/dialog';
-import { Button } from '@/components/ui/core';
-import { FileCode, Trash2, ExternalLink, Download, FileText, FileJson, Clock } from 'lucide-react';
+import { Button, Input } from '@/components/ui/core';
+import { FileCode, Trash2, ExternalLink, Download, FileText, FileJson, Clock, Activity, Loader2, Combine } from 'lucide-react';
 import { ScrollArea } from '@/components/ui/scroll-area';
 import { useTranslation } from 'react-i18next';
 import { formatDistanceToNow } from 'date-fns';
@@ -16,6 +16,28 @@ interface OutputFile {
     path: string;
 }
 
+// scripts/lora_inspect.py output (trimmed to what is shown here)
+interface LoraInspection {
+    name: string;
+    epoch: number | null;
+    steps: number | null;
+    rank: number | null;
+    ranks: number[];
+    alpha: number | null;
+    modules: number;
+    coverage: Record<string, number>;
+    norm: number;
+    topModules: { module: string; norm: number }[];
+}
+
+interface LoraDelta {
+    from: string;
+    to: string;
+    norm: number;
+    relative: number | null;
+    topModules: { module: string; norm: number }[];
+}
+
 interface TrainOutputsModalProps {
     open: boolean;
     onOpenChange: (open: boolean) => void;
@@ -27,6 +49,14 @@ export function TrainOutputsModal({ open, onOpenChange, projectId }: TrainOutput
     const [files, setFiles] = useState<OutputFile[]>([]);
     const [loading, setLoading] = useState(false);
     const [error, setError] = useState<string | null>(null);
+    const [inspection, setInspection] = useState<Record<string, LoraInspection> | null>(null);
+    const [deltas, setDeltas] = useState<LoraDelta[]>([]);
+    const [inspecting, setInspecting] = useState(false);
+    const [selected, setSelected] = useState<string[]>([]);
+    const [mergeMode, setMergeMode] = useState<'average' | 'ema' | 'svd'>('average');
+    const [mergeWeights, setMergeWeights] = useState('');
+    const [mergeRank, setMergeRank] = useState('');
+    const [merging, setMerging] = useState(false);
 
     const fetchFiles = async () => {
         setLoading(true);
@@ -43,8 +73,28 @@ export function TrainOutputsModal({ open, onOpenChange, projectId }: TrainOutput
         }
     };
 
+    const fetchInspection = async () => {
+        setInspecting(true);
+        try {
+            const res = await fetch(`/api/projects/${projectId}/train/outputs/inspect`);
+            const data = await res.json();
+            if (!res.ok) throw new Error(data.error || 'Failed to inspect outputs');
+            const byName: Record<string, LoraInspection> = {};
+            for (const file of data.files || []) byName[file.name] = file;
+            setInspection(byName);
+            setDeltas(data.deltas || []);
+        } catch (err: any) {
+            alert(err.message);
+        } finally {
+            setInspecting(false);
+        }
+    };
+
     useEffect(() => {
         if (open) {
+            setInspection(null);
+            setDeltas([]);
+            setSelected([]);
             fetchFiles();
         }
     }, [open, projectId]);
@@ -59,6 +109,43 @@ export function TrainOutputsModal({ open, onOpenChange, projectId }: TrainOutput
         window.open(url, '_blank');
     };
 
+    const toggleSelected = (filename: string) => {
+        setSelected(prev => prev.includes(filename) ? prev.filter(f => f !== filename) : [...prev, filename]);
+    };
+
+    const handleMerge = async () => {
+        // Optional comma-separated weights, one per selected file in selection order
+        const weights = mergeWeights.trim() ? mergeWeights.split(',').map(w => parseFloat(w)) : undefined;
+        if (weights && (weights.length !== selected.length || weights.some(w => !Number.isFinite(w)))) {
+            alert(`Enter ${selected.length} comma-separated weights, or leave empty for equal weights`);
+            return;
+        }
+
+        setMerging(true);
+        try {
+            const res = await fetch(`/api/projects/${projectId}/train/outputs/merge`, {
+                method: 'POST',
+                headers: { 'Content-Type': 'application/json' },
+                body: JSON.stringify({
+                    files: selected,
+                    mode: mergeMode,
+                    weights: mergeMode === 'ema' ? undefined : weights,
+                    rank: mergeMode === 'svd' && mergeRank ? parseInt(mergeRank) : undefined
+                })
+            });
+            const data = await res.json();
+            if (!res.ok) throw new Error(data.error || 'Failed to merge');
+
+            setSelected([]);
+            fetchFiles();
+            if (inspection) fetchInspection();
+        } catch (err: any) {
+            alert(err.message);
+        } finally {
+            setMerging(false);
+        }
+    };
+
     const handleDelete = async (filename: string) => {
         if (!confirm(`Are you sure you want to delete ${filename}?`)) return;
 
@@ -71,8 +158,10 @@ export function TrainOutputsModal({ open, onOpenChange, projectId }: TrainOutput
 
             if (!res.ok) throw new Error('Failed to delete');
 
+            setSelected(prev => prev.filter(f => f !== filename));
             // Refresh
             fetchFiles();
+            if (inspection) fetchInspection();
         } catch (err: any) {
             alert(err.message);
         }
@@ -86,6 +175,11 @@ export function TrainOutputsModal({ open, onOpenChange, projectId }: TrainOutput
         return parseFloat((bytes / Math.pow(k, i)).toFixed(2)) + ' ' + sizes[i];
     };
 
+    const formatCoverage = (coverage: Record<string, number>) => {
+        const labels: Record<string, string> = { unet: 'UNet', text_encoder: 'TE', text_encoder_2: 'TE2' };
+        return Object.entries(coverage).map(([part, count]) => `${labels[part] || part} ${count}`).join(' / ');
+    };
+
     const getIcon = (type: string) => {
         if (type === 'json') return <FileJson className="w-5 h-5 text-yellow-500" />;
         if (type === 'safetensors' || type === 'ckpt') return <FileCode className="w-5 h-5 text-green-500" />;
@@ -119,6 +213,15 @@ export function TrainOutputsModal({ open, onOpenChange, projectId }: TrainOutput
                                 {files.map((file) => (
                                     <div key={file.name} className="flex items-center justify-between p-3 hover:bg-secondary/50 transition-colors group">
                                         <div className="flex items-center gap-3 min-w-0">
+                                            {file.type === 'safetensors' && (
+                                                <input
+                                                    type="checkbox"
+                                                    className="h-4 w-4 shrink-0 accent-primary"
+                                                    checked={selected.includes(file.name)}
+                                                    onChange={() => toggleSelected(file.name)}
+                                                    title="Select for averaging / merging"
+                                                />
+                                            )}
                                             {getIcon(file.type)}
                                             <div className="flex flex-col min-w-0">
                                                 <span className="font-medium truncate" title={file.name}>{file.name}</span>
@@ -130,6 +233,22 @@ export function TrainOutputsModal({ open, onOpenChange, projectId }: TrainOutput
                                                         {formatDistanceToNow(new Date(file.date), { addSuffix: true })}
                                                     </span>
                                                 </div>
+                                                {inspection?.[file.name] && (() => {
+                                                    const info = inspection[file.name];
+                                                    return (
+                                                        <div
+                                                            className="flex flex-wrap items-center gap-x-2 text-xs text-muted-foreground font-mono"
+                                                            title={info.topModules.slice(0, 5).map(m => `${m.module}: ${m.norm.toFixed(4)}`).join('\n')}
+                                                        >
+                                                            {info.epoch !== null && <span>epoch {info.epoch}</span>}
+                                                            {info.steps !== null && <span>{info.steps} steps</span>}
+                                                            <span>rank {info.ranks.length > 1 ? info.ranks.join('/') : info.rank ?? '?'}</span>
+                                                            <span>alpha {info.alpha ?? '?'}</span>
+                                                            <span>{info.modules} modules ({formatCoverage(info.coverage)})</span>
+                                                            <span>‖ΔW‖ {info.norm.toFixed(3)}</span>
+                                                        </div>
+                                                    );
+                                                })()}
                                             </div>
                                         </div>
                                         <div className="flex items-center gap-1 opacity-0 group-hover:opacity-100 transition-opacity">
@@ -157,15 +276,86 @@ export function TrainOutputsModal({ open, onOpenChange, projectId }: TrainOutput
                                     </div>
                                 ))}
                             </div>
+                            {deltas.length > 0 && (
+                                <div className="border-t p-3 space-y-1">
+                                    <div className="text-sm font-medium">Change between epochs</div>
+                                    {deltas.map(delta => (
+                                        <div
+                                            key={`${delta.from}|${delta.to}`}
+                                            className="flex items-center justify-between gap-3 text-xs font-mono"
+                                            title={delta.topModules.slice(0, 5).map(m => `${m.module}: ${m.norm.toFixed(4)}`).join('\n')}
+                                        >
+                                            <span className="truncate text-muted-foreground">{delta.from} → {delta.to}</span>
+                                            <span className="shrink-0">
+                                                {delta.norm.toFixed(3)}
+                                                {delta.relative !== null && ` (${(delta.relative * 100).toFixed(1)}%)`}
+                                            </span>
+                                        </div>
+                                    ))}
+                                </div>
+                            )}
                         </ScrollArea>
                     )}
                 </div>
 
+                {selected.length > 0 && (
+                    <div className="flex flex-wrap items-center gap-2 rounded-md border p-2 text-sm">
+                        <span className="text-muted-foreground">{selected.length} selected</span>
+                        <select
+                            className="flex h-9 rounded-md border border-input bg-transparent px-3 py-1 text-sm shadow-sm transition-colors focus-visible:outline-none focus-visible:ring-1 focus-visible:ring-ring disabled:cursor-not-allowed disabled:opacity-50"
+                            value={mergeMode}
+                            onChange={(e) => setMergeMode(e.target.value as typeof mergeMode)}
+                            disabled={merging}
+                        >
+                            <option value="average" className="bg-popover text-popover-foreground">Weighted average</option>
+                            <option value="ema" className="bg-popover text-popover-foreground">EMA (newest epochs weigh most)</option>
+                            <option value="svd" className="bg-popover text-popover-foreground">SVD merge (any ranks)</option>
+                        </select>
+                        {mergeMode !== 'ema' && (
+                            <Input
+                                className="w-40"
+                                placeholder="Weights, e.g. 0.3, 0.7"
+                                value={mergeWeights}
+                                onChange={(e) => setMergeWeights(e.target.value)}
+                                disabled={merging}
+                            />
+                        )}
+                        {mergeMode === 'svd' && (
+                            <Input
+                                className="w-24"
+                                type="number"
+                                min={1}
+                                placeholder="Rank"
+                                value={mergeRank}
+                                onChange={(e) => setMergeRank(e.target.value)}
+                                disabled={merging}
+                            />
+                        )}
+                        <Button
+                            onClick={handleMerge}
+                            disabled={merging || selected.length < (mergeMode === 'svd' ? 1 : 2)}
+                            className="ml-auto"
+                        >
+                            {merging ? <Loader2 className="w-4 h-4 mr-2 animate-spin" /> : <Combine className="w-4 h-4 mr-2" />}
+                            Merge
+                        </Button>
+                    </div>
+                )}
+
                 <DialogFooter>
                     <Button onClick={handleDownloadAll} variant="outline" className="mr-auto">
                         <Download className="w-4 h-4 mr-2" />
                         Download All (.zip)
                     </Button>
+                    <Button
+                        onClick={fetchInspection}
+                        variant="outline"
+                        disabled={inspecting || !files.some(f => f.type === 'safetensors')}
+                        title="Read rank, coverage and weight norms from the LoRA files"
+                    >
+                        {inspecting ? <Loader2 className="w-4 h-4 mr-2 animate-spin" /> : <Activity className="w-4 h-4 mr-2" />}
+                        Inspect
+                    </Button>
                     <Button onClick={() => onOpenChange(false)}>
                         Close
                     </Button>
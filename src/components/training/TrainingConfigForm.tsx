@@ -3,7 +3,7 @@
 import { useState, useEffect, useCallback, useRef } from 'react';
 import { Card, CardContent, CardHeader, CardTitle, CardDescription, Button, Input, Switch } from '@/components/ui/core';
 import { Label } from '@/components/ui/label';
-import { Project, ProjectSettings } from '@/types';
+import { CheckpointEntry, Project, ProjectSettings } from '@/types';
 import { AlertCircle, CheckCircle2, Loader2, HelpCircle, ChevronDown, ChevronRight, ExternalLink } from 'lucide-react';
 
 // Define the shape of our config
@@ -205,6 +205,22 @@ export function TrainingConfigForm({ project, onStart, disabled }: TrainingConfi
         });
     };
 
+    // Checkpoint library: indexed models next to the current one (or in models/checkpoints),
+    // served from the index so the picker fills instantly; the server refreshes it in the background
+    const getScriptDir = (fullPath: string) => fullPath.substring(0, Math.max(fullPath.lastIndexOf('/'), fullPath.lastIndexOf('\\')));
+    const [library, setLibrary] = useState<CheckpointEntry[]>([]);
+    const libraryDir = config.pretrainedModelPath ? getScriptDir(config.pretrainedModelPath) : '';
+    useEffect(() => {
+        let cancelled = false;
+        fetch(`/api/train/checkpoints${libraryDir ? `?dir=${encodeURIComponent(libraryDir)}` : ''}`)
+            .then(res => res.ok ? res.json() : null)
+            .then(data => {
+                if (!cancelled && data?.checkpoints) setLibrary(data.checkpoints);
+            })
+            .catch(e => console.error('Failed to load checkpoint library', e));
+        return () => { cancelled = true; };
+    }, [libraryDir]);
+
     // Auto-detect when model path changes
     useEffect(() => {
         const path = config.pretrainedModelPath;
@@ -293,7 +309,6 @@ export function TrainingConfigForm({ project, onStart, disabled }: TrainingConfi
     };
 
     const getScriptName = (fullPath: string) => fullPath.split(/[/\\]/).pop() || '';
-    const getScriptDir = (fullPath: string) => fullPath.substring(0, Math.max(fullPath.lastIndexOf('/'), fullPath.lastIndexOf('\\')));
 
     const isSDXL = config.modelFamily === 'sdxl';
 
@@ -357,10 +372,18 @@ export function TrainingConfigForm({ project, onStart, disabled }: TrainingConfi
                                     value={config.pretrainedModelPath}
                                     onChange={e => handleChange('pretrainedModelPath', e.target.value)}
                                     placeholder="C:/Models/stable-diffusion-v1-5.safetensors"
+                                    list="checkpoint-library"
                                     required
                                     disabled={disabled}
                                     className="flex-1"
                                 />
+                                <datalist id="checkpoint-library">
+                                    {library.map(c => (
+                                        <option key={c.path} value={c.path}>
+                                            {[c.name, c.family, c.autov2].filter(Boolean).join(' · ')}
+                                        </option>
+                                    ))}
+                                </datalist>
                                 <Button
                                     type="button"
                                     variant="outline"
@@ -4,6 +4,7 @@ import { useEffect, useRef, useState } from 'react';
 import { Card, CardContent, CardHeader, CardTitle, Progress, Button } from '@/components/ui/core';
 import { Terminal } from 'lucide-react';
 import { TrainOutputsModal } from './TrainOutputsModal';
+import { LossChart } from './LossChart';
 
 export interface TrainingStatus {
     runId: string | null;
@@ -100,6 +101,8 @@ export function TrainingMonitor({ status, onStop, projectId }: TrainingMonitorPr
                     <Progress value={status.progress.percent} className="h-2" />
                 </div>
 
+                <LossChart projectId={projectId} runId={status.runId} isRunning={isRunning} />
+
                 <div className="flex-1 border rounded-md bg-black p-4 font-mono text-xs text-green-400 overflow-hidden flex flex-col relative">
                     <div className="absolute top-2 right-2 flex gap-2">
                         <Button
@@ -0,0 +1,145 @@
+import fs from 'fs/promises';
+import path from 'path';
+import { v4 as uuidv4 } from 'uuid';
+import { AugmentationSettings, ManifestItem } from '@/types';
+import { augmentVariants, getRandomAugmentationParams } from './images';
+import { resolveAugmentInput } from './augment-resolver';
+import { defaultConcurrency, mapWithConcurrency } from './concurrency';
+import { ingestFile } from './blobs';
+
+// Upper bound on variants per source per run, to keep one request from filling the disk
+export const MAX_VARIANTS_PER_IMAGE = 16;
+
+export interface AugmentResult {
+    file: string;
+    url?: string;
+    angle?: number;
+    flipped?: boolean;
+    groupKey?: string;
+    error?: string;
+}
+
+export interface AugmentBatchResult {
+    results: AugmentResult[];
+    manifestItems: ManifestItem[];
+}
+
+// Next free <n>.png index in a per-image _aug folder
+async function nextVariantIndex(itemAugDir: string): Promise<number> {
+    const existingFiles = await fs.readdir(itemAugDir).catch(() => [] as string[]);
+    const indices = existingFiles
+        .map(f => {
+            const match = f.match(/^(\d+)\.png$/);
+            return match ? parseInt(match[1]) : 0;
+        })
+        .filter(n => n > 0);
+    return indices.length > 0 ? Math.max(...indices) + 1 : 1;
+}
+
+// Claims `count` free <n>.png names by creating them exclusively ('wx'). Sources with the
+// same basename (1.jpg and 1.png both use 1_aug/) are processed concurrently, so a folder
+// listing alone could hand both the same index. The empty placeholders are overwritten
+// by the render, or removed if it fails.
+async function reserveVariantIndices(itemAugDir: string, count: number): Promise<number[]> {
+    const indices: number[] = [];
+    for (let candidate = await nextVariantIndex(itemAugDir); indices.length < count; candidate++) {
+        try {
+            await (await fs.open(path.join(itemAugDir, `${candidate}.png`), 'wx')).close();
+            indices.push(candidate);
+        } catch (e: any) {
+            if (e.code !== 'EEXIST') throw e;
+        }
+    }
+    return indices;
+}
+
+/**
+ * Generates `settings.variantsPerImage` augmented variants for every raw file.
+ * Each source is resolved and decoded once; sources are spread over a worker pool.
+ * Manifest items are returned rather than written, so the caller can add
+ * them in one bulk write at the end.
+ */
+export async function runAugmentBatch(
+    projectId: string,
+    imageFiles: string[],
+    settings: AugmentationSettings,
+    cropMode: string,
+    onProgress: (processed: number, results: AugmentResult[]) => void,
+    concurrency: number = defaultConcurrency()
+): Promise<AugmentBatchResult> {
+    const augDir = path.join(process.cwd(), 'projects', projectId, 'augmented');
+    const variantCount = Math.min(Math.max(1, Math.floor(settings.variantsPerImage || 1)), MAX_VARIANTS_PER_IMAGE);
+
+    const results: AugmentResult[] = [];
+    const manifestItems: ManifestItem[] = [];
+    let processed = 0;
+
+    await mapWithConcurrency(imageFiles, concurrency, async (filename) => {
+        try {
+            // Use shared resolver to determine the effective input source
+            const { sourceType, absPath, sourceFile } = await resolveAugmentInput(projectId, filename, cropMode);
+
+            const fileBaseName = path.basename(filename, path.extname(filename));
+
+            // Subfolder per raw image
+            const itemAugDir = path.join(augDir, `${fileBaseName}_aug`);
+            await fs.mkdir(itemAugDir, { recursive: true });
+            const indices = await reserveVariantIndices(itemAugDir, variantCount);
+
+            const variants = indices.map((index, i) => ({
+                outputName: `${index}.png`,
+                outputPath: path.join(itemAugDir, `${index}.png`),
+                params: getRandomAugmentationParams(settings, i)
+            }));
+
+            try {
+                await augmentVariants(absPath, variants);
+            } catch (e) {
+                await Promise.all(variants.map(v => fs.rm(v.outputPath, { force: true })));
+                throw e;
+            }
+
+            for (const variant of variants) {
+                const blob = await ingestFile(projectId, variant.outputPath);
+                const outputUrl = `/api/images?path=${encodeURIComponent(variant.outputPath)}&t=${Date.now()}`;
+
+                // Ephemeral result for Job UI
+                results.push({
+                    file: variant.outputName,
+                    url: outputUrl,
+                    angle: variant.params.rotate,
+                    flipped: variant.params.flipH,
+                    groupKey: filename // Pass group key for client sorting
+                });
+
+                // Permanent Manifest Item with enhanced metadata
+                manifestItems.push({
+                    id: uuidv4(),
+                    stage: 'augmented',
+                    src: outputUrl,
+                    path: variant.outputPath,
+                    displayName: variant.outputName,
+                    groupKey: filename, // Link to source raw for grouping
+                    ...(blob ? { blob } : {}),
+                    aug: {
+                        rotate: variant.params.rotate,
+                        flip: variant.params.flipH,
+                        inputSourceType: sourceType,
+                        inputFile: sourceFile || filename
+                    }
+                });
+            }
+        } catch (e) {
+            console.error(`Failed to augment ${filename}`, e);
+            results.push({
+                file: filename,
+                error: 'Failed to process'
+            });
+        }
+
+        processed++;
+        onProgress(processed, results);
+    });
+
+    return { results, manifestItems };
+}
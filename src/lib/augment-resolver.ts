@@ -23,7 +23,9 @@ export interface AugmentInputSource {
  */
 export async function resolveAugmentInput(
     projectId: string,
-    imageId: string
+    imageId: string,
+    // Batch callers pass the project's crop mode to avoid re-reading config.json per image
+    cropMode?: string
 ): Promise<AugmentInputSource> {
     const projectDir = path.join(process.cwd(), 'projects', projectId);
     const rawDir = path.join(projectDir, 'raw');
@@ -63,8 +65,8 @@ export async function resolveAugmentInput(
 
     // Priority 2: Check for skip crop (if not already using crop)
     if (sourceType === 'raw') {
-        const project = await getProject(projectId);
-        if (project?.crop?.mode === 'skip') {
+        const mode = cropMode ?? (await getProject(projectId))?.crop?.mode;
+        if (mode === 'skip') {
             const skipCropPath = path.join(skipCropDir, imageId);
             try {
                 await fs.access(skipCropPath);
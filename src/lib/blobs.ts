@@ -0,0 +1,207 @@
+import fs from 'fs/promises';
+import { createReadStream } from 'fs';
+import crypto from 'crypto';
+import path from 'path';
+import { queryManifest } from './manifest';
+
+const PROJECTS_DIR = path.join(process.cwd(), 'projects');
+
+// Content-addressed blob store: projects/<id>/.blobs/<2 hex>/<sha256>.
+// Stage folders (raw, skip_crop, resized, train_data, train_dataset, combined) hold
+// hardlinks to blobs instead of copies, so identical pixels are stored once per
+// project and "copying" a stage is a link per file. Because links share one inode,
+// files in those folders must never be rewritten in place: writers replace them
+// (breakLink before writing, or write elsewhere and rename), never truncate them.
+// Without hardlink support (e.g. FAT/exFAT volumes) everything falls back to copies.
+const BLOBS_DIR = '.blobs';
+const HASH_CACHE_LIMIT = 50_000;
+const STALE_TEMP_MS = 60 * 60 * 1000;
+
+const hardlinkSupport = new Map<string, boolean>();
+// dev:ino:size:mtime -> sha256, so linking an already-linked file doesn't re-hash it
+const hashCache = new Map<string, string>();
+
+export interface BlobGcResult {
+    blobs: number;
+    removed: number;
+    freedBytes: number;
+}
+
+function blobsRoot(projectId: string) {
+    return path.join(PROJECTS_DIR, projectId, BLOBS_DIR);
+}
+
+export function blobPath(projectId: string, hash: string) {
+    return path.join(blobsRoot(projectId), hash.slice(0, 2), hash);
+}
+
+function tempPathFor(target: string) {
+    return `${target}.${process.pid}.${crypto.randomBytes(4).toString('hex')}.tmp`;
+}
+
+export async function hashFile(filePath: string): Promise<string> {
+    const stat = await fs.stat(filePath);
+    const key = `${stat.dev}:${stat.ino}:${stat.size}:${stat.mtimeMs}`;
+    const cached = hashCache.get(key);
+    if (cached) return cached;
+
+    const hash = await new Promise<string>((resolve, reject) => {
+        const h = crypto.createHash('sha256');
+        createReadStream(filePath)
+            .on('data', chunk => h.update(chunk))
+            .on('end', () => resolve(h.digest('hex')))
+            .on('error', reject);
+    });
+
+    if (hashCache.size >= HASH_CACHE_LIMIT) hashCache.clear();
+    hashCache.set(key, hash);
+    return hash;
+}
+
+export async function supportsHardlinks(projectId: string): Promise<boolean> {
+    const cached = hardlinkSupport.get(projectId);
+    if (cached !== undefined) return cached;
+
+    const root = blobsRoot(projectId);
+    await fs.mkdir(root, { recursive: true });
+    const probe = tempPathFor(path.join(root, 'probe'));
+    let supported = false;
+    try {
+        await fs.writeFile(probe, '');
+        await fs.link(probe, `${probe}.link`);
+        supported = true;
+    } catch {
+        supported = false;
+    } finally {
+        await fs.rm(probe, { force: true });
+        await fs.rm(`${probe}.link`, { force: true });
+    }
+    hardlinkSupport.set(projectId, supported);
+    return supported;
+}
+
+// Atomically points dest at the blob (dest may already exist)
+async function linkBlob(blob: string, dest: string) {
+    const tmp = tempPathFor(dest);
+    await fs.link(blob, tmp);
+    try {
+        await fs.rename(tmp, dest);
+    } catch (e) {
+        await fs.rm(tmp, { force: true });
+        throw e;
+    }
+}
+
+async function sameInode(a: string, b: string) {
+    const [sa, sb] = await Promise.all([fs.stat(a), fs.stat(b)]);
+    return sa.dev === sb.dev && sa.ino === sb.ino;
+}
+
+/**
+ * Adds a file that was just written to the store. If an identical blob exists the
+ * file is replaced by a link to it (dedup); otherwise the file becomes the blob.
+ * Returns the SHA-256, or null when the project can't use hardlinks.
+ */
+export async function ingestFile(projectId: string, filePath: string): Promise<string | null> {
+    if (!(await supportsHardlinks(projectId))) return null;
+
+    const hash = await hashFile(filePath);
+    const blob = blobPath(projectId, hash);
+    await fs.mkdir(path.dirname(blob), { recursive: true });
+
+    try {
+        await fs.link(filePath, blob);
+        return hash;
+    } catch (e: any) {
+        if (e.code !== 'EEXIST') throw e;
+    }
+
+    if (!(await sameInode(filePath, blob))) {
+        await linkBlob(blob, filePath);
+    }
+    return hash;
+}
+
+/**
+ * Writes a buffer (e.g. an upload) as dest, storing the bytes once.
+ * Pass the buffer's SHA-256 if it is already known to skip hashing it again.
+ * Returns the SHA-256, or null when it fell back to a plain write.
+ */
+export async function writeFileDeduped(projectId: string, buffer: Buffer, dest: string, knownHash?: string): Promise<string | null> {
+    if (!(await supportsHardlinks(projectId))) {
+        await fs.writeFile(dest, buffer);
+        return null;
+    }
+
+    const hash = knownHash || crypto.createHash('sha256').update(buffer).digest('hex');
+    const blob = blobPath(projectId, hash);
+    await fs.mkdir(path.dirname(blob), { recursive: true });
+
+    try {
+        await fs.access(blob);
+    } catch {
+        const tmp = tempPathFor(blob);
+        await fs.writeFile(tmp, buffer);
+        await fs.rename(tmp, blob);
+    }
+    await linkBlob(blob, dest);
+    return hash;
+}
+
+/**
+ * Drop-in replacement for fs.copyFile between stage folders: dest becomes a
+ * hardlink to src's blob. Falls back to a real copy without hardlink support.
+ */
+export async function linkFile(projectId: string, src: string, dest: string): Promise<string | null> {
+    const hash = await ingestFile(projectId, src);
+    if (!hash) {
+        await fs.copyFile(src, dest);
+        return null;
+    }
+    await linkBlob(blobPath(projectId, hash), dest);
+    return hash;
+}
+
+// Call before a writer overwrites filePath in place, so the write can't reach other links
+export async function breakLink(filePath: string) {
+    await fs.rm(filePath, { force: true });
+}
+
+/**
+ * Removes blobs nothing refers to: no stage file links them (link count 1,
+ * i.e. only the store itself) and no manifest item records them.
+ */
+export async function collectBlobGarbage(projectId: string): Promise<BlobGcResult> {
+    const result: BlobGcResult = { blobs: 0, removed: 0, freedBytes: 0 };
+    const root = blobsRoot(projectId);
+
+    const referenced = new Set<string>();
+    for (const item of await queryManifest(projectId)) {
+        if (item.blob) referenced.add(item.blob);
+    }
+
+    const shards = await fs.readdir(root, { withFileTypes: true }).catch(() => []);
+    for (const shard of shards) {
+        if (!shard.isDirectory()) continue;
+        const shardDir = path.join(root, shard.name);
+        for (const name of await fs.readdir(shardDir)) {
+            const blob = path.join(shardDir, name);
+            result.blobs++;
+            try {
+                const stat = await fs.stat(blob);
+                // Leftover temp files from interrupted writes are garbage too (once clearly stale)
+                if (name.endsWith('.tmp')) {
+                    if (Date.now() - stat.mtimeMs < STALE_TEMP_MS) continue;
+                } else if (stat.nlink > 1 || referenced.has(name)) {
+                    continue;
+                }
+                await fs.rm(blob, { force: true });
+                result.removed++;
+                result.freedBytes += stat.size;
+            } catch {
+                // Removed concurrently
+            }
+        }
+    }
+    return result;
+}
@@ -0,0 +1,270 @@
+import fs from 'fs/promises';
+import { existsSync } from 'fs';
+import path from 'path';
+import Database from 'better-sqlite3';
+import { clearTagIndex, updateTagIndex } from './tag-index';
+
+const PROJECTS_DIR = path.join(process.cwd(), 'projects');
+
+// Optional consolidated caption store: projects/<id>/captions.db (SQLite, WAL mode).
+// A project uses it when the file exists; otherwise captions are .txt sidecars in
+// train_data/<folder>/ as before. Rows are keyed by the image path relative to
+// train_data ("10_class/img.png"). With the store, .txt files are only written when
+// staging for sd-scripts or exporting. scripts/caption_store.py uses the same schema.
+const CAPTIONS_DB = 'captions.db';
+const SCHEMA_VERSION = 1;
+const BUSY_TIMEOUT_MS = 5000;
+
+const SCHEMA = `
+CREATE TABLE IF NOT EXISTS captions (
+    key TEXT PRIMARY KEY,
+    folder TEXT NOT NULL,
+    text TEXT NOT NULL,
+    source TEXT,
+    edited INTEGER NOT NULL DEFAULT 0,
+    updated_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_captions_folder ON captions(folder);
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+`;
+
+const UPSERT_SQL = `
+INSERT INTO captions (key, folder, text, source, edited, updated_at)
+VALUES (@key, @folder, @text, @source, @edited, @updated_at)
+ON CONFLICT(key) DO UPDATE SET
+    text = excluded.text,
+    source = excluded.source,
+    edited = excluded.edited,
+    updated_at = excluded.updated_at
+`;
+
+const IMAGE_RE = /\.(jpg|jpeg|png|webp)$/i;
+
+const stores = new Map<string, Database.Database>();
+
+export interface CaptionRecord {
+    text: string;
+    edited: boolean;
+    updatedAt: number;
+    source?: string;
+}
+
+export interface CaptionWrite {
+    file: string; // Image filename within the folder
+    text: string;
+    source?: string;
+    edited?: boolean;
+}
+
+export function getCaptionStorePath(projectId: string) {
+    return path.join(PROJECTS_DIR, projectId, CAPTIONS_DB);
+}
+
+export function isCaptionStoreEnabled(projectId: string) {
+    return existsSync(getCaptionStorePath(projectId));
+}
+
+// Sidecar name for an image, e.g. img.png -> img.txt
+export function captionFileFor(imageFile: string, extension: string = '.txt') {
+    return imageFile.replace(/\.[^/.]+$/, '') + extension;
+}
+
+function openStore(projectId: string, create = false): Database.Database | null {
+    const cached = stores.get(projectId);
+    if (cached && cached.open) return cached;
+
+    const dbPath = getCaptionStorePath(projectId);
+    if (!create && !existsSync(dbPath)) return null;
+
+    const db = new Database(dbPath);
+    db.pragma('journal_mode = WAL');
+    db.pragma('synchronous = NORMAL');
+    db.pragma(`busy_timeout = ${BUSY_TIMEOUT_MS}`);
+    db.exec(SCHEMA);
+    db.prepare(`INSERT OR IGNORE INTO meta (key, value) VALUES ('schema_version', ?)`).run(String(SCHEMA_VERSION));
+
+    stores.set(projectId, db);
+    return db;
+}
+
+function trainDataFolder(projectId: string, folder: string) {
+    return path.join(PROJECTS_DIR, projectId, 'train_data', folder);
+}
+
+/**
+ * All captions in a train_data folder, keyed by image filename.
+ * Store: one indexed query. Sidecars: one read + stat per caption (legacy path),
+ * with `edited` meaning the caption is newer than its image.
+ */
+export async function readCaptions(projectId: string, folder: string): Promise<Map<string, CaptionRecord>> {
+    const captions = new Map<string, CaptionRecord>();
+
+    const db = openStore(projectId);
+    if (db) {
+        const rows = db.prepare('SELECT key, text, source, edited, updated_at FROM captions WHERE folder = ?').all(folder) as {
+            key: string; text: string; source: string | null; edited: number; updated_at: number;
+        }[];
+        for (const row of rows) {
+            captions.set(row.key.slice(folder.length + 1), {
+                text: row.text,
+                edited: row.edited === 1,
+                updatedAt: row.updated_at,
+                source: row.source ?? undefined
+            });
+        }
+        return captions;
+    }
+
+    const dir = trainDataFolder(projectId, folder);
+    const files = await fs.readdir(dir).catch(() => [] as string[]);
+    const present = new Set(files);
+    for (const file of files.filter(f => IMAGE_RE.test(f))) {
+        const txtFile = captionFileFor(file);
+        if (!present.has(txtFile)) continue;
+        try {
+            const txtPath = path.join(dir, txtFile);
+            const [text, txtStat, imgStat] = await Promise.all([
+                fs.readFile(txtPath, 'utf-8'),
+                fs.stat(txtPath),
+                fs.stat(path.join(dir, file))
+            ]);
+            captions.set(file, { text, edited: txtStat.mtime > imgStat.mtime, updatedAt: txtStat.mtimeMs });
+        } catch {
+            // Removed while scanning
+        }
+    }
+    return captions;
+}
+
+export async function readCaption(projectId: string, folder: string, file: string): Promise<string | null> {
+    const db = openStore(projectId);
+    if (db) {
+        const row = db.prepare('SELECT text FROM captions WHERE key = ?').get(`${folder}/${file}`) as { text: string } | undefined;
+        return row ? row.text : null;
+    }
+    return fs.readFile(path.join(trainDataFolder(projectId, folder), captionFileFor(file)), 'utf-8').catch(() => null);
+}
+
+// Bulk write; one transaction with the store, one file per caption without it.
+// The tag index is updated either way.
+export async function writeCaptions(projectId: string, folder: string, entries: CaptionWrite[]) {
+    updateTagIndex(projectId, entries.map(entry => ({ key: `${folder}/${entry.file}`, text: entry.text })));
+
+    const db = openStore(projectId);
+    if (db) {
+        const upsert = db.prepare(UPSERT_SQL);
+        const now = Date.now();
+        db.transaction(() => {
+            for (const entry of entries) {
+                upsert.run({
+                    key: `${folder}/${entry.file}`,
+                    folder,
+                    text: entry.text,
+                    source: entry.source ?? null,
+                    edited: entry.edited ? 1 : 0,
+                    updated_at: now
+                });
+            }
+        }).immediate();
+        return;
+    }
+
+    const dir = trainDataFolder(projectId, folder);
+    for (const entry of entries) {
+        await fs.writeFile(path.join(dir, captionFileFor(entry.file)), entry.text, 'utf-8');
+    }
+}
+
+// Manual edit from the tag editor
+export async function writeCaption(projectId: string, folder: string, file: string, text: string) {
+    await writeCaptions(projectId, folder, [{ file, text, source: 'manual', edited: true }]);
+}
+
+// Drops stored captions (all folders, or one). Sidecars go away with their folder.
+export async function clearCaptions(projectId: string, folder?: string) {
+    clearTagIndex(projectId, folder);
+    const db = openStore(projectId);
+    if (!db) return;
+    if (folder) db.prepare('DELETE FROM captions WHERE folder = ?').run(folder);
+    else db.prepare('DELETE FROM captions').run();
+}
+
+/**
+ * Writes .txt (or `extension`) sidecars for a folder's stored captions into targetDir,
+ * e.g. the sd-scripts staging folder. No-op without the store, since the
+ * sidecars already exist and are copied with the images. Returns files written.
+ */
+export async function materializeCaptions(projectId: string, folder: string, targetDir: string, extension: string = '.txt'): Promise<number> {
+    if (!isCaptionStoreEnabled(projectId)) return 0;
+
+    const captions = await readCaptions(projectId, folder);
+    await fs.mkdir(targetDir, { recursive: true });
+    for (const [file, record] of captions) {
+        await fs.writeFile(path.join(targetDir, captionFileFor(file, extension)), record.text, 'utf-8');
+    }
+    return captions.size;
+}
+
+async function listFolders(projectId: string): Promise<string[]> {
+    const trainDataDir = path.join(PROJECTS_DIR, projectId, 'train_data');
+    const entries = await fs.readdir(trainDataDir, { withFileTypes: true }).catch(() => []);
+    return entries.filter(e => e.isDirectory()).map(e => e.name);
+}
+
+/**
+ * Switches a project to the caption store: imports existing sidecars in one
+ * transaction, then removes them. Returns the number of captions imported.
+ */
+export async function enableCaptionStore(projectId: string): Promise<number> {
+    if (isCaptionStoreEnabled(projectId)) return 0;
+
+    const imported: { folder: string; files: string[]; entries: CaptionWrite[] }[] = [];
+    for (const folder of await listFolders(projectId)) {
+        // Read before the store exists, so this goes through the sidecar path
+        const captions = await readCaptions(projectId, folder);
+        imported.push({
+            folder,
+            files: [...captions.keys()],
+            entries: [...captions].map(([file, record]) => ({ file, text: record.text, edited: record.edited }))
+        });
+    }
+
+    openStore(projectId, true);
+    let count = 0;
+    for (const { folder, files, entries } of imported) {
+        await writeCaptions(projectId, folder, entries);
+        count += entries.length;
+        for (const file of files) {
+            await fs.rm(path.join(trainDataFolder(projectId, folder), captionFileFor(file)), { force: true });
+        }
+    }
+    return count;
+}
+
+// Switches back to sidecars: writes every stored caption out, then removes the store
+export async function disableCaptionStore(projectId: string): Promise<number> {
+    if (!isCaptionStoreEnabled(projectId)) return 0;
+
+    let count = 0;
+    for (const folder of await listFolders(projectId)) {
+        count += await materializeCaptions(projectId, folder, trainDataFolder(projectId, folder));
+    }
+
+    closeCaptionStore(projectId);
+    const dbPath = getCaptionStorePath(projectId);
+    for (const suffix of ['', '-wal', '-shm']) {
+        await fs.rm(`${dbPath}${suffix}`, { force: true });
+    }
+    return count;
+}
+
+export function closeCaptionStore(projectId: string) {
+    const db = stores.get(projectId);
+    if (db) {
+        stores.delete(projectId);
+        if (db.open) db.close();
+    }
+}
@@ -0,0 +1,147 @@
+import fs from 'fs';
+import path from 'path';
+import Database from 'better-sqlite3';
+import { runPythonScript } from './python';
+import { CheckpointEntry } from '@/types';
+
+// Checkpoint library index: data/checkpoint_index.db, written by scripts/checkpoint_index.py
+// (family from the safetensors header, SHA-256/AutoV2 hashes), keyed by path and
+// reused while size+mtime match. Reads here are plain SELECTs, so the model picker
+// and detect-model answer from the index without spawning Python; refreshes run
+// the indexer in the background, one at a time per directory.
+const CHECKPOINT_INDEX_DB = path.join(process.cwd(), 'data', 'checkpoint_index.db');
+export const DEFAULT_CHECKPOINTS_DIR = path.join(process.cwd(), 'models', 'checkpoints');
+const BUSY_TIMEOUT_MS = 5000;
+// A background refresh at most this often per directory and mode (a rescan is a walk + stats)
+const REFRESH_INTERVAL_MS = 30_000;
+
+// Same mapping as detect_model.py
+const TRAINER_SCRIPTS: Record<string, string> = {
+    'SD1.5': 'train_network.py',
+    'SD1.x/2.x': 'train_network.py',
+    'SD1.x/2.x (Assumed)': 'train_network.py',
+    'SD2.x': 'train_network.py',
+    'SDXL': 'sdxl_train_network.py',
+    'SD3': 'sd3_train_network.py',
+    'FLUX': 'flux_train_network.py',
+    'Hunyuan': 'hunyuan_image_train_network.py',
+    'Lumina': 'lumina_train_network.py'
+};
+
+export interface CheckpointIndexSummary {
+    dir: string;
+    checkpoints: number;
+    indexed: number;
+    removed: number;
+    hashed: number;
+    failed: number;
+}
+
+let db: Database.Database | null = null;
+const refreshing = new Map<string, Promise<CheckpointIndexSummary>>();
+const lastRefresh = new Map<string, number>();
+
+// The indexer creates the database; until it has run once there is nothing to read
+function openIndex(): Database.Database | null {
+    if (db) return db;
+    if (!fs.existsSync(CHECKPOINT_INDEX_DB)) return null;
+    db = new Database(CHECKPOINT_INDEX_DB);
+    db.pragma(`busy_timeout = ${BUSY_TIMEOUT_MS}`);
+    return db;
+}
+
+const SELECT_COLUMNS = `path, name, size, CAST(mtime_ns / 1000000 AS INTEGER) AS mtimeMs, format, family,
+    tensors, metadata, sha256, autov1, autov2, error`;
+
+function toEntry(row: any): CheckpointEntry {
+    return { ...row, metadata: row.metadata ? JSON.parse(row.metadata) : null };
+}
+
+export function listCheckpoints(dir: string = DEFAULT_CHECKPOINTS_DIR): CheckpointEntry[] {
+    const index = openIndex();
+    if (!index) return [];
+    return index.prepare(`SELECT ${SELECT_COLUMNS} FROM checkpoints WHERE dir = ? ORDER BY name COLLATE NOCASE`)
+        .all(path.resolve(dir))
+        .map(toEntry);
+}
+
+// The indexed entry for a file, only if it is still the same version (size and mtime in ns)
+export async function lookupCheckpoint(filePath: string): Promise<CheckpointEntry | null> {
+    const index = openIndex();
+    if (!index) return null;
+    const resolved = path.resolve(filePath);
+    const stats = await fs.promises.stat(resolved, { bigint: true }).catch(() => null);
+    if (!stats) return null;
+    const row = index.prepare(`SELECT ${SELECT_COLUMNS} FROM checkpoints WHERE path = ? AND size = ? AND mtime_ns = ?`)
+        .get(resolved, stats.size, stats.mtimeNs);
+    return row ? toEntry(row) : null;
+}
+
+// Refreshes are tracked per directory and mode, so a header-only refresh (detect-model)
+// neither throttles nor stands in for a hashing one (the model picker)
+function refreshKey(dir: string, hashes: boolean) {
+    return `${hashes ? 'hashes' : 'headers'}:${dir}`;
+}
+
+/**
+ * Runs the indexer over dir (new and modified files only). Concurrent calls for the
+ * same directory share one run. hashes=false indexes headers only.
+ */
+export function refreshCheckpointIndex(dir: string = DEFAULT_CHECKPOINTS_DIR, options: { hashes?: boolean } = {}): Promise<CheckpointIndexSummary> {
+    const resolved = path.resolve(dir);
+    const hashes = options.hashes !== false;
+    const key = refreshKey(resolved, hashes);
+    // A hashing run indexes headers too, so header-only callers can share it
+    const running = refreshing.get(key) ?? (hashes ? undefined : refreshing.get(refreshKey(resolved, true)));
+    if (running) return running;
+
+    const args = ['--models_dir', resolved, '--db', CHECKPOINT_INDEX_DB];
+    if (!hashes) args.push('--no_hash');
+
+    // Still one indexer per directory: a hashing run queues behind a header-only one
+    const before = hashes ? refreshing.get(refreshKey(resolved, false))?.catch(() => undefined) : undefined;
+    const run = Promise.resolve(before)
+        .then(() => runPythonScript('checkpoint_index.py', args))
+        .then(output => {
+            const summaryLine = output.trim().split('\n').filter(l => !l.startsWith('PROGRESS:')).pop();
+            return JSON.parse(summaryLine || '{}').dirs?.[0] as CheckpointIndexSummary;
+        })
+        .finally(() => {
+            refreshing.delete(key);
+            lastRefresh.set(key, Date.now());
+            if (hashes) lastRefresh.set(refreshKey(resolved, false), Date.now());
+        });
+    refreshing.set(key, run);
+    return run;
+}
+
+// Fire-and-forget refresh, throttled per directory and mode. Returns whether one is running.
+export function refreshCheckpointIndexInBackground(dir: string = DEFAULT_CHECKPOINTS_DIR, options: { hashes?: boolean } = {}): boolean {
+    const resolved = path.resolve(dir);
+    const hashes = options.hashes !== false;
+    const key = refreshKey(resolved, hashes);
+    if (refreshing.has(key) || (!hashes && refreshing.has(refreshKey(resolved, true)))) return true;
+    if (Date.now() - (lastRefresh.get(key) ?? 0) < REFRESH_INTERVAL_MS) return false;
+    refreshCheckpointIndex(resolved, options).catch(e => console.error(`Checkpoint index refresh failed for ${resolved}`, e));
+    return true;
+}
+
+// detect_model.py's result shape, built from an indexed family
+export function trainerScriptFor(family: string, repoPath: string) {
+    const known = new Set(Object.values(TRAINER_SCRIPTS));
+    const availableScripts = fs.existsSync(repoPath) ? fs.readdirSync(repoPath).filter(f => known.has(f)) : [];
+    const recommended = TRAINER_SCRIPTS[family];
+
+    if (!recommended) {
+        return { modelFamily: family, supported: false, recommendedScript: '', availableScripts, reason: 'Could not identify model family or unsupported type.', repoPath };
+    }
+    const supported = availableScripts.includes(recommended);
+    return {
+        modelFamily: family,
+        supported,
+        recommendedScript: supported ? recommended : '',
+        availableScripts,
+        reason: supported ? `Detected ${family}` : `Detected ${family} but script ${recommended} not found in ${repoPath}`,
+        repoPath
+    };
+}
@@ -2,6 +2,7 @@ import fs from 'fs/promises';
 import path from 'path';
 import { ManifestItem } from '@/types'; // Adjust import path as needed
 import { formatCanonicalName, parseCanonicalName } from './naming';
+import { linkFile } from './blobs';
 
 export async function ensureCombinedDirectory(projectId: string) {
     const combinedDir = path.join(process.cwd(), 'projects', projectId, 'combined');
@@ -23,14 +24,8 @@ export async function syncRawToCombined(projectId: string, rawItems: ManifestIte
             // Check if exists
             await fs.access(destPath);
         } catch {
-            // Doesn't exist, create link
-            try {
-                // Try hardlink first
-                await fs.link(item.path, destPath);
-            } catch (e) {
-                // Fallback to copy
-                await fs.copyFile(item.path, destPath);
-            }
+            // Doesn't exist: hardlink to the blob (copy fallback handled by linkFile)
+            await linkFile(projectId, item.path, destPath);
         }
 
         // Update item to point to combined? 
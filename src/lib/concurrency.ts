@@ -0,0 +1,31 @@
+import os from 'os';
+
+// Default pool size for image pipelines.
+// sharp/libvips already threads each pipeline internally, so we only run
+// about half as many pipelines as there are cores to avoid oversubscription.
+export function defaultConcurrency(): number {
+    const cores = typeof os.availableParallelism === 'function' ? os.availableParallelism() : os.cpus().length;
+    return Math.max(2, Math.floor(cores / 2));
+}
+
+// Bounded worker pool: runs `worker` over `items` with at most `limit` in flight.
+// Results keep input order. A rejected worker rejects the whole batch, so
+// callers that want per-item error handling should catch inside `worker`.
+export async function mapWithConcurrency<T, R>(
+    items: T[],
+    limit: number,
+    worker: (item: T, index: number) => Promise<R>
+): Promise<R[]> {
+    const results: R[] = new Array(items.length);
+    let nextIndex = 0;
+
+    const runners = Array.from({ length: Math.max(1, Math.min(limit, items.length)) }, async () => {
+        while (nextIndex < items.length) {
+            const index = nextIndex++;
+            results[index] = await worker(items[index], index);
+        }
+    });
+
+    await Promise.all(runners);
+    return results;
+}
@@ -1,9 +1,12 @@
 import fs from 'fs/promises';
 import path from 'path';
-import AdmZip from 'adm-zip';
 import { getProject } from './projects';
+import { createZipStream, ZipEntry } from './zip';
+import { captionFileFor, isCaptionStoreEnabled, readCaptions } from './captions';
 
-export async function createExportZip(projectId: string): Promise<Buffer> {
+// Returns the dataset ZIP as a stream; files are read from disk as the response drains,
+// so exports of any size run in constant memory.
+export async function createExportZip(projectId: string): Promise<ReadableStream<Uint8Array>> {
     const project = await getProject(projectId);
     if (!project) throw new Error('Project not found');
 
@@ -17,43 +20,42 @@ export async function createExportZip(projectId: string): Promise<Buffer> {
         throw new Error('train_data folder not found. Please run captioning first to generate the training dataset.');
     }
 
-    const zip = new AdmZip();
-
     // Read all files from train_data/
     const files = await fs.readdir(trainDataDir);
 
-    let imagesExported = 0;
-    let captionsExported = 0;
-
     // Separate images and captions
     const imageFiles = files.filter(f => /\.(jpg|jpeg|png|webp)$/i.test(f));
-    const captionFiles = files.filter(f => f.endsWith('.txt'));
-
-    // Add images
-    for (const imageFile of imageFiles) {
-        const filePath = path.join(trainDataDir, imageFile);
-        const fileBuffer = await fs.readFile(filePath);
-        zip.addFile(`dataset/${imageFile}`, fileBuffer);
-        imagesExported++;
-    }
 
-    // Add captions
-    for (const captionFile of captionFiles) {
-        const filePath = path.join(trainDataDir, captionFile);
-        const fileBuffer = await fs.readFile(filePath);
-        zip.addFile(`dataset/${captionFile}`, fileBuffer);
-        captionsExported++;
+    const entries: ZipEntry[] = imageFiles.map(f => ({ name: `dataset/${f}`, filePath: path.join(trainDataDir, f) }));
+
+    // Captions from the store are materialized straight into the archive as .txt entries
+    let captionsExported: number;
+    if (isCaptionStoreEnabled(projectId)) {
+        const captions = await readCaptions(projectId, '10_class');
+        for (const [file, caption] of captions) {
+            entries.push({ name: `dataset/${captionFileFor(file)}`, data: Buffer.from(caption.text, 'utf-8') });
+        }
+        captionsExported = captions.size;
+    } else {
+        const captionFiles = files.filter(f => f.endsWith('.txt'));
+        entries.push(...captionFiles.map(f => ({ name: `dataset/${f}`, filePath: path.join(trainDataDir, f) })));
+        captionsExported = captionFiles.length;
     }
 
+    const imagesExported = imageFiles.length;
+
     // Add export metadata
-    zip.addFile('export_map.json', Buffer.from(JSON.stringify({
-        projectId: project.id,
-        projectName: project.name,
-        exportedAt: new Date().toISOString(),
-        imagesExported,
-        captionsExported,
-        source: 'train_data'
-    }, null, 2), 'utf-8'));
+    entries.push({
+        name: 'export_map.json',
+        data: Buffer.from(JSON.stringify({
+            projectId: project.id,
+            projectName: project.name,
+            exportedAt: new Date().toISOString(),
+            imagesExported,
+            captionsExported,
+            source: 'train_data'
+        }, null, 2), 'utf-8')
+    });
 
     // Add README
     const readmeContent = `
@@ -80,9 +82,9 @@ Generated by LoRA Bento.
 - \`dataset/captions/\` - Caption files matching image basenames
   `.trim();
 
-    zip.addFile('README.md', Buffer.from(readmeContent, 'utf-8'));
+    entries.push({ name: 'README.md', data: Buffer.from(readmeContent, 'utf-8') });
 
-    console.log(`Exported project ${projectId} from train_data/: ${imagesExported} images, ${captionsExported} captions.`);
+    console.log(`Exporting project ${projectId} from train_data/: ${imagesExported} images, ${captionsExported} captions.`);
 
-    return zip.toBuffer();
+    return createZipStream(entries);
 }
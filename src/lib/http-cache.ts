@@ -0,0 +1,134 @@
+import { createReadStream, Stats } from 'fs';
+import path from 'path';
+import { Readable } from 'stream';
+
+// Conditional GET helpers shared by the file/image serving routes.
+
+// Revalidate every time (a cheap 304 while unchanged), for files that may be replaced in place
+export const CACHE_REVALIDATE = 'private, no-cache';
+// For versioned URLs of write-once outputs: the browser never asks again
+export const CACHE_IMMUTABLE = 'private, max-age=31536000, immutable';
+
+// Stage folders whose files are never rewritten under the same URL: new outputs get new
+// names or a new ?t=/?v= token, and blob-store links are replaced, not modified.
+const WRITE_ONCE_DIRS = new Set(['raw', 'augmented', 'resized', 'cropped']);
+
+export function validatorHeaders(etag: string, lastModified: Date): Record<string, string> {
+    return {
+        'ETag': etag,
+        'Last-Modified': lastModified.toUTCString()
+    };
+}
+
+// True when the client's cached copy (If-None-Match / If-Modified-Since) is still valid.
+// If-None-Match takes precedence over If-Modified-Since, per RFC 9110.
+export function isNotModified(req: Request, etag: string, lastModified: Date): boolean {
+    const ifNoneMatch = req.headers.get('if-none-match');
+    if (ifNoneMatch) {
+        return ifNoneMatch.split(',').some(tag => {
+            const t = tag.trim();
+            return t === '*' || t === etag || t === `W/${etag}`;
+        });
+    }
+
+    const ifModifiedSince = req.headers.get('if-modified-since');
+    if (ifModifiedSince) {
+        const since = Date.parse(ifModifiedSince);
+        // HTTP dates have second precision
+        if (!isNaN(since)) return Math.floor(lastModified.getTime() / 1000) <= Math.floor(since / 1000);
+    }
+
+    return false;
+}
+
+// Strong validator from the inode, size and mtime. The inode matters because replacing a
+// file with a link to an older blob (lib/blobs.ts) can bring back an older mtime.
+export function fileETag(stats: Stats): string {
+    return `"${stats.ino.toString(16)}-${stats.size.toString(16)}-${Math.floor(stats.mtimeMs).toString(16)}"`;
+}
+
+// True when the URL pins a version (?t= / ?v=) of a file in a write-once stage folder
+export function isImmutableUrl(url: URL, projectDir: string, filePath: string): boolean {
+    if (!url.searchParams.has('t') && !url.searchParams.has('v')) return false;
+    const relative = path.relative(projectDir, filePath);
+    if (relative.startsWith('..') || path.isAbsolute(relative)) return false;
+    return WRITE_ONCE_DIRS.has(relative.split(path.sep)[0]);
+}
+
+// Parses a single "bytes=" range. null means serve the whole file (no header, or a
+// multi-range request, which we're allowed to answer with 200), 'unsatisfiable' means 416.
+export function parseRange(header: string | null, size: number): { start: number; end: number } | 'unsatisfiable' | null {
+    if (!header) return null;
+    const match = /^bytes=(\d*)-(\d*)$/.exec(header.trim());
+    if (!match) return null;
+
+    const [, first, last] = match;
+    let start: number;
+    let end: number;
+    if (first === '') {
+        // Suffix range: the last N bytes
+        if (last === '') return null;
+        start = Math.max(0, size - Number(last));
+        end = size - 1;
+    } else {
+        start = Number(first);
+        end = last === '' ? size - 1 : Math.min(Number(last), size - 1);
+    }
+
+    if (start >= size || start > end) return 'unsatisfiable';
+    return { start, end };
+}
+
+// If-Range: only resume a partial download when the file is still the same version
+function rangeStillValid(req: Request, etag: string, lastModified: Date): boolean {
+    const ifRange = req.headers.get('if-range');
+    if (!ifRange) return true;
+    if (ifRange.startsWith('"') || ifRange.startsWith('W/')) return ifRange === etag;
+    const since = Date.parse(ifRange);
+    return !isNaN(since) && Math.floor(lastModified.getTime() / 1000) === Math.floor(since / 1000);
+}
+
+/**
+ * Streams a file with ETag/Last-Modified validation (304), single byte-range
+ * support (206/416) and the given cache policy. `stats` is the caller's fs.stat
+ * of filePath, so a request costs one stat plus the bytes actually sent.
+ */
+export function serveFile(
+    req: Request,
+    filePath: string,
+    stats: Stats,
+    options: { contentType: string; immutable?: boolean }
+): Response {
+    const etag = fileETag(stats);
+    const headers: Record<string, string> = {
+        ...validatorHeaders(etag, stats.mtime),
+        'Cache-Control': options.immutable ? CACHE_IMMUTABLE : CACHE_REVALIDATE,
+        'Accept-Ranges': 'bytes'
+    };
+
+    if (isNotModified(req, etag, stats.mtime)) {
+        return new Response(null, { status: 304, headers });
+    }
+
+    const size = stats.size;
+    const range = rangeStillValid(req, etag, stats.mtime) ? parseRange(req.headers.get('range'), size) : null;
+    if (range === 'unsatisfiable') {
+        return new Response(null, { status: 416, headers: { ...headers, 'Content-Range': `bytes */${size}` } });
+    }
+
+    const start = range ? range.start : 0;
+    const end = range ? range.end : size - 1;
+    const body = size === 0 || req.method === 'HEAD'
+        ? null
+        : Readable.toWeb(createReadStream(filePath, { start, end })) as ReadableStream<Uint8Array>;
+
+    return new Response(body, {
+        status: range ? 206 : 200,
+        headers: {
+            ...headers,
+            'Content-Type': options.contentType,
+            'Content-Length': String(end - start + 1),
+            ...(range ? { 'Content-Range': `bytes ${start}-${end}/${size}` } : {})
+        }
+    });
+}
@@ -1,7 +1,7 @@
 import sharp from 'sharp';
 import path from 'path';
 import fs from 'fs/promises';
-import { ImageFile, ProjectSettings } from '@/types';
+import { AugmentationSettings, ImageFile, ProjectSettings } from '@/types';
 
 export async function getImageMetadata(filePath: string): Promise<ImageFile> {
     const metadata = await sharp(filePath).metadata();
@@ -36,61 +36,69 @@ export async function processImage(
     const newWidth = Math.round(metadata.width * scale);
     const newHeight = Math.round(metadata.height * scale);
 
-    let pipeline = image.resize(newWidth, newHeight, {
-        fit: 'contain',
-        background: { r: 0, g: 0, b: 0, alpha: 0 } // Transparent initially
-    });
+    let pipeline: sharp.Sharp;
 
     // Extension/Padding logic
-    if (padMode === 'transparent' || padMode === 'solid') {
-        let background: any = { r: 0, g: 0, b: 0, alpha: 0 };
-
-        if (padMode === 'solid' && padColor) {
-            // Parse hex color to RGB
-            const hex = padColor.replace('#', '');
-            const r = parseInt(hex.substring(0, 2), 16);
-            const g = parseInt(hex.substring(2, 4), 16);
-            const b = parseInt(hex.substring(4, 6), 16);
-            background = { r, g, b, alpha: 1 };
-        }
-
-        pipeline = pipeline.extend({
-            top: Math.floor((targetSize - newHeight) / 2),
-            bottom: Math.ceil((targetSize - newHeight) / 2),
-            left: Math.floor((targetSize - newWidth) / 2),
-            right: Math.ceil((targetSize - newWidth) / 2),
-            background: background
-        });
-    } else if (padMode === 'blur') {
-        // For blur, we create a blurred version of the background and composite the resized image on top
-        // This is more complex, for V1 we can fallback to extend or do a composite
-        // A simple approximation is extending with a blurred version of the edge pixels, 
-        // but sharp's extend doesn't verify blur. 
-        // Alternative: Resize original to cover targetSize (crop), blur it, then composite the 'contain' resize on top.
-
-        // 1. Create blurred background
+    if (padMode === 'blur') {
+        // Blurred background + 'contain' foreground, both derived from a single decode.
+        // Decode once at the 'cover' size (the larger of the two, so libvips can
+        // shrink-on-load), then crop/blur it for the background and downscale it
+        // again for the foreground.
         const bgScale = Math.max(targetSize / metadata.width, targetSize / metadata.height);
-        const bgWidth = Math.round(metadata.width * bgScale);
-        const bgHeight = Math.round(metadata.height * bgScale);
-
-        const bgBuffer = await sharp(inputPath)
-            .resize(bgWidth, bgHeight, { fit: 'cover' })
-            .blur(20)
+        const bgWidth = Math.max(targetSize, Math.round(metadata.width * bgScale));
+        const bgHeight = Math.max(targetSize, Math.round(metadata.height * bgScale));
+
+        const { data, info } = await image
+            .resize(bgWidth, bgHeight, { fit: 'fill' })
+            .raw()
+            .toBuffer({ resolveWithObject: true });
+        const raw = { width: info.width, height: info.height, channels: info.channels };
+
+        // 1. Resize foreground from the decoded pixels
+        const fg = await sharp(data, { raw })
+            .resize(newWidth, newHeight, { fit: 'fill' })
+            .raw()
+            .toBuffer({ resolveWithObject: true });
+
+        // 2. Blurred background (centre crop), with the foreground composited on top
+        pipeline = sharp(data, { raw })
             .extract({
                 left: Math.floor((bgWidth - targetSize) / 2),
                 top: Math.floor((bgHeight - targetSize) / 2),
                 width: targetSize,
                 height: targetSize
             })
-            .toBuffer();
+            .blur(20)
+            .composite([{
+                input: fg.data,
+                raw: { width: fg.info.width, height: fg.info.height, channels: fg.info.channels }
+            }]);
+    } else {
+        pipeline = image.resize(newWidth, newHeight, {
+            fit: 'contain',
+            background: { r: 0, g: 0, b: 0, alpha: 0 } // Transparent initially
+        });
+
+        if (padMode === 'transparent' || padMode === 'solid') {
+            let background: any = { r: 0, g: 0, b: 0, alpha: 0 };
 
-        // 2. Resize foreground
-        const fgBuffer = await sharp(inputPath)
-            .resize(newWidth, newHeight, { fit: 'contain', background: { r: 0, g: 0, b: 0, alpha: 0 } })
-            .toBuffer();
+            if (padMode === 'solid' && padColor) {
+                // Parse hex color to RGB
+                const hex = padColor.replace('#', '');
+                const r = parseInt(hex.substring(0, 2), 16);
+                const g = parseInt(hex.substring(2, 4), 16);
+                const b = parseInt(hex.substring(4, 6), 16);
+                background = { r, g, b, alpha: 1 };
+            }
 
-        // 3. Composite
-        pipeline = sharp(bgBuffer).composite([{ input: fgBuffer }]);
+            pipeline = pipeline.extend({
+                top: Math.floor((targetSize - newHeight) / 2),
+                bottom: Math.ceil((targetSize - newHeight) / 2),
+                left: Math.floor((targetSize - newWidth) / 2),
+                right: Math.ceil((targetSize - newWidth) / 2),
+                background: background
+            });
+        }
     }
 
     // Ensure output is png
@@ -102,53 +110,25 @@ export async function augmentImage(
     outputPath: string,
     options: { rotate?: number; flipH?: boolean; zoom?: number }
 ) {
-    let pipeline = sharp(inputPath).ensureAlpha();
-
-    // 1. Horizontal flip (LEFT<->RIGHT)
-    // Must be done BEFORE rotation to act as a pure mirror of the source
-    if (options.flipH) {
-        pipeline = pipeline.flop();
-    }
-
-    // 2. Rotation with transparent background
-    if (options.rotate && options.rotate !== 0) {
-        pipeline = pipeline.rotate(options.rotate, {
-            background: { r: 0, g: 0, b: 0, alpha: 0 }
-        });
-    }
-    // Zoom implementation requires extracting a crop. 
-    // Zoom > 1 means cropping. Zoom < 1 means adding padding (which we can leave to resize step, or handle here).
-    // For simplicity, let's handle mild zoom in (cropping) here.
-    if (options.zoom && options.zoom !== 1) {
-        const metadata = await sharp(inputPath).metadata();
-        if (metadata.width && metadata.height) {
-            const width = metadata.width;
-            const height = metadata.height;
-
-            // If zoom = 1.1, we crop the center 1/1.1 of the image
-            if (options.zoom > 1) {
-                const cropWidth = Math.round(width / options.zoom);
-                const cropHeight = Math.round(height / options.zoom);
-                const left = Math.round((width - cropWidth) / 2);
-                const top = Math.round((height - cropHeight) / 2);
-
-                pipeline = pipeline.extract({ left, top, width: cropWidth, height: cropHeight })
-                    .resize(width, height); // Resize back to original dimensions? Or let the next step handle it?
-                // Usually augmentation preserves resolution or lets the downstream resize handle it.
-                // Let's keep it simple: just crop.
-            }
-        }
-    }
+    await augmentVariants(inputPath, [{
+        outputPath,
+        params: { rotate: options.rotate || 0, flipH: !!options.flipH, zoom: options.zoom }
+    }]);
+}
 
-    // Force PNG output to preserve transparency
-    await pipeline.png().toFile(outputPath);
+export interface AugmentParams {
+    rotate: number;
+    flipH: boolean;
+    zoom?: number;
+    // Colour jitter, as sharp modulate() multipliers and hue rotation in degrees
+    brightness?: number;
+    saturation?: number;
+    hue?: number;
+    // Random-resized-crop region, as fractions of the source dimensions
+    crop?: { left: number; top: number; width: number; height: number };
 }
 
-export function getRandomAugmentationParams(settings: {
-    rotationRandom: boolean;
-    rotationRange: [number, number];
-    flipEnabled: boolean;
-}) {
+export function getRandomAugmentationParams(settings: AugmentationSettings, variantIndex: number = 0): AugmentParams {
     let rotate = 0;
     let flipH = false;
 
@@ -157,10 +137,111 @@ export function getRandomAugmentationParams(settings: {
         rotate = Math.floor(Math.random() * (max - min + 1)) + min;
     }
 
-    // Deterministic flip if enabled
+    // Deterministic flip if enabled. With several variants per image, alternate
+    // so the batch has both orientations instead of K mirrored copies.
     if (settings.flipEnabled) {
-        flipH = true;
+        flipH = (settings.variantsPerImage || 1) === 1 || variantIndex % 2 === 0;
     }
 
-    return { rotate, flipH };
+    const params: AugmentParams = { rotate, flipH };
+
+    if (settings.colorJitter) {
+        const strength = settings.jitterStrength ?? 0.2;
+        const jitter = (range: number) => 1 + (Math.random() * 2 - 1) * range;
+        params.brightness = jitter(strength);
+        params.saturation = jitter(strength);
+        params.hue = Math.round((Math.random() * 2 - 1) * strength * 30);
+    }
+
+    if (settings.randomCrop) {
+        // torchvision-style RandomResizedCrop: area fraction + log-uniform aspect in [3/4, 4/3]
+        const [minScale, maxScale] = settings.cropScaleRange || [0.7, 1.0];
+        const scale = minScale + Math.random() * (maxScale - minScale);
+        const ratio = Math.exp(Math.log(3 / 4) + Math.random() * (Math.log(4 / 3) - Math.log(3 / 4)));
+        const width = Math.min(1, Math.sqrt(scale * ratio));
+        const height = Math.min(1, Math.sqrt(scale / ratio));
+        params.crop = {
+            left: Math.random() * (1 - width),
+            top: Math.random() * (1 - height),
+            width,
+            height
+        };
+    }
+
+    if (settings.zoom && settings.zoom !== 1) {
+        params.zoom = settings.zoom;
+    }
+
+    return params;
+}
+
+/**
+ * Writes one augmented PNG per entry in `variants`, decoding `inputPath` only once.
+ * Each variant is rendered from the shared raw RGBA buffer, and since its
+ * dimensions are known up front, no per-variant metadata reads are needed.
+ */
+export async function augmentVariants(
+    inputPath: string,
+    variants: { outputPath: string; params: AugmentParams }[]
+) {
+    const { data, info } = await sharp(inputPath).ensureAlpha().raw().toBuffer({ resolveWithObject: true });
+    const raw = { width: info.width, height: info.height, channels: 4 as const };
+
+    for (const { outputPath, params } of variants) {
+        // 1. Random-resized-crop, in source coordinates. Its own pass: a second extract in the
+        // pipeline below would be applied after the resize, breaking the zoom's order.
+        let input = data;
+        let size = { width: info.width, height: info.height };
+        if (params.crop) {
+            const left = Math.floor(params.crop.left * info.width);
+            const top = Math.floor(params.crop.top * info.height);
+            const region = {
+                left,
+                top,
+                width: Math.min(Math.max(1, Math.round(params.crop.width * info.width)), info.width - left),
+                height: Math.min(Math.max(1, Math.round(params.crop.height * info.height)), info.height - top)
+            };
+            if (region.width !== info.width || region.height !== info.height) {
+                const cropped = await sharp(data, { raw }).extract(region).raw().toBuffer({ resolveWithObject: true });
+                input = cropped.data;
+                size = { width: cropped.info.width, height: cropped.info.height };
+            }
+        }
+        let pipeline = sharp(input, { raw: { ...size, channels: 4 } });
+
+        // 2. Horizontal flip (LEFT<->RIGHT), before rotation to act as a pure mirror of the source
+        if (params.flipH) {
+            pipeline = pipeline.flop();
+        }
+
+        // 3. Rotation with transparent background
+        if (params.rotate) {
+            pipeline = pipeline.rotate(params.rotate, {
+                background: { r: 0, g: 0, b: 0, alpha: 0 }
+            });
+        }
+
+        // 4. Zoom, as augmentImage always did it: after rotation (sharp rotates before an extract
+        // called after rotate), crop the centre 1/zoom of the unrotated size, scaled back to it
+        if (params.zoom && params.zoom > 1) {
+            const cropWidth = Math.round(size.width / params.zoom);
+            const cropHeight = Math.round(size.height / params.zoom);
+            const left = Math.round((size.width - cropWidth) / 2);
+            const top = Math.round((size.height - cropHeight) / 2);
+            pipeline = pipeline.extract({ left, top, width: cropWidth, height: cropHeight })
+                .resize(size.width, size.height);
+        }
+
+        // 5. Colour jitter
+        if (params.brightness !== undefined || params.saturation !== undefined || params.hue) {
+            pipeline = pipeline.modulate({
+                brightness: params.brightness,
+                saturation: params.saturation,
+                hue: params.hue || undefined
+            });
+        }
+
+        // Force PNG output to preserve transparency
+        await pipeline.png().toFile(outputPath);
+    }
 }
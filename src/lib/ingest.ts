@@ -0,0 +1,156 @@
+import sharp from 'sharp';
+import crypto from 'crypto';
+import { QaMetrics } from '@/types';
+
+// Fused ingest: one decode per upload yields everything later stages used to
+// re-decode the original for - dHash (duplicates), blur/exposure/noise metrics (QA),
+// display dimensions and EXIF orientation (crop, buckets) and the content hash (blob store).
+// The metrics use the definitions of scripts/qa_metrics.py, but on sharp's decode (linear
+// downscale) rather than Pillow's (JPEG draft + bilinear thumbnail), so values agree only to
+// within resampling noise. They are tagged source 'ingest' with their own version; the QA
+// worker lists which ingest version it accepts (INGEST_METRICS_VERSION) and reuses only those.
+export const QA_METRICS_VERSION = 1;
+// Bump when the dHash input changes; the QA job re-hashes older items.
+// v2: EXIF-oriented. v3: upload and QA both hash through dHashOf (v2 QA hashes didn't match uploads).
+export const HASH_VERSION = 3;
+const ANALYSIS_MAX_SIDE = 1024;
+// blurScore everywhere is this one metric: Laplacian variance of a signed response on the
+// oriented greyscale image at ANALYSIS_MAX_SIDE. Same threshold as the QA worker's default.
+export const BLUR_THRESHOLD = 100;
+
+export interface IngestResult {
+    contentHash: string; // SHA-256 of the file bytes, same as the blob store
+    hash: string; // dHash, same as dHashOf/calculatePHash
+    width: number; // As displayed, i.e. after EXIF orientation
+    height: number;
+    orientation: number; // EXIF orientation tag, 1 when absent
+    blurScore: number;
+    isBlurry: boolean;
+    qa: QaMetrics;
+}
+
+// 64-bit difference hash of a 9x8 greyscale raster, as hex
+export function dHashFromGrey(pixels: Buffer): string {
+    let bits = '';
+    for (let y = 0; y < 8; y++) {
+        for (let x = 0; x < 8; x++) {
+            bits += pixels[y * 9 + x] > pixels[y * 9 + x + 1] ? '1' : '0';
+        }
+    }
+    return BigInt('0b' + bits).toString(16);
+}
+
+// Port of compute_metrics() in scripts/qa_metrics.py over a greyscale raster
+function greyMetrics(grey: Float32Array, w: number, h: number) {
+    if (w < 3 || h < 3) throw new Error('Image too small to analyse');
+
+    let lapSum = 0, lapSumSq = 0, tenengrad = 0, noise = 0;
+    for (let y = 1; y < h - 1; y++) {
+        const row = y * w;
+        for (let x = 1; x < w - 1; x++) {
+            const i = row + x;
+            const c = grey[i];
+            const n = grey[i - w], s = grey[i + w], west = grey[i - 1], e = grey[i + 1];
+            const nw = grey[i - w - 1], ne = grey[i - w + 1], sw = grey[i + w - 1], se = grey[i + w + 1];
+
+            const lap = n + s + west + e - 4 * c;
+            lapSum += lap;
+            lapSumSq += lap * lap;
+
+            const gx = (ne + 2 * e + se) - (nw + 2 * west + sw);
+            const gy = (sw + 2 * s + se) - (nw + 2 * n + ne);
+            tenengrad += gx * gx + gy * gy;
+
+            noise += Math.abs((nw + ne + sw + se) - 2 * (n + s + west + e) + 4 * c);
+        }
+    }
+
+    let lumaSum = 0, clipLow = 0, clipHigh = 0;
+    for (let i = 0; i < grey.length; i++) {
+        const v = grey[i];
+        lumaSum += v;
+        if (v <= 2) clipLow++;
+        else if (v >= 253) clipHigh++;
+    }
+
+    const inner = (w - 2) * (h - 2);
+    const lapMean = lapSum / inner;
+    const round = (v: number, digits: number) => Number(v.toFixed(digits));
+    return {
+        laplacianVar: round(lapSumSq / inner - lapMean * lapMean, 2),
+        tenengrad: round(tenengrad / inner, 2),
+        meanLuma: round(lumaSum / grey.length / 255, 4),
+        clipLow: round(clipLow / grey.length, 4),
+        clipHigh: round(clipHigh / grey.length, 4),
+        noiseSigma: round(Math.sqrt(Math.PI / 2) * noise / (6 * inner), 3)
+    };
+}
+
+// Oriented, downscaled greyscale decode (one channel per pixel is read)
+function decodeGrey(input: Buffer | string) {
+    return sharp(input)
+        .rotate()
+        .removeAlpha()
+        .greyscale()
+        .resize(ANALYSIS_MAX_SIDE, ANALYSIS_MAX_SIDE, { fit: 'inside', withoutEnlargement: true, kernel: 'linear' })
+        .raw()
+        .toBuffer({ resolveWithObject: true });
+}
+
+// 9x8 dHash of an already decoded raster from decodeGrey
+async function dHashOfRaster(data: Buffer, info: sharp.OutputInfo) {
+    const tiny = await sharp(data, { raw: { width: info.width, height: info.height, channels: info.channels } })
+        .extractChannel(0)
+        .resize(9, 8, { fit: 'fill' })
+        .raw()
+        .toBuffer();
+    return dHashFromGrey(tiny);
+}
+
+// The dHash of an image, HASH_VERSION. Upload (ingestImage) and QA (calculatePHash) both
+// hash this way, so their hashes compare
+export async function dHashOf(input: Buffer | string): Promise<string> {
+    const { data, info } = await decodeGrey(input);
+    return dHashOfRaster(data, info);
+}
+
+// Oriented, downscaled greyscale decode plus the QA metrics of it.
+// Also used by detectBlur (lib/qa.ts), so fallback blur scores share the ingest/worker scale.
+export async function analyseGrey(input: Buffer | string) {
+    const { data, info } = await decodeGrey(input);
+    const grey = new Float32Array(info.width * info.height);
+    for (let i = 0, p = 0; i < grey.length; i++, p += info.channels) grey[i] = data[p];
+    return { data, info, metrics: greyMetrics(grey, info.width, info.height) };
+}
+
+/**
+ * Decodes an uploaded image once and returns its hashes, metrics and geometry.
+ * metadata() only parses the header; the single pixel decode is an oriented,
+ * downscaled greyscale raster (JPEG shrink-on-load applies), which both the
+ * metrics and the 9x8 dHash are computed from.
+ */
+export async function ingestImage(buffer: Buffer): Promise<IngestResult> {
+    const contentHash = crypto.createHash('sha256').update(buffer).digest('hex');
+
+    const meta = await sharp(buffer).metadata();
+    if (!meta.width || !meta.height) throw new Error('Invalid image metadata');
+    const orientation = meta.orientation || 1;
+    // Orientations 5-8 rotate by 90 degrees, swapping the stored axes
+    const swap = orientation >= 5;
+    const width = swap ? meta.height : meta.width;
+    const height = swap ? meta.width : meta.height;
+
+    const { data, info, metrics } = await analyseGrey(buffer);
+
+    return {
+        contentHash,
+        // Same as dHashOf, but from the raster already decoded for the metrics
+        hash: await dHashOfRaster(data, info),
+        width,
+        height,
+        orientation,
+        blurScore: Math.round(metrics.laplacianVar),
+        isBlurry: metrics.laplacianVar < BLUR_THRESHOLD,
+        qa: { source: 'ingest', version: QA_METRICS_VERSION, contentHash, width, height, ...metrics }
+    };
+}
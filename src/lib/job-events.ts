@@ -0,0 +1,78 @@
+// Browser side of the job event bus (see lib/jobs.ts): follows a job over
+// Server-Sent Events and falls back to polling its JSON endpoint if the
+// stream can't be opened (old browser, proxy that buffers event streams).
+
+const POLL_INTERVAL_MS = 1000;
+const TERMINAL_STATUSES = new Set(['completed', 'done', 'error', 'failed', 'cancelled']);
+
+export interface JobSubscription {
+    eventsUrl: string;
+    pollUrl: string;
+    onState: (job: any) => void;
+}
+
+// Returns an unsubscribe function. onState stops being called after a terminal status.
+export function followJob({ eventsUrl, pollUrl, onState }: JobSubscription): () => void {
+    let stopped = false;
+    let source: EventSource | null = null;
+    let pollTimer: ReturnType<typeof setInterval> | null = null;
+
+    const stop = () => {
+        stopped = true;
+        source?.close();
+        source = null;
+        if (pollTimer) clearInterval(pollTimer);
+        pollTimer = null;
+    };
+
+    const deliver = (job: any) => {
+        if (stopped) return;
+        const terminal = TERMINAL_STATUSES.has(job?.status);
+        // Stop first so the browser doesn't reconnect when the server ends the stream
+        if (terminal) stop();
+        onState(job);
+    };
+
+    const startPolling = () => {
+        if (stopped || pollTimer) return;
+        pollTimer = setInterval(async () => {
+            try {
+                const res = await fetch(pollUrl);
+                if (res.ok) deliver(await res.json());
+                // Unknown job (the events route 404s too, which is how we got here): end as an error
+                else if (res.status === 404) deliver({ status: 'error', error: 'Job not found' });
+            } catch (e) {
+                console.error('Poll error', e);
+            }
+        }, POLL_INTERVAL_MS);
+    };
+
+    if (typeof EventSource === 'undefined') {
+        startPolling();
+        return stop;
+    }
+
+    let opened = false;
+    source = new EventSource(eventsUrl);
+    source.onopen = () => {
+        opened = true;
+    };
+    source.onmessage = (event) => {
+        try {
+            deliver(JSON.parse(event.data));
+        } catch (e) {
+            console.error('Bad job event', e);
+        }
+    };
+    source.onerror = () => {
+        // A stream that never opened won't work on retry either; EventSource
+        // reconnects on its own after a drop, so only fall back in the first case.
+        if (!opened && source) {
+            source.close();
+            source = null;
+            startPolling();
+        }
+    };
+
+    return stop;
+}
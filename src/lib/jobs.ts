@@ -0,0 +1,236 @@
+import fs from 'fs/promises';
+
+// Background jobs publish progress to an in-process event bus. The UI subscribes over
+// Server-Sent Events (jobEventStream), so job files are only a durable snapshot:
+// written every few seconds while running and once more on completion.
+export const JOB_WRITE_INTERVAL_MS = 5000;
+// Bursts of updates (e.g. one per image) reach subscribers at most this often
+export const JOB_EVENT_INTERVAL_MS = 100;
+// Finished jobs stay in memory this long, so late subscribers/pollers skip the disk
+const JOB_RETAIN_MS = 60_000;
+const SSE_HEARTBEAT_MS = 15_000;
+
+const TERMINAL_STATUSES = new Set(['completed', 'done', 'error', 'failed', 'cancelled']);
+
+type JobListener = (json: string, done: boolean) => void;
+
+interface JobChannel {
+    latest: unknown;
+    json: string | null; // Serialized latest state, as last published
+    listeners: Set<JobListener>;
+    timer: NodeJS.Timeout | null;
+    done: boolean;
+    expiry: NodeJS.Timeout | null;
+}
+
+// Kept on globalThis so route modules (and dev-mode reloads) share one bus
+const globalForJobs = globalThis as unknown as { jobChannels?: Map<string, JobChannel> };
+const channels = globalForJobs.jobChannels ??= new Map<string, JobChannel>();
+
+export function isTerminalJobStatus(status: unknown) {
+    return typeof status === 'string' && TERMINAL_STATUSES.has(status);
+}
+
+function getChannel(jobPath: string): JobChannel {
+    let channel = channels.get(jobPath);
+    if (!channel) {
+        channel = { latest: null, json: null, listeners: new Set(), timer: null, done: false, expiry: null };
+        channels.set(jobPath, channel);
+    }
+    return channel;
+}
+
+function emit(jobPath: string, channel: JobChannel) {
+    if (channel.timer) {
+        clearTimeout(channel.timer);
+        channel.timer = null;
+    }
+    // Serialize at emit time so mutable state objects capture their latest values
+    const json = JSON.stringify(channel.latest);
+    channel.done = isTerminalJobStatus((channel.latest as { status?: unknown } | null)?.status);
+    if (json === channel.json && !channel.done) return;
+    channel.json = json;
+
+    for (const listener of channel.listeners) {
+        try {
+            listener(json, channel.done);
+        } catch (e) {
+            console.error(`Job listener failed for ${jobPath}`, e);
+        }
+    }
+
+    if (channel.expiry) {
+        clearTimeout(channel.expiry);
+        channel.expiry = null;
+    }
+    if (channel.done) {
+        channel.expiry = setTimeout(() => {
+            if (channels.get(jobPath) === channel && channel.listeners.size === 0) channels.delete(jobPath);
+        }, JOB_RETAIN_MS);
+        channel.expiry.unref?.();
+    }
+}
+
+/**
+ * Publish a job's state to subscribers. Non-immediate updates are coalesced:
+ * at most one event per JOB_EVENT_INTERVAL_MS, carrying the newest state.
+ */
+export function publishJob(jobPath: string, state: unknown, immediate = false) {
+    const channel = getChannel(jobPath);
+    channel.latest = state;
+    if (immediate) {
+        emit(jobPath, channel);
+    } else if (!channel.timer) {
+        channel.timer = setTimeout(() => emit(jobPath, channel), JOB_EVENT_INTERVAL_MS);
+    }
+}
+
+// Latest in-memory state of a job (as JSON), or null if this process isn't tracking it
+export function getJobJson(jobPath: string): string | null {
+    const channel = channels.get(jobPath);
+    if (!channel || channel.latest === null) return null;
+    return channel.timer ? JSON.stringify(channel.latest) : channel.json;
+}
+
+// Current job state: memory first, then the persisted job file
+export async function readJobState<T = any>(jobPath: string): Promise<T | null> {
+    const json = getJobJson(jobPath);
+    if (json !== null) return JSON.parse(json);
+    try {
+        return JSON.parse(await fs.readFile(jobPath, 'utf-8'));
+    } catch {
+        return null;
+    }
+}
+
+export function subscribeJob(jobPath: string, listener: JobListener): () => void {
+    const channel = getChannel(jobPath);
+    channel.listeners.add(listener);
+    return () => {
+        channel.listeners.delete(listener);
+        if (channel.listeners.size === 0 && channel.latest === null && channels.get(jobPath) === channel) {
+            channels.delete(jobPath);
+        }
+    };
+}
+
+/**
+ * Server-Sent Events response for a job: sends the current state, then every
+ * published update, and closes once the job reaches a terminal status.
+ * `fallback` is sent when the job has no state yet (e.g. { status: 'idle' }).
+ */
+export function jobEventStream(jobPath: string, signal: AbortSignal, fallback?: unknown): Response {
+    const encoder = new TextEncoder();
+    let cleanup = () => { };
+
+    const stream = new ReadableStream<Uint8Array>({
+        async start(controller) {
+            let closed = false;
+            const send = (chunk: string) => {
+                if (!closed) controller.enqueue(encoder.encode(chunk));
+            };
+            const sendState = (json: string) => send(`data: ${json}\n\n`);
+
+            // Subscribe before reading the current state so nothing published in between is lost
+            let lastSent: string | null = null;
+            const unsubscribe = subscribeJob(jobPath, (json, done) => {
+                if (json !== lastSent) {
+                    lastSent = json;
+                    sendState(json);
+                }
+                if (done) close();
+            });
+            const heartbeat = setInterval(() => send(': ping\n\n'), SSE_HEARTBEAT_MS);
+
+            cleanup = () => {
+                if (closed) return;
+                closed = true;
+                unsubscribe();
+                clearInterval(heartbeat);
+                signal.removeEventListener('abort', close);
+            };
+            function close() {
+                if (closed) return;
+                cleanup();
+                try {
+                    controller.close();
+                } catch {
+                    // Already closed by the client
+                }
+            }
+            signal.addEventListener('abort', close);
+
+            const current = await readJobState(jobPath) ?? fallback;
+            if (current === undefined || current === null || closed || lastSent !== null) return;
+            lastSent = JSON.stringify(current);
+            sendState(lastSent);
+            if (isTerminalJobStatus((current as { status?: unknown }).status)) close();
+        },
+        cancel() {
+            cleanup();
+        }
+    });
+
+    return new Response(stream, {
+        headers: {
+            'Content-Type': 'text/event-stream; charset=utf-8',
+            'Cache-Control': 'no-cache, no-transform',
+            'Connection': 'keep-alive',
+            'X-Accel-Buffering': 'no'
+        }
+    });
+}
+
+export interface JobWriter<T> {
+    // Record the latest state: published to subscribers right away (coalesced),
+    // persisted to disk at most once per interval.
+    update(state: T): void;
+    // Publish and write immediately (e.g. on completion), cancelling any pending write.
+    flush(state?: T): Promise<void>;
+}
+
+export function createJobWriter<T>(jobPath: string, intervalMs: number = JOB_WRITE_INTERVAL_MS): JobWriter<T> {
+    let pending: T | null = null;
+    let timer: NodeJS.Timeout | null = null;
+    // Serialize writes so a slow write never lands after a newer one
+    let writing: Promise<void> = Promise.resolve();
+
+    const write = (state: T) => {
+        // Serialize at write time so mutable state objects capture their latest values
+        writing = writing
+            .then(() => fs.writeFile(jobPath, JSON.stringify(state, null, 2)))
+            .catch(e => console.error(`Failed to write job file ${jobPath}`, e));
+        return writing;
+    };
+
+    return {
+        update(state: T) {
+            publishJob(jobPath, state);
+            pending = state;
+            if (timer) return;
+            timer = setTimeout(() => {
+                timer = null;
+                if (pending !== null) {
+                    const next = pending;
+                    pending = null;
+                    write(next);
+                }
+            }, intervalMs);
+        },
+
+        async flush(state?: T) {
+            if (timer) {
+                clearTimeout(timer);
+                timer = null;
+            }
+            const next = state ?? pending;
+            pending = null;
+            if (next !== null && next !== undefined) {
+                publishJob(jobPath, next, true);
+                await write(next);
+            } else {
+                await writing;
+            }
+        }
+    };
+}
@@ -1,46 +1,149 @@
-import fs from 'fs/promises';
+import { existsSync, readFileSync, readdirSync, renameSync } from 'fs';
 import path from 'path';
+import Database from 'better-sqlite3';
 import { v4 as uuidv4 } from 'uuid';
 import { ProjectManifest, ManifestItem } from '@/types';
-import { getProject } from './projects';
 
 const PROJECTS_DIR = path.join(process.cwd(), 'projects');
 
+// Manifest rows live in projects/<id>/manifest.db (SQLite, WAL mode).
+// Indexed columns are copied out of the item JSON so lookups by id/stage/groupKey/hash
+// don't need to parse every row. scripts/manifest_store.py uses the same schema.
+const MANIFEST_DB = 'manifest.db';
+const SCHEMA_VERSION = 1;
+// How long a writer waits for another process (e.g. a Python worker) to release the lock
+const BUSY_TIMEOUT_MS = 5000;
+
+const SCHEMA = `
+CREATE TABLE IF NOT EXISTS items (
+    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+    id TEXT NOT NULL UNIQUE,
+    stage TEXT NOT NULL,
+    path TEXT NOT NULL,
+    group_key TEXT,
+    hash TEXT,
+    data TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_items_stage ON items(stage);
+CREATE INDEX IF NOT EXISTS idx_items_group_key ON items(group_key);
+CREATE INDEX IF NOT EXISTS idx_items_hash ON items(hash);
+CREATE INDEX IF NOT EXISTS idx_items_path ON items(path);
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+`;
+
+const UPSERT_SQL = `
+INSERT INTO items (id, stage, path, group_key, hash, data)
+VALUES (@id, @stage, @path, @group_key, @hash, @data)
+ON CONFLICT(id) DO UPDATE SET
+    stage = excluded.stage,
+    path = excluded.path,
+    group_key = excluded.group_key,
+    hash = excluded.hash,
+    data = excluded.data
+WHERE items.data != excluded.data
+`;
+
+const stores = new Map<string, Database.Database>();
+
+export interface ManifestQuery {
+    stage?: ManifestItem['stage'];
+    groupKey?: string;
+    hash?: string;
+}
+
 export async function getManifestPath(projectId: string) {
     return path.join(PROJECTS_DIR, projectId, 'manifest.json');
 }
 
-export async function getManifest(projectId: string): Promise<ProjectManifest> {
-    const manifestPath = await getManifestPath(projectId);
-    try {
-        const data = await fs.readFile(manifestPath, 'utf-8');
-        return JSON.parse(data);
-    } catch {
-        // If no manifest, try to create one from raw files (bootstrap)
-        return await bootstrapManifest(projectId);
-    }
+export function getManifestDbPath(projectId: string) {
+    return path.join(PROJECTS_DIR, projectId, MANIFEST_DB);
 }
 
-export async function saveManifest(projectId: string, manifest: ProjectManifest) {
-    const manifestPath = await getManifestPath(projectId);
-    await fs.writeFile(manifestPath, JSON.stringify(manifest, null, 2));
+function toRow(item: ManifestItem) {
+    return {
+        id: item.id,
+        stage: item.stage,
+        path: item.path,
+        group_key: item.groupKey ?? null,
+        hash: item.hash ?? null,
+        data: JSON.stringify(item)
+    };
 }
 
-async function bootstrapManifest(projectId: string): Promise<ProjectManifest> {
+function fromRows(rows: unknown[]): ManifestItem[] {
+    return (rows as { data: string }[]).map(r => JSON.parse(r.data));
+}
+
+// Opens (and on first use initializes) the project's manifest database.
+// Returns null when the project directory doesn't exist.
+function openStore(projectId: string): Database.Database | null {
+    const cached = stores.get(projectId);
+    if (cached && cached.open) return cached;
+
     const projectDir = path.join(PROJECTS_DIR, projectId);
+    if (!existsSync(projectDir)) return null;
+
+    const db = new Database(path.join(projectDir, MANIFEST_DB));
+    db.pragma('journal_mode = WAL');
+    db.pragma('synchronous = NORMAL');
+    db.pragma(`busy_timeout = ${BUSY_TIMEOUT_MS}`);
+    db.exec(SCHEMA);
+
+    // Migration and bootstrap run in one IMMEDIATE transaction so a concurrent
+    // opener (another request or a Python worker) can't initialize twice.
+    db.transaction(() => {
+        const initialized = db.prepare(`SELECT value FROM meta WHERE key = 'schema_version'`).get();
+        if (initialized) return;
+
+        const upsert = db.prepare(UPSERT_SQL);
+        for (const item of loadInitialItems(projectDir)) {
+            upsert.run(toRow(item));
+        }
+        db.prepare(`INSERT INTO meta (key, value) VALUES ('schema_version', ?)`).run(String(SCHEMA_VERSION));
+    }).immediate();
+
+    // Keep the old JSON around for reference, but out of the way
+    const jsonPath = path.join(projectDir, 'manifest.json');
+    if (existsSync(jsonPath)) {
+        try {
+            renameSync(jsonPath, `${jsonPath}.migrated`);
+        } catch (e) {
+            console.warn(`Could not rename migrated manifest for ${projectId}`, e);
+        }
+    }
+
+    stores.set(projectId, db);
+    return db;
+}
+
+// Items for a fresh store: the legacy manifest.json if present, otherwise one item per raw file
+function loadInitialItems(projectDir: string): ManifestItem[] {
+    const jsonPath = path.join(projectDir, 'manifest.json');
+    if (existsSync(jsonPath)) {
+        try {
+            const legacy: ProjectManifest = JSON.parse(readFileSync(jsonPath, 'utf-8'));
+            console.log(`Migrating ${legacy.items.length} manifest items from manifest.json`);
+            return legacy.items;
+        } catch (e) {
+            console.error(`Failed to parse legacy manifest at ${jsonPath}, bootstrapping from raw/`, e);
+        }
+    }
+    return bootstrapItems(projectDir);
+}
+
+function bootstrapItems(projectDir: string): ManifestItem[] {
     const rawDir = path.join(projectDir, 'raw');
 
     // Ensure raw dir exists
-    try {
-        await fs.access(rawDir);
-    } catch {
-        return { version: 1, items: [] };
-    }
+    if (!existsSync(rawDir)) return [];
 
-    const files = await fs.readdir(rawDir);
+    const files = readdirSync(rawDir);
     const imageFiles = files.filter(f => /\.(jpg|jpeg|png|webp)$/i.test(f));
 
-    const items: ManifestItem[] = imageFiles.map(file => ({
+    return imageFiles.map(file => ({
         id: uuidv4(),
         stage: 'raw',
         src: `/api/images?path=${encodeURIComponent(path.join(rawDir, file))}`,
@@ -48,32 +151,126 @@ async function bootstrapManifest(projectId: string): Promise<ProjectManifest> {
         displayName: file,
         groupKey: file // Group by itself
     }));
+}
 
-    const manifest: ProjectManifest = {
-        version: 1,
-        items
-    };
+export async function getManifest(projectId: string): Promise<ProjectManifest> {
+    const db = openStore(projectId);
+    if (!db) return { version: 1, items: [] };
 
-    await saveManifest(projectId, manifest);
-    return manifest;
+    const rows = db.prepare('SELECT data FROM items ORDER BY seq').all();
+    return { version: 1, items: fromRows(rows) };
+}
+
+// Replaces the manifest with `manifest.items` in one transaction.
+// Unchanged rows are not rewritten, and existing items keep their position.
+export async function saveManifest(projectId: string, manifest: ProjectManifest) {
+    const db = openStore(projectId);
+    if (!db) throw new Error('Project not found');
+
+    const upsert = db.prepare(UPSERT_SQL);
+    const remove = db.prepare('DELETE FROM items WHERE id = ?');
+
+    db.transaction(() => {
+        const keep = new Set(manifest.items.map(i => i.id));
+        const existing = db.prepare('SELECT id FROM items').pluck().all() as string[];
+        for (const id of existing) {
+            if (!keep.has(id)) remove.run(id);
+        }
+        for (const item of manifest.items) {
+            upsert.run(toRow(item));
+        }
+    }).immediate();
 }
 
 export async function addToManifest(projectId: string, newItems: ManifestItem[]) {
-    // We need to lock this ideally, but for simple MVP fs is file
-    const manifest = await getManifest(projectId);
+    const db = openStore(projectId);
+    if (!db) throw new Error('Project not found');
+
+    // Skip items whose path is already tracked, to avoid double adding on re-runs
+    const hasPath = db.prepare('SELECT 1 FROM items WHERE path = ? LIMIT 1').pluck();
+    const upsert = db.prepare(UPSERT_SQL);
+
+    db.transaction(() => {
+        for (const item of newItems) {
+            if (!hasPath.get(item.path)) upsert.run(toRow(item));
+        }
+    }).immediate();
+}
+
+export async function getManifestItem(projectId: string, itemId: string): Promise<ManifestItem | null> {
+    const db = openStore(projectId);
+    if (!db) return null;
 
-    // Merge: If item with same path exists, update it? 
-    // Or just append? User said: "augmented filenames to be literally 2.png next to 1.png".
-    // We append.
+    const row = db.prepare('SELECT data FROM items WHERE id = ?').get(itemId);
+    return row ? fromRows([row])[0] : null;
+}
 
-    // Check for duplicates based on path to avoid double adding on re-runs if we don't clear
-    const existingPaths = new Set(manifest.items.map(i => i.path));
-    const uniqueNewItems = newItems.filter(i => !existingPaths.has(i.path));
+// Indexed lookup; all given filters must match. Results are in manifest order.
+export async function queryManifest(projectId: string, query: ManifestQuery = {}): Promise<ManifestItem[]> {
+    const db = openStore(projectId);
+    if (!db) return [];
 
-    manifest.items.push(...uniqueNewItems);
+    const clauses: string[] = [];
+    const params: string[] = [];
+    if (query.stage) { clauses.push('stage = ?'); params.push(query.stage); }
+    if (query.groupKey) { clauses.push('group_key = ?'); params.push(query.groupKey); }
+    if (query.hash) { clauses.push('hash = ?'); params.push(query.hash); }
 
-    // Save
-    await saveManifest(projectId, manifest);
+    const where = clauses.length > 0 ? `WHERE ${clauses.join(' AND ')}` : '';
+    const rows = db.prepare(`SELECT data FROM items ${where} ORDER BY seq`).all(...params);
+    return fromRows(rows);
+}
+
+/**
+ * Applies shallow patches to individual items in a single transaction.
+ * Each row is read and written inside the transaction, so concurrent writers
+ * touching other items (or other fields) are never clobbered.
+ * Returns the number of items updated.
+ */
+export async function updateManifestItems(
+    projectId: string,
+    patches: { id: string; patch: Partial<ManifestItem> }[]
+): Promise<number> {
+    const db = openStore(projectId);
+    if (!db) throw new Error('Project not found');
+
+    const select = db.prepare('SELECT data FROM items WHERE id = ?');
+    const upsert = db.prepare(UPSERT_SQL);
+
+    return db.transaction(() => {
+        let updated = 0;
+        for (const { id, patch } of patches) {
+            const row = select.get(id);
+            if (!row) continue;
+            const item = { ...fromRows([row])[0], ...patch, id };
+            upsert.run(toRow(item));
+            updated++;
+        }
+        return updated;
+    }).immediate();
+}
+
+export async function updateManifestItem(projectId: string, itemId: string, patch: Partial<ManifestItem>) {
+    return (await updateManifestItems(projectId, [{ id: itemId, patch }])) > 0;
+}
+
+export async function removeManifestItems(projectId: string, itemIds: string[]) {
+    const db = openStore(projectId);
+    if (!db) return;
+
+    const remove = db.prepare('DELETE FROM items WHERE id = ?');
+    db.transaction(() => {
+        for (const id of itemIds) remove.run(id);
+    }).immediate();
+}
+
+// Releases the connection, e.g. before deleting the project directory
+export function closeManifest(projectId: string) {
+    const db = stores.get(projectId);
+    if (db) {
+        stores.delete(projectId);
+        if (db.open) db.close();
+    }
 }
 
 // Sorting logic helper
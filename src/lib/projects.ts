@@ -2,7 +2,12 @@ import fs from 'fs/promises';
 import path from 'path';
 import { v4 as uuidv4 } from 'uuid';
 import { Project, ProjectSettings, ProjectStats } from '@/types';
-import AdmZip from 'adm-zip';
+import { createZipStream, extractZipEntry, listZipEntries, readZipEntry, ZipEntry } from './zip';
+import { mapWithConcurrency } from './concurrency';
+import { closeManifest } from './manifest';
+import { closeCaptionStore } from './captions';
+import { closeTagIndex } from './tag-index';
+import { refreshStatsIndex, setStatsChangeHandler, unwatchProjectStats } from './stats-index';
 
 
 
@@ -38,57 +43,9 @@ export async function getProjects(): Promise<Project[]> {
     return projects.sort((a, b) => new Date(b.updatedAt).getTime() - new Date(a.updatedAt).getTime());
 }
 
+// Served from the persisted stats index; only folders that changed since the last call are re-read
 export async function getProjectStats(projectId: string): Promise<ProjectStats> {
-    const projectDir = path.join(PROJECTS_DIR, projectId);
-
-    const countFiles = async (dir: string) => {
-        try {
-            const files = await fs.readdir(dir);
-            return files.filter(f => /\.(jpg|jpeg|png|webp)$/i.test(f)).length;
-        } catch { return 0; }
-    };
-
-    const countTxt = async (dir: string) => {
-        try {
-            const files = await fs.readdir(dir);
-            return files.filter(f => f.endsWith('.txt')).length;
-        } catch { return 0; }
-    };
-
-    return {
-        total: await countFiles(path.join(projectDir, 'raw')),
-        // Update crop count to count all crop variants in subdirectories
-        cropped: await (async () => {
-            try {
-                const cropDir = path.join(projectDir, 'cropped');
-                const entries = await fs.readdir(cropDir, { withFileTypes: true });
-                let count = 0;
-                for (const entry of entries) {
-                    if (entry.isDirectory()) {
-                        // It's a directory for a raw image, count crops inside
-                        const subDir = path.join(cropDir, entry.name);
-                        const subFiles = await fs.readdir(subDir);
-                        count += subFiles.filter(f => /\.(jpg|jpeg|png|webp)$/i.test(f)).length;
-                    } else if (/\.(jpg|jpeg|png|webp)$/i.test(entry.name)) {
-                        // Legacy flat file support
-                        count++;
-                    }
-                }
-                return count;
-            } catch { return 0; }
-        })(),
-        augmented: await countFiles(path.join(projectDir, 'augmented')),
-        processed: await countFiles(path.join(projectDir, 'resized')),
-        captions: await countTxt(path.join(projectDir, 'resized')),
-        outputs: await (async () => {
-            try {
-                const outputsDir = path.join(projectDir, 'train_outputs');
-                const files = await fs.readdir(outputsDir);
-                // Filter out dotfiles/directories if needed, or just count
-                return files.filter(f => !f.startsWith('.')).length;
-            } catch { return 0; }
-        })()
-    };
+    return refreshStatsIndex(projectId);
 }
 
 export async function getProject(id: string): Promise<Project | null> {
@@ -159,33 +116,23 @@ export async function updateProjectStats(id: string) {
     const project = await getProject(id);
     if (!project) return;
 
-    const projectDir = path.join(PROJECTS_DIR, id);
-
-    const rawFiles = await fs.readdir(path.join(projectDir, 'raw')).catch(() => []);
-    const augmentedFiles = await fs.readdir(path.join(projectDir, 'augmented')).catch(() => []);
-    const croppedFiles = await fs.readdir(path.join(projectDir, 'cropped')).catch(() => []);
-    const resizedFiles = await fs.readdir(path.join(projectDir, 'resized')).catch(() => []);
-
-    // Basic count of text files in resized for captions (assuming .txt)
-    const captionFiles = resizedFiles.filter(f => f.endsWith('.txt'));
-    const resizedImages = resizedFiles.filter(f => f.endsWith('.png') || f.endsWith('.jpg'));
+    await updateProject(id, { stats: await refreshStatsIndex(id) });
+}
 
-    await updateProject(id, {
-        stats: {
-            total: rawFiles.length,
-            cropped: croppedFiles.length,
-            augmented: augmentedFiles.length,
-            processed: resizedImages.length,
-            captions: captionFiles.length,
-            outputs: await (async () => {
-                try {
-                    const files = await fs.readdir(path.join(projectDir, 'train_outputs'));
-                    return files.filter(f => !f.startsWith('.')).length;
-                } catch { return 0; }
-            })()
+// With LORA_BENTO_WATCH_STATS=1, filesystem changes refresh config.json stats on their own.
+// Unlike updateProjectStats this doesn't bump updatedAt unless the counts moved.
+setStatsChangeHandler(async (id) => {
+    try {
+        const project = await getProject(id);
+        if (!project) return;
+        const stats = await refreshStatsIndex(id);
+        if (JSON.stringify(stats) !== JSON.stringify(project.stats)) {
+            await updateProject(id, { stats });
         }
-    });
-}
+    } catch (e) {
+        console.error(`Failed to refresh stats for ${id}`, e);
+    }
+});
 
 export async function renameProject(id: string, newName: string): Promise<Project> {
     return updateProject(id, { name: newName });
@@ -193,11 +140,16 @@ export async function renameProject(id: string, newName: string): Promise<Projec
 
 export async function deleteProject(id: string): Promise<void> {
     const projectDir = path.join(PROJECTS_DIR, id);
+    // Release the manifest/caption/tag index DB handles first (Windows won't delete open files)
+    closeManifest(id);
+    closeCaptionStore(id);
+    closeTagIndex(id);
+    unwatchProjectStats(id);
     // Recursive delete
     await fs.rm(projectDir, { recursive: true, force: true });
 }
 
-export async function exportProjectZip(id: string): Promise<Buffer> {
+export async function exportProjectZip(id: string): Promise<ReadableStream<Uint8Array>> {
     const project = await getProject(id);
     if (!project) throw new Error('Project not found');
 
@@ -211,63 +163,90 @@ export async function exportProjectZip(id: string): Promise<Buffer> {
         throw new Error('train_data folder not found. Please run captioning first.');
     }
 
-    const zip = new AdmZip();
-
     // Read all files from train_data/
     const files = await fs.readdir(trainDataDir);
 
-    for (const file of files) {
-        const filePath = path.join(trainDataDir, file);
-        const stats = await fs.stat(filePath);
+    // Entries are produced lazily so each file is stat'ed and streamed as the response drains
+    async function* entries(): AsyncGenerator<ZipEntry> {
+        for (const file of files) {
+            const filePath = path.join(trainDataDir, file);
+            const stats = await fs.stat(filePath);
+
+            if (!stats.isFile()) continue;
+
+            // Separate images and captions into appropriate folders
+            if (file.endsWith('.txt')) {
+                // Add to dataset/captions/
+                yield { name: `dataset/captions/${file}`, filePath, mtime: stats.mtime };
+            } else if (/\.(jpg|jpeg|png|webp)$/i.test(file)) {
+                // Add to dataset/images/
+                yield { name: `dataset/images/${file}`, filePath, mtime: stats.mtime };
+            }
+        }
+    }
 
-        if (!stats.isFile()) continue;
+    return createZipStream(entries());
+}
 
-        const fileBuffer = await fs.readFile(filePath);
+export interface ProjectImportProgress {
+    processed: number; // Entries
+    total: number;
+    bytes: number; // Uncompressed bytes written
+    totalBytes: number;
+    current: string;
+}
 
-        // Separate images and captions into appropriate folders
-        if (file.endsWith('.txt')) {
-            // Add to dataset/captions/
-            zip.addFile(`dataset/captions/${file}`, fileBuffer);
-        } else if (/\.(jpg|jpeg|png|webp)$/i.test(file)) {
-            // Add to dataset/images/
-            zip.addFile(`dataset/images/${file}`, fileBuffer);
-        }
-    }
+const IMPORT_CONCURRENCY = 4;
 
-    return zip.toBuffer();
+// Maps an archive entry name to its path under root, or null for names that would escape it
+function resolveEntryPath(root: string, name: string): string | null {
+    const normalized = name.replace(/\\/g, '/');
+    if (normalized.startsWith('/') || /^[a-zA-Z]:/.test(normalized) || normalized.includes('\0')) return null;
+    const parts = normalized.split('/').filter(p => p && p !== '.');
+    if (parts.length === 0 || parts.includes('..')) return null;
+    const target = path.resolve(root, ...parts);
+    return target.startsWith(root + path.sep) ? target : null;
 }
 
-export async function importProjectZip(zipBuffer: Buffer): Promise<Project> {
+/**
+ * Imports a project backup from a ZIP file on disk. The central directory is read
+ * first to validate the archive and find config.json, then entries are streamed
+ * straight to their project paths a few at a time, so memory use doesn't grow with
+ * the archive. Entries with unsafe paths (absolute, "..") are skipped.
+ */
+export async function importProjectZipFile(zipPath: string, onProgress?: (progress: ProjectImportProgress) => void): Promise<Project> {
     await ensureDir(PROJECTS_DIR); // Ensure projects dir exists
 
     // We need to inspect the zip before extracting to determine ID / validity
-    const zip = new AdmZip(zipBuffer);
-    const zipEntries = zip.getEntries();
+    const zipEntries = await listZipEntries(zipPath);
 
-    // Validate: look for config.json
-    const configEntry = zipEntries.find(entry => entry.entryName === 'config.json' || entry.entryName.endsWith('/config.json'));
+    // Validate: look for config.json (the shallowest one, in case the backup has a top-level folder)
+    const configEntry = zipEntries
+        .filter(entry => entry.name === 'config.json' || entry.name.endsWith('/config.json'))
+        .sort((a, b) => a.name.length - b.name.length)[0];
 
     if (!configEntry) {
         throw new Error('Invalid project zip: config.json not found');
     }
+    const prefix = configEntry.name.slice(0, -'config.json'.length);
 
     // Read config to extract ID (or generate new one if we want to avoid collisions, but user asked for "restore" or "import")
     // "either keep original projectId if no collision or generate new projectId"
-    // Let's read the config first.
-    const configContent = configEntry.getData().toString('utf8');
     let projectConfig: Project;
     try {
-        projectConfig = JSON.parse(configContent);
+        projectConfig = JSON.parse((await readZipEntry(zipPath, configEntry)).toString('utf8'));
     } catch {
         throw new Error('Invalid project zip: malformed config.json');
     }
+    const originalId = projectConfig.id;
 
     // Check availability
     let finalId = projectConfig.id;
-    let existing = await getProject(finalId);
+    // Any existing folder counts, even one without a config.json
+    const taken = (id: string) => fs.access(path.join(PROJECTS_DIR, id)).then(() => true, () => false);
 
-    // If collision, generate new ID
-    if (existing) {
+    // If collision (or the id isn't a plain folder name), generate new ID
+    if (typeof finalId !== 'string' || !/^[\w-]+$/.test(finalId) || await taken(finalId)) {
         finalId = uuidv4();
         projectConfig.id = finalId;
         // We might need to rewrite other ID refs if they existed, but for now ID is mainly in config.
@@ -276,11 +255,37 @@ export async function importProjectZip(zipBuffer: Buffer): Promise<Project> {
     const projectDir = path.join(PROJECTS_DIR, finalId);
     await ensureDir(projectDir);
 
-    // Extract all
-    zip.extractAllTo(projectDir, true);
+    // Only entries under the config's folder belong to the project
+    const files = zipEntries.filter(entry => !entry.isDirectory && entry.name.startsWith(prefix));
+    const progress: ProjectImportProgress = {
+        processed: 0,
+        total: files.length,
+        bytes: 0,
+        totalBytes: files.reduce((sum, entry) => sum + entry.uncompressedSize, 0),
+        current: ''
+    };
+
+    try {
+        await mapWithConcurrency(files, IMPORT_CONCURRENCY, async (entry) => {
+            const dest = resolveEntryPath(projectDir, entry.name.slice(prefix.length));
+            if (dest) {
+                await extractZipEntry(zipPath, entry, dest);
+            } else {
+                console.warn(`Skipping unsafe zip entry: ${entry.name}`);
+            }
+            progress.processed++;
+            progress.bytes += entry.uncompressedSize;
+            progress.current = entry.name;
+            onProgress?.({ ...progress });
+        });
+    } catch (e) {
+        // Don't leave a half-imported project behind
+        await fs.rm(projectDir, { recursive: true, force: true });
+        throw e;
+    }
 
     // If we changed ID, we must update the config.json on disk
-    if (finalId !== JSON.parse(configContent).id) {
+    if (finalId !== originalId) {
         await fs.writeFile(path.join(projectDir, 'config.json'), JSON.stringify(projectConfig, null, 2));
     }
 
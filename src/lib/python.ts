@@ -1,16 +1,24 @@
 import { spawn } from 'child_process';
 import path from 'path';
 
-export async function runPythonScript(scriptName: string, args: string[]): Promise<string> {
+// Resolves with the script's stdout. onLine, if given, also sees each stdout line as it
+// arrives (e.g. to forward PROGRESS: lines while the script runs).
+export async function runPythonScript(scriptName: string, args: string[], onLine?: (line: string) => void): Promise<string> {
     return new Promise((resolve, reject) => {
         const scriptPath = path.join(process.cwd(), 'scripts', scriptName);
         const pythonProcess = spawn('python', [scriptPath, ...args]);
 
         let output = '';
         let errorOutput = '';
+        let partial = '';
 
         pythonProcess.stdout.on('data', (data) => {
-            output += data.toString();
+            const text = data.toString();
+            output += text;
+            if (!onLine) return;
+            const lines = (partial + text).split('\n');
+            partial = lines.pop() || '';
+            lines.forEach(onLine);
         });
 
         pythonProcess.stderr.on('data', (data) => {
@@ -18,6 +26,7 @@ export async function runPythonScript(scriptName: string, args: string[]): Promi
         });
 
         pythonProcess.on('close', (code) => {
+            if (onLine && partial) onLine(partial);
             if (code !== 0) {
                 reject(new Error(`Python script exited with code ${code}: ${errorOutput}`));
             } else {
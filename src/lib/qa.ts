@@ -1,29 +1,18 @@
-import sharp from 'sharp';
-import fs from 'fs/promises';
+import { runPythonScript } from './python';
+import { analyseGrey, BLUR_THRESHOLD, dHashOf } from './ingest';
+
+export interface QaProgress {
+    processed: number;
+    total: number;
+    current: string;
+}
 
 // Simple perceptual hash (dHash equivalent)
-// Resize to 9x8, grayscale. Compare adjacent pixels.
+// Oriented greyscale at analysis size, then 9x8. Compare adjacent pixels.
 export async function calculatePHash(path: string): Promise<string> {
     try {
-        const buffer = await sharp(path)
-            .greyscale()
-            .resize(9, 8, { fit: 'fill' })
-            .raw()
-            .toBuffer();
-
-        let hash = '';
-        // 8 rows
-        for (let y = 0; y < 8; y++) {
-            // 8 cols comparisons (row has 9 pixels)
-            for (let x = 0; x < 8; x++) {
-                const left = buffer[y * 9 + x];
-                const right = buffer[y * 9 + x + 1];
-                hash += left > right ? '1' : '0';
-            }
-        }
-
-        // Convert binary string to hex for compactness
-        return BigInt('0b' + hash).toString(16);
+        // The same helper ingestImage hashes with, so upload and QA hashes compare
+        return await dHashOf(path);
     } catch (e) {
         console.error('Hash calculation failed', e);
         return '0000000000000000'; // fallback
@@ -32,49 +21,32 @@ export async function calculatePHash(path: string): Promise<string> {
 
 // Blur detection using Laplacian Variance
 // Higher variance = sharper edges = less blurry.
-// Lower variance = blurry.
+// Fallback for when the QA worker can't run. Measured like ingest and the worker (signed
+// Laplacian on the oriented image downscaled to 1024px), so scores and the threshold match
+// theirs; the old full-size uint8 convolve scored on a different scale (threshold 300).
 export async function detectBlur(path: string): Promise<{ score: number, isBlurry: boolean }> {
     try {
-        // Greyscale first
-        const image = sharp(path).greyscale();
-
-        // Laplacian kernel
-        const kernel = {
-            width: 3,
-            height: 3,
-            kernel: [0, 1, 0, 1, -4, 1, 0, 1, 0]
-        };
-
-        const { data, info } = await image
-            .convolve(kernel)
-            .raw()
-            .toBuffer({ resolveWithObject: true });
-
-        // Calculate variance
-        let sum = 0;
-        let sumSq = 0;
-        const len = data.length;
-
-        for (let i = 0; i < len; i++) {
-            const val = data[i];
-            sum += val;
-            sumSq += val * val;
-        }
-
-        const mean = sum / len;
-        const variance = (sumSq / len) - (mean * mean);
-
-        // Threshold tuning is tricky.
-        // Usually < 100 is quite blurry. < 300 is soft.
-        // Let's set a conservative threshold.
-        const BLUR_THRESHOLD = 300;
-
+        const { metrics } = await analyseGrey(path);
         return {
-            score: Math.round(variance),
-            isBlurry: variance < BLUR_THRESHOLD
+            score: Math.round(metrics.laplacianVar),
+            isBlurry: metrics.laplacianVar < BLUR_THRESHOLD
         };
     } catch (e) {
         console.error('Blur detection failed', e);
         return { score: 0, isBlurry: false };
     }
 }
+
+// Runs scripts/qa_metrics.py over all raw items of a project.
+// The worker computes blur/exposure/noise/resolution metrics in parallel, caches them
+// per content hash and writes qa, blurScore and flags back to the manifest itself.
+export async function runQaMetricsWorker(projectDir: string, onProgress: (progress: QaProgress) => void): Promise<void> {
+    await runPythonScript('qa_metrics.py', ['--project-dir', projectDir], line => {
+        if (!line.trim().startsWith('PROGRESS:')) return;
+        try {
+            onProgress(JSON.parse(line.replace('PROGRESS:', '').trim()).progress);
+        } catch (e) {
+            console.error('Error parsing QA progress:', e);
+        }
+    });
+}
@@ -0,0 +1,121 @@
+import fs from 'fs/promises';
+import path from 'path';
+import { ManifestItem, ProjectSettings } from '@/types';
+import { getProject } from './projects';
+import { processImage } from './images';
+import { defaultConcurrency, mapWithConcurrency } from './concurrency';
+import { breakLink, ingestFile } from './blobs';
+
+export interface ResizeItemState {
+    status: 'pending' | 'processing' | 'done' | 'error';
+    processedPath?: string;
+    error?: string;
+}
+
+// Everything the resize job needs to know about the project, loaded once up front
+// instead of re-reading config.json / meta.json for every item.
+export interface ResizeContext {
+    projectId: string;
+    projectDir: string;
+    resizedDir: string;
+    skipCrop: boolean;
+    skipCropFiles: Set<string>;
+    activeCrops: Map<string, string>; // raw filename -> absolute path of active crop
+}
+
+export async function loadResizeContext(projectId: string, items: ManifestItem[]): Promise<ResizeContext> {
+    const projectDir = path.join(process.cwd(), 'projects', projectId);
+    const project = await getProject(projectId);
+    const skipCrop = project?.crop?.mode === 'skip';
+
+    const skipCropFiles = new Set<string>();
+    const activeCrops = new Map<string, string>();
+
+    if (skipCrop) {
+        const files = await fs.readdir(path.join(projectDir, 'skip_crop')).catch(() => [] as string[]);
+        files.forEach(f => skipCropFiles.add(f));
+    } else {
+        const rawNames = items.filter(i => i.stage === 'raw').map(i => path.basename(i.path));
+        await mapWithConcurrency(rawNames, 16, async (filename) => {
+            const cropDir = path.join(projectDir, 'cropped', filename);
+            try {
+                const meta = JSON.parse(await fs.readFile(path.join(cropDir, 'meta.json'), 'utf-8'));
+                if (meta.activeCrop) {
+                    activeCrops.set(filename, path.join(cropDir, meta.activeCrop));
+                }
+            } catch {
+                // No crop or meta, stick to raw
+            }
+        });
+    }
+
+    return {
+        projectId,
+        projectDir,
+        resizedDir: path.join(projectDir, 'resized'),
+        skipCrop,
+        skipCropFiles,
+        activeCrops
+    };
+}
+
+// Raw items use their active crop (or skip_crop copy); augmented items are used as-is.
+export function resolveResizeSource(ctx: ResizeContext, item: ManifestItem): string {
+    if (item.stage !== 'raw') return item.path;
+
+    const filename = path.basename(item.path);
+    if (ctx.skipCrop) {
+        if (ctx.skipCropFiles.has(filename)) {
+            return path.join(ctx.projectDir, 'skip_crop', filename);
+        }
+        console.warn(`Skip crop enabled but file not found: ${filename}`);
+        return item.path;
+    }
+    return ctx.activeCrops.get(filename) || item.path;
+}
+
+// Use ID slice to ensure uniqueness even if basenames match (e.g. 1.jpg in raw and 1.png in augmented)
+export function getResizedOutputName(item: ManifestItem): string {
+    const nameWithoutExt = path.parse(path.basename(item.path)).name;
+    return `${nameWithoutExt}_${item.id.slice(0, 8)}.png`;
+}
+
+/**
+ * Resizes and pads every item into resized/ using a bounded worker pool.
+ * `onItem` is called whenever an item changes state so callers can publish progress.
+ * Returns the paths of the outputs that were written.
+ */
+export async function runResizeBatch(
+    items: ManifestItem[],
+    ctx: ResizeContext,
+    settings: ProjectSettings,
+    onItem: (item: ManifestItem, state: ResizeItemState) => void,
+    concurrency: number = defaultConcurrency()
+): Promise<string[]> {
+    const outputs: string[] = [];
+
+    await mapWithConcurrency(items, concurrency, async (item) => {
+        onItem(item, { status: 'processing' });
+
+        try {
+            const outputPath = path.join(ctx.resizedDir, getResizedOutputName(item));
+            // A previous output may be a blob link shared with other stages; write a fresh file
+            await breakLink(outputPath);
+            await processImage(resolveResizeSource(ctx, item), outputPath, settings);
+            // Identical outputs (e.g. re-runs with the same settings) end up as one blob
+            await ingestFile(ctx.projectId, outputPath);
+            outputs.push(outputPath);
+
+            onItem(item, {
+                status: 'done',
+                // Versioned: the file is replaced on every run, and versioned URLs are served as immutable
+                processedPath: `/api/images?path=${encodeURIComponent(outputPath)}&t=${Date.now()}`
+            });
+        } catch (e) {
+            console.error(`Failed to process ${item.displayName}`, e);
+            onItem(item, { status: 'error', error: 'Failed' });
+        }
+    });
+
+    return outputs;
+}
@@ -0,0 +1,229 @@
+import fs from 'fs/promises';
+import { watch, FSWatcher } from 'fs';
+import path from 'path';
+import { ProjectStats } from '@/types';
+import { mapWithConcurrency } from './concurrency';
+
+// Persisted per-project stats index (projects/<id>/.cache/stats.json).
+// Each tracked directory stores its mtime and counts; a refresh only re-reads
+// directories whose mtime changed, so after a job touches a few folders the
+// update costs a handful of stat() calls instead of a readdir of every folder.
+
+const PROJECTS_DIR = path.join(process.cwd(), 'projects');
+const INDEX_VERSION = 1;
+
+// Directories whose children are per-image folders (cropped/<file>/, augmented/<base>_aug/)
+const NESTED_DIRS = ['cropped', 'augmented'];
+const FLAT_DIRS = ['raw', 'resized', 'train_outputs'];
+
+// Set LORA_BENTO_WATCH_STATS=1 to keep stats live via fs.watch instead of relying on callers
+const WATCH_ENABLED = process.env.LORA_BENTO_WATCH_STATS === '1';
+const WATCH_DEBOUNCE_MS = 1000;
+
+const IMAGE_RE = /\.(jpg|jpeg|png|webp)$/i;
+
+interface DirStats {
+    mtimeMs: number;
+    images: number;
+    captions: number;
+    entries: number; // Non-dot entries
+    subdirs?: string[];
+}
+
+interface StatsIndex {
+    version: number;
+    dirs: Record<string, DirStats>;
+}
+
+interface WatchState {
+    watcher: FSWatcher;
+    dirty: boolean;
+    timer: NodeJS.Timeout | null;
+}
+
+const watchers = new Map<string, WatchState>();
+// Serialize refreshes per project so concurrent jobs don't interleave index writes
+const refreshing = new Map<string, Promise<ProjectStats | null>>();
+
+function getIndexPath(projectId: string) {
+    return path.join(PROJECTS_DIR, projectId, '.cache', 'stats.json');
+}
+
+async function loadIndex(projectId: string): Promise<StatsIndex> {
+    try {
+        const index: StatsIndex = JSON.parse(await fs.readFile(getIndexPath(projectId), 'utf-8'));
+        if (index.version === INDEX_VERSION && index.dirs) return index;
+    } catch {
+        // Missing or corrupt: full rescan
+    }
+    return { version: INDEX_VERSION, dirs: {} };
+}
+
+async function saveIndex(projectId: string, index: StatsIndex) {
+    const indexPath = getIndexPath(projectId);
+    await fs.mkdir(path.dirname(indexPath), { recursive: true });
+    const tmpPath = `${indexPath}.${process.pid}.tmp`;
+    await fs.writeFile(tmpPath, JSON.stringify(index));
+    await fs.rename(tmpPath, indexPath);
+}
+
+async function scanDir(absDir: string, mtimeMs: number, nested: boolean): Promise<DirStats> {
+    const entries = await fs.readdir(absDir, { withFileTypes: true });
+    const stats: DirStats = { mtimeMs, images: 0, captions: 0, entries: 0 };
+    if (nested) stats.subdirs = [];
+
+    for (const entry of entries) {
+        if (entry.name.startsWith('.')) continue;
+        stats.entries++;
+        if (entry.isDirectory()) {
+            stats.subdirs?.push(entry.name);
+        } else if (IMAGE_RE.test(entry.name)) {
+            stats.images++;
+        } else if (entry.name.endsWith('.txt')) {
+            stats.captions++;
+        }
+    }
+    return stats;
+}
+
+// Re-reads `rel` (and for nested dirs, each per-image subdir) only if its mtime moved.
+// Returns true if anything in the index changed.
+async function refreshDir(projectDir: string, index: StatsIndex, rel: string, nested: boolean): Promise<boolean> {
+    const absDir = path.join(projectDir, rel);
+    let mtimeMs: number;
+    try {
+        mtimeMs = (await fs.stat(absDir)).mtimeMs;
+    } catch {
+        // Directory gone: drop it and its children
+        const had = Object.keys(index.dirs).filter(k => k === rel || k.startsWith(`${rel}/`));
+        had.forEach(k => delete index.dirs[k]);
+        return had.length > 0;
+    }
+
+    let changed = false;
+    const cached = index.dirs[rel];
+    if (!cached || cached.mtimeMs !== mtimeMs) {
+        index.dirs[rel] = await scanDir(absDir, mtimeMs, nested);
+        changed = true;
+
+        if (nested && cached?.subdirs) {
+            const current = new Set(index.dirs[rel].subdirs);
+            for (const sub of cached.subdirs) {
+                if (!current.has(sub)) delete index.dirs[`${rel}/${sub}`];
+            }
+        }
+    }
+
+    if (nested) {
+        const results = await mapWithConcurrency(index.dirs[rel].subdirs || [], 32, sub =>
+            refreshDir(projectDir, index, `${rel}/${sub}`, false)
+        );
+        changed = changed || results.some(Boolean);
+    }
+
+    return changed;
+}
+
+function computeStats(index: StatsIndex): ProjectStats {
+    const dir = (rel: string) => index.dirs[rel];
+    const nestedImages = (rel: string) => {
+        const top = dir(rel);
+        if (!top) return 0;
+        // Per-image folders, plus legacy flat files at the top level
+        return (top.subdirs || []).reduce((sum, sub) => sum + (dir(`${rel}/${sub}`)?.images || 0), top.images);
+    };
+
+    return {
+        total: dir('raw')?.images || 0,
+        cropped: nestedImages('cropped'),
+        augmented: nestedImages('augmented'),
+        processed: dir('resized')?.images || 0,
+        captions: dir('resized')?.captions || 0,
+        outputs: dir('train_outputs')?.entries || 0
+    };
+}
+
+/**
+ * Brings the stats index up to date and returns the project's counts.
+ * With the watcher enabled and no filesystem events since the last refresh,
+ * this returns straight from the index without touching the project folders.
+ */
+export async function refreshStatsIndex(projectId: string): Promise<ProjectStats> {
+    const previous = refreshing.get(projectId) || Promise.resolve(null);
+    const run = previous.catch(() => null).then(() => refreshIndex(projectId));
+    refreshing.set(projectId, run);
+    try {
+        return await run;
+    } finally {
+        if (refreshing.get(projectId) === run) refreshing.delete(projectId);
+    }
+}
+
+async function refreshIndex(projectId: string): Promise<ProjectStats> {
+    const projectDir = path.join(PROJECTS_DIR, projectId);
+    const index = await loadIndex(projectId);
+    const watchState = ensureWatcher(projectId);
+
+    if (watchState && !watchState.dirty && Object.keys(index.dirs).length > 0) {
+        return computeStats(index);
+    }
+    if (watchState) watchState.dirty = false;
+
+    let changed = false;
+    for (const rel of FLAT_DIRS) {
+        changed = (await refreshDir(projectDir, index, rel, false)) || changed;
+    }
+    for (const rel of NESTED_DIRS) {
+        changed = (await refreshDir(projectDir, index, rel, true)) || changed;
+    }
+
+    if (changed) await saveIndex(projectId, index);
+    return computeStats(index);
+}
+
+// Called after a refresh is triggered by the watcher (set by projects.ts to persist into config.json)
+let onWatchedChange: ((projectId: string) => void) | null = null;
+
+export function setStatsChangeHandler(handler: (projectId: string) => void) {
+    onWatchedChange = handler;
+}
+
+function ensureWatcher(projectId: string): WatchState | null {
+    if (!WATCH_ENABLED) return null;
+    const existing = watchers.get(projectId);
+    if (existing) return existing;
+
+    const projectDir = path.join(PROJECTS_DIR, projectId);
+    const tracked = new Set([...FLAT_DIRS, ...NESTED_DIRS]);
+    try {
+        const state: WatchState = {
+            dirty: true,
+            timer: null,
+            watcher: watch(projectDir, { recursive: true }, (_event, filename) => {
+                // Only events inside tracked folders matter (ignores config.json, .cache, jobs, ...)
+                const top = filename ? filename.toString().split(/[\\/]/)[0] : null;
+                if (top && !tracked.has(top)) return;
+                state.dirty = true;
+                if (state.timer) clearTimeout(state.timer);
+                state.timer = setTimeout(() => {
+                    state.timer = null;
+                    onWatchedChange?.(projectId);
+                }, WATCH_DEBOUNCE_MS);
+            })
+        };
+        state.watcher.on('error', () => unwatchProjectStats(projectId));
+        watchers.set(projectId, state);
+        return state;
+    } catch (e) {
+        console.warn(`Stats watcher unavailable for ${projectId}, falling back to mtime checks`, e);
+        return null;
+    }
+}
+
+export function unwatchProjectStats(projectId: string) {
+    const state = watchers.get(projectId);
+    if (!state) return;
+    if (state.timer) clearTimeout(state.timer);
+    state.watcher.close();
+    watchers.delete(projectId);
+}
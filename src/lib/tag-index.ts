@@ -0,0 +1,366 @@
+import fs from 'fs/promises';
+import path from 'path';
+import Database from 'better-sqlite3';
+import { readCaptions } from './captions';
+
+const PROJECTS_DIR = path.join(process.cwd(), 'projects');
+
+// Inverted tag index: projects/<id>/tag_index.db (SQLite, WAL mode).
+// tag -> images (postings) with a running count per tag, so "tagged X but not Y"
+// is a few indexed set operations instead of reading every caption. Images are
+// keyed like the caption store ("10_class/img.png"). writeCaptions() and the
+// Python CaptionWriter (scripts/tag_index.py, same schema) update it as they
+// write; projects from before the index are indexed on first use.
+const TAG_INDEX_DB = 'tag_index.db';
+const SCHEMA_VERSION = 1;
+const BUSY_TIMEOUT_MS = 5000;
+
+const SCHEMA = `
+CREATE TABLE IF NOT EXISTS images (
+    id INTEGER PRIMARY KEY,
+    key TEXT NOT NULL UNIQUE
+);
+CREATE TABLE IF NOT EXISTS tags (
+    id INTEGER PRIMARY KEY,
+    tag TEXT NOT NULL UNIQUE,
+    count INTEGER NOT NULL DEFAULT 0
+);
+CREATE TABLE IF NOT EXISTS postings (
+    tag_id INTEGER NOT NULL,
+    image_id INTEGER NOT NULL,
+    PRIMARY KEY (tag_id, image_id)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS idx_postings_image ON postings(image_id);
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+`;
+
+const indexes = new Map<string, Database.Database>();
+
+export interface TagCount {
+    tag: string;
+    count: number;
+}
+
+export interface TagQueryResult {
+    total: number;
+    ids: string[]; // Image keys, e.g. "10_class/img.png"
+    tookMs: number;
+}
+
+export class TagQueryError extends Error { }
+
+// "Long Hair" and "long_hair" are the same tag (matches normalize_tag in scripts/tag_index.py)
+export function normalizeTag(tag: string) {
+    return tag.trim().toLowerCase().split(/\s+/).filter(Boolean).join('_');
+}
+
+export function parseTags(text: string | null | undefined): string[] {
+    const tags = (text || '').split(',').map(normalizeTag).filter(Boolean);
+    return [...new Set(tags)];
+}
+
+function openIndex(projectId: string): Database.Database {
+    const cached = indexes.get(projectId);
+    if (cached && cached.open) return cached;
+
+    const db = new Database(path.join(PROJECTS_DIR, projectId, TAG_INDEX_DB));
+    db.pragma('journal_mode = WAL');
+    db.pragma('synchronous = NORMAL');
+    db.pragma(`busy_timeout = ${BUSY_TIMEOUT_MS}`);
+    db.exec(SCHEMA);
+    db.prepare(`INSERT OR IGNORE INTO meta (key, value) VALUES ('schema_version', ?)`).run(String(SCHEMA_VERSION));
+
+    indexes.set(projectId, db);
+    return db;
+}
+
+/**
+ * Replaces the indexed tags of each image in one transaction.
+ * text null removes the image from the index.
+ */
+export function updateTagIndex(projectId: string, entries: { key: string; text: string | null }[]) {
+    const db = openIndex(projectId);
+    const getImage = db.prepare('SELECT id FROM images WHERE key = ?');
+    const insertImage = db.prepare('INSERT INTO images (key) VALUES (?)');
+    const deleteImage = db.prepare('DELETE FROM images WHERE id = ?');
+    const oldTags = db.prepare('SELECT tag_id FROM postings WHERE image_id = ?').pluck();
+    const deletePostings = db.prepare('DELETE FROM postings WHERE image_id = ?');
+    const insertTag = db.prepare('INSERT OR IGNORE INTO tags (tag) VALUES (?)');
+    const getTag = db.prepare('SELECT id FROM tags WHERE tag = ?').pluck();
+    const insertPosting = db.prepare('INSERT INTO postings (tag_id, image_id) VALUES (?, ?)');
+    const addCount = db.prepare('UPDATE tags SET count = count + ? WHERE id = ?');
+
+    db.transaction(() => {
+        const tagIds = new Map<string, number>();
+        // Counts are applied once per tag rather than once per posting
+        const deltas = new Map<number, number>();
+        const bump = (tagId: number, by: number) => deltas.set(tagId, (deltas.get(tagId) ?? 0) + by);
+
+        for (const { key, text } of entries) {
+            const existing = getImage.get(key) as { id: number } | undefined;
+            let imageId: number;
+            if (existing) {
+                imageId = existing.id;
+                for (const tagId of oldTags.all(imageId) as number[]) bump(tagId, -1);
+                deletePostings.run(imageId);
+                if (text === null) {
+                    deleteImage.run(imageId);
+                    continue;
+                }
+            } else if (text === null) {
+                continue;
+            } else {
+                imageId = Number(insertImage.run(key).lastInsertRowid);
+            }
+
+            for (const tag of parseTags(text)) {
+                let tagId = tagIds.get(tag);
+                if (tagId === undefined) {
+                    insertTag.run(tag);
+                    tagId = getTag.get(tag) as number;
+                    tagIds.set(tag, tagId);
+                }
+                insertPosting.run(tagId, imageId);
+                bump(tagId, 1);
+            }
+        }
+
+        for (const [tagId, by] of deltas) {
+            if (by !== 0) addCount.run(by, tagId);
+        }
+    }).immediate();
+}
+
+// Drops indexed images (all, or one train_data folder)
+export function clearTagIndex(projectId: string, folder?: string) {
+    const db = openIndex(projectId);
+    db.transaction(() => {
+        if (folder) {
+            const keys = db.prepare(`SELECT key FROM images WHERE key >= ? AND key < ?`).all(`${folder}/`, `${folder}0`) as { key: string }[];
+            updateTagIndex(projectId, keys.map(({ key }) => ({ key, text: null })));
+        } else {
+            db.exec('DELETE FROM postings; DELETE FROM images; DELETE FROM tags;');
+        }
+        db.prepare(`DELETE FROM meta WHERE key = 'built_at'`).run();
+    })();
+}
+
+/**
+ * Re-indexes every train_data folder from the captions (store or sidecars).
+ * Needed once for projects captioned before the index existed, or after
+ * sidecars were edited outside the app. Returns the number of images indexed.
+ */
+export async function rebuildTagIndex(projectId: string): Promise<number> {
+    const trainDataDir = path.join(PROJECTS_DIR, projectId, 'train_data');
+    const folders = (await fs.readdir(trainDataDir, { withFileTypes: true }).catch(() => []))
+        .filter(e => e.isDirectory())
+        .map(e => e.name);
+
+    const entries: { key: string; text: string | null }[] = [];
+    for (const folder of folders) {
+        for (const [file, record] of await readCaptions(projectId, folder)) {
+            entries.push({ key: `${folder}/${file}`, text: record.text });
+        }
+    }
+
+    const db = openIndex(projectId);
+    db.transaction(() => {
+        db.exec('DELETE FROM postings; DELETE FROM images; DELETE FROM tags;');
+        updateTagIndex(projectId, entries);
+        db.prepare(`INSERT OR REPLACE INTO meta (key, value) VALUES ('built_at', ?)`).run(new Date().toISOString());
+    })();
+    return entries.length;
+}
+
+// Builds the index on first use; after that writers keep it current
+export async function ensureTagIndex(projectId: string) {
+    const db = openIndex(projectId);
+    const built = db.prepare(`SELECT value FROM meta WHERE key = 'built_at'`).get();
+    if (!built) await rebuildTagIndex(projectId);
+}
+
+// Tags by count, optionally only those starting with prefix (autocomplete)
+export function listTags(projectId: string, prefix = '', limit = 100): TagCount[] {
+    const db = openIndex(projectId);
+    const norm = normalizeTag(prefix);
+    if (norm) {
+        return db.prepare('SELECT tag, count FROM tags WHERE tag >= ? AND tag < ? AND count > 0 ORDER BY count DESC LIMIT ?')
+            .all(norm, prefixEnd(norm), limit) as TagCount[];
+    }
+    return db.prepare('SELECT tag, count FROM tags WHERE count > 0 ORDER BY count DESC LIMIT ?').all(limit) as TagCount[];
+}
+
+// Tags most often seen on the same images as `tag`
+export function cooccurringTags(projectId: string, tag: string, limit = 20): TagCount[] {
+    const db = openIndex(projectId);
+    return db.prepare(`
+        SELECT t.tag AS tag, COUNT(*) AS count
+        FROM tags base
+        JOIN postings p1 ON p1.tag_id = base.id
+        JOIN postings p2 ON p2.image_id = p1.image_id AND p2.tag_id != base.id
+        JOIN tags t ON t.id = p2.tag_id
+        WHERE base.tag = ?
+        GROUP BY p2.tag_id
+        ORDER BY count DESC
+        LIMIT ?
+    `).all(normalizeTag(tag), limit) as TagCount[];
+}
+
+// Smallest string greater than every string starting with prefix
+function prefixEnd(prefix: string) {
+    return prefix.slice(0, -1) + String.fromCharCode(prefix.charCodeAt(prefix.length - 1) + 1);
+}
+
+// --- query language -------------------------------------------------------
+//
+//   long_hair smile             both (AND is implicit; "AND" may be written out)
+//   blonde_hair OR red_hair     either
+//   1girl -hat / 1girl NOT hat  without (a dash only negates before a letter or digit:
+//                               -_- is a tag; quote it, "-hat", to search a tag starting with -)
+//   hair_*                      any tag with the prefix
+//   "long hair"                 quoted tags may use spaces
+//   (a OR b) -c                 grouping
+
+type TagQuery =
+    | { type: 'tag'; tag: string }
+    | { type: 'prefix'; prefix: string }
+    | { type: 'not'; query: TagQuery }
+    | { type: 'and' | 'or'; queries: TagQuery[] };
+
+function tokenize(query: string): string[] {
+    const tokens: string[] = [];
+    const re = /\s*(?:"([^"]*)"|(\()|(\))|([^\s()"]+))/y;
+    let pos = 0;
+    while (pos < query.length) {
+        re.lastIndex = pos;
+        const match = re.exec(query);
+        if (!match) {
+            if (query.slice(pos).trim()) throw new TagQueryError('Unterminated quote');
+            break;
+        }
+        pos = re.lastIndex;
+        if (match[1] !== undefined) tokens.push(`"${match[1]}`); // Marked as a literal tag
+        else tokens.push(match[2] || match[3] || match[4]);
+    }
+    return tokens;
+}
+
+export function parseTagQuery(query: string): TagQuery {
+    const tokens = tokenize(query);
+    let pos = 0;
+
+    const parseOr = (): TagQuery => {
+        const queries = [parseAnd()];
+        while (tokens[pos] === 'OR') {
+            pos++;
+            queries.push(parseAnd());
+        }
+        return queries.length === 1 ? queries[0] : { type: 'or', queries };
+    };
+
+    const parseAnd = (): TagQuery => {
+        const queries = [parseNot()];
+        while (pos < tokens.length && tokens[pos] !== 'OR' && tokens[pos] !== ')') {
+            if (tokens[pos] === 'AND') pos++;
+            queries.push(parseNot());
+        }
+        return queries.length === 1 ? queries[0] : { type: 'and', queries };
+    };
+
+    const parseNot = (): TagQuery => {
+        const token = tokens[pos];
+        if (token === 'NOT') {
+            pos++;
+            return { type: 'not', query: parseNot() };
+        }
+        // "-hat", or a lone "-" before a quoted tag or group. Only a letter or digit after
+        // the dash negates, so tags like -_- can still be searched (or quote them).
+        if (token && /^-[\p{L}\p{N}]/u.test(token)) {
+            tokens[pos] = token.slice(1);
+            return { type: 'not', query: parseNot() };
+        }
+        if (token === '-' && (tokens[pos + 1] === '(' || tokens[pos + 1]?.startsWith('"'))) {
+            pos++;
+            return { type: 'not', query: parseNot() };
+        }
+        return parseAtom();
+    };
+
+    const parseAtom = (): TagQuery => {
+        const token = tokens[pos++];
+        if (token === undefined) throw new TagQueryError('Unexpected end of query');
+        if (token === '(') {
+            const inner = parseOr();
+            if (tokens[pos++] !== ')') throw new TagQueryError('Missing )');
+            return inner;
+        }
+        if (token === ')' || token === 'OR' || token === 'AND') throw new TagQueryError(`Unexpected ${token}`);
+        if (token.startsWith('"')) return { type: 'tag', tag: normalizeTag(token.slice(1)) };
+        if (token.endsWith('*')) {
+            const prefix = normalizeTag(token.slice(0, -1));
+            if (!prefix) throw new TagQueryError('Prefix search needs at least one character');
+            return { type: 'prefix', prefix };
+        }
+        return { type: 'tag', tag: normalizeTag(token) };
+    };
+
+    const parsed = parseOr();
+    if (pos < tokens.length) throw new TagQueryError(`Unexpected ${tokens[pos]}`);
+    return parsed;
+}
+
+// Compiles a query to a SELECT of image ids (compound selects over the postings index)
+function compile(query: TagQuery, params: unknown[]): string {
+    switch (query.type) {
+        case 'tag':
+            params.push(query.tag);
+            return 'SELECT p.image_id FROM postings p JOIN tags t ON t.id = p.tag_id WHERE t.tag = ?';
+        case 'prefix':
+            params.push(query.prefix, prefixEnd(query.prefix));
+            return 'SELECT DISTINCT p.image_id FROM postings p JOIN tags t ON t.id = p.tag_id WHERE t.tag >= ? AND t.tag < ?';
+        case 'not':
+            return `SELECT id AS image_id FROM images EXCEPT SELECT image_id FROM (${compile(query.query, params)})`;
+        case 'or':
+            return query.queries.map(q => `SELECT image_id FROM (${compile(q, params)})`).join(' UNION ');
+        case 'and': {
+            // Intersect the positive terms, then subtract the negated ones
+            const positive = query.queries.filter(q => q.type !== 'not');
+            const negative = query.queries.filter(q => q.type === 'not') as { type: 'not'; query: TagQuery }[];
+            const parts = positive.length > 0
+                ? positive.map(q => `SELECT image_id FROM (${compile(q, params)})`).join(' INTERSECT ')
+                : 'SELECT id AS image_id FROM images';
+            const excluded = negative.map(q => ` EXCEPT SELECT image_id FROM (${compile(q.query, params)})`).join('');
+            return parts + excluded;
+        }
+    }
+}
+
+/**
+ * Images matching a tag query, sorted by key. limit 0 returns every match.
+ * Throws TagQueryError for malformed queries.
+ */
+export function queryTagIndex(projectId: string, query: string, limit = 100, offset = 0): TagQueryResult {
+    const started = performance.now();
+    const db = openIndex(projectId);
+    const params: unknown[] = [];
+    const sql = compile(parseTagQuery(query), params);
+
+    const total = (db.prepare(`SELECT COUNT(*) AS n FROM (${sql})`).get(...params) as { n: number }).n;
+    const rows = db.prepare(`
+        SELECT key FROM images WHERE id IN (${sql}) ORDER BY key
+        ${limit > 0 ? 'LIMIT ? OFFSET ?' : ''}
+    `).all(...params, ...(limit > 0 ? [limit, offset] : [])) as { key: string }[];
+
+    return { total, ids: rows.map(r => r.key), tookMs: Math.round((performance.now() - started) * 100) / 100 };
+}
+
+export function closeTagIndex(projectId: string) {
+    const db = indexes.get(projectId);
+    if (db) {
+        indexes.delete(projectId);
+        if (db.open) db.close();
+    }
+}
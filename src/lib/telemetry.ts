@@ -0,0 +1,371 @@
+import fs from 'fs/promises';
+import path from 'path';
+
+// Training telemetry: log ring buffer + compact metric time series per run.
+// Runs are persisted under projects/<id>/train_runs/<runId>/:
+//   run.json    - run metadata and final status
+//   series.f64  - metric rows, SERIES_FIELDS.length little-endian float64 values per row
+//   logs.txt    - tail of the log at the end of the run
+
+export const LOG_RING_CAPACITY = 2000;
+// Default number of points returned to charts
+export const DEFAULT_MAX_POINTS = 300;
+// How often new series rows are appended to disk while a run is active
+const PERSIST_INTERVAL_MS = 5000;
+
+export const SERIES_FIELDS = ['step', 'loss', 'avrLoss', 'lr', 'itPerSec', 'elapsed'] as const;
+export type SeriesField = typeof SERIES_FIELDS[number];
+export type TelemetryPoint = Partial<Record<SeriesField, number>>;
+
+export interface ParsedTrainingLine {
+    step?: number;
+    totalSteps?: number;
+    loss?: number;
+    avrLoss?: number;
+    lr?: number;
+    itPerSec?: number;
+}
+
+export interface RunMeta {
+    runId: string;
+    startedAt: string;
+    finishedAt?: string;
+    status: string;
+    totalSteps?: number;
+}
+
+export interface SeriesQueryResult {
+    runId: string;
+    status: string;
+    totalPoints: number;
+    // Downsampled columns; null where the metric wasn't reported
+    series: Record<SeriesField, (number | null)[]>;
+}
+
+// Fixed-capacity log buffer. push() is O(1): the oldest line is overwritten once full.
+export class LogRing {
+    private lines: string[];
+    private start = 0;
+    private count = 0;
+    // Lines ever pushed; lets a writer tell whether its last line is still the newest
+    private pushedTotal = 0;
+
+    constructor(capacity: number = LOG_RING_CAPACITY) {
+        this.lines = new Array(capacity);
+    }
+
+    get size() {
+        return this.count;
+    }
+
+    get pushed() {
+        return this.pushedTotal;
+    }
+
+    push(line: string) {
+        const capacity = this.lines.length;
+        if (this.count < capacity) {
+            this.lines[(this.start + this.count) % capacity] = line;
+            this.count++;
+        } else {
+            this.lines[this.start] = line;
+            this.start = (this.start + 1) % capacity;
+        }
+        this.pushedTotal++;
+    }
+
+    // Overwrites the newest line (a \r redraw in a terminal)
+    replaceLast(line: string) {
+        if (this.count === 0) return this.push(line);
+        this.lines[(this.start + this.count - 1) % this.lines.length] = line;
+    }
+
+    // Oldest first. Only materialized when someone asks (e.g. the status endpoint).
+    toArray(limit: number = this.count): string[] {
+        const n = Math.min(limit, this.count);
+        const out = new Array<string>(n);
+        const capacity = this.lines.length;
+        const offset = this.count - n;
+        for (let i = 0; i < n; i++) {
+            out[i] = this.lines[(this.start + offset + i) % capacity];
+        }
+        return out;
+    }
+}
+
+// Column-oriented metric storage in growable Float64Arrays. Missing values are NaN.
+export class MetricSeries {
+    private columns: Float64Array[];
+    private length = 0;
+
+    constructor(initialCapacity: number = 1024) {
+        this.columns = SERIES_FIELDS.map(() => new Float64Array(initialCapacity).fill(NaN));
+    }
+
+    get size() {
+        return this.length;
+    }
+
+    // Values for the same step as the latest row are merged into it,
+    // so tqdm redraws don't create duplicate samples.
+    record(point: TelemetryPoint) {
+        const stepCol = this.columns[0];
+        const sameStep = this.length > 0 && point.step !== undefined && stepCol[this.length - 1] === point.step;
+        if (!sameStep) {
+            this.ensureCapacity(this.length + 1);
+            this.length++;
+        }
+        const row = this.length - 1;
+        SERIES_FIELDS.forEach((field, col) => {
+            const value = point[field];
+            if (value !== undefined && !isNaN(value)) this.columns[col][row] = value;
+        });
+    }
+
+    get(field: SeriesField, row: number): number {
+        return this.columns[SERIES_FIELDS.indexOf(field)][row];
+    }
+
+    latest(field: SeriesField): number | undefined {
+        const col = this.columns[SERIES_FIELDS.indexOf(field)];
+        for (let row = this.length - 1; row >= 0; row--) {
+            if (!isNaN(col[row])) return col[row];
+        }
+        return undefined;
+    }
+
+    // Row-major little-endian float64 encoding of rows [from, to)
+    encodeRows(from: number, to: number = this.length): Buffer {
+        const width = SERIES_FIELDS.length;
+        const buf = Buffer.alloc(Math.max(0, to - from) * width * 8);
+        for (let row = from; row < to; row++) {
+            for (let col = 0; col < width; col++) {
+                buf.writeDoubleLE(this.columns[col][row], ((row - from) * width + col) * 8);
+            }
+        }
+        return buf;
+    }
+
+    static decode(buf: Buffer): MetricSeries {
+        const width = SERIES_FIELDS.length;
+        const rows = Math.floor(buf.length / (width * 8));
+        const series = new MetricSeries(Math.max(rows, 1));
+        for (let row = 0; row < rows; row++) {
+            for (let col = 0; col < width; col++) {
+                series.columns[col][row] = buf.readDoubleLE((row * width + col) * 8);
+            }
+        }
+        series.length = rows;
+        return series;
+    }
+
+    /**
+     * Bucket-averages the rows after `sinceStep` down to at most `maxPoints`.
+     * Each bucket reports its last step and the mean of every other metric.
+     */
+    downsample(maxPoints: number = DEFAULT_MAX_POINTS, sinceStep?: number): Record<SeriesField, (number | null)[]> {
+        const stepCol = this.columns[0];
+        let first = 0;
+        if (sinceStep !== undefined) {
+            while (first < this.length && stepCol[first] <= sinceStep) first++;
+        }
+
+        const rows = this.length - first;
+        const buckets = Math.min(rows, Math.max(1, maxPoints));
+        const out = Object.fromEntries(SERIES_FIELDS.map(f => [f, [] as (number | null)[]])) as Record<SeriesField, (number | null)[]>;
+
+        for (let b = 0; b < buckets; b++) {
+            const from = first + Math.floor((b * rows) / buckets);
+            const to = first + Math.floor(((b + 1) * rows) / buckets);
+            SERIES_FIELDS.forEach((field, col) => {
+                const column = this.columns[col];
+                if (field === 'step' || field === 'elapsed') {
+                    const v = column[to - 1];
+                    out[field].push(isNaN(v) ? null : v);
+                    return;
+                }
+                let sum = 0;
+                let n = 0;
+                for (let row = from; row < to; row++) {
+                    if (!isNaN(column[row])) {
+                        sum += column[row];
+                        n++;
+                    }
+                }
+                out[field].push(n > 0 ? sum / n : null);
+            });
+        }
+        return out;
+    }
+
+    private ensureCapacity(needed: number) {
+        const capacity = this.columns[0].length;
+        if (needed <= capacity) return;
+        const next = Math.max(needed, capacity * 2);
+        this.columns = this.columns.map(col => {
+            const grown = new Float64Array(next).fill(NaN);
+            grown.set(col.subarray(0, this.length));
+            return grown;
+        });
+    }
+}
+
+const STEP_RE = /(\d+)\/(\d+)/;
+const RATE_RE = /([\d.]+)\s*(it\/s|s\/it)/;
+const KV_RE = /\b(avr_loss|loss|current_loss|lr)[=:]\s*([-+]?\d*\.?\d+(?:[eE][-+]?\d+)?)/g;
+
+// Parses an sd-scripts / tqdm progress line, e.g.
+// "steps:  12%|█▏  | 120/1000 [01:23<10:00,  1.43it/s, avr_loss=0.0912]"
+export function parseTrainingLine(line: string): ParsedTrainingLine | null {
+    const isProgress = line.includes('|') || line.includes('it/s') || line.includes('s/it') || line.includes('steps:');
+    if (!isProgress) return null;
+
+    const parsed: ParsedTrainingLine = {};
+
+    const stepMatch = line.match(STEP_RE);
+    if (stepMatch) {
+        const current = parseInt(stepMatch[1]);
+        const total = parseInt(stepMatch[2]);
+        if (!isNaN(current) && !isNaN(total) && total > 0) {
+            parsed.step = current;
+            parsed.totalSteps = total;
+        }
+    }
+
+    const rateMatch = line.match(RATE_RE);
+    if (rateMatch) {
+        const rate = parseFloat(rateMatch[1]);
+        if (rate > 0) parsed.itPerSec = rateMatch[2] === 'it/s' ? rate : 1 / rate;
+    }
+
+    for (const [, key, value] of line.matchAll(KV_RE)) {
+        const v = parseFloat(value);
+        if (isNaN(v)) continue;
+        if (key === 'avr_loss') parsed.avrLoss = v;
+        else if (key === 'lr') parsed.lr = v;
+        else parsed.loss = v;
+    }
+
+    return Object.keys(parsed).length > 0 ? parsed : null;
+}
+
+export function getRunsDir(projectId: string) {
+    return path.join(process.cwd(), 'projects', projectId, 'train_runs');
+}
+
+// Collects logs and metrics for one training run and persists them incrementally.
+export class RunTelemetry {
+    readonly logs = new LogRing();
+    readonly series = new MetricSeries();
+    readonly meta: RunMeta;
+
+    private runDir: string;
+    private startedAtMs: number;
+    private persistedRows = 0;
+    private timer: NodeJS.Timeout | null = null;
+    private writing: Promise<void> = Promise.resolve();
+
+    constructor(projectId: string, runId: string, startedAt: string, totalSteps?: number) {
+        this.runDir = path.join(getRunsDir(projectId), runId);
+        this.startedAtMs = Date.parse(startedAt);
+        this.meta = { runId, startedAt, status: 'running', totalSteps };
+    }
+
+    async init() {
+        await fs.mkdir(this.runDir, { recursive: true });
+        await this.writeMeta();
+        this.timer = setInterval(() => this.persist(false), PERSIST_INTERVAL_MS);
+    }
+
+    // Returns the parsed progress (if any) so callers can update their status.
+    // replace overwrites the newest log line instead of adding one (progress bar redraws).
+    ingest(line: string, replace = false): ParsedTrainingLine | null {
+        if (replace) this.logs.replaceLast(line);
+        else this.logs.push(line);
+        const parsed = parseTrainingLine(line);
+        if (parsed && (parsed.step !== undefined || parsed.loss !== undefined || parsed.avrLoss !== undefined)) {
+            this.series.record({
+                step: parsed.step,
+                loss: parsed.loss,
+                avrLoss: parsed.avrLoss,
+                lr: parsed.lr,
+                itPerSec: parsed.itPerSec,
+                elapsed: (Date.now() - this.startedAtMs) / 1000
+            });
+        }
+        return parsed;
+    }
+
+    query(maxPoints?: number, sinceStep?: number): SeriesQueryResult {
+        return {
+            runId: this.meta.runId,
+            status: this.meta.status,
+            totalPoints: this.series.size,
+            series: this.series.downsample(maxPoints, sinceStep)
+        };
+    }
+
+    // Safe to call more than once (a failed spawn emits both 'error' and 'close'); the first status wins
+    async finish(status: string) {
+        if (this.meta.finishedAt) return;
+        if (this.timer) {
+            clearInterval(this.timer);
+            this.timer = null;
+        }
+        this.meta.status = status;
+        this.meta.finishedAt = new Date().toISOString();
+        await this.persist(true);
+        await fs.writeFile(path.join(this.runDir, 'logs.txt'), this.logs.toArray().join('\n'));
+        await this.writeMeta();
+    }
+
+    // Appends rows that can no longer change. The latest row may still be
+    // merged with later output for the same step, so it waits for the final flush.
+    private persist(final: boolean) {
+        const upTo = final ? this.series.size : this.series.size - 1;
+        if (upTo <= this.persistedRows) return this.writing;
+        const from = this.persistedRows;
+        this.persistedRows = upTo;
+        const rows = this.series.encodeRows(from, upTo);
+        this.writing = this.writing
+            .then(() => fs.appendFile(path.join(this.runDir, 'series.f64'), rows))
+            .catch(e => console.error(`Failed to persist telemetry for run ${this.meta.runId}`, e));
+        return this.writing;
+    }
+
+    private async writeMeta() {
+        await fs.writeFile(path.join(this.runDir, 'run.json'), JSON.stringify(this.meta, null, 2));
+    }
+}
+
+export async function listRuns(projectId: string): Promise<RunMeta[]> {
+    const runsDir = getRunsDir(projectId);
+    const dirs = await fs.readdir(runsDir).catch(() => [] as string[]);
+    const runs: RunMeta[] = [];
+    for (const dir of dirs) {
+        try {
+            runs.push(JSON.parse(await fs.readFile(path.join(runsDir, dir, 'run.json'), 'utf-8')));
+        } catch {
+            // Not a run directory
+        }
+    }
+    return runs.sort((a, b) => b.startedAt.localeCompare(a.startedAt));
+}
+
+// Loads a finished (or interrupted) run from disk
+export async function loadRunSeries(projectId: string, runId: string, maxPoints?: number, sinceStep?: number): Promise<SeriesQueryResult | null> {
+    const runDir = path.join(getRunsDir(projectId), path.basename(runId));
+    try {
+        const meta: RunMeta = JSON.parse(await fs.readFile(path.join(runDir, 'run.json'), 'utf-8'));
+        const buf = await fs.readFile(path.join(runDir, 'series.f64')).catch(() => Buffer.alloc(0));
+        const series = MetricSeries.decode(buf);
+        return {
+            runId: meta.runId,
+            status: meta.status,
+            totalPoints: series.size,
+            series: series.downsample(maxPoints, sinceStep)
+        };
+    } catch {
+        return null;
+    }
+}
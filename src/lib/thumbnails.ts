@@ -0,0 +1,194 @@
+import fs from 'fs/promises';
+import path from 'path';
+import crypto from 'crypto';
+import sharp from 'sharp';
+import { NextResponse } from 'next/server';
+import { isNotModified, validatorHeaders } from './http-cache';
+import { defaultConcurrency, mapWithConcurrency } from './concurrency';
+
+const PROJECTS_DIR = path.join(process.cwd(), 'projects');
+
+// Default size used by the crop variant strip
+export const DEFAULT_THUMB_SIZE = 512;
+// Size used by dense image grids (caption browser, processed view)
+export const GRID_THUMB_SIZE = 256;
+// Sizes accepted from ?thumb= query params, to keep the cache bounded
+export const ALLOWED_THUMB_SIZES = [128, GRID_THUMB_SIZE, DEFAULT_THUMB_SIZE, 1024];
+
+// Per-project cache budget. Least recently used thumbnails are evicted past this.
+export const THUMB_CACHE_MAX_BYTES = 256 * 1024 * 1024;
+// Prune after this many new thumbnails have been written to a project cache
+const PRUNE_EVERY_WRITES = 200;
+// Hits only refresh the LRU timestamp when it is older than this, to avoid a write per request
+const TOUCH_INTERVAL_MS = 10 * 60 * 1000;
+
+export interface CachedThumbnail {
+    path: string;
+    etag: string;
+    lastModified: Date;
+}
+
+const inFlight = new Map<string, Promise<void>>();
+const writesSincePrune = new Map<string, number>();
+
+export function getThumbCacheDir(projectId: string) {
+    return path.join(PROJECTS_DIR, projectId, '.cache', 'thumbs');
+}
+
+// Parses a ?thumb= value, returning null for anything outside ALLOWED_THUMB_SIZES
+export function parseThumbSize(value: string | null): number | null {
+    if (!value) return null;
+    const size = parseInt(value, 10);
+    return ALLOWED_THUMB_SIZES.includes(size) ? size : null;
+}
+
+/**
+ * Returns a cached JPEG thumbnail for `sourcePath`, generating it on a miss.
+ * The cache key covers source path + size + mtime + thumb size, so edits to
+ * the source invalidate the entry without any explicit bookkeeping.
+ * Throws if the source does not exist.
+ */
+export async function getThumbnail(
+    projectId: string,
+    sourcePath: string,
+    thumbSize: number = DEFAULT_THUMB_SIZE
+): Promise<CachedThumbnail> {
+    const stats = await fs.stat(sourcePath);
+    if (!stats.isFile()) throw new Error('Not a file');
+
+    const key = crypto
+        .createHash('sha1')
+        .update(`${path.resolve(sourcePath)}|${stats.size}|${stats.mtimeMs}|${thumbSize}`)
+        .digest('hex');
+    const cacheDir = getThumbCacheDir(projectId);
+    const cachePath = path.join(cacheDir, key.slice(0, 2), `${key}.jpg`);
+    const thumb = { path: cachePath, etag: `"${key}"`, lastModified: stats.mtime };
+
+    try {
+        const cached = await fs.stat(cachePath);
+        if (Date.now() - cached.mtimeMs > TOUCH_INTERVAL_MS) {
+            const now = new Date();
+            fs.utimes(cachePath, now, now).catch(() => { });
+        }
+        return thumb;
+    } catch {
+        // Miss, generate below
+    }
+
+    // Concurrent requests for the same thumbnail share one render
+    let pending = inFlight.get(key);
+    if (!pending) {
+        pending = renderThumbnail(sourcePath, cachePath, thumbSize).finally(() => inFlight.delete(key));
+        inFlight.set(key, pending);
+        pending.then(() => recordWrite(projectId)).catch(() => { });
+    }
+    await pending;
+
+    return thumb;
+}
+
+// Serves a cached thumbnail with ETag/Last-Modified validation (304 when unchanged).
+// Throws if the source does not exist, so callers can map that to a 404.
+export async function serveThumbnail(
+    req: Request,
+    projectId: string,
+    sourcePath: string,
+    thumbSize: number = DEFAULT_THUMB_SIZE
+): Promise<NextResponse> {
+    const thumb = await getThumbnail(projectId, sourcePath, thumbSize);
+    const headers = {
+        ...validatorHeaders(thumb.etag, thumb.lastModified),
+        // Always revalidate: cheap 304s, and edits to the source show up immediately
+        'Cache-Control': 'private, no-cache'
+    };
+
+    if (isNotModified(req, thumb.etag, thumb.lastModified)) {
+        return new NextResponse(null, { status: 304, headers });
+    }
+
+    const buffer = await fs.readFile(thumb.path);
+    return new NextResponse(buffer as any, {
+        headers: { ...headers, 'Content-Type': 'image/jpeg' }
+    });
+}
+
+async function renderThumbnail(sourcePath: string, cachePath: string, thumbSize: number) {
+    await fs.mkdir(path.dirname(cachePath), { recursive: true });
+    // Write to a temp file and rename so readers never see a partial JPEG
+    const tmpPath = `${cachePath}.${process.pid}.${crypto.randomUUID()}.tmp`;
+    try {
+        await sharp(sourcePath)
+            .resize({ width: thumbSize, height: thumbSize, fit: 'inside', withoutEnlargement: true })
+            .jpeg({ quality: 80 })
+            .toFile(tmpPath);
+        await fs.rename(tmpPath, cachePath);
+    } catch (e) {
+        await fs.unlink(tmpPath).catch(() => { });
+        throw e;
+    }
+}
+
+function recordWrite(projectId: string) {
+    const count = (writesSincePrune.get(projectId) || 0) + 1;
+    if (count >= PRUNE_EVERY_WRITES) {
+        writesSincePrune.set(projectId, 0);
+        pruneThumbnailCache(projectId).catch(e => console.error('Thumbnail cache prune failed', e));
+    } else {
+        writesSincePrune.set(projectId, count);
+    }
+}
+
+/**
+ * Evicts least recently used thumbnails until the project cache is below
+ * 80% of `maxBytes`. Recency is the file mtime, refreshed on cache hits.
+ */
+export async function pruneThumbnailCache(projectId: string, maxBytes: number = THUMB_CACHE_MAX_BYTES) {
+    const cacheDir = getThumbCacheDir(projectId);
+    const entries: { path: string; size: number; mtimeMs: number }[] = [];
+
+    const buckets = await fs.readdir(cacheDir).catch(() => [] as string[]);
+    for (const bucket of buckets) {
+        const bucketDir = path.join(cacheDir, bucket);
+        const files = await fs.readdir(bucketDir).catch(() => [] as string[]);
+        for (const file of files) {
+            if (!file.endsWith('.jpg')) continue;
+            try {
+                const stats = await fs.stat(path.join(bucketDir, file));
+                entries.push({ path: path.join(bucketDir, file), size: stats.size, mtimeMs: stats.mtimeMs });
+            } catch {
+                // Removed concurrently
+            }
+        }
+    }
+
+    let total = entries.reduce((sum, e) => sum + e.size, 0);
+    if (total <= maxBytes) return;
+
+    const target = maxBytes * 0.8;
+    entries.sort((a, b) => a.mtimeMs - b.mtimeMs);
+    for (const entry of entries) {
+        if (total <= target) break;
+        await fs.unlink(entry.path).catch(() => { });
+        total -= entry.size;
+    }
+}
+
+/**
+ * Renders thumbnails for freshly written images in the background so the
+ * first grid scroll after a crop/resize job is served from cache.
+ * Fire-and-forget: failures are logged, never thrown.
+ */
+export function prewarmThumbnails(projectId: string, sourcePaths: string[], thumbSize: number = DEFAULT_THUMB_SIZE) {
+    if (sourcePaths.length === 0) return;
+
+    (async () => {
+        await mapWithConcurrency(sourcePaths, defaultConcurrency(), async (sourcePath) => {
+            try {
+                await getThumbnail(projectId, sourcePath, thumbSize);
+            } catch (e) {
+                console.warn(`Thumbnail prewarm failed for ${sourcePath}`, e);
+            }
+        });
+        await pruneThumbnailCache(projectId);
+    })().catch(e => console.error('Thumbnail prewarm failed', e));
+}
@@ -2,6 +2,15 @@ import { spawn, ChildProcess } from 'child_process';
 import path from 'path';
 import fs from 'fs/promises';
 import { v4 as uuidv4 } from 'uuid';
+import { ParsedTrainingLine, RunTelemetry, SeriesQueryResult, loadRunSeries, listRuns } from './telemetry';
+import { runPythonScript } from './python';
+import { materializeCaptions } from './captions';
+import { linkFile } from './blobs';
+
+// Bucket settings shared by the planner and sd-scripts so both build the same bucket list
+const MIN_BUCKET_RESO = 256;
+const BUCKET_RESO_STEPS = 64;
+const BUCKET_METADATA_FILE = 'meta_buckets.json';
 
 export interface TrainingConfig {
     pretrainedModelPath: string;
@@ -24,6 +33,8 @@ export interface TrainingConfig {
     seed?: number;
     captionExtension: string;
     enableBucket: boolean;
+    // Pre-resize images to their buckets at staging time (only used with enableBucket, defaults on)
+    preResizeBuckets?: boolean;
     repeats: number;
     trainerScriptPath: string;
     modelFamily?: string;
@@ -59,7 +70,7 @@ interface ActiveJob {
     runId: string;
     process: ChildProcess;
     status: TrainingStatus;
-    logBuffer: string[];
+    telemetry: RunTelemetry;
 }
 
 class TrainingManager {
@@ -88,10 +99,22 @@ class TrainingManager {
         }
         return {
             ...job.status,
-            lastLogs: [...job.logBuffer] // Return copy
+            lastLogs: job.telemetry.logs.toArray() // Materialized per request, not per log line
         };
     }
 
+    // Downsampled metric series for a run. Defaults to the current (or most recent) run.
+    public async getTelemetry(projectId: string, runId?: string, maxPoints?: number, sinceStep?: number): Promise<SeriesQueryResult | null> {
+        const job = this.jobs.get(projectId);
+        if (job && (!runId || runId === job.runId)) {
+            return job.telemetry.query(maxPoints, sinceStep);
+        }
+
+        const targetRunId = runId || (await listRuns(projectId))[0]?.runId;
+        if (!targetRunId) return null;
+        return loadRunSeries(projectId, targetRunId, maxPoints, sinceStep);
+    }
+
     public async startTraining(projectId: string, config: TrainingConfig, pythonPath: string = 'python', trainerScriptPath: string): Promise<string> {
         if (this.jobs.has(projectId)) {
             const job = this.jobs.get(projectId);
@@ -134,13 +157,30 @@ class TrainingManager {
         await fs.rm(stagingRoot, { recursive: true, force: true }).catch(() => { });
         await fs.mkdir(stagingDir, { recursive: true });
 
-        // Copy all files from sourceDir to stagingDir
+        // Captions first: sidecars are copied, stored captions are materialized here
+        // (the only place they exist as files), and the bucket planner reads them from stagingDir
         for (const file of files) {
-            // Copy images and text files
-            if (/\.(png|jpg|jpeg|webp|txt|caption)$/i.test(file)) {
+            if (/\.(txt|caption)$/i.test(file)) {
                 await fs.copyFile(path.join(sourceDir, file), path.join(stagingDir, file));
             }
         }
+        await materializeCaptions(projectId, path.basename(sourceDir), stagingDir, config.captionExtension || '.txt');
+
+        // With bucketing on, images are pre-resized to their bucket once here instead of
+        // sd-scripts sizing every file at startup and resizing them on every step
+        let bucketMetadataPath: string | null = null;
+        if (config.enableBucket && config.preResizeBuckets !== false) {
+            bucketMetadataPath = await this.stageBucketedDataset(projectDir, sourceDir, stagingDir, config);
+        }
+
+        // Link images (blob store hardlinks) unless the planner already wrote bucket-sized ones
+        if (!bucketMetadataPath) {
+            for (const file of files) {
+                if (/\.(png|jpg|jpeg|webp)$/i.test(file)) {
+                    await linkFile(projectId, path.join(sourceDir, file), path.join(stagingDir, file));
+                }
+            }
+        }
 
         // Verify staging
         const stagedFiles = await fs.readdir(stagingDir);
@@ -154,8 +194,11 @@ class TrainingManager {
         const startedAt = new Date().toISOString();
 
         // Generate Command
-        // Pass the STAGING ROOT as train_data_dir (parent of concept folder)
-        const args = this.constructArgs(config, stagingRoot);
+        // Pass the STAGING ROOT as train_data_dir (parent of concept folder).
+        // Pre-bucketed datasets use the fine-tuning layout: the concept folder plus the metadata JSON.
+        const args = bucketMetadataPath
+            ? this.constructArgs(config, stagingDir, bucketMetadataPath)
+            : this.constructArgs(config, stagingRoot);
 
         console.log('Starting training with command:', pythonPath, '-X utf8', trainerScriptPath, args.join(' '));
 
@@ -188,31 +231,36 @@ class TrainingManager {
             lastLogs: []
         };
 
+        const telemetry = new RunTelemetry(projectId, runId, startedAt, totalSteps);
+        await telemetry.init();
+
         const job: ActiveJob = {
             projectId,
             runId,
             process: child,
             status: initialStatus,
-            logBuffer: []
+            telemetry
         };
 
         this.jobs.set(projectId, job);
 
         // Stream Handling
-        const handleOutput = (data: Buffer) => {
-            const lines = data.toString().split('\n');
-            for (const line of lines) {
-                if (!line.trim()) continue;
-                this.appendLog(job, line);
-                this.parseProgress(job, line);
-            }
-        };
+        const stdout = this.createOutputHandler(job);
+        const stderr = this.createOutputHandler(job);
+        child.stdout?.on('data', stdout.write);
+        child.stderr?.on('data', stderr.write);
 
-        child.stdout?.on('data', handleOutput);
-        child.stderr?.on('data', handleOutput);
+        const finishTelemetry = (status: string) => {
+            job.telemetry.finish(status).catch(e => console.error(`Failed to finish telemetry for run ${runId}`, e));
+        };
 
         child.on('close', (code) => {
-            if (job.status.status === 'canceled') return;
+            stdout.flush();
+            stderr.flush();
+            if (job.status.status === 'canceled') {
+                finishTelemetry('canceled');
+                return;
+            }
 
             if (code === 0) {
                 job.status.status = 'completed';
@@ -222,11 +270,15 @@ class TrainingManager {
                 job.status.status = 'failed';
                 job.status.progress.message = `Failed with exit code ${code}`;
             }
+            finishTelemetry(job.status.status);
         });
 
         child.on('error', (err) => {
             job.status.status = 'failed';
+            job.status.progress.message = `Error spawning process: ${err.message}`;
             this.appendLog(job, `Error spawning process: ${err.message}`);
+            // 'close' may never follow a failed spawn; this also stops the persist timer
+            finishTelemetry('failed');
         });
 
         return runId;
@@ -241,7 +293,49 @@ class TrainingManager {
         job.process.kill();
     }
 
-    private constructArgs(config: TrainingConfig, datasetRoot: string): string[] {
+    // Runs scripts/bucket_planner.py. Returns the metadata path, or null to fall back to a plain copy.
+    private async stageBucketedDataset(projectDir: string, sourceDir: string, stagingDir: string, config: TrainingConfig): Promise<string | null> {
+        const metadataPath = path.join(stagingDir, BUCKET_METADATA_FILE);
+        try {
+            const output = await runPythonScript('bucket_planner.py', [
+                '--source-dir', sourceDir,
+                '--output-dir', stagingDir,
+                '--metadata', metadataPath,
+                '--resolution', `${config.width},${config.height}`,
+                '--min-bucket-reso', MIN_BUCKET_RESO.toString(),
+                '--max-bucket-reso', this.maxBucketReso(config).toString(),
+                '--bucket-reso-steps', BUCKET_RESO_STEPS.toString(),
+                '--caption-dir', stagingDir,
+                '--caption-extension', config.captionExtension || '.txt',
+                '--dims-cache', path.join(projectDir, '.cache', 'image_dims.json')
+            ]);
+
+            const summaryLine = output.trim().split('\n').filter(l => !l.startsWith('PROGRESS:')).pop();
+            const summary = summaryLine ? JSON.parse(summaryLine) : null;
+            if (!summary || summary.error || summary.failed > 0 || summary.images === 0) {
+                throw new Error(summary?.error || `${summary?.failed ?? 'unknown'} images failed to resize`);
+            }
+            console.log('Bucketed dataset:', summary.buckets);
+            return metadataPath;
+        } catch (e) {
+            console.warn('Bucket planner failed, staging originals and letting sd-scripts bucket them', e);
+            // Drop partial output (keeping the captions) so the plain copy starts clean
+            const staged = await fs.readdir(stagingDir).catch(() => [] as string[]);
+            for (const file of staged) {
+                if (/\.(png|jpg|jpeg|webp)$/i.test(file) || file === BUCKET_METADATA_FILE) {
+                    await fs.rm(path.join(stagingDir, file), { force: true });
+                }
+            }
+            return null;
+        }
+    }
+
+    // sd-scripts defaults max_bucket_reso to 1024 and rejects anything below the training resolution
+    private maxBucketReso(config: TrainingConfig) {
+        return Math.max(1024, config.width, config.height);
+    }
+
+    private constructArgs(config: TrainingConfig, datasetRoot: string, bucketMetadataPath?: string): string[] {
         const args: string[] = [];
 
         if (config.pretrainedModelPath) args.push('--pretrained_model_name_or_path', config.pretrainedModelPath);
@@ -250,6 +344,11 @@ class TrainingManager {
 
         // Dataset
         args.push('--train_data_dir', datasetRoot);
+        if (bucketMetadataPath) {
+            // Fine-tuning dataset: sizes come from train_resolution, repeats from the flag instead of the folder name
+            args.push('--in_json', bucketMetadataPath);
+            args.push('--dataset_repeats', config.repeats.toString());
+        }
 
         // Resolution & Batch
         args.push('--resolution', `${config.width},${config.height}`);
@@ -286,7 +385,12 @@ class TrainingManager {
         // Common Args
         if (config.seed) args.push('--seed', config.seed.toString());
         if (config.captionExtension) args.push('--caption_extension', config.captionExtension);
-        if (config.enableBucket) args.push('--enable_bucket');
+        if (config.enableBucket) {
+            args.push('--enable_bucket');
+            args.push('--min_bucket_reso', MIN_BUCKET_RESO.toString());
+            args.push('--max_bucket_reso', this.maxBucketReso(config).toString());
+            args.push('--bucket_reso_steps', BUCKET_RESO_STEPS.toString());
+        }
 
         // Advanced / Parity Args
         if (config.clipSkip && config.clipSkip > 1) {
@@ -360,30 +464,56 @@ class TrainingManager {
         return args;
     }
 
-    private appendLog(job: ActiveJob, line: string) {
-        job.logBuffer.push(line);
-        if (job.logBuffer.length > 2000) {
-            job.logBuffer.shift();
-        }
-        job.status.lastLogs = [...job.logBuffer];
+    // Logs the line and feeds it to the telemetry parsers, updating progress from the result
+    private appendLog(job: ActiveJob, line: string, replace = false) {
+        const parsed = job.telemetry.ingest(line, replace);
+        if (parsed) this.applyProgress(job, parsed);
     }
 
-    private parseProgress(job: ActiveJob, line: string) {
-        // Regex for "Step 123/1000" or similar
-        const match = line.match(/(\d+)\/(\d+)/);
-        if (match && (line.includes('|') || line.includes('it/s') || line.includes('steps:'))) {
-            const current = parseInt(match[1]);
-            const total = parseInt(match[2]);
-            if (!isNaN(current) && !isNaN(total) && total > 0) {
-                job.status.progress.step = current;
-                // Only update total if not yet set or drastically different (like initial estimate was wrong)
-                if (job.status.progress.totalSteps === 0 || Math.abs(job.status.progress.totalSteps - total) > 100) {
-                    job.status.progress.totalSteps = total;
+    // Splits one output stream into lines the way a terminal shows it. Every \r segment is
+    // parsed (each tqdm redraw carries step/loss), but later segments of the same line
+    // overwrite its log entry instead of adding one, as long as nothing else was logged
+    // in between. A trailing unterminated segment waits for its separator.
+    private createOutputHandler(job: ActiveJob) {
+        let partial = '';
+        let lineLogged = false; // The current line (since the last \n) already has a log entry
+        let lastPushed = -1;
+
+        const emit = (segment: string) => {
+            if (!segment.trim()) return;
+            this.appendLog(job, segment, lineLogged && job.telemetry.logs.pushed === lastPushed);
+            lastPushed = job.telemetry.logs.pushed;
+            lineLogged = true;
+        };
+
+        return {
+            write: (data: Buffer) => {
+                const parts = (partial + data.toString()).split(/(\r\n|\r|\n)/);
+                partial = parts.pop() ?? '';
+                for (let i = 0; i < parts.length; i += 2) {
+                    emit(parts[i]);
+                    if (parts[i + 1] !== '\r') lineLogged = false;
                 }
-                job.status.progress.percent = Math.round((current / total) * 100);
-                job.status.progress.message = `Step ${current} / ${total}`;
+            },
+            flush: () => {
+                emit(partial);
+                partial = '';
             }
+        };
+    }
+
+    private applyProgress(job: ActiveJob, parsed: ParsedTrainingLine) {
+        if (parsed.step === undefined || parsed.totalSteps === undefined) return;
+
+        const current = parsed.step;
+        const total = parsed.totalSteps;
+        job.status.progress.step = current;
+        // Only update total if not yet set or drastically different (like initial estimate was wrong)
+        if (job.status.progress.totalSteps === 0 || Math.abs(job.status.progress.totalSteps - total) > 100) {
+            job.status.progress.totalSteps = total;
         }
+        job.status.progress.percent = Math.round((current / total) * 100);
+        job.status.progress.message = `Step ${current} / ${total}`;
     }
 }
 
@@ -0,0 +1,522 @@
+import fs from 'fs';
+import path from 'path';
+import zlib from 'zlib';
+import { once } from 'events';
+import { Readable, Transform, pipeline as pipeStreams } from 'stream';
+import { pipeline } from 'stream/promises';
+
+// Minimal streaming ZIP writer (and a matching reader at the bottom).
+// Entries are written with data descriptors (general purpose bit 3), so CRC and
+// sizes are computed while the bytes stream out and nothing is buffered beyond
+// one read chunk. ZIP64 records are emitted automatically when sizes, offsets or
+// the entry count exceed the classic 32/16-bit limits.
+
+export interface ZipEntry {
+    name: string;       // Path inside the archive, '/' separated
+    filePath?: string;  // Streamed from disk
+    data?: Buffer;      // Small in-memory entries (README, metadata)
+    mtime?: Date;
+}
+
+const METHOD_STORE = 0;
+const METHOD_DEFLATE = 8;
+
+const UINT32_MAX = 0xffffffff;
+const UINT16_MAX = 0xffff;
+// Deflate can grow incompressible input slightly, so switch to ZIP64 a bit early
+const ZIP64_ENTRY_THRESHOLD = UINT32_MAX - 0x1000000;
+
+const FLAG_DATA_DESCRIPTOR = 0x0008;
+const FLAG_UTF8 = 0x0800;
+
+const VERSION_DEFAULT = 20;
+const VERSION_ZIP64 = 45;
+
+const READ_CHUNK_SIZE = 1024 * 1024;
+
+// Already-compressed formats are stored as-is; deflating them costs CPU for ~0% gain
+const STORED_EXTENSIONS = /\.(png|jpe?g|webp|gif|avif|zip|7z|gz)$/i;
+
+const CRC_TABLE = (() => {
+    const table = new Uint32Array(256);
+    for (let n = 0; n < 256; n++) {
+        let c = n;
+        for (let k = 0; k < 8; k++) {
+            c = c & 1 ? 0xedb88320 ^ (c >>> 1) : c >>> 1;
+        }
+        table[n] = c >>> 0;
+    }
+    return table;
+})();
+
+// Node >= 20.15 ships a native zlib.crc32
+const nativeCrc32 = (zlib as unknown as { crc32?: (data: Uint8Array, value?: number) => number }).crc32;
+
+export function crc32(data: Uint8Array, crc: number = 0): number {
+    if (nativeCrc32) return nativeCrc32(data, crc);
+    let c = (crc ^ UINT32_MAX) >>> 0;
+    for (let i = 0; i < data.length; i++) {
+        c = CRC_TABLE[(c ^ data[i]) & 0xff] ^ (c >>> 8);
+    }
+    return (c ^ UINT32_MAX) >>> 0;
+}
+
+function toDosDateTime(d: Date): { time: number; date: number } {
+    const year = Math.max(1980, d.getFullYear());
+    return {
+        time: (d.getHours() << 11) | (d.getMinutes() << 5) | Math.floor(d.getSeconds() / 2),
+        date: ((year - 1980) << 9) | ((d.getMonth() + 1) << 5) | d.getDate()
+    };
+}
+
+interface CentralRecord {
+    name: Buffer;
+    method: number;
+    time: number;
+    date: number;
+    crc: number;
+    compressedSize: number;
+    uncompressedSize: number;
+    offset: number;
+}
+
+function localHeader(name: Buffer, method: number, time: number, date: number, zip64: boolean): Buffer {
+    // With bit 3 set, CRC and sizes live in the data descriptor.
+    // ZIP64 entries carry a zeroed ZIP64 extra field so readers expect 8-byte descriptor sizes.
+    const extra = zip64 ? Buffer.alloc(20) : Buffer.alloc(0);
+    if (zip64) {
+        extra.writeUInt16LE(0x0001, 0);
+        extra.writeUInt16LE(16, 2);
+    }
+
+    const header = Buffer.alloc(30);
+    header.writeUInt32LE(0x04034b50, 0);
+    header.writeUInt16LE(zip64 ? VERSION_ZIP64 : VERSION_DEFAULT, 4);
+    header.writeUInt16LE(FLAG_DATA_DESCRIPTOR | FLAG_UTF8, 6);
+    header.writeUInt16LE(method, 8);
+    header.writeUInt16LE(time, 10);
+    header.writeUInt16LE(date, 12);
+    header.writeUInt32LE(0, 14);
+    header.writeUInt32LE(zip64 ? UINT32_MAX : 0, 18);
+    header.writeUInt32LE(zip64 ? UINT32_MAX : 0, 22);
+    header.writeUInt16LE(name.length, 26);
+    header.writeUInt16LE(extra.length, 28);
+    return Buffer.concat([header, name, extra]);
+}
+
+function dataDescriptor(crc: number, compressedSize: number, uncompressedSize: number, zip64: boolean): Buffer {
+    if (zip64) {
+        const buf = Buffer.alloc(24);
+        buf.writeUInt32LE(0x08074b50, 0);
+        buf.writeUInt32LE(crc, 4);
+        buf.writeBigUInt64LE(BigInt(compressedSize), 8);
+        buf.writeBigUInt64LE(BigInt(uncompressedSize), 16);
+        return buf;
+    }
+    const buf = Buffer.alloc(16);
+    buf.writeUInt32LE(0x08074b50, 0);
+    buf.writeUInt32LE(crc, 4);
+    buf.writeUInt32LE(compressedSize, 8);
+    buf.writeUInt32LE(uncompressedSize, 12);
+    return buf;
+}
+
+function centralHeader(rec: CentralRecord): Buffer {
+    // ZIP64 extra holds only the fields that overflow, in spec order
+    const extraFields: bigint[] = [];
+    if (rec.uncompressedSize >= UINT32_MAX) extraFields.push(BigInt(rec.uncompressedSize));
+    if (rec.compressedSize >= UINT32_MAX) extraFields.push(BigInt(rec.compressedSize));
+    if (rec.offset >= UINT32_MAX) extraFields.push(BigInt(rec.offset));
+
+    let extra = Buffer.alloc(0);
+    if (extraFields.length > 0) {
+        extra = Buffer.alloc(4 + extraFields.length * 8);
+        extra.writeUInt16LE(0x0001, 0);
+        extra.writeUInt16LE(extraFields.length * 8, 2);
+        extraFields.forEach((v, i) => extra.writeBigUInt64LE(v, 4 + i * 8));
+    }
+    const zip64 = extraFields.length > 0;
+
+    const header = Buffer.alloc(46);
+    header.writeUInt32LE(0x02014b50, 0);
+    header.writeUInt16LE(VERSION_ZIP64, 4); // Version made by
+    header.writeUInt16LE(zip64 ? VERSION_ZIP64 : VERSION_DEFAULT, 6);
+    header.writeUInt16LE(FLAG_DATA_DESCRIPTOR | FLAG_UTF8, 8);
+    header.writeUInt16LE(rec.method, 10);
+    header.writeUInt16LE(rec.time, 12);
+    header.writeUInt16LE(rec.date, 14);
+    header.writeUInt32LE(rec.crc, 16);
+    header.writeUInt32LE(Math.min(rec.compressedSize, UINT32_MAX), 20);
+    header.writeUInt32LE(Math.min(rec.uncompressedSize, UINT32_MAX), 24);
+    header.writeUInt16LE(rec.name.length, 28);
+    header.writeUInt16LE(extra.length, 30);
+    header.writeUInt16LE(0, 32); // Comment length
+    header.writeUInt16LE(0, 34); // Disk number start
+    header.writeUInt16LE(0, 36); // Internal attributes
+    header.writeUInt32LE(0, 38); // External attributes
+    header.writeUInt32LE(Math.min(rec.offset, UINT32_MAX), 42);
+    return Buffer.concat([header, rec.name, extra]);
+}
+
+function endOfCentralDirectory(entryCount: number, cdOffset: number, cdSize: number): Buffer {
+    const parts: Buffer[] = [];
+    const needsZip64 = entryCount >= UINT16_MAX || cdOffset >= UINT32_MAX || cdSize >= UINT32_MAX;
+
+    if (needsZip64) {
+        const zip64Eocd = Buffer.alloc(56);
+        zip64Eocd.writeUInt32LE(0x06064b50, 0);
+        zip64Eocd.writeBigUInt64LE(BigInt(44), 4); // Size of remaining record
+        zip64Eocd.writeUInt16LE(VERSION_ZIP64, 12);
+        zip64Eocd.writeUInt16LE(VERSION_ZIP64, 14);
+        zip64Eocd.writeUInt32LE(0, 16);
+        zip64Eocd.writeUInt32LE(0, 20);
+        zip64Eocd.writeBigUInt64LE(BigInt(entryCount), 24);
+        zip64Eocd.writeBigUInt64LE(BigInt(entryCount), 32);
+        zip64Eocd.writeBigUInt64LE(BigInt(cdSize), 40);
+        zip64Eocd.writeBigUInt64LE(BigInt(cdOffset), 48);
+
+        const locator = Buffer.alloc(20);
+        locator.writeUInt32LE(0x07064b50, 0);
+        locator.writeUInt32LE(0, 4);
+        locator.writeBigUInt64LE(BigInt(cdOffset + cdSize), 8);
+        locator.writeUInt32LE(1, 16);
+
+        parts.push(zip64Eocd, locator);
+    }
+
+    const eocd = Buffer.alloc(22);
+    eocd.writeUInt32LE(0x06054b50, 0);
+    eocd.writeUInt16LE(0, 4);
+    eocd.writeUInt16LE(0, 6);
+    eocd.writeUInt16LE(Math.min(entryCount, UINT16_MAX), 8);
+    eocd.writeUInt16LE(Math.min(entryCount, UINT16_MAX), 10);
+    eocd.writeUInt32LE(Math.min(cdSize, UINT32_MAX), 12);
+    eocd.writeUInt32LE(Math.min(cdOffset, UINT32_MAX), 16);
+    eocd.writeUInt16LE(0, 20);
+    parts.push(eocd);
+
+    return Buffer.concat(parts);
+}
+
+async function* entryData(entry: ZipEntry, method: number, onRaw: (chunk: Buffer) => void): AsyncGenerator<Buffer> {
+    const source: AsyncIterable<Buffer> = entry.filePath
+        ? fs.createReadStream(entry.filePath, { highWaterMark: READ_CHUNK_SIZE })
+        : [entry.data || Buffer.alloc(0)];
+
+    if (method === METHOD_STORE) {
+        for await (const chunk of source) {
+            onRaw(chunk);
+            yield chunk;
+        }
+        return;
+    }
+
+    const deflate = zlib.createDeflateRaw();
+    const feeding = (async () => {
+        for await (const chunk of source) {
+            onRaw(chunk);
+            if (!deflate.write(chunk)) await once(deflate, 'drain');
+        }
+        deflate.end();
+    })().catch(err => deflate.destroy(err));
+
+    for await (const chunk of deflate) {
+        yield chunk as Buffer;
+    }
+    await feeding;
+}
+
+async function* zipChunks(entries: Iterable<ZipEntry> | AsyncIterable<ZipEntry>): AsyncGenerator<Buffer> {
+    let offset = 0;
+    const central: CentralRecord[] = [];
+
+    for await (const entry of entries) {
+        const name = Buffer.from(entry.name, 'utf8');
+        let size = entry.data ? entry.data.length : 0;
+        let mtime = entry.mtime || new Date();
+        if (entry.filePath) {
+            const stats = await fs.promises.stat(entry.filePath);
+            size = stats.size;
+            mtime = entry.mtime || stats.mtime;
+        }
+
+        const method = STORED_EXTENSIONS.test(entry.name) ? METHOD_STORE : METHOD_DEFLATE;
+        const zip64 = size >= ZIP64_ENTRY_THRESHOLD;
+        const { time, date } = toDosDateTime(mtime);
+
+        const headerOffset = offset;
+        const header = localHeader(name, method, time, date, zip64);
+        yield header;
+        offset += header.length;
+
+        let crc = 0;
+        let uncompressedSize = 0;
+        let compressedSize = 0;
+        for await (const chunk of entryData(entry, method, raw => {
+            crc = crc32(raw, crc);
+            uncompressedSize += raw.length;
+        })) {
+            compressedSize += chunk.length;
+            offset += chunk.length;
+            yield chunk;
+        }
+
+        const descriptor = dataDescriptor(crc, compressedSize, uncompressedSize, zip64);
+        yield descriptor;
+        offset += descriptor.length;
+
+        central.push({ name, method, time, date, crc, compressedSize, uncompressedSize, offset: headerOffset });
+    }
+
+    const cdOffset = offset;
+    let cdSize = 0;
+    for (const rec of central) {
+        const record = centralHeader(rec);
+        cdSize += record.length;
+        yield record;
+    }
+
+    yield endOfCentralDirectory(central.length, cdOffset, cdSize);
+}
+
+/**
+ * Returns a web ReadableStream producing a ZIP archive of `entries`.
+ * Pull-based: files are only read as fast as the consumer (e.g. the HTTP
+ * response) drains them, so memory use stays flat regardless of dataset size.
+ */
+export function createZipStream(entries: Iterable<ZipEntry> | AsyncIterable<ZipEntry>): ReadableStream<Uint8Array> {
+    const iterator = zipChunks(entries);
+
+    return new ReadableStream<Uint8Array>({
+        async pull(controller) {
+            try {
+                const { value, done } = await iterator.next();
+                if (done) {
+                    controller.close();
+                } else {
+                    controller.enqueue(value);
+                }
+            } catch (e) {
+                controller.error(e);
+            }
+        },
+        async cancel() {
+            await iterator.return(undefined);
+        }
+    });
+}
+
+// Streaming ZIP reader.
+// Only the central directory is parsed (read from the end of the file in bounded
+// chunks); entry data is streamed straight from disk through inflate, so
+// extracting an archive never holds more than a read chunk per entry in memory.
+
+export interface ZipReaderEntry {
+    name: string;
+    method: number;
+    flags: number;
+    crc: number;
+    compressedSize: number;
+    uncompressedSize: number;
+    offset: number;     // Of the local header
+    isDirectory: boolean;
+}
+
+const SIG_EOCD = 0x06054b50;
+const SIG_ZIP64_LOCATOR = 0x07064b50;
+const SIG_ZIP64_EOCD = 0x06064b50;
+const SIG_CENTRAL = 0x02014b50;
+const SIG_LOCAL = 0x04034b50;
+const FLAG_ENCRYPTED = 0x0001;
+const EOCD_SEARCH = 22 + UINT16_MAX; // Fixed record plus the longest comment
+
+async function readAt(handle: fs.promises.FileHandle, position: number, length: number): Promise<Buffer> {
+    const buf = Buffer.alloc(length);
+    const { bytesRead } = await handle.read(buf, 0, length, position);
+    if (bytesRead < length) throw new Error('Invalid zip: unexpected end of file');
+    return buf;
+}
+
+async function findCentralDirectory(handle: fs.promises.FileHandle, fileSize: number) {
+    const tailLength = Math.min(fileSize, EOCD_SEARCH);
+    const tail = await readAt(handle, fileSize - tailLength, tailLength);
+
+    let eocd = -1;
+    for (let i = tail.length - 22; i >= 0; i--) {
+        if (tail.readUInt32LE(i) === SIG_EOCD) {
+            eocd = i;
+            break;
+        }
+    }
+    if (eocd < 0) throw new Error('Invalid zip: end of central directory not found');
+
+    let count = tail.readUInt16LE(eocd + 10);
+    let size = tail.readUInt32LE(eocd + 12);
+    let offset = tail.readUInt32LE(eocd + 16);
+
+    if (count === UINT16_MAX || size === UINT32_MAX || offset === UINT32_MAX) {
+        const locatorPos = fileSize - tailLength + eocd - 20;
+        const locator = locatorPos >= 0 ? await readAt(handle, locatorPos, 20) : null;
+        if (locator && locator.readUInt32LE(0) === SIG_ZIP64_LOCATOR) {
+            const record = await readAt(handle, Number(locator.readBigUInt64LE(8)), 56);
+            if (record.readUInt32LE(0) !== SIG_ZIP64_EOCD) throw new Error('Invalid zip: bad ZIP64 record');
+            count = Number(record.readBigUInt64LE(32));
+            size = Number(record.readBigUInt64LE(40));
+            offset = Number(record.readBigUInt64LE(48));
+        }
+    }
+    if (offset + size > fileSize) throw new Error('Invalid zip: central directory out of range');
+    return { count, size, offset };
+}
+
+function parseCentralRecord(buf: Buffer, pos: number): { entry: ZipReaderEntry; length: number } {
+    const flags = buf.readUInt16LE(pos + 8);
+    const nameLength = buf.readUInt16LE(pos + 28);
+    const extraLength = buf.readUInt16LE(pos + 30);
+    const commentLength = buf.readUInt16LE(pos + 32);
+    const name = buf.toString('utf8', pos + 46, pos + 46 + nameLength);
+
+    let uncompressedSize = buf.readUInt32LE(pos + 24);
+    let compressedSize = buf.readUInt32LE(pos + 20);
+    let offset = buf.readUInt32LE(pos + 42);
+
+    // ZIP64 extra: only the fields that overflowed, in this order
+    let extra = pos + 46 + nameLength;
+    const extraEnd = extra + extraLength;
+    while (extra + 4 <= extraEnd) {
+        const id = buf.readUInt16LE(extra);
+        const length = buf.readUInt16LE(extra + 2);
+        if (id === 0x0001) {
+            let field = extra + 4;
+            if (uncompressedSize === UINT32_MAX) { uncompressedSize = Number(buf.readBigUInt64LE(field)); field += 8; }
+            if (compressedSize === UINT32_MAX) { compressedSize = Number(buf.readBigUInt64LE(field)); field += 8; }
+            if (offset === UINT32_MAX) { offset = Number(buf.readBigUInt64LE(field)); }
+        }
+        extra += 4 + length;
+    }
+
+    return {
+        entry: {
+            name,
+            method: buf.readUInt16LE(pos + 10),
+            flags,
+            crc: buf.readUInt32LE(pos + 16),
+            compressedSize,
+            uncompressedSize,
+            offset,
+            isDirectory: name.endsWith('/')
+        },
+        length: 46 + nameLength + extraLength + commentLength
+    };
+}
+
+/**
+ * Lists the entries of a ZIP file on disk from its central directory (ZIP64 aware).
+ * Only entry metadata is kept; the directory itself is read in READ_CHUNK_SIZE pieces.
+ */
+export async function listZipEntries(zipPath: string): Promise<ZipReaderEntry[]> {
+    const handle = await fs.promises.open(zipPath, 'r');
+    try {
+        const { size: fileSize } = await handle.stat();
+        const cd = await findCentralDirectory(handle, fileSize);
+
+        const entries: ZipReaderEntry[] = [];
+        let buf = Buffer.alloc(0);
+        let position = cd.offset;
+        const end = cd.offset + cd.size;
+
+        while (entries.length < cd.count) {
+            // Refill until the next record (fixed part plus variable fields) is complete
+            const need = buf.length >= 46 ? 46 + buf.readUInt16LE(28) + buf.readUInt16LE(30) + buf.readUInt16LE(32) : 46;
+            if (buf.length < need) {
+                if (position >= end) throw new Error('Invalid zip: truncated central directory');
+                const length = Math.min(READ_CHUNK_SIZE, end - position);
+                buf = Buffer.concat([buf, await readAt(handle, position, length)]);
+                position += length;
+                continue;
+            }
+            if (buf.readUInt32LE(0) !== SIG_CENTRAL) throw new Error('Invalid zip: bad central directory record');
+            const { entry, length } = parseCentralRecord(buf, 0);
+            entries.push(entry);
+            buf = buf.subarray(length);
+        }
+        return entries;
+    } finally {
+        await handle.close();
+    }
+}
+
+/**
+ * Streams the uncompressed bytes of one entry. The CRC and size are verified
+ * as the data flows; a mismatch (corrupt archive, or an entry inflating past its
+ * declared size) errors the stream.
+ */
+export async function openZipEntry(zipPath: string, entry: ZipReaderEntry): Promise<Readable> {
+    if (entry.flags & FLAG_ENCRYPTED) throw new Error(`Encrypted zip entries are not supported: ${entry.name}`);
+    if (entry.method !== METHOD_STORE && entry.method !== METHOD_DEFLATE) {
+        throw new Error(`Unsupported compression method ${entry.method}: ${entry.name}`);
+    }
+
+    // The local header's name/extra lengths can differ from the central record's
+    const handle = await fs.promises.open(zipPath, 'r');
+    let dataStart: number;
+    try {
+        const local = await readAt(handle, entry.offset, 30);
+        if (local.readUInt32LE(0) !== SIG_LOCAL) throw new Error(`Invalid zip: bad local header for ${entry.name}`);
+        dataStart = entry.offset + 30 + local.readUInt16LE(26) + local.readUInt16LE(28);
+    } finally {
+        await handle.close();
+    }
+
+    const raw: Readable = entry.compressedSize > 0
+        ? fs.createReadStream(zipPath, { start: dataStart, end: dataStart + entry.compressedSize - 1, highWaterMark: READ_CHUNK_SIZE })
+        : Readable.from([]);
+
+    let crc = 0;
+    let size = 0;
+    const verify = new Transform({
+        transform(chunk: Buffer, _encoding, callback) {
+            size += chunk.length;
+            if (size > entry.uncompressedSize) {
+                callback(new Error(`Zip entry larger than declared: ${entry.name}`));
+                return;
+            }
+            crc = crc32(chunk, crc);
+            callback(null, chunk);
+        },
+        flush(callback) {
+            if (size !== entry.uncompressedSize || crc !== entry.crc) {
+                callback(new Error(`Zip entry failed CRC check: ${entry.name}`));
+                return;
+            }
+            callback();
+        }
+    });
+
+    // Any failure destroys every stage (closing the file) and surfaces on the returned stream
+    const ignore = () => { };
+    return entry.method === METHOD_DEFLATE
+        ? pipeStreams(raw, zlib.createInflateRaw(), verify, ignore)
+        : pipeStreams(raw, verify, ignore);
+}
+
+// Streams one entry to dest (written to a temp file and renamed into place)
+export async function extractZipEntry(zipPath: string, entry: ZipReaderEntry, dest: string): Promise<void> {
+    await fs.promises.mkdir(path.dirname(dest), { recursive: true });
+    const tmp = `${dest}.${process.pid}.${Math.random().toString(36).slice(2, 10)}.unzip.tmp`;
+    try {
+        await pipeline(await openZipEntry(zipPath, entry), fs.createWriteStream(tmp));
+        await fs.promises.rename(tmp, dest);
+    } catch (e) {
+        await fs.promises.rm(tmp, { force: true });
+        throw e;
+    }
+}
+
+// Reads a small entry (e.g. config.json) into memory
+export async function readZipEntry(zipPath: string, entry: ZipReaderEntry, maxBytes: number = 16 * 1024 * 1024): Promise<Buffer> {
+    if (entry.uncompressedSize > maxBytes) throw new Error(`Zip entry too large to read: ${entry.name}`);
+    const chunks: Buffer[] = [];
+    for await (const chunk of await openZipEntry(zipPath, entry)) chunks.push(chunk as Buffer);
+    return Buffer.concat(chunks);
+}
@@ -17,8 +17,18 @@ export interface CaptionAdvancedSettings {
     shuffleTags: boolean;          // default true
 }
 
+// Chunks leased to workers on any machine that mounts the project folder (scripts/caption/distributed.py)
+export interface DistributedCaptionConfig {
+    enabled: boolean;
+    localWorkers?: number;         // Workers started on this machine, default 1 (0 = remote only)
+    chunkSize?: number;            // Images per lease, default 64
+}
+
 export interface CaptionConfig {
     wdModel: WDModel;              // Full WD model key
+    ensembleModels?: WDModel[];    // Extra models run in the same pass as wdModel
+    ensembleMode?: 'max' | 'mean'; // How ensemble probabilities are merged, default 'max'
+    distributed?: DistributedCaptionConfig;
     triggerWord: string;
     taggingMode?: 'append' | 'override'; // New field
     advanced: CaptionAdvancedSettings;
@@ -43,6 +53,27 @@ export const DEFAULT_CAPTION_CONFIG: CaptionConfig = {
     }
 };
 
+// Bulk tag edit rules (scripts/bulk_tags.py), applied in order to every caption.
+// Tags match case-insensitively, spaces and underscores alike; "hair_*" matches by prefix.
+export type BulkTagRule =
+    | { op: 'remove'; tags: string[] }
+    | { op: 'replace'; from: string; to: string }          // to '' removes
+    | { op: 'alias'; map: Record<string, string> }
+    | { op: 'move_to_front'; tags: string[]; keep_tokens?: number } // Placed after the first keep_tokens (trigger)
+    | { op: 'dedupe' }
+    | { op: 'max_tags'; count: number; keep_tokens?: number };
+
+export interface BulkTagResult {
+    dry_run: boolean;
+    scanned: number;
+    changed: number;
+    unreadable: number;                                   // Sidecars skipped (unreadable or not UTF-8)
+    rules: { op: BulkTagRule['op']; captions: number }[]; // Captions each rule changed
+    tag_changes: Record<string, number>;                  // Net count change per tag
+    samples: { key: string; before: string; after: string }[];
+    seconds: number;
+}
+
 // Preview result type
 export interface CaptionPreviewResult {
     image: string;
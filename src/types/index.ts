@@ -24,6 +24,12 @@ export interface AugmentationSettings {
     rotationRandom: boolean;
     rotationRange: [number, number]; // [min, max]
     flipEnabled: boolean;
+    // Variants generated per source image in one run (default 1)
+    variantsPerImage?: number;
+    colorJitter?: boolean;
+    jitterStrength?: number; // 0-1, default 0.2
+    randomCrop?: boolean;
+    cropScaleRange?: [number, number]; // Area fraction, default [0.7, 1.0]
     // Legacy/Base support
     zoom?: number;
 }
@@ -67,11 +73,23 @@ export interface ManifestItem {
     originalName?: string;
     groupId?: number;
     hash?: string;
+    hashVersion?: number; // HASH_VERSION in lib/ingest.ts; absent = v1 (unoriented)
+    blob?: string; // SHA-256 of the file in the project's blob store (lib/blobs.ts)
     blurScore?: number;
+    // Captured at upload (lib/ingest.ts): display size after EXIF orientation
+    width?: number;
+    height?: number;
+    orientation?: number; // EXIF orientation tag, 1 = as stored
     flags?: {
         isDuplicate?: boolean;
         isBlurry?: boolean;
+        isUnderexposed?: boolean;
+        isOverexposed?: boolean;
+        isNoisy?: boolean;
+        isLowRes?: boolean;
+        isExtremeAspect?: boolean;
     };
+    qa?: QaMetrics;
     excluded?: boolean;
     aug?: {
         rotate: number;
@@ -82,7 +100,38 @@ export interface ManifestItem {
     processed?: boolean;
 }
 
+// Written by scripts/qa_metrics.py (cached per content hash) or at upload by lib/ingest.ts
+export interface QaMetrics {
+    source?: 'ingest' | 'worker'; // lib/ingest.ts (sharp) or scripts/qa_metrics.py (Pillow); absent = worker
+    version: number; // Per source
+    contentHash: string; // blake2b from the worker, SHA-256 from ingest
+    width: number;
+    height: number;
+    laplacianVar: number;
+    tenengrad: number;
+    meanLuma: number; // 0-1
+    clipLow: number; // Fraction of crushed shadows
+    clipHigh: number; // Fraction of blown highlights
+    noiseSigma: number;
+}
+
 export interface ProjectManifest {
     version: number;
     items: ManifestItem[];
 }
+
+// Checkpoint library index row (lib/checkpoints.ts, scripts/checkpoint_index.py)
+export interface CheckpointEntry {
+    path: string;
+    name: string;
+    size: number;
+    mtimeMs: number;
+    format: string; // safetensors, ckpt, pt, pth
+    family: string | null; // null when the header can't tell (pickled checkpoints)
+    tensors: number | null;
+    metadata: Record<string, string> | null;
+    sha256: string | null; // null until the hash pass reaches the file
+    autov1: string | null;
+    autov2: string | null;
+    error: string | null;
+}
@@ -59,6 +59,7 @@ export interface CaptionImage {
     id: string;
     filename: string;
     url: string;
+    thumbUrl?: string; // Cached grid thumbnail
     tags: string[];
     has_caption: boolean;
     is_edited: boolean;